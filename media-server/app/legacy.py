@@ -14,6 +14,8 @@ Provides:
 - Admin user management (requires FileBrowser auth token):
   - GET /api/droppr/users: account scope config
   - POST /api/droppr/users: create scoped upload user
+- Admin cache inspection (requires FileBrowser auth token):
+  - GET /api/droppr/cache/stats: per-worker share cache stats
 - Admin analytics (requires FileBrowser auth token):
   - GET /api/analytics/config
   - GET /api/analytics/shares
@@ -31,7 +33,6 @@ import threading
 import time
 from collections import deque
 
-import requests
 import sentry_sdk
 from celery import Celery
 from flask import Flask, g, has_request_context, jsonify, request
@@ -58,6 +59,7 @@ from .routes.analytics import create_analytics_blueprint
 from .routes.comments import create_comments_blueprint
 from .routes.droppr_aliases import create_droppr_aliases_blueprint
 from .routes.droppr_auth import create_droppr_auth_blueprint
+from .routes.droppr_cache import create_droppr_cache_blueprint
 from .routes.droppr_media import create_droppr_media_blueprint
 from .routes.droppr_requests import create_droppr_requests_blueprint
 from .routes.droppr_shares import create_droppr_shares_blueprint
@@ -70,7 +72,6 @@ from .routes.share import create_share_blueprint
 from .routes.share_media import create_share_media_blueprint
 from .services.aliases import (
     _get_share_alias_meta,
-    _increment_share_alias_download_count,
     _resolve_share_hash,
 )
 from .services.analytics import (
@@ -79,12 +80,24 @@ from .services.analytics import (
     _log_auth_event,
     _log_event,
 )
+from .services.analytics_retention import (
+    ANALYTICS_RETENTION_INTERVAL_SECONDS,
+    _analytics_retention_tick,
+    _ensure_analytics_retention_scheduler,
+)
 from .services.cache import (
     REDIS_ENABLED,
+    _redis_lease_acquire,
+    _redis_lease_held,
+    _redis_lease_release,
     _redis_share_cache_get,
     _redis_share_cache_set,
+    _redis_share_index_delete,
+    _redis_share_index_get,
+    _redis_share_index_set,
 )
 from .services.container import init_services
+from .services.download_counts import _claim_share_alias_download
 from .services.file_requests import (
     CAPTCHA_ENABLED,
     REQUEST_PASSWORD_CAPTCHA_THRESHOLD,
@@ -104,9 +117,12 @@ from .services.file_requests import (
 from .services.filebrowser import (
     FILEBROWSER_BASE_URL,
     FILEBROWSER_PUBLIC_DL_API,
+    _count_public_share_requests,
     _fetch_filebrowser_resource,
     _fetch_public_share_json,
+    _filebrowser_get,
 )
+from .services.invalidation import _ensure_invalidation_listener
 from .services.media_processing import (
     HLS_CACHE_DIR,
     HLS_RENDITIONS,
@@ -141,12 +157,39 @@ from .services.media_processing import (
     _thumb_sema,
     configure_enqueue_task,
 )
+from .services.media_source import _media_source
 from .services.secrets import _load_external_secrets
 from .services.share import (
+    SHARE_CRAWL_DEADLINE_SECONDS,
+    SHARE_CRAWL_TRUNCATED_TTL_SECONDS,
+    SHARE_INDEX_ENABLED,
+    SHARE_INDEX_MAX_AGE_SECONDS,
     _build_file_share_file_list,
     _build_folder_share_file_list,
 )
-from .services.share_cache import _share_cache_lock, _share_files_cache
+from .services.share_cache import (
+    _record_share_build_coalesced,
+    _record_share_stale_served,
+    _share_build_flight,
+    _share_files_cache,
+    clear_share_cache,
+)
+from .services.share_listing import _share_list_etag
+from .services.share_manifest import (
+    SHARE_MANIFEST_ENABLED,
+    _share_manifest_get,
+    _share_manifest_set,
+)
+from .services.share_meta_cache import _fetch_public_share_json_cached, _prime_share_file_meta
+from .services.share_warmer import (
+    SHARE_CACHE_WARM_ENABLED,
+    SHARE_CACHE_WARM_INTERVAL_SECONDS,
+    SHARE_CACHE_WARM_LEAD_SECONDS,
+    ShareWarmRun,
+    _ensure_share_warm_scheduler,
+    _rank_warm_candidates,
+    _run_share_cache_warm,
+)
 from .services.video_meta import _ensure_video_meta_record, _ffprobe_video_meta
 from .tracing import configure_tracing
 from .utils.config_validation import validate_config
@@ -157,7 +200,6 @@ from .utils.jwt import (
     _peek_jwt_payload,
 )
 from .utils.request import _get_rate_limit_key, _get_request_ip
-from .utils.security import _with_internal_signature
 from .utils.totp import ADMIN_TOTP_ENABLED, _get_totp_code_from_request, _is_valid_totp
 from .utils.validation import (
     IMAGE_EXTS,
@@ -238,14 +280,24 @@ if SENTRY_DSN:
 
 # Gallery file-list caching (in-memory, per gunicorn worker)
 DEFAULT_CACHE_TTL_SECONDS = int(os.environ.get("DROPPR_SHARE_CACHE_TTL_SECONDS", "3600"))
-MAX_CACHE_SIZE = 1000  # Max number of shares to cache
-SHARE_CACHE_WARM_ENABLED = parse_bool(os.environ.get("DROPPR_SHARE_CACHE_WARM_ENABLED", "true"))
-SHARE_CACHE_WARM_INTERVAL_SECONDS = int(
-    os.environ.get("DROPPR_SHARE_CACHE_WARM_INTERVAL_SECONDS", "900")
+# Cross-worker coalescing of share list builds: lease lifetime for the building
+# worker, and how long other workers wait for its result before crawling.
+SHARE_BUILD_LEASE_SECONDS = float(
+    os.environ.get("DROPPR_SHARE_BUILD_LEASE_SECONDS", str(SHARE_CRAWL_DEADLINE_SECONDS + 15))
+)
+SHARE_BUILD_WAIT_SECONDS = float(
+    os.environ.get("DROPPR_SHARE_BUILD_WAIT_SECONDS", str(SHARE_CRAWL_DEADLINE_SECONDS + 5))
+)
+# Past its freshness window a cached list is still served for up to
+# SHARE_CACHE_STALE_SECONDS while a background refresh runs (stale-while-revalidate),
+# and for up to SHARE_CACHE_STALE_IF_ERROR_SECONDS when a rebuild fails (stale-if-error).
+SHARE_CACHE_STALE_SECONDS = max(0, int(os.environ.get("DROPPR_SHARE_CACHE_STALE_SECONDS", "600")))
+SHARE_CACHE_STALE_IF_ERROR_SECONDS = max(
+    0, int(os.environ.get("DROPPR_SHARE_CACHE_STALE_IF_ERROR_SECONDS", "86400"))
+)
+SHARE_CACHE_RETAIN_STALE_SECONDS = max(
+    SHARE_CACHE_STALE_SECONDS, SHARE_CACHE_STALE_IF_ERROR_SECONDS
 )
-SHARE_CACHE_WARM_LIMIT = int(os.environ.get("DROPPR_SHARE_CACHE_WARM_LIMIT", "20"))
-SHARE_CACHE_WARM_DAYS = int(os.environ.get("DROPPR_SHARE_CACHE_WARM_DAYS", "7"))
-_last_share_cache_warm_at: float = 0.0
 
 CELERY_BROKER_URL = (os.environ.get("DROPPR_CELERY_BROKER_URL") or "").strip()
 CELERY_RESULT_BACKEND = (
@@ -476,6 +528,11 @@ def _record_request_metrics(response) -> None:
 def _init_request_context():
     g.request_id = _generate_request_id(request.headers.get(REQUEST_ID_HEADER))
     g._request_started_at = time.perf_counter()
+    _ensure_invalidation_listener()
+    if not CELERY_ENABLED:
+        # Celery beat schedules warming and retention when Celery is configured.
+        _ensure_share_warm_scheduler(_share_cache_warm_tick)
+        _ensure_analytics_retention_scheduler()
     if METRICS_ENABLED and REQUEST_IN_FLIGHT is not None:
         REQUEST_IN_FLIGHT.inc()
         g._metrics_inflight = True
@@ -573,9 +630,9 @@ def _validate_filebrowser_admin(token: str) -> int | None:
         _log_auth_event("filebrowser_admin", False, "rate_limited")
         return 429
 
-    url = f"{FILEBROWSER_BASE_URL}/api/users"
-    headers = _with_internal_signature({"X-Auth": token}, "GET", url)
-    resp = requests.get(url, headers=headers, timeout=10)
+    resp = _filebrowser_get(
+        f"{FILEBROWSER_BASE_URL}/api/users", endpoint="users", headers={"X-Auth": token}
+    )
     if resp.status_code in {401, 403}:
         failures = _record_auth_failure(client_ip)
         if failures >= AUTH_FAILURE_MAX:
@@ -697,56 +754,67 @@ def _admin_password_expired(fb_token: str | None, fb_iat: int | None = None) ->
     return age_seconds > (ADMIN_PASSWORD_MAX_AGE_DAYS * 86400)
 
 
-def _maybe_warm_share_cache() -> None:
+def _share_cache_warm_tick() -> ShareWarmRun | None:
+    """
+    One scheduled warm pass, run by Celery beat or the per-worker scheduler
+    thread. A Redis lease that is left to expire elects a single runner per
+    interval across all workers; without Redis each process warms its own cache.
+    """
     if not SHARE_CACHE_WARM_ENABLED or not ANALYTICS_ENABLED:
-        return
-    if SHARE_CACHE_WARM_INTERVAL_SECONDS <= 0:
-        return
+        return None
+    if _redis_lease_acquire("share-warm", max(1, SHARE_CACHE_WARM_INTERVAL_SECONDS - 1)) is None:
+        return None
 
-    global _last_share_cache_warm_at
-    now = time.time()
-    if now - _last_share_cache_warm_at < SHARE_CACHE_WARM_INTERVAL_SECONDS:
-        return
-    _last_share_cache_warm_at = now
+    try:
+        with _analytics_conn() as conn:
+            ranked = _rank_warm_candidates(conn, now=time.time())
+    except Exception as e:
+        app.logger.warning("Share cache warm query failed: %s", e)
+        return None
 
-    since = int(now - max(1, SHARE_CACHE_WARM_DAYS) * 86400)
-    limit = max(1, SHARE_CACHE_WARM_LIMIT)
+    # Only this run's own FileBrowser calls count towards its budget, not
+    # requests served concurrently by this process.
+    with _count_public_share_requests() as filebrowser_calls:
+        return _run_share_cache_warm(
+            [share_hash for share_hash, _score in ranked],
+            warm_one=_warm_share,
+            filebrowser_calls=filebrowser_calls,
+        )
 
-    def runner():
-        try:
-            with _analytics_conn() as conn:
-                rows = conn.execute(
-                    """
-                    SELECT share_hash, COUNT(*) AS downloads
-                    FROM download_events
-                    WHERE created_at >= ? AND event_type IN ('file_download', 'zip_download')
-                    GROUP BY share_hash
-                    ORDER BY downloads DESC
-                    LIMIT ?
-                    """,
-                    (since, limit),
-                ).fetchall()
-        except Exception as e:
-            app.logger.warning("Share cache warm query failed: %s", e)
-            return
-
-        for row in rows:
-            share_hash = str(row["share_hash"] or "")
-            if not is_valid_share_hash(share_hash):
-                continue
-            try:
-                source_hash = _resolve_share_hash(share_hash)
-                _get_share_files(
-                    share_hash,
-                    source_hash=source_hash,
-                    force_refresh=False,
-                    max_age_seconds=DEFAULT_CACHE_TTL_SECONDS,
-                    recursive=True,
-                )
-            except Exception:
-                continue
-
-    _spawn_background("share-cache-warm", runner)
+
+def _warm_share(share_hash: str) -> tuple[str, int]:
+    """Rebuilds a share's recursive list if it is missing or expires within the lead time."""
+    if not is_valid_share_hash(share_hash):
+        return "missing", 0
+    source_hash = _resolve_share_hash(share_hash)
+    if source_hash is None:
+        return "missing", 0
+
+    if REDIS_ENABLED:
+        cached = _redis_share_cache_get(
+            share_hash,
+            source_hash=source_hash,
+            recursive=True,
+            max_age_seconds=DEFAULT_CACHE_TTL_SECONDS,
+        )
+        fresh_until = getattr(cached, "fresh_until", None) if cached is not None else None
+    else:
+        fresh_until = _share_files_cache.fresh_until(
+            share_hash, source_hash=source_hash, recursive=True
+        )
+    if fresh_until is not None and fresh_until > time.time() + SHARE_CACHE_WARM_LEAD_SECONDS:
+        return "fresh", 0
+
+    files = _build_share_files_once(
+        share_hash,
+        source_hash=source_hash,
+        max_age_seconds=DEFAULT_CACHE_TTL_SECONDS,
+        recursive=True,
+        fresh_only=True,
+    )
+    if files is None:
+        return "missing", 0
+    return "warmed", len(files)
 
 
 def _get_share_files(
@@ -758,60 +826,323 @@ def _get_share_files(
     recursive: bool,
 ) -> list[dict] | None:
     now = time.time()
+    stale: list[dict] | None = None
+    if force_refresh and SHARE_INDEX_ENABLED:
+        # An explicit refresh re-lists every folder, catching changes the
+        # folder stamps in the index cannot see.
+        _redis_share_index_delete(source_hash)
     if not force_refresh:
+        # Cheapest layer first: this worker's memory, then the host's on-disk
+        # manifest, then Redis. Hits from the shared layers are promoted.
+        memory_cached = _share_files_cache.get(
+            request_hash,
+            source_hash=source_hash,
+            recursive=recursive,
+            max_age_seconds=max_age_seconds,
+            stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+            now=now,
+        )
+        if memory_cached is not None and not getattr(memory_cached, "stale", False):
+            return memory_cached
+
+        manifest_cached = _share_manifest_get(
+            request_hash,
+            source_hash=source_hash,
+            recursive=recursive,
+            max_age_seconds=max_age_seconds,
+            stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+        )
+        if manifest_cached is not None and not getattr(manifest_cached, "stale", False):
+            if SHARE_CACHE_HITS is not None:
+                SHARE_CACHE_HITS.labels("manifest").inc()
+            _promote_share_files(request_hash, manifest_cached, source_hash, recursive, now)
+            return manifest_cached
+        if SHARE_CACHE_MISSES is not None and SHARE_MANIFEST_ENABLED:
+            SHARE_CACHE_MISSES.labels("manifest").inc()
+
         redis_cached = _redis_share_cache_get(
             request_hash,
             source_hash=source_hash,
             recursive=recursive,
             max_age_seconds=max_age_seconds,
+            stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
         )
-        if redis_cached is not None:
+        if redis_cached is not None and not getattr(redis_cached, "stale", False):
             if SHARE_CACHE_HITS is not None and REDIS_ENABLED:
                 SHARE_CACHE_HITS.labels("redis").inc()
+            _promote_share_files(
+                request_hash, redis_cached, source_hash, recursive, now, to_manifest=True
+            )
             return redis_cached
         if SHARE_CACHE_MISSES is not None and REDIS_ENABLED:
             SHARE_CACHE_MISSES.labels("redis").inc()
 
-        with _share_cache_lock:
-            memory_cached = _share_files_cache.get(request_hash)
-            if (
-                memory_cached
-                and (now - memory_cached[0]) < max_age_seconds
-                and memory_cached[1] == source_hash
-                and memory_cached[2] == recursive
-            ):
-                if SHARE_CACHE_HITS is not None:
-                    SHARE_CACHE_HITS.labels("memory").inc()
-                return memory_cached[3]
-        if SHARE_CACHE_MISSES is not None:
-            SHARE_CACHE_MISSES.labels("memory").inc()
+        stale = min(
+            (c for c in (memory_cached, manifest_cached, redis_cached) if c is not None),
+            key=lambda c: getattr(c, "stale_age", 0.0),
+            default=None,
+        )
+        if stale is not None and getattr(stale, "stale_age", 0.0) < SHARE_CACHE_STALE_SECONDS:
+            _schedule_share_refresh(
+                request_hash,
+                source_hash=source_hash,
+                max_age_seconds=max_age_seconds,
+                recursive=recursive,
+            )
+            _record_share_stale_served("revalidate")
+            return stale
 
+    try:
+        return _build_share_files_once(
+            request_hash,
+            source_hash=source_hash,
+            max_age_seconds=max_age_seconds,
+            recursive=recursive,
+            fresh_only=force_refresh,
+        )
+    except Exception as e:
+        if stale is None or getattr(stale, "stale_age", 0.0) >= SHARE_CACHE_STALE_IF_ERROR_SECONDS:
+            raise
+        app.logger.warning(
+            "Share list rebuild failed for %s; serving stale list: %s", request_hash, e
+        )
+        _record_share_stale_served("error")
+        return stale
+
+
+def _promote_share_files(
+    request_hash: str,
+    files: list[dict],
+    source_hash: str,
+    recursive: bool,
+    now: float,
+    *,
+    to_manifest: bool = False,
+) -> None:
+    """Copies a fresh list found in a shared layer into the faster local ones."""
+    ttl_seconds = int((getattr(files, "fresh_until", None) or now) - now)
+    if ttl_seconds <= 0:
+        return
+    if to_manifest:
+        _share_manifest_set(
+            request_hash,
+            source_hash=source_hash,
+            recursive=recursive,
+            files=files,
+            ttl_seconds=ttl_seconds,
+            stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+        )
+    _share_files_cache.set(
+        request_hash,
+        source_hash=source_hash,
+        recursive=recursive,
+        files=files,
+        ttl_seconds=ttl_seconds,
+        stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+        now=now,
+    )
+
+
+def _build_share_files_once(
+    request_hash: str,
+    *,
+    source_hash: str,
+    max_age_seconds: int,
+    recursive: bool,
+    fresh_only: bool,
+) -> list[dict] | None:
+    flight_key = f"{request_hash}:{source_hash}:{int(recursive)}"
+    return _share_build_flight.do(
+        flight_key,
+        lambda: _build_share_files_coalesced(
+            request_hash,
+            flight_key=flight_key,
+            source_hash=source_hash,
+            max_age_seconds=max_age_seconds,
+            recursive=recursive,
+            fresh_only=fresh_only,
+        ),
+    )
+
+
+def _schedule_share_refresh(
+    request_hash: str, *, source_hash: str, max_age_seconds: int, recursive: bool
+) -> bool:
+    """
+    Queues a background rebuild of a stale share list. A short Redis lease,
+    left to expire rather than released, limits this to one refresh per share
+    across workers; without Redis the background task id dedupes per worker.
+    """
+    task_id = f"share-refresh:{request_hash}:{source_hash}:{int(recursive)}"
+    if _redis_lease_acquire(task_id, SHARE_BUILD_LEASE_SECONDS) is None:
+        return False
+    return _enqueue_task(
+        task_id,
+        "droppr.share_refresh",
+        _refresh_share_files,
+        request_hash,
+        source_hash,
+        max_age_seconds,
+        recursive,
+    )
+
+
+def _refresh_share_files(
+    request_hash: str, source_hash: str, max_age_seconds: int, recursive: bool
+) -> None:
+    files = _build_share_files_once(
+        request_hash,
+        source_hash=source_hash,
+        max_age_seconds=max_age_seconds,
+        recursive=recursive,
+        fresh_only=True,
+    )
+    if files is None:
+        # The share is gone upstream; stop serving the stale copy.
+        clear_share_cache(request_hash)
+
+
+def _build_share_files_coalesced(
+    request_hash: str,
+    *,
+    flight_key: str,
+    source_hash: str,
+    max_age_seconds: int,
+    recursive: bool,
+    fresh_only: bool,
+) -> list[dict] | None:
+    """
+    Builds a share list at most once across workers: the holder of the Redis
+    lease crawls, others wait for its result to land in the Redis cache and
+    fall back to crawling themselves if it does not arrive in time.
+    """
+    lease_name = f"share-build:{flight_key}"
+    token = _redis_lease_acquire(lease_name, SHARE_BUILD_LEASE_SECONDS)
+    if token is None:
+        waited = _wait_for_share_build(
+            lease_name,
+            request_hash,
+            source_hash=source_hash,
+            max_age_seconds=max_age_seconds,
+            recursive=recursive,
+            fresh_only=fresh_only,
+        )
+        if waited is not None:
+            _record_share_build_coalesced("redis")
+            return waited
+        token = _redis_lease_acquire(lease_name, SHARE_BUILD_LEASE_SECONDS) or ""
+    try:
+        return _build_share_files(
+            request_hash,
+            source_hash=source_hash,
+            max_age_seconds=max_age_seconds,
+            recursive=recursive,
+        )
+    finally:
+        _redis_lease_release(lease_name, token)
+
+
+def _wait_for_share_build(
+    lease_name: str,
+    request_hash: str,
+    *,
+    source_hash: str,
+    max_age_seconds: int,
+    recursive: bool,
+    fresh_only: bool,
+) -> list[dict] | None:
+    started = time.time()
+    deadline = started + max(0.0, SHARE_BUILD_WAIT_SECONDS)
+    delay = 0.05
+    while True:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+        # A forced refresh only accepts a list built after it started waiting.
+        max_age = int(time.time() - started) + 1 if fresh_only else max_age_seconds
+        cached = _redis_share_cache_get(
+            request_hash, source_hash=source_hash, recursive=recursive, max_age_seconds=max_age
+        )
+        if cached is not None:
+            return cached
+        if not _redis_lease_held(lease_name) or time.time() >= deadline:
+            return None
+
+
+def _build_share_files(
+    request_hash: str,
+    *,
+    source_hash: str,
+    max_age_seconds: int,
+    recursive: bool,
+) -> list[dict] | None:
+    now = time.time()
     data = _fetch_public_share_json(source_hash)
     if not data:
         return None
 
+    files: list[dict]
     if isinstance(data.get("items"), list):
+        index = None
+        crawled_at = now
+        if recursive and SHARE_INDEX_ENABLED:
+            cached_index = _redis_share_index_get(
+                source_hash, max_age_seconds=SHARE_INDEX_MAX_AGE_SECONDS
+            )
+            if cached_index is not None:
+                crawled_at = float(cached_index["crawled_at"])
+            index = cached_index["dirs"] if cached_index is not None else {}
         files = _build_folder_share_file_list(
-            request_hash=request_hash, source_hash=source_hash, root=data, recursive=recursive
+            request_hash=request_hash,
+            source_hash=source_hash,
+            root=data,
+            recursive=recursive,
+            index=index,
         )
+        if index is not None:
+            _redis_share_index_set(
+                source_hash,
+                dirs=index,
+                crawled_at=crawled_at,
+                max_age_seconds=SHARE_INDEX_MAX_AGE_SECONDS,
+            )
+        _prime_share_file_meta(source_hash, data["items"], index)
     else:
         files = _build_file_share_file_list(
             request_hash=request_hash, source_hash=source_hash, meta=data
         )
 
+    ttl_seconds = max_age_seconds if max_age_seconds > 0 else DEFAULT_CACHE_TTL_SECONDS
+    # Hash once at build time; the ETag travels with the list through both caches.
+    _share_list_etag(files)
+    if getattr(files, "truncated", False):
+        # Partial crawl: keep it briefly so the next request retries the crawl.
+        ttl_seconds = min(ttl_seconds, max(1, SHARE_CRAWL_TRUNCATED_TTL_SECONDS))
+
     _redis_share_cache_set(
         request_hash,
         source_hash=source_hash,
         recursive=recursive,
         files=files,
-        ttl_seconds=max_age_seconds,
+        ttl_seconds=ttl_seconds,
+        stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+    )
+    _share_manifest_set(
+        request_hash,
+        source_hash=source_hash,
+        recursive=recursive,
+        files=files,
+        ttl_seconds=ttl_seconds,
+        stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+    )
+    _share_files_cache.set(
+        request_hash,
+        source_hash=source_hash,
+        recursive=recursive,
+        files=files,
+        ttl_seconds=ttl_seconds,
+        stale_seconds=SHARE_CACHE_RETAIN_STALE_SECONDS,
+        now=now,
     )
-    with _share_cache_lock:
-        if len(_share_files_cache) >= MAX_CACHE_SIZE:
-            # Simple eviction strategy: clear the whole cache if it gets too big.
-            # A more sophisticated LRU is possible but likely overkill for this scale.
-            _share_files_cache.clear()
-        _share_files_cache[request_hash] = (now, source_hash, recursive, files)
 
     return files
 
@@ -883,6 +1214,38 @@ if celery_app:
     def _celery_r2_upload_hls(cache_key: str, output_dir: str) -> None:
         _r2_upload_hls_package(cache_key, output_dir)
 
+    @celery_app.task(name="droppr.share_refresh")
+    def _celery_share_refresh(
+        request_hash: str, source_hash: str, max_age_seconds: int, recursive: bool
+    ) -> None:
+        _refresh_share_files(request_hash, source_hash, max_age_seconds, recursive)
+
+    @celery_app.task(name="droppr.share_cache_warm")
+    def _celery_share_cache_warm() -> None:
+        _share_cache_warm_tick()
+
+    if SHARE_CACHE_WARM_ENABLED and SHARE_CACHE_WARM_INTERVAL_SECONDS > 0:
+        celery_app.conf.beat_schedule = {
+            **(celery_app.conf.beat_schedule or {}),
+            "droppr-share-cache-warm": {
+                "task": "droppr.share_cache_warm",
+                "schedule": float(SHARE_CACHE_WARM_INTERVAL_SECONDS),
+            },
+        }
+
+    @celery_app.task(name="droppr.analytics_retention")
+    def _celery_analytics_retention() -> None:
+        _analytics_retention_tick()
+
+    if ANALYTICS_ENABLED and ANALYTICS_RETENTION_INTERVAL_SECONDS > 0:
+        celery_app.conf.beat_schedule = {
+            **(celery_app.conf.beat_schedule or {}),
+            "droppr-analytics-retention": {
+                "task": "droppr.analytics_retention",
+                "schedule": float(ANALYTICS_RETENTION_INTERVAL_SECONDS),
+            },
+        }
+
 
 app.register_blueprint(health_bp)
 app.register_blueprint(metrics_bp)
@@ -896,13 +1259,12 @@ app.register_blueprint(
             "default_cache_ttl_seconds": DEFAULT_CACHE_TTL_SECONDS,
             "get_share_files": _get_share_files,
             "log_event": _log_event,
-            "maybe_warm_share_cache": _maybe_warm_share_cache,
             "safe_rel_path": _safe_rel_path,
             "rate_limit_downloads": RATE_LIMIT_DOWNLOADS,
             "fetch_public_share_json": _fetch_public_share_json,
             "filebrowser_public_dl_api": FILEBROWSER_PUBLIC_DL_API,
-            "with_internal_signature": _with_internal_signature,
-            "increment_share_alias_download_count": _increment_share_alias_download_count,
+            "filebrowser_get": _filebrowser_get,
+            "claim_share_alias_download": _claim_share_alias_download,
             "get_share_alias_meta": _get_share_alias_meta,
         }
     )
@@ -929,12 +1291,12 @@ app.register_blueprint(
             "thumb_sema": _thumb_sema,
             "thumb_ffmpeg_timeout_seconds": THUMB_FFMPEG_TIMEOUT_SECONDS,
             "preview_mimetype": _preview_mimetype,
-            "filebrowser_public_dl_api": FILEBROWSER_PUBLIC_DL_API,
             "normalize_preview_format": _normalize_preview_format,
             "ffprobe_video_meta": _ffprobe_video_meta,
             "thumb_multi_default": THUMB_MULTI_DEFAULT,
             "thumb_multi_max": THUMB_MULTI_MAX,
-            "fetch_public_share_json": _fetch_public_share_json,
+            "fetch_public_share_json": _fetch_public_share_json_cached,
+            "media_source": _media_source,
             "parse_bool": parse_bool,
             "proxy_cache_key": _proxy_cache_key,
             "r2_proxy_key": _r2_proxy_key,
@@ -972,6 +1334,7 @@ app.register_blueprint(
     )
 )
 app.register_blueprint(create_droppr_aliases_blueprint(_require_admin_access))
+app.register_blueprint(create_droppr_cache_blueprint(_require_admin_access))
 
 app.register_blueprint(create_droppr_shares_blueprint(_require_admin_access))
 app.register_blueprint(
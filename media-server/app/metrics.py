@@ -14,6 +14,25 @@ REQUEST_ERRORS: Counter | None
 REQUEST_IN_FLIGHT: Gauge | None
 SHARE_CACHE_HITS: Counter | None
 SHARE_CACHE_MISSES: Counter | None
+SHARE_CACHE_EVICTIONS: Counter | None
+SHARE_CACHE_STALE_HITS: Counter | None
+SHARE_CACHE_OVERSIZE: Counter | None
+SHARE_CACHE_BYTES: Gauge | None
+SHARE_CACHE_COALESCED: Counter | None
+SHARE_CACHE_STALE_SERVED: Counter | None
+CACHE_INVALIDATIONS: Counter | None
+SHARE_WARM_SHARES: Counter | None
+SHARE_WARM_DURATION: Histogram | None
+SHARE_WARM_FILEBROWSER_CALLS: Counter | None
+UPSTREAM_LATENCY: Histogram | None
+UPSTREAM_ERRORS: Counter | None
+UPSTREAM_CIRCUIT_STATE: Gauge | None
+MEDIA_SOURCE_RESOLUTIONS: Counter | None
+SQLITE_CONN_WAIT: Histogram | None
+SQLITE_LOCKED_RETRIES: Counter | None
+ANALYTICS_EVENTS_DROPPED: Counter | None
+ANALYTICS_RETENTION_ROWS: Counter | None
+ANALYTICS_RETENTION_DURATION: Histogram | None
 BACKGROUND_TASKS: Gauge | None
 VIDEO_TRANSCODE_COUNT: Counter | None
 VIDEO_TRANSCODE_LATENCY: Histogram | None
@@ -49,6 +68,100 @@ if METRICS_ENABLED:
         "Share cache misses",
         ["layer"],
     )
+    SHARE_CACHE_EVICTIONS = Counter(
+        "droppr_share_cache_evictions_total",
+        "Share cache evictions",
+        ["layer", "reason"],
+    )
+    SHARE_CACHE_STALE_HITS = Counter(
+        "droppr_share_cache_stale_hits_total",
+        "Share cache lookups that found only an entry past its freshness window",
+        ["layer"],
+    )
+    SHARE_CACHE_OVERSIZE = Counter(
+        "droppr_share_cache_oversize_total",
+        "Share lists not cached because they exceed the whole cache budget",
+        ["layer"],
+    )
+    SHARE_CACHE_BYTES = Gauge(
+        "droppr_share_cache_bytes",
+        "Approximate bytes held by the share cache",
+        ["layer"],
+    )
+    SHARE_CACHE_COALESCED = Counter(
+        "droppr_share_cache_coalesced_total",
+        "Share list requests that joined an in-flight build instead of crawling",
+        ["scope"],
+    )
+    SHARE_CACHE_STALE_SERVED = Counter(
+        "droppr_share_cache_stale_served_total",
+        "Share lists served past their freshness window",
+        ["reason"],
+    )
+    CACHE_INVALIDATIONS = Counter(
+        "droppr_cache_invalidations_total",
+        "Cache invalidations sent to or received from other workers",
+        ["kind", "direction"],
+    )
+    SHARE_WARM_SHARES = Counter(
+        "droppr_share_warm_shares_total",
+        "Shares visited by the scheduled share cache warmer",
+        ["result"],
+    )
+    SHARE_WARM_DURATION = Histogram(
+        "droppr_share_warm_duration_seconds",
+        "Duration of scheduled share cache warm runs",
+    )
+    SHARE_WARM_FILEBROWSER_CALLS = Counter(
+        "droppr_share_warm_filebrowser_calls_total",
+        "FileBrowser share API calls made by the share cache warmer",
+    )
+    UPSTREAM_LATENCY = Histogram(
+        "droppr_upstream_request_duration_seconds",
+        "Upstream HTTP request latency, including retries",
+        ["upstream", "endpoint"],
+    )
+    UPSTREAM_ERRORS = Counter(
+        "droppr_upstream_request_errors_total",
+        "Failed or rejected upstream HTTP requests",
+        ["upstream", "endpoint", "reason"],
+    )
+    UPSTREAM_CIRCUIT_STATE = Gauge(
+        "droppr_upstream_circuit_state",
+        "Upstream circuit breaker state (0 closed, 1 open, 2 half-open)",
+        ["upstream"],
+    )
+    MEDIA_SOURCE_RESOLUTIONS = Counter(
+        "droppr_media_source_resolutions_total",
+        "Media pipeline inputs by source (local file or FileBrowser HTTP)",
+        ["source"],
+    )
+    SQLITE_CONN_WAIT = Histogram(
+        "droppr_sqlite_connection_wait_seconds",
+        "Time spent waiting for a pooled SQLite connection",
+        ["db"],
+        buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+    )
+    SQLITE_LOCKED_RETRIES = Counter(
+        "droppr_sqlite_locked_retries_total",
+        "Operations retried because SQLite reported the database as locked",
+        ["db"],
+    )
+    ANALYTICS_EVENTS_DROPPED = Counter(
+        "droppr_analytics_events_dropped_total",
+        "Analytics events discarded before reaching the database",
+        ["kind", "reason"],
+    )
+    ANALYTICS_RETENTION_ROWS = Counter(
+        "droppr_analytics_retention_rows_total",
+        "Analytics rows moved out of each table by retention",
+        ["table"],
+    )
+    ANALYTICS_RETENTION_DURATION = Histogram(
+        "droppr_analytics_retention_duration_seconds",
+        "Analytics retention run duration",
+        buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+    )
     BACKGROUND_TASKS = Gauge(
         "droppr_background_tasks",
         "Background tasks running",
@@ -75,6 +188,25 @@ else:
     REQUEST_IN_FLIGHT = None
     SHARE_CACHE_HITS = None
     SHARE_CACHE_MISSES = None
+    SHARE_CACHE_EVICTIONS = None
+    SHARE_CACHE_STALE_HITS = None
+    SHARE_CACHE_OVERSIZE = None
+    SHARE_CACHE_BYTES = None
+    SHARE_CACHE_COALESCED = None
+    SHARE_CACHE_STALE_SERVED = None
+    CACHE_INVALIDATIONS = None
+    SHARE_WARM_SHARES = None
+    SHARE_WARM_DURATION = None
+    SHARE_WARM_FILEBROWSER_CALLS = None
+    UPSTREAM_LATENCY = None
+    UPSTREAM_ERRORS = None
+    UPSTREAM_CIRCUIT_STATE = None
+    MEDIA_SOURCE_RESOLUTIONS = None
+    SQLITE_CONN_WAIT = None
+    SQLITE_LOCKED_RETRIES = None
+    ANALYTICS_EVENTS_DROPPED = None
+    ANALYTICS_RETENTION_ROWS = None
+    ANALYTICS_RETENTION_DURATION = None
     BACKGROUND_TASKS = None
     VIDEO_TRANSCODE_COUNT = None
     VIDEO_TRANSCODE_LATENCY = None
@@ -6,6 +6,8 @@ from functools import lru_cache
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base
 
+from ..utils.sqlite_pool import SQLITE_POOL_SIZE, _configure_sqlite_connection
+
 ANALYTICS_DB_PATH = os.environ.get("DROPPR_ANALYTICS_DB_PATH", "/database/droppr-analytics.sqlite3")
 ANALYTICS_DB_TIMEOUT_SECONDS = float(os.environ.get("DROPPR_ANALYTICS_DB_TIMEOUT_SECONDS", "30"))
 ANALYTICS_POOL_SIZE = int(os.environ.get("DROPPR_ANALYTICS_POOL_SIZE", "4"))
@@ -37,12 +39,7 @@ def _sqlite_engine(db_path: str, timeout: float, pool_size: int | None = None):
 
     @event.listens_for(engine, "connect")
     def _configure_sqlite(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL;")
-        cursor.execute("PRAGMA synchronous=NORMAL;")
-        cursor.execute("PRAGMA busy_timeout=5000;")
-        cursor.execute("PRAGMA foreign_keys=ON;")
-        cursor.close()
+        _configure_sqlite_connection(dbapi_connection)
 
     return engine
 
@@ -54,9 +51,9 @@ def get_analytics_engine():
 
 @lru_cache(maxsize=1)
 def get_video_meta_engine():
-    return _sqlite_engine(VIDEO_META_DB_PATH, VIDEO_META_DB_TIMEOUT_SECONDS, None)
+    return _sqlite_engine(VIDEO_META_DB_PATH, VIDEO_META_DB_TIMEOUT_SECONDS, SQLITE_POOL_SIZE)
 
 
 @lru_cache(maxsize=1)
 def get_comments_engine():
-    return _sqlite_engine(COMMENTS_DB_PATH, COMMENTS_DB_TIMEOUT_SECONDS, None)
+    return _sqlite_engine(COMMENTS_DB_PATH, COMMENTS_DB_TIMEOUT_SECONDS, SQLITE_POOL_SIZE)
@@ -1,29 +1,11 @@
 from __future__ import annotations
 
-from sqlalchemy import Column, Index, Integer, Text
+from sqlalchemy import Column, Index, Integer, LargeBinary, Text
 
 from . import AnalyticsBase
 
-
-class DownloadEvent(AnalyticsBase):
-    __tablename__ = "download_events"
-
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    share_hash = Column(Text, nullable=False)
-    event_type = Column(Text, nullable=False)
-    file_path = Column(Text)
-    ip = Column(Text)
-    user_agent = Column(Text)
-    referer = Column(Text)
-    created_at = Column(Integer, nullable=False)
-
-    __table_args__ = (
-        Index("idx_download_events_share_hash", "share_hash"),
-        Index("idx_download_events_share_hash_created_at", "share_hash", "created_at"),
-        Index("idx_download_events_created_at", "created_at"),
-        Index("idx_download_events_ip", "ip"),
-        Index("idx_download_events_event_type", "event_type"),
-    )
+# Live download events are stored in monthly partition tables created on
+# demand; see services/analytics_partitions.py.
 
 
 class DownloadEventArchive(AnalyticsBase):
@@ -121,3 +103,82 @@ class AuditEventArchive(AnalyticsBase):
         Index("idx_audit_events_archive_created_at", "created_at"),
         Index("idx_audit_events_archive_action", "action"),
     )
+
+
+class DownloadEventHourly(AnalyticsBase):
+    __tablename__ = "download_events_hourly"
+
+    share_hash = Column(Text, primary_key=True)
+    event_type = Column(Text, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    last_seen = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("idx_download_events_hourly_bucket", "bucket"),
+        Index("idx_download_events_hourly_share_hash_bucket", "share_hash", "bucket"),
+    )
+
+
+class DownloadEventDaily(AnalyticsBase):
+    __tablename__ = "download_events_daily"
+
+    share_hash = Column(Text, primary_key=True)
+    event_type = Column(Text, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    last_seen = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("idx_download_events_daily_bucket", "bucket"),
+        Index("idx_download_events_daily_share_hash_bucket", "share_hash", "bucket"),
+    )
+
+
+class DownloadIpDaily(AnalyticsBase):
+    __tablename__ = "download_ips_daily"
+
+    share_hash = Column(Text, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    ip = Column(Text, primary_key=True)
+    file_downloads = Column(Integer, nullable=False)
+    zip_downloads = Column(Integer, nullable=False)
+    last_seen = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("idx_download_ips_daily_bucket", "bucket"),)
+
+
+class DownloadIpSketch(AnalyticsBase):
+    __tablename__ = "download_ip_sketches"
+
+    share_hash = Column(Text, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (Index("idx_download_ip_sketches_bucket", "bucket"),)
+
+
+# How far retention has copied an expired partition into the archive.
+class ArchiveProgress(AnalyticsBase):
+    __tablename__ = "analytics_archive_progress"
+
+    table_name = Column(Text, primary_key=True)
+    last_id = Column(Integer, nullable=False)
+
+
+# A Parquet file of archived rows compacted out of an *_archive table. Stays
+# pending until those rows have been deleted from the table.
+class ArchiveParquetFile(AnalyticsBase):
+    __tablename__ = "analytics_parquet_files"
+
+    path = Column(Text, primary_key=True)
+    table_name = Column(Text, nullable=False)
+    month = Column(Integer, nullable=False)
+    first_created_at = Column(Integer, nullable=False)
+    last_created_at = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=False)
+    compacted_at = Column(Integer, nullable=False)
+    pending = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("idx_analytics_parquet_files_table_name_month", "table_name", "month"),)
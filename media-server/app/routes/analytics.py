@@ -15,6 +15,20 @@ from ..services.analytics import (
     _analytics_conn,
     _get_time_range,
 )
+from ..services.analytics_export import (
+    EXPORT_SOURCES,
+    _parse_export_fields,
+    _stream_share_events_csv,
+)
+from ..services.analytics_parquet import ARCHIVE_KINDS, _parse_archive_query, _query_archive
+from ..services.analytics_partitions import _fan_out
+from ..services.analytics_rollups import (
+    _estimate_unique_ips,
+    _share_event_totals,
+    _share_ip_stats,
+    _share_unique_ips,
+    _total_unique_ips,
+)
 from ..services.container import get_services
 from ..utils.validation import is_valid_share_hash
 
@@ -71,8 +85,10 @@ def create_analytics_blueprint(require_admin_access):
         include_deleted = parse_bool(
             request.args.get("include_deleted") or request.args.get("includeDeleted") or "true"
         )
+        # Distinct IP counts are HyperLogLog estimates unless exact=1 is requested.
+        exact = parse_bool(request.args.get("exact") or "false")
         since, until = _get_time_range()
-        cache_key = f"analytics_shares:{include_empty}:{include_deleted}:{since}:{until}"
+        cache_key = f"analytics_shares:{include_empty}:{include_deleted}:{exact}:{since}:{until}"
         cached = _analytics_cache_get(cache_key)
         if cached:
             return jsonify(cached)
@@ -86,48 +102,41 @@ def create_analytics_blueprint(require_admin_access):
             return jsonify({"error": f"Failed to fetch FileBrowser shares: {exc}"}), 502
 
         stats_by_hash: dict[str, dict] = {}
-        total_unique_ips = 0
         with _analytics_conn() as conn:
-            rows = conn.execute(
-                """
-                SELECT
-                    share_hash,
-                    SUM(CASE WHEN event_type = 'gallery_view' THEN 1 ELSE 0 END) AS gallery_views,
-                    SUM(CASE WHEN event_type = 'file_download' THEN 1 ELSE 0 END) AS file_downloads,
-                    SUM(CASE WHEN event_type = 'zip_download' THEN 1 ELSE 0 END) AS zip_downloads,
-                    COUNT(DISTINCT CASE WHEN event_type IN ('file_download', 'zip_download') THEN ip END) AS unique_ips,
-                    MAX(created_at) AS last_seen,
-                    MAX(CASE WHEN event_type IN ('file_download', 'zip_download') THEN created_at ELSE NULL END) AS last_download_at
-                FROM download_events
-                WHERE created_at >= ? AND created_at <= ?
-                GROUP BY share_hash
-                """,
-                (since, until),
-            ).fetchall()
-
-            for row in rows:
-                stats_by_hash[str(row["share_hash"])] = {
-                    "gallery_views": int(row["gallery_views"] or 0),
-                    "file_downloads": int(row["file_downloads"] or 0),
-                    "zip_downloads": int(row["zip_downloads"] or 0),
-                    "downloads": int((row["file_downloads"] or 0) + (row["zip_downloads"] or 0)),
-                    "unique_ips": int(row["unique_ips"] or 0),
-                    "last_seen": int(row["last_seen"] or 0) if row["last_seen"] else None,
-                    "last_download_at": (
-                        int(row["last_download_at"] or 0) if row["last_download_at"] else None
-                    ),
-                }
-
-            total_unique_ips_row = conn.execute(
-                """
-                SELECT COUNT(DISTINCT ip) AS unique_ips
-                FROM download_events
-                WHERE created_at >= ? AND created_at <= ? AND ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
-                """,
-                (since, until),
-            ).fetchone()
-            if total_unique_ips_row is not None:
-                total_unique_ips = int(total_unique_ips_row["unique_ips"] or 0)
+            for row in _share_event_totals(conn, since, until):
+                stats = stats_by_hash.setdefault(
+                    str(row["share_hash"]),
+                    {
+                        "gallery_views": 0,
+                        "file_downloads": 0,
+                        "zip_downloads": 0,
+                        "downloads": 0,
+                        "unique_ips": 0,
+                        "last_seen": None,
+                        "last_download_at": None,
+                    },
+                )
+                count = int(row["count"] or 0)
+                last_seen = int(row["last_seen"] or 0) or None
+                event_type = row["event_type"]
+                if event_type == "gallery_view":
+                    stats["gallery_views"] += count
+                elif event_type in ("file_download", "zip_download"):
+                    stats[f"{event_type}s"] += count
+                    stats["downloads"] += count
+                    stats["last_download_at"] = (
+                        max(stats["last_download_at"] or 0, last_seen or 0) or None
+                    )
+                stats["last_seen"] = max(stats["last_seen"] or 0, last_seen or 0) or None
+
+            if exact:
+                unique_ips_by_hash = _share_unique_ips(conn, since, until)
+                total_unique_ips = _total_unique_ips(conn, since, until)
+            else:
+                unique_ips_by_hash, total_unique_ips = _estimate_unique_ips(conn, since, until)
+            for share_hash, unique_ips in unique_ips_by_hash.items():
+                if share_hash in stats_by_hash:
+                    stats_by_hash[share_hash]["unique_ips"] = unique_ips
 
         shares = []
         seen_hashes: set[str] = set()
@@ -189,6 +198,7 @@ def create_analytics_blueprint(require_admin_access):
             "range": {"since": since, "until": until},
             "shares": shares,
             "totals": {"unique_ips": total_unique_ips},
+            "approximate": not exact,
         }
         _analytics_cache_set(cache_key, payload)
         return jsonify(payload)
@@ -226,15 +236,7 @@ def create_analytics_blueprint(require_admin_access):
 
         counts: dict[str, int] = {}
         with _analytics_conn() as conn:
-            for row in conn.execute(
-                """
-                SELECT event_type, COUNT(*) AS count
-                FROM download_events
-                WHERE share_hash = ? AND created_at >= ? AND created_at <= ?
-                GROUP BY event_type
-                """,
-                (share_hash, since, until),
-            ).fetchall():
+            for row in _share_event_totals(conn, since, until, share_hash):
                 counts[str(row["event_type"])] = int(row["count"] or 0)
 
             ips = [
@@ -245,23 +247,19 @@ def create_analytics_blueprint(require_admin_access):
                     "downloads": int((row["file_downloads"] or 0) + (row["zip_downloads"] or 0)),
                     "last_seen": int(row["last_seen"] or 0) if row["last_seen"] else None,
                 }
-                for row in conn.execute(
-                    """
-                    SELECT
-                        ip,
-                        SUM(CASE WHEN event_type = 'file_download' THEN 1 ELSE 0 END) AS file_downloads,
-                        SUM(CASE WHEN event_type = 'zip_download' THEN 1 ELSE 0 END) AS zip_downloads,
-                        MAX(created_at) AS last_seen
-                    FROM download_events
-                    WHERE share_hash = ? AND created_at >= ? AND created_at <= ? AND ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
-                    GROUP BY ip
-                    ORDER BY (file_downloads + zip_downloads) DESC, last_seen DESC
-                    LIMIT 200
-                    """,
-                    (share_hash, since, until),
-                ).fetchall()
+                for row in _share_ip_stats(conn, share_hash, since, until)
             ]
 
+            recent_sql, recent_params = _fan_out(
+                conn,
+                [(since, until + 1)],
+                lambda events: f"""
+                    SELECT event_type, file_path, ip, user_agent, created_at
+                    FROM {events}
+                    WHERE share_hash = ? AND created_at >= ? AND created_at <= ?
+                """,
+                (share_hash, since, until),
+            )
             events = [
                 {
                     "event_type": row["event_type"],
@@ -271,14 +269,13 @@ def create_analytics_blueprint(require_admin_access):
                     "created_at": int(row["created_at"] or 0),
                 }
                 for row in conn.execute(
-                    """
+                    f"""
                     SELECT event_type, file_path, ip, user_agent, created_at
-                    FROM download_events
-                    WHERE share_hash = ? AND created_at >= ? AND created_at <= ?
+                    FROM ({recent_sql})
                     ORDER BY created_at DESC
                     LIMIT 200
                     """,
-                    (share_hash, since, until),
+                    recent_params,
                 ).fetchall()
             ]
 
@@ -322,49 +319,26 @@ def create_analytics_blueprint(require_admin_access):
         except Exception as exc:
             return f"Failed to validate auth: {exc}", 502
 
+        try:
+            fields = _parse_export_fields(request.args.get("fields"))
+        except ValueError as exc:
+            return str(exc), 400
+        source = (request.args.get("source") or "events").strip().lower()
+        if source not in EXPORT_SOURCES:
+            return f"Unknown source: {source}", 400
+        use_gzip = parse_bool(request.args.get("gzip") or "false")
         since, until = _get_time_range()
 
-        with _analytics_conn() as conn:
-            rows = conn.execute(
-                """
-                SELECT event_type, file_path, ip, user_agent, referer, created_at
-                FROM download_events
-                WHERE share_hash = ? AND created_at >= ? AND created_at <= ?
-                ORDER BY created_at DESC
-                """,
-                (share_hash, since, until),
-            ).fetchall()
-
-        def esc(value):
-            if value is None:
-                return ""
-            value = str(value).replace('"', '""')
-            if any(c in value for c in [",", "\n", "\r", '"']):
-                return f'"{value}"'
-            return value
-
-        lines = ["event_type,file_path,ip,user_agent,referer,created_at"]
-        for row in rows:
-            lines.append(
-                ",".join(
-                    [
-                        esc(row["event_type"]),
-                        esc(row["file_path"]),
-                        esc(row["ip"]),
-                        esc(row["user_agent"]),
-                        esc(row["referer"]),
-                        esc(int(row["created_at"] or 0)),
-                    ]
-                )
-            )
-
-        csv_data = "\n".join(lines) + "\n"
+        # Streamed without a Content-Length, i.e. with chunked transfer encoding.
+        filename = f"droppr-share-{share_hash}-analytics.csv"
+        if use_gzip:
+            filename += ".gz"
         return Response(
-            csv_data,
-            content_type="text/csv; charset=utf-8",
-            headers={
-                "Content-Disposition": f'attachment; filename="droppr-share-{share_hash}-analytics.csv"'
-            },
+            _stream_share_events_csv(
+                share_hash, since, until, fields=fields, source=source, gzip=use_gzip
+            ),
+            content_type="application/gzip" if use_gzip else "text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
     @bp.route("/api/analytics/audit")
@@ -409,6 +383,33 @@ def create_analytics_blueprint(require_admin_access):
         resp.headers["Cache-Control"] = "no-store"
         return resp
 
+    @bp.route("/api/analytics/archive/query")
+    def analytics_archive_query():
+        if not ANALYTICS_ENABLED:
+            return jsonify({"error": "Analytics disabled"}), 404
+
+        error_resp, _auth = require_admin_access()
+        if error_resp:
+            return error_resp
+
+        kind = (request.args.get("kind") or "download").strip().lower()
+        if kind not in ARCHIVE_KINDS:
+            return jsonify({"error": f"Unknown kind: {kind}"}), 400
+        try:
+            query = _parse_archive_query(kind, request.args)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        try:
+            limit = int(request.args.get("limit") or 1000)
+        except (TypeError, ValueError):
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = min(max(1, limit), 10000)
+        since, until = _get_time_range()
+
+        resp = jsonify(_query_archive(kind, since, until, limit=limit, **query))
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+
     return bp
 
     return bp
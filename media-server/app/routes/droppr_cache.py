@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from flask import Blueprint, jsonify
+
+from ..services.share_cache import _share_build_stats, _share_cache_stats
+from ..services.share_warmer import _share_warm_stats
+
+
+def create_droppr_cache_blueprint(require_admin_access):
+    bp = Blueprint("droppr_cache", __name__)
+
+    @bp.route("/api/droppr/cache/stats")
+    def droppr_cache_stats():
+        error_resp, _auth = require_admin_access()
+        if error_resp:
+            return error_resp
+
+        resp = jsonify(
+            {
+                "share_files": _share_cache_stats(),
+                "share_builds": _share_build_stats(),
+                "share_warm": _share_warm_stats(),
+            }
+        )
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+
+    return bp
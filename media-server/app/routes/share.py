@@ -3,10 +3,19 @@ from __future__ import annotations
 import logging
 from urllib.parse import quote
 
-import requests
 from flask import Blueprint, Response, jsonify, redirect, request, stream_with_context
 
 from ..middleware.rate_limit import limiter
+from ..services.share_listing import (
+    SHARE_LIST_MAX_LIMIT,
+    SHARE_LIST_STREAM_GZIP,
+    SHARE_LIST_STREAM_MIN_ITEMS,
+    ShareListQueryError,
+    _share_list_etag,
+    _share_list_page,
+    _stream_share_listing,
+)
+from ..utils.http_cache import _etag_for, _not_modified, _revalidate_cache_control
 
 logger = logging.getLogger("droppr.share")
 
@@ -18,13 +27,12 @@ def create_share_blueprint(deps: dict):
     default_cache_ttl_seconds = deps["default_cache_ttl_seconds"]
     get_share_files = deps["get_share_files"]
     log_event = deps["log_event"]
-    maybe_warm_share_cache = deps["maybe_warm_share_cache"]
     safe_rel_path = deps["safe_rel_path"]
     rate_limit_downloads = deps["rate_limit_downloads"]
     fetch_public_share_json = deps["fetch_public_share_json"]
     filebrowser_public_dl_api = deps["filebrowser_public_dl_api"]
-    with_internal_signature = deps["with_internal_signature"]
-    increment_share_alias_download_count = deps["increment_share_alias_download_count"]
+    filebrowser_get = deps["filebrowser_get"]
+    claim_share_alias_download = deps["claim_share_alias_download"]
     get_share_alias_meta = deps["get_share_alias_meta"]
 
     bp = Blueprint("share", __name__)
@@ -50,6 +58,33 @@ def create_share_blueprint(deps: dict):
         recursive_param = request.args.get("recursive")
         recursive = True if recursive_param is None else parse_bool(recursive_param)
 
+        limit = None
+        limit_param = request.args.get("limit")
+        if limit_param is not None:
+            try:
+                limit = int(limit_param)
+            except (TypeError, ValueError):
+                return jsonify({"error": "limit must be an integer"}), 400
+            if not 1 <= limit <= SHARE_LIST_MAX_LIMIT:
+                return (
+                    jsonify({"error": f"limit must be between 1 and {SHARE_LIST_MAX_LIMIT}"}),
+                    400,
+                )
+
+        sort = (request.args.get("sort") or "").strip().lower() or None
+        descending = (request.args.get("order") or "").strip().lower() == "desc"
+        if sort and sort.startswith("-"):
+            sort, descending = sort[1:], True
+
+        def _csv_param(name: str) -> set[str] | None:
+            raw = request.args.get(name)
+            if raw is None:
+                return None
+            return {v.strip().lower().lstrip(".") for v in raw.split(",") if v.strip()}
+
+        prefix = request.args.get("prefix")
+        prefix = prefix.lstrip("/") if prefix else None
+
         files = get_share_files(
             share_hash,
             source_hash=source_hash,
@@ -62,13 +97,68 @@ def create_share_blueprint(deps: dict):
 
         meta = get_share_alias_meta(share_hash)
         allow_download = meta.get("allow_download", True) if meta else True
-
-        resp = jsonify(
-            {"files": files, "meta": {"allow_download": allow_download, "share_hash": share_hash}}
+        truncated = bool(getattr(files, "truncated", False))
+        stale = bool(getattr(files, "stale", False))
+
+        # The ETag covers the cached list's content hash plus everything else the
+        # body depends on, so a matching revalidation is answered without paging
+        # or serializing anything.
+        etag = _etag_for(
+            _share_list_etag(files),
+            request.query_string,
+            share_hash,
+            allow_download,
+            truncated,
+            stale,
+        )
+        cache_control = _revalidate_cache_control()
+        # Gzip-streamed bodies are a different representation with their own tag.
+        not_modified = _not_modified(etag, cache_control) or _not_modified(
+            f"{etag}-gz", cache_control
         )
-        resp.headers["Cache-Control"] = "no-store"
+        if not_modified is not None:
+            log_event("gallery_view", share_hash)
+            return not_modified
+
+        try:
+            page, total, next_cursor = _share_list_page(
+                files,
+                sort=sort,
+                descending=descending,
+                types=_csv_param("type"),
+                exts=_csv_param("ext"),
+                prefix=prefix,
+                limit=limit,
+                cursor=request.args.get("cursor") or None,
+            )
+        except ShareListQueryError as e:
+            return jsonify({"error": str(e)}), 400
+
+        listing_meta = {
+            "allow_download": allow_download,
+            "share_hash": share_hash,
+            "truncated": truncated,
+            "stale": stale,
+            "total": total,
+            "next_cursor": next_cursor,
+        }
+        if len(page) >= SHARE_LIST_STREAM_MIN_ITEMS:
+            # Large listings are streamed from pre-encoded item fragments so the
+            # full body is never held in memory at once.
+            use_gzip = SHARE_LIST_STREAM_GZIP and "gzip" in request.accept_encodings
+            resp = Response(
+                _stream_share_listing(files, page, listing_meta, gzip=use_gzip),
+                mimetype="application/json",
+            )
+            if use_gzip:
+                resp.headers["Content-Encoding"] = "gzip"
+                etag = f"{etag}-gz"
+            resp.headers["Vary"] = "Accept-Encoding"
+        else:
+            resp = jsonify({"files": page, "meta": listing_meta})
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = cache_control
         log_event("gallery_view", share_hash)
-        maybe_warm_share_cache()
         return resp
 
     @bp.route("/api/share/<share_hash>/file/<path:filename>")
@@ -91,8 +181,9 @@ def create_share_blueprint(deps: dict):
             meta = get_share_alias_meta(share_hash)
             if meta and not meta.get("allow_download", True):
                 return "Download is disabled for this share", 403
+            if not claim_share_alias_download(share_hash):
+                return jsonify({"error": "This share link has expired or reached its limit."}), 410
             log_event("file_download", share_hash, file_path=safe)
-            increment_share_alias_download_count(share_hash)
 
         encoded = quote(safe, safe="/")
         if is_download:
@@ -115,20 +206,26 @@ def create_share_blueprint(deps: dict):
 
         data = fetch_public_share_json(source_hash)
         if data and not isinstance(data.get("items"), list):
+            if not claim_share_alias_download(share_hash):
+                return jsonify({"error": "This share link has expired or reached its limit."}), 410
             log_event("file_download", share_hash)
-            increment_share_alias_download_count(share_hash)
             inline = request.args.get("inline") or request.args.get("play")
             if inline:
                 return redirect(f"/api/public/file/{source_hash}?inline=true", code=302)
             return redirect(f"/api/public/file/{source_hash}", code=302)
 
         try:
-            req_url = f"{filebrowser_public_dl_api}/{source_hash}?download=1"
-            req_headers = with_internal_signature({}, "GET", req_url)
-            req = requests.get(req_url, headers=req_headers, stream=True, timeout=120)
+            req = filebrowser_get(
+                f"{filebrowser_public_dl_api}/{source_hash}?download=1",
+                endpoint="public_dl_zip",
+                stream=True,
+                read_timeout=120,
+            )
             req.raise_for_status()
+            if not claim_share_alias_download(share_hash):
+                req.close()
+                return jsonify({"error": "This share link has expired or reached its limit."}), 410
             log_event("zip_download", share_hash)
-            increment_share_alias_download_count(share_hash)
 
             headers = {}
             content_disposition = req.headers.get("Content-Disposition")
@@ -9,6 +9,8 @@ from urllib.parse import quote
 
 from flask import Blueprint, Response, jsonify, redirect, request
 
+from ..utils.http_cache import _conditional_json, _revalidate_cache_control
+
 logger = logging.getLogger("droppr.share_media")
 
 
@@ -32,12 +34,12 @@ def create_share_media_blueprint(deps: dict):
     thumb_sema = deps["thumb_sema"]
     thumb_ffmpeg_timeout_seconds = deps["thumb_ffmpeg_timeout_seconds"]
     preview_mimetype = deps["preview_mimetype"]
-    filebrowser_public_dl_api = deps["filebrowser_public_dl_api"]
     normalize_preview_format = deps["normalize_preview_format"]
     ffprobe_video_meta = deps["ffprobe_video_meta"]
     thumb_multi_default = deps["thumb_multi_default"]
     thumb_multi_max = deps["thumb_multi_max"]
     fetch_public_share_json = deps["fetch_public_share_json"]
+    media_source = deps["media_source"]
     parse_bool = deps["parse_bool"]
     proxy_cache_key = deps["proxy_cache_key"]
     r2_proxy_key = deps["r2_proxy_key"]
@@ -179,7 +181,7 @@ def create_share_media_blueprint(deps: dict):
                             return resp
 
                     # Generate thumbnail
-                    src_url = f"{filebrowser_public_dl_api}/{source_hash}/{quote(safe, safe='/')}?inline=true"
+                    src_url = media_source(source_hash, safe)
 
                     def run_thumb(fmt_value: str, dst_path: str) -> subprocess.CompletedProcess:
                         cmd = ffmpeg_thumbnail_cmd(
@@ -304,9 +306,7 @@ def create_share_media_blueprint(deps: dict):
 
         duration = None
         try:
-            src_url = (
-                f"{filebrowser_public_dl_api}/{source_hash}/{quote(safe, safe='/')}?inline=true"
-            )
+            src_url = media_source(source_hash, safe)
             meta = ffprobe_video_meta(src_url)
             if meta and isinstance(meta.get("duration"), (int, float)):
                 duration = float(meta["duration"])
@@ -559,7 +559,7 @@ def create_share_media_blueprint(deps: dict):
                 modified=modified,
             )
 
-        resp = jsonify(
+        resp = _conditional_json(
             {
                 "share": share_hash,
                 "path": safe,
@@ -593,9 +593,10 @@ def create_share_media_blueprint(deps: dict):
                     "requested": sorted(prepare_targets) if prepare_targets else [],
                     "started": prepare_started,
                 },
-            }
+            },
+            # Polled while transcodes run, so always revalidate.
+            _revalidate_cache_control(0),
         )
-        resp.headers["Cache-Control"] = "no-store"
         return resp
 
     @bp.route("/api/share/<share_hash>/video-meta/<path:filename>")
@@ -631,9 +632,7 @@ def create_share_media_blueprint(deps: dict):
         db_path = "/" + safe.lstrip("/")
         row = None
         try:
-            src_url = (
-                f"{filebrowser_public_dl_api}/{source_hash}/{quote(safe, safe='/')}?inline=true"
-            )
+            src_url = media_source(source_hash, safe)
             row = ensure_video_meta_record(
                 db_path=db_path,
                 src_url=src_url,
@@ -645,17 +644,16 @@ def create_share_media_blueprint(deps: dict):
             return jsonify({"error": "Failed to read video metadata"}), 500
 
         if not row:
-            resp = jsonify(
+            return _conditional_json(
                 {
                     "share": share_hash,
                     "path": safe,
                     "name": name or os.path.basename(safe),
                     "current": {"size": current_size, "modified": current_modified},
                     "recorded": False,
-                }
+                },
+                _revalidate_cache_control(),
             )
-            resp.headers["Cache-Control"] = "no-store"
-            return resp
 
         original_meta = None
         processed_meta = None
@@ -672,7 +670,7 @@ def create_share_media_blueprint(deps: dict):
             processed_meta = None
 
         recorded = bool(original_meta or processed_meta)
-        resp = jsonify(
+        return _conditional_json(
             {
                 "share": share_hash,
                 "path": safe,
@@ -690,9 +688,8 @@ def create_share_media_blueprint(deps: dict):
                 ),
                 "original": original_meta,
                 "processed": processed_meta,
-            }
+            },
+            _revalidate_cache_control(),
         )
-        resp.headers["Cache-Control"] = "no-store"
-        return resp
 
     return bp
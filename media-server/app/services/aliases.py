@@ -4,10 +4,15 @@ import fcntl
 import logging
 import os
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from contextlib import contextmanager
 
+from ..utils.sqlite_pool import _record_locked_retry, _retry_locked, _sqlite_pool
 from ..utils.validation import is_valid_share_hash
+from .cache import _redis_download_count_get
+from .invalidation import _publish_invalidation, register_invalidation_handler
 
 logger = logging.getLogger("droppr.aliases")
 
@@ -18,27 +23,25 @@ _aliases_db_ready: bool = False
 
 MAX_ALIAS_DEPTH = 10
 
+# Resolutions are cached per process; writes evict them here and, via the
+# invalidation bus, on every other worker. The TTL bounds anything missed.
+ALIAS_CACHE_TTL_SECONDS = float(os.environ.get("DROPPR_ALIAS_CACHE_TTL_SECONDS", "30"))
+ALIAS_CACHE_MAX_ITEMS = int(os.environ.get("DROPPR_ALIAS_CACHE_MAX_ITEMS", "10000"))
+
+_alias_cache_lock = threading.Lock()
+# share_hash -> (expires_at, terminal_hash, hops, chain); hops hold each alias
+# row's (from_hash, target_expire, download_limit, download_count) so limits
+# are re-checked on every hit.
+_alias_cache: OrderedDict[str, tuple[float, str, tuple[tuple, ...], frozenset[str]]] = OrderedDict()
+
 
 @contextmanager
 def _aliases_conn():
     _ensure_aliases_db()
 
-    conn = sqlite3.connect(
-        ALIASES_DB_PATH,
-        timeout=ALIASES_DB_TIMEOUT_SECONDS,
-        isolation_level=None,
-        check_same_thread=False,
-    )
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA temp_store=MEMORY;")
-    conn.execute("PRAGMA busy_timeout=5000;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    try:
+    pool = _sqlite_pool("aliases", ALIASES_DB_PATH, timeout=ALIASES_DB_TIMEOUT_SECONDS)
+    with pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def _init_aliases_db() -> None:
@@ -79,6 +82,18 @@ def _init_aliases_db() -> None:
         conn.execute(
             "CREATE INDEX IF NOT EXISTS idx_share_aliases_updated_at ON share_aliases(updated_at)"
         )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(share_aliases)")}
+        if "terminal_hash" not in columns:
+            conn.execute("ALTER TABLE share_aliases ADD COLUMN terminal_hash TEXT")
+        pending = conn.execute(
+            "SELECT from_hash FROM share_aliases WHERE terminal_hash IS NULL"
+        ).fetchall()
+        for row in pending:
+            _, terminal = _alias_chain(conn, row["from_hash"])
+            conn.execute(
+                "UPDATE share_aliases SET terminal_hash = ? WHERE from_hash = ?",
+                (terminal, row["from_hash"]),
+            )
     finally:
         conn.close()
 
@@ -105,6 +120,7 @@ def _ensure_aliases_db() -> None:
                 return
             except sqlite3.OperationalError as exc:
                 if "locked" in str(exc).lower() and attempt < 9:
+                    _record_locked_retry("aliases")
                     time.sleep(0.05 * (attempt + 1))
                     continue
                 logger.warning("Aliases init failed: %s", exc)
@@ -119,42 +135,136 @@ def _ensure_aliases_db() -> None:
             lock_file.close()
 
 
+def _alias_chain(conn, share_hash: str) -> tuple[list[sqlite3.Row], str]:
+    """Walks an alias chain hop by hop; returns the rows visited and the hash it ends on."""
+    current = share_hash
+    visited = {current}
+    rows: list[sqlite3.Row] = []
+    for _ in range(MAX_ALIAS_DEPTH):
+        row = conn.execute(
+            "SELECT from_hash, to_hash, download_limit, download_count, target_expire FROM share_aliases WHERE from_hash = ? LIMIT 1",
+            (current,),
+        ).fetchone()
+        if row is None:
+            break
+        rows.append(row)
+
+        nxt = str(row["to_hash"] or "").strip()
+        if not is_valid_share_hash(nxt) or nxt in visited:
+            break
+        visited.add(nxt)
+        current = nxt
+    return rows, current
+
+
+def _refresh_terminal_hashes(conn, share_hash: str) -> None:
+    """Recomputes the flattened terminal hash of every alias whose chain passes through ``share_hash``."""
+    upstream = conn.execute(
+        """
+        WITH RECURSIVE upstream(hash) AS (
+            SELECT ?
+            UNION
+            SELECT share_aliases.from_hash
+            FROM share_aliases JOIN upstream ON share_aliases.to_hash = upstream.hash
+        )
+        SELECT hash FROM upstream
+        """,
+        (share_hash,),
+    ).fetchall()
+    for row in upstream:
+        _, terminal = _alias_chain(conn, row["hash"])
+        conn.execute(
+            "UPDATE share_aliases SET terminal_hash = ? WHERE from_hash = ?",
+            (terminal, row["hash"]),
+        )
+
+
+def _alias_hop_blocked(hop: tuple, now: int) -> bool:
+    from_hash, expire, limit, count = hop
+    if expire and expire < now:
+        return True
+    if limit is None or limit <= 0:
+        return False
+    # Downloads counted in Redis reach the database only on the next flush.
+    live = _redis_download_count_get(from_hash)
+    return max(count or 0, live or 0) >= limit
+
+
+def _lookup_alias_resolution(share_hash: str) -> tuple[str, tuple[tuple, ...], frozenset[str]]:
+    with _aliases_conn() as conn:
+        # The stored terminal_hash ends the walk, so any chain is read in one
+        # query; every hop's row still comes back so its own expiry and
+        # download limit apply.
+        rows = conn.execute(
+            """
+            WITH RECURSIVE chain(from_hash, to_hash, terminal_hash, download_limit,
+                                 download_count, target_expire, depth) AS (
+                SELECT from_hash, to_hash, terminal_hash, download_limit,
+                       download_count, target_expire, 0
+                FROM share_aliases WHERE from_hash = ?
+                UNION ALL
+                SELECT a.from_hash, a.to_hash, chain.terminal_hash, a.download_limit,
+                       a.download_count, a.target_expire, chain.depth + 1
+                FROM share_aliases a JOIN chain ON a.from_hash = chain.to_hash
+                WHERE chain.from_hash != chain.terminal_hash AND chain.depth + 1 < ?
+            )
+            SELECT * FROM chain ORDER BY depth
+            """,
+            (share_hash, MAX_ALIAS_DEPTH),
+        ).fetchall()
+        if not rows:
+            return share_hash, (), frozenset({share_hash})
+        if rows[0]["terminal_hash"]:
+            terminal = str(rows[0]["terminal_hash"])
+        else:
+            rows, terminal = _alias_chain(conn, share_hash)
+    hops = tuple(
+        (str(r["from_hash"]), r["target_expire"], r["download_limit"], r["download_count"] or 0)
+        for r in rows
+    )
+    chain = frozenset({share_hash, terminal, *(str(r["to_hash"]) for r in rows)})
+    return terminal, hops, chain
+
+
 def _resolve_share_hash(share_hash: str) -> str | None:
     if not is_valid_share_hash(share_hash):
         return share_hash
 
-    current = share_hash
-    visited = {current}
-    try:
-        with _aliases_conn() as conn:
-            for _ in range(MAX_ALIAS_DEPTH):
-                row = conn.execute(
-                    "SELECT to_hash, download_limit, download_count, target_expire FROM share_aliases WHERE from_hash = ? LIMIT 1",
-                    (current,),
-                ).fetchone()
-                if row is None:
-                    break
-
-                # Check expiration
-                expire = row["target_expire"]
-                if expire and expire < int(time.time()):
-                    return None
-
-                # Check download limit
-                limit = row["download_limit"]
-                count = row["download_count"] or 0
-                if limit is not None and limit > 0 and count >= limit:
-                    return None
-
-                nxt = str(row["to_hash"] or "").strip()
-                if not is_valid_share_hash(nxt) or nxt in visited:
-                    break
-                visited.add(nxt)
-                current = nxt
-    except Exception:
-        return share_hash
+    now = time.time()
+    with _alias_cache_lock:
+        cached = _alias_cache.get(share_hash)
+        if cached is not None:
+            _alias_cache.move_to_end(share_hash)
+    if cached is not None and cached[0] > now:
+        _, terminal, hops, _ = cached
+    else:
+        try:
+            terminal, hops, chain = _lookup_alias_resolution(share_hash)
+        except Exception:
+            return share_hash
+        if ALIAS_CACHE_TTL_SECONDS > 0:
+            with _alias_cache_lock:
+                _alias_cache[share_hash] = (now + ALIAS_CACHE_TTL_SECONDS, terminal, hops, chain)
+                _alias_cache.move_to_end(share_hash)
+                while len(_alias_cache) > max(1, ALIAS_CACHE_MAX_ITEMS):
+                    _alias_cache.popitem(last=False)
+
+    if any(_alias_hop_blocked(hop, int(now)) for hop in hops):
+        return None
+    return terminal
+
+
+def _evict_local_alias_cache(share_hash: str | None) -> None:
+    """Drops cached resolutions that start at or pass through ``share_hash`` (all if None)."""
+    with _alias_cache_lock:
+        if share_hash is None:
+            _alias_cache.clear()
+            return
+        for key in [key for key, entry in _alias_cache.items() if share_hash in entry[3]]:
+            del _alias_cache[key]
 
-    return current
+
+register_invalidation_handler("alias", _evict_local_alias_cache)
 
 
 def _get_share_alias_meta(share_hash: str) -> dict | None:
@@ -200,6 +310,7 @@ def _upsert_share_alias(
 
     now = int(time.time())
     with _aliases_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
         conn.execute(
             """
             INSERT INTO share_aliases (from_hash, to_hash, path, target_expire, download_limit, allow_download, created_at, updated_at)
@@ -223,17 +334,82 @@ def _upsert_share_alias(
                 now,
             ),
         )
+        _refresh_terminal_hashes(conn, from_hash)
+        conn.execute("COMMIT")
+    _evict_local_alias_cache(from_hash)
+    # Other workers drop any alias resolution they hold for this hash.
+    _publish_invalidation("alias", from_hash)
 
 
 def _increment_share_alias_download_count(share_hash: str) -> None:
     if not is_valid_share_hash(share_hash):
         return
 
+    def _increment() -> None:
+        with _aliases_conn() as conn:
+            conn.execute(
+                "UPDATE share_aliases SET download_count = download_count + 1 WHERE from_hash = ?",
+                (share_hash,),
+            )
+
+    _retry_locked("aliases", _increment)
+    _evict_local_alias_cache(share_hash)
+    _publish_invalidation("alias", share_hash)
+
+
+def _alias_download_state(share_hash: str) -> tuple[int | None, int] | None:
+    """Returns ``(download_limit, download_count)`` for an alias, or None if there is none."""
     with _aliases_conn() as conn:
-        conn.execute(
-            "UPDATE share_aliases SET download_count = download_count + 1 WHERE from_hash = ?",
+        row = conn.execute(
+            "SELECT download_limit, download_count FROM share_aliases WHERE from_hash = ? LIMIT 1",
             (share_hash,),
-        )
+        ).fetchone()
+    if row is None:
+        return None
+    return row["download_limit"], int(row["download_count"] or 0)
+
+
+def _claim_share_alias_download_sync(share_hash: str) -> bool:
+    """
+    Counts a download in the database unless the alias's limit is reached,
+    as one conditional UPDATE so concurrent downloads cannot overshoot it.
+    """
+
+    def _claim() -> int:
+        with _aliases_conn() as conn:
+            return conn.execute(
+                """
+                UPDATE share_aliases
+                SET download_count = COALESCE(download_count, 0) + 1
+                WHERE from_hash = ?
+                    AND (download_limit IS NULL OR download_limit <= 0
+                        OR COALESCE(download_count, 0) < download_limit)
+                """,
+                (share_hash,),
+            ).rowcount
+
+    if not _retry_locked("aliases", _claim):
+        return False
+    _evict_local_alias_cache(share_hash)
+    _publish_invalidation("alias", share_hash)
+    return True
+
+
+def _add_share_alias_download_counts(counts: dict[str, int]) -> None:
+    """Applies batched download count deltas in one transaction."""
+    if not counts:
+        return
+
+    def _apply() -> None:
+        with _aliases_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE share_aliases SET download_count = COALESCE(download_count, 0) + ? WHERE from_hash = ?",
+                [(int(delta), share_hash) for share_hash, delta in counts.items()],
+            )
+            conn.execute("COMMIT")
+
+    _retry_locked("aliases", _apply)
 
 
 def _list_share_aliases(*, limit: int = 500) -> list[dict]:
@@ -1,22 +1,38 @@
 from __future__ import annotations
 
+import atexit
 import fcntl
 import ipaddress
 import json
 import logging
 import os
+import socket
 import threading
 import time
 from collections import OrderedDict
 from contextlib import contextmanager
 
 from flask import request
+from sqlalchemy import inspect
 from sqlalchemy.exc import OperationalError
 
 from ..config import parse_bool
+from ..metrics import ANALYTICS_EVENTS_DROPPED
 from ..models import ANALYTICS_DB_PATH, AnalyticsBase, get_analytics_engine
-from ..models.analytics import AuditEvent, AuthEvent, DownloadEvent
+from ..models.analytics import AuditEvent, AuthEvent
+from ..utils.sqlite_pool import _record_locked_retry
 from ..utils.validation import _normalize_ip
+from .analytics_partitions import (
+    LEGACY_EVENTS_TABLE,
+    _insert_download_events,
+    _migrate_unpartitioned_events,
+)
+from .analytics_rollups import (
+    ROLLUP_TABLES,
+    _apply_download_rollups,
+    _rebuild_download_rollups,
+)
+from .invalidation import _publish_invalidation, register_invalidation_handler
 
 logger = logging.getLogger("droppr.analytics")
 
@@ -34,8 +50,19 @@ ANALYTICS_LOG_ZIP_DOWNLOADS = parse_bool(
 ANALYTICS_IP_MODE = (os.environ.get("DROPPR_ANALYTICS_IP_MODE", "full") or "full").strip().lower()
 ANALYTICS_CACHE_TTL_SECONDS = int(os.environ.get("DROPPR_ANALYTICS_CACHE_TTL_SECONDS", "30"))
 ANALYTICS_CACHE_MAX_ITEMS = int(os.environ.get("DROPPR_ANALYTICS_CACHE_MAX_ITEMS", "256"))
+# Events are queued per worker and bulk-inserted by a background writer every
+# FLUSH_INTERVAL_MS, or sooner once BATCH_SIZE events are waiting. 0 writes
+# each event on the request thread.
+ANALYTICS_FLUSH_INTERVAL_MS = int(os.environ.get("DROPPR_ANALYTICS_FLUSH_INTERVAL_MS", "250"))
+ANALYTICS_BATCH_SIZE = int(os.environ.get("DROPPR_ANALYTICS_BATCH_SIZE", "500"))
+ANALYTICS_QUEUE_MAX_EVENTS = int(os.environ.get("DROPPR_ANALYTICS_QUEUE_MAX_EVENTS", "10000"))
+# Queued events are also appended here so a crashed worker's events are
+# recovered by the next worker to start. Empty disables the spool.
+ANALYTICS_SPOOL_DIR = os.environ.get(
+    "DROPPR_ANALYTICS_SPOOL_DIR",
+    os.path.join(os.path.dirname(ANALYTICS_DB_PATH), "analytics-spool"),
+)
 
-_last_retention_sweep_at: float = 0.0
 _analytics_db_ready: bool = False
 _analytics_cache_lock = threading.Lock()
 _analytics_cache: OrderedDict[str, tuple[float, dict]] = OrderedDict()
@@ -43,6 +70,22 @@ _ANALYTICS_ENGINE = get_analytics_engine()
 
 MAX_ANALYTICS_DAYS = 3650
 
+# Download events go to monthly partitions instead (analytics_partitions).
+_EVENT_TABLES = {
+    "auth": AuthEvent.__table__,
+    "audit": AuditEvent.__table__,
+}
+_EVENT_KINDS = ("download", *_EVENT_TABLES)
+
+_queue_cond = threading.Condition()
+_queue: list[tuple[str, dict]] = []
+_queue_pid: int | None = None
+_flush_lock = threading.Lock()
+_writer_thread: threading.Thread | None = None
+_spool_file = None
+_spool_lock_file = None
+_spool_paths: tuple[str, str, str] | None = None
+
 
 def _parse_int(value: str | None) -> int | None:
     if value is None:
@@ -149,7 +192,18 @@ def _init_analytics_db() -> None:
     db_dir = os.path.dirname(ANALYTICS_DB_PATH)
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
+    inspector = inspect(_ANALYTICS_ENGINE)
+    had_rollups = all(inspector.has_table(table) for table in ROLLUP_TABLES)
+    unpartitioned = inspector.has_table(LEGACY_EVENTS_TABLE)
     AnalyticsBase.metadata.create_all(_ANALYTICS_ENGINE)
+    if unpartitioned:
+        with _ANALYTICS_ENGINE.begin() as conn:
+            moved = _migrate_unpartitioned_events(_DriverConnection(conn))
+        logger.info("Moved %d download events into monthly partitions", moved)
+    if not had_rollups:
+        # First start with (new) rollup tables: build them from the existing events.
+        with _ANALYTICS_ENGINE.begin() as conn:
+            _rebuild_download_rollups(_DriverConnection(conn))
 
 
 def _ensure_analytics_db() -> None:
@@ -174,6 +228,7 @@ def _ensure_analytics_db() -> None:
                 return
             except OperationalError as exc:
                 if "locked" in str(exc).lower() and attempt < 9:
+                    _record_locked_retry("analytics")
                     time.sleep(0.05 * (attempt + 1))
                     continue
                 logger.warning("Analytics init failed: %s", exc)
@@ -188,59 +243,6 @@ def _ensure_analytics_db() -> None:
             lock_file.close()
 
 
-def _maybe_apply_retention(conn) -> None:
-    global _last_retention_sweep_at
-
-    if ANALYTICS_RETENTION_DAYS <= 0:
-        return
-
-    now = time.time()
-    if now - _last_retention_sweep_at < 3600:
-        return
-
-    cutoff = int(now - (ANALYTICS_RETENTION_DAYS * 86400))
-    try:
-        archived_at = int(now)
-        conn.execute(
-            """
-            INSERT INTO download_events_archive (
-                share_hash, event_type, file_path, ip, user_agent, referer, created_at, archived_at
-            )
-            SELECT share_hash, event_type, file_path, ip, user_agent, referer, created_at, ?
-            FROM download_events
-            WHERE created_at < ?
-            """,
-            (archived_at, cutoff),
-        )
-        conn.execute(
-            """
-            INSERT INTO auth_events_archive (
-                event_type, path, ip, user_agent, success, detail, created_at, archived_at
-            )
-            SELECT event_type, path, ip, user_agent, success, detail, created_at, ?
-            FROM auth_events
-            WHERE created_at < ?
-            """,
-            (archived_at, cutoff),
-        )
-        conn.execute(
-            """
-            INSERT INTO audit_events_archive (
-                action, target, detail, ip, user_agent, created_at, archived_at
-            )
-            SELECT action, target, detail, ip, user_agent, created_at, ?
-            FROM audit_events
-            WHERE created_at < ?
-            """,
-            (archived_at, cutoff),
-        )
-        conn.execute("DELETE FROM download_events WHERE created_at < ?", (cutoff,))
-        conn.execute("DELETE FROM auth_events WHERE created_at < ?", (cutoff,))
-        conn.execute("DELETE FROM audit_events WHERE created_at < ?", (cutoff,))
-    finally:
-        _last_retention_sweep_at = now
-
-
 def _analytics_cache_get(key: str) -> dict | None:
     if ANALYTICS_CACHE_TTL_SECONDS <= 0:
         return None
@@ -257,6 +259,23 @@ def _analytics_cache_get(key: str) -> dict | None:
         return value
 
 
+def _evict_local_analytics_cache(key: str | None) -> None:
+    with _analytics_cache_lock:
+        if key is None:
+            _analytics_cache.clear()
+        else:
+            _analytics_cache.pop(key, None)
+
+
+register_invalidation_handler("analytics", _evict_local_analytics_cache)
+
+
+def _invalidate_analytics_cache(key: str | None = None) -> None:
+    """Drops cached analytics responses here and in every other worker."""
+    _evict_local_analytics_cache(key)
+    _publish_invalidation("analytics", key)
+
+
 def _analytics_cache_set(key: str, value: dict) -> None:
     if ANALYTICS_CACHE_TTL_SECONDS <= 0:
         return
@@ -281,43 +300,332 @@ def _should_log_event(event_type: str) -> bool:
     return True
 
 
-def _log_event(event_type: str, share_hash: str, file_path: str | None = None) -> None:
+def _record_dropped_event(kind: str, reason: str, count: int = 1) -> None:
+    if ANALYTICS_EVENTS_DROPPED is not None and count > 0:
+        ANALYTICS_EVENTS_DROPPED.labels(kind, reason).inc(count)
+
+
+def _spool_owner_paths(owner: str) -> tuple[str, str, str]:
+    base = os.path.join(ANALYTICS_SPOOL_DIR, owner)
+    return f"{base}.lock", f"{base}.jsonl", f"{base}.inflight.jsonl"
+
+
+def _read_spool(path: str) -> list[tuple[str, dict]]:
+    events: list[tuple[str, dict]] = []
+    try:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A crash can leave a partial last line.
+                    continue
+                if isinstance(entry, dict) and entry.get("kind") in _EVENT_KINDS:
+                    events.append((entry["kind"], entry.get("row") or {}))
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def _write_spool(handle, events: list[tuple[str, dict]]) -> None:
+    handle.write("".join(json.dumps({"kind": kind, "row": row}) + "\n" for kind, row in events))
+    handle.flush()
+
+
+def _recover_orphaned_spools(own_lock_path: str) -> list[tuple[str, dict]]:
     """
-    Logs a download or gallery view event to the analytics database.
+    Collects events spooled by workers that exited without writing them. A
+    worker holds the lock on its spool for its whole life, so a lock that
+    can be taken belongs to a dead worker.
     """
-    if not _should_log_event(event_type):
+    recovered: list[tuple[str, dict]] = []
+    try:
+        names = os.listdir(ANALYTICS_SPOOL_DIR)
+    except OSError:
+        return recovered
+    for name in names:
+        if not name.endswith(".lock"):
+            continue
+        lock_path, active_path, inflight_path = _spool_owner_paths(name[: -len(".lock")])
+        if lock_path == own_lock_path:
+            continue
+        try:
+            lock_file = open(lock_path, "a")
+        except OSError:
+            continue
+        try:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue
+            recovered.extend(_read_spool(inflight_path))
+            recovered.extend(_read_spool(active_path))
+            for path in (inflight_path, active_path, lock_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            lock_file.close()
+    if recovered:
+        logger.info("Recovered %d spooled analytics events", len(recovered))
+    return recovered
+
+
+def _open_analytics_spool() -> list[tuple[str, dict]]:
+    """Opens this worker's spool; returns orphaned events to re-queue. Caller holds _queue_cond."""
+    global _spool_file, _spool_lock_file, _spool_paths
+
+    if not ANALYTICS_SPOOL_DIR:
+        return []
+    try:
+        os.makedirs(ANALYTICS_SPOOL_DIR, exist_ok=True)
+        paths = _spool_owner_paths(f"{socket.gethostname()}-{os.getpid()}")
+        lock_file = open(paths[0], "a")
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        recovered = _recover_orphaned_spools(paths[0])
+        _spool_lock_file = lock_file
+        _spool_paths = paths
+        _spool_file = open(paths[1], "a", encoding="utf-8")
+        return recovered
+    except OSError as exc:
+        logger.warning("Analytics spool unavailable, queueing in memory only: %s", exc)
+        return []
+
+
+def _spool_append(events: list[tuple[str, dict]]) -> None:
+    if _spool_file is None:
         return
+    try:
+        _write_spool(_spool_file, events)
+    except OSError as exc:
+        logger.warning("Analytics spool write failed: %s", exc)
+
 
-    ip = _get_client_ip()
-    user_agent = request.headers.get("User-Agent")
-    referer = request.headers.get("Referer")
-    created_at = int(time.time())
+def _spool_rotate() -> None:
+    """Moves the spool aside while its events are written. Caller holds _queue_cond."""
+    global _spool_file
 
-    for attempt in range(3):
+    if _spool_file is None or _spool_paths is None:
+        return
+    _, active_path, inflight_path = _spool_paths
+    try:
+        _spool_file.close()
+        os.replace(active_path, inflight_path)
+    except OSError as exc:
+        logger.warning("Analytics spool rotation failed: %s", exc)
+    try:
+        _spool_file = open(active_path, "a", encoding="utf-8")
+    except OSError as exc:
+        logger.warning("Analytics spool unavailable: %s", exc)
+        _spool_file = None
+
+
+def _spool_discard_inflight() -> None:
+    if _spool_paths is None:
+        return
+    try:
+        os.remove(_spool_paths[2])
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        logger.warning("Analytics spool cleanup failed: %s", exc)
+
+
+def _reset_analytics_queue_for_pid() -> None:
+    """Forked children start with an empty queue and open their own spool. Caller holds _queue_cond."""
+    global _queue_pid, _spool_file, _spool_lock_file, _spool_paths, _writer_thread
+
+    _queue_pid = os.getpid()
+    _queue.clear()
+    # The parent still owns the inherited spool handles and their lock.
+    _spool_file = None
+    _spool_lock_file = None
+    _spool_paths = None
+    _writer_thread = None
+    recovered = _open_analytics_spool()
+    if recovered:
+        _queue.extend(recovered[: max(1, ANALYTICS_QUEUE_MAX_EVENTS)])
+        _spool_append(_queue)
+
+
+def _ensure_analytics_writer() -> None:
+    """Starts this worker's writer thread. Caller holds _queue_cond."""
+    global _writer_thread
+
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    _writer_thread = threading.Thread(
+        target=_analytics_writer_loop, name="droppr-analytics-writer", daemon=True
+    )
+    _writer_thread.start()
+
+
+def _write_analytics_events(events: list[tuple[str, dict]]) -> None:
+    """Inserts ``events`` in one transaction, one executemany per table."""
+    grouped: dict[str, list[dict]] = {}
+    for kind, row in events:
+        grouped.setdefault(kind, []).append(row)
+
+    batch_size = max(1, ANALYTICS_BATCH_SIZE)
+    with _analytics_conn() as conn:
+        for kind, rows in grouped.items():
+            if kind == "download":
+                _insert_download_events(conn, rows, batch_size)
+                _apply_download_rollups(conn, rows)
+                continue
+            table = _EVENT_TABLES.get(kind)
+            if table is None:
+                continue
+            for start in range(0, len(rows), batch_size):
+                conn.execute(table.insert(), rows[start : start + batch_size])
+
+
+def _requeue_analytics_events(events: list[tuple[str, dict]]) -> None:
+    """Puts a failed batch back ahead of newer events and rewrites the spool to match."""
+    global _spool_file
+
+    with _queue_cond:
+        if _queue_pid != os.getpid():
+            return
+        combined = events + _queue
+        max_events = max(1, ANALYTICS_QUEUE_MAX_EVENTS)
+        for kind, _ in combined[max_events:]:
+            _record_dropped_event(kind, "queue_full")
+        _queue[:] = combined[:max_events]
+
+        if _spool_file is None or _spool_paths is None:
+            return
+        _, active_path, _ = _spool_paths
+        tmp_path = f"{active_path}.tmp"
         try:
-            with _analytics_conn() as conn:
-                _maybe_apply_retention(conn)
-                conn.execute(
-                    DownloadEvent.__table__.insert(),
-                    {
-                        "share_hash": share_hash,
-                        "event_type": event_type,
-                        "file_path": file_path,
-                        "ip": ip,
-                        "user_agent": user_agent,
-                        "referer": referer,
-                        "created_at": created_at,
-                    },
-                )
+            _spool_file.close()
+            with open(tmp_path, "w", encoding="utf-8") as handle:
+                _write_spool(handle, _queue)
+            os.replace(tmp_path, active_path)
+            _spool_file = open(active_path, "a", encoding="utf-8")
+        except OSError as exc:
+            logger.warning("Analytics spool rewrite failed: %s", exc)
+            _spool_file = None
             return
-        except OperationalError as exc:
-            if "locked" not in str(exc).lower() or attempt == 2:
-                logger.warning("Analytics logging failed: %s", exc)
-                return
-            time.sleep(0.05 * (attempt + 1))
+    _spool_discard_inflight()
+
+
+def _flush_analytics_events() -> int:
+    """
+    Writes every queued event to the database; returns how many were
+    written. A failed batch is re-queued and the error re-raised.
+    """
+    with _flush_lock:
+        with _queue_cond:
+            if _queue_pid != os.getpid() or not _queue:
+                return 0
+            events = _queue[:]
+            _queue.clear()
+            _spool_rotate()
+        try:
+            _write_analytics_events(events)
+        except Exception as exc:
+            if isinstance(exc, OperationalError) and "locked" in str(exc).lower():
+                _record_locked_retry("analytics")
+            _requeue_analytics_events(events)
+            raise
+        _spool_discard_inflight()
+        return len(events)
+
+
+def _analytics_writer_loop() -> None:
+    interval = max(0.01, ANALYTICS_FLUSH_INTERVAL_MS / 1000.0)
+    while True:
+        with _queue_cond:
+            if len(_queue) < max(1, ANALYTICS_BATCH_SIZE):
+                _queue_cond.wait(interval)
+        try:
+            _flush_analytics_events()
         except Exception as exc:
             logger.warning("Analytics logging failed: %s", exc)
+            time.sleep(min(5.0, interval * 10))
+
+
+def _enqueue_analytics_event(kind: str, row: dict) -> None:
+    """
+    Hands an event to this worker's background writer. The request thread
+    only appends to the queue and the spool; when the queue is full the event
+    is dropped and counted.
+    """
+    if ANALYTICS_FLUSH_INTERVAL_MS <= 0:
+        try:
+            _write_analytics_events([(kind, row)])
+        except Exception as exc:
+            logger.warning("Analytics logging failed: %s", exc)
+        return
+
+    with _queue_cond:
+        if _queue_pid != os.getpid():
+            _reset_analytics_queue_for_pid()
+        _ensure_analytics_writer()
+        if len(_queue) >= max(1, ANALYTICS_QUEUE_MAX_EVENTS):
+            _record_dropped_event(kind, "queue_full")
             return
+        _queue.append((kind, row))
+        _spool_append([(kind, row)])
+        if len(_queue) >= max(1, ANALYTICS_BATCH_SIZE):
+            _queue_cond.notify()
+
+
+def _shutdown_analytics_writer() -> None:
+    """
+    Flushes queued events when the worker exits (gunicorn workers leave
+    through ``sys.exit``, which runs atexit handlers). Whatever cannot be
+    written stays in the spool for the next worker to recover.
+    """
+    global _spool_file, _spool_lock_file
+
+    try:
+        _flush_analytics_events()
+    except Exception as exc:
+        logger.warning("Analytics flush at shutdown failed: %s", exc)
+    with _queue_cond:
+        if _queue_pid != os.getpid() or _queue or _spool_paths is None:
+            return
+        try:
+            if _spool_file is not None:
+                _spool_file.close()
+            for path in (_spool_paths[1], _spool_paths[2], _spool_paths[0]):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            if _spool_lock_file is not None:
+                _spool_lock_file.close()
+        except OSError:
+            pass
+        _spool_file = None
+        _spool_lock_file = None
+
+
+atexit.register(_shutdown_analytics_writer)
+
+
+def _log_event(event_type: str, share_hash: str, file_path: str | None = None) -> None:
+    """
+    Logs a download or gallery view event to the analytics database.
+    """
+    if not _should_log_event(event_type):
+        return
+
+    _enqueue_analytics_event(
+        "download",
+        {
+            "share_hash": share_hash,
+            "event_type": event_type,
+            "file_path": file_path,
+            "ip": _get_client_ip(),
+            "user_agent": request.headers.get("User-Agent"),
+            "referer": request.headers.get("Referer"),
+            "created_at": int(time.time()),
+        },
+    )
 
 
 def _log_auth_event(event_type: str, success: bool, detail: str | None = None) -> None:
@@ -327,37 +635,18 @@ def _log_auth_event(event_type: str, success: bool, detail: str | None = None) -
     if not ANALYTICS_ENABLED:
         return
 
-    ip = _get_client_ip()
-    user_agent = request.headers.get("User-Agent")
-    path = request.path
-    created_at = int(time.time())
-    detail_value = str(detail) if detail is not None else None
-
-    for attempt in range(3):
-        try:
-            with _analytics_conn() as conn:
-                _maybe_apply_retention(conn)
-                conn.execute(
-                    AuthEvent.__table__.insert(),
-                    {
-                        "event_type": event_type,
-                        "path": path,
-                        "ip": ip,
-                        "user_agent": user_agent,
-                        "success": 1 if success else 0,
-                        "detail": detail_value,
-                        "created_at": created_at,
-                    },
-                )
-            return
-        except OperationalError as exc:
-            if "locked" not in str(exc).lower() or attempt == 2:
-                logger.warning("Auth logging failed: %s", exc)
-                return
-            time.sleep(0.05 * (attempt + 1))
-        except Exception as exc:
-            logger.warning("Auth logging failed: %s", exc)
-            return
+    _enqueue_analytics_event(
+        "auth",
+        {
+            "event_type": event_type,
+            "path": request.path,
+            "ip": _get_client_ip(),
+            "user_agent": request.headers.get("User-Agent"),
+            "success": 1 if success else 0,
+            "detail": str(detail) if detail is not None else None,
+            "created_at": int(time.time()),
+        },
+    )
 
 
 def _log_audit_event(action: str, target: str | None = None, detail: dict | None = None) -> None:
@@ -367,32 +656,14 @@ def _log_audit_event(action: str, target: str | None = None, detail: dict | None
     if not ANALYTICS_ENABLED:
         return
 
-    ip = _get_client_ip()
-    user_agent = request.headers.get("User-Agent")
-    created_at = int(time.time())
-    detail_json = json.dumps(detail) if detail is not None else None
-
-    for attempt in range(3):
-        try:
-            with _analytics_conn() as conn:
-                _maybe_apply_retention(conn)
-                conn.execute(
-                    AuditEvent.__table__.insert(),
-                    {
-                        "action": action,
-                        "target": target,
-                        "detail": detail_json,
-                        "ip": ip,
-                        "user_agent": user_agent,
-                        "created_at": created_at,
-                    },
-                )
-            return
-        except OperationalError as exc:
-            if "locked" not in str(exc).lower() or attempt == 2:
-                logger.warning("Audit logging failed: %s", exc)
-                return
-            time.sleep(0.05 * (attempt + 1))
-        except Exception as exc:
-            logger.warning("Audit logging failed: %s", exc)
-            return
+    _enqueue_analytics_event(
+        "audit",
+        {
+            "action": action,
+            "target": target,
+            "detail": json.dumps(detail) if detail is not None else None,
+            "ip": _get_client_ip(),
+            "user_agent": request.headers.get("User-Agent"),
+            "created_at": int(time.time()),
+        },
+    )
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import zlib
+from collections.abc import Iterator
+
+from .analytics import _analytics_conn
+from .analytics_parquet import _iter_archived_share_events
+from .analytics_partitions import LEGACY_EVENTS_TABLE, _partitions_for_ranges
+
+ANALYTICS_EXPORT_BATCH_ROWS = int(os.environ.get("DROPPR_ANALYTICS_EXPORT_BATCH_ROWS", "1000"))
+_EXPORT_CHUNK_BYTES = 64 * 1024
+
+# download_events stands for its monthly partitions, and PARQUET_ARCHIVE for
+# the archived months compacted into Parquet files.
+PARQUET_ARCHIVE = "download_events_parquet"
+EXPORT_SOURCES = {
+    "events": ("download_events",),
+    "archive": ("download_events_archive", PARQUET_ARCHIVE),
+    "all": ("download_events", "download_events_archive", PARQUET_ARCHIVE),
+}
+DEFAULT_EXPORT_FIELDS = ("event_type", "file_path", "ip", "user_agent", "referer", "created_at")
+EXPORT_FIELDS = ("id", "share_hash", *DEFAULT_EXPORT_FIELDS, "archived_at")
+
+
+def _parse_export_fields(value: str | None) -> tuple[str, ...]:
+    """Parses a ``fields=`` projection; raises ValueError on unknown columns."""
+    if not value:
+        return DEFAULT_EXPORT_FIELDS
+    fields = tuple(f.strip() for f in value.split(",") if f.strip())
+    unknown = [f for f in fields if f not in EXPORT_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown) or value}")
+    return fields
+
+
+def _export_tables(source: str, since: int, until: int) -> list[str]:
+    """The tables to read for ``source``, newest partition first."""
+    tables: list[str] = []
+    for table in EXPORT_SOURCES[source]:
+        if table != LEGACY_EVENTS_TABLE:
+            tables.append(table)
+            continue
+        with _analytics_conn() as conn:
+            tables.extend(reversed(_partitions_for_ranges(conn, [(since, until + 1)])))
+    return tables
+
+
+def _iter_share_events(
+    table: str, share_hash: str, since: int, until: int, fields: tuple[str, ...]
+) -> Iterator[dict]:
+    """
+    Yields a share's events newest first, one short keyset-paginated query
+    per batch, so no connection or transaction is held while the response
+    is being sent.
+    """
+    columns = [
+        f for f in fields if f != "id" and (f != "archived_at" or table.endswith("_archive"))
+    ]
+    select = ", ".join(["id", *columns])
+    batch = max(1, ANALYTICS_EXPORT_BATCH_ROWS)
+    cursor: tuple[int, int] | None = None
+
+    while True:
+        where = ""
+        params: tuple = (share_hash, since, until)
+        if cursor is not None:
+            where = " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += (cursor[0], cursor[0], cursor[1])
+        with _analytics_conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {select}, created_at AS _cursor_at
+                FROM {table}
+                WHERE share_hash = ? AND created_at >= ? AND created_at <= ?{where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT {batch}
+                """,
+                params,
+            ).fetchall()
+        for row in rows:
+            yield dict(row)
+        if len(rows) < batch:
+            return
+        cursor = (int(rows[-1]["_cursor_at"]), int(rows[-1]["id"]))
+
+
+def _stream_share_events_csv(
+    share_hash: str,
+    since: int,
+    until: int,
+    *,
+    fields: tuple[str, ...] = DEFAULT_EXPORT_FIELDS,
+    source: str = "events",
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    """
+    Yields a share's events as CSV in ~64 KiB chunks, optionally gzipped.
+    Memory use is bounded by one batch of rows whatever the export size.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    def drain() -> bytes:
+        chunk = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+        return compressor.compress(chunk) if compressor is not None else chunk
+
+    writer.writerow(fields)
+    for table in _export_tables(source, since, until):
+        if table == PARQUET_ARCHIVE:
+            rows = _iter_archived_share_events(share_hash, since, until, fields)
+        else:
+            rows = _iter_share_events(table, share_hash, since, until, fields)
+        for row in rows:
+            writer.writerow(["" if row.get(f) is None else row[f] for f in fields])
+            if buf.tell() >= _EXPORT_CHUNK_BYTES:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+
+    tail = drain()
+    if compressor is not None:
+        tail += compressor.flush()
+    if tail:
+        yield tail
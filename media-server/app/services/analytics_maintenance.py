@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+from .analytics import _analytics_conn, _invalidate_analytics_cache
+from .analytics_retention import (
+    _analytics_retention_tick,
+    _convert_to_incremental_auto_vacuum,
+)
+from .analytics_rollups import _check_download_rollups, _rebuild_download_rollups
+
+
+def _backfill_rollups() -> int:
+    with _analytics_conn() as conn:
+        _rebuild_download_rollups(conn)
+    _invalidate_analytics_cache()
+    print("Analytics rollups rebuilt")
+    return 0
+
+
+def _check_rollups(repair: bool) -> int:
+    with _analytics_conn() as conn:
+        mismatches = _check_download_rollups(conn)
+    if not mismatches:
+        print("Analytics rollups are consistent")
+        return 0
+
+    for mismatch in mismatches[:100]:
+        print(
+            f"{mismatch['table']} {mismatch['key']}: "
+            f"expected {mismatch['expected']}, found {mismatch['actual']}"
+        )
+    print(f"{len(mismatches)} rollup buckets differ from download_events")
+    if repair:
+        return _backfill_rollups()
+    return 1
+
+
+def _run_retention() -> int:
+    run = _analytics_retention_tick()
+    if run is None:
+        print("Analytics retention is disabled or already running")
+        return 1
+    moved = ", ".join(f"{table}={count}" for table, count in run.moved.items())
+    compacted = ", ".join(f"{table}={count}" for table, count in run.compacted.items())
+    print(
+        f"Archived {moved} in {run.batches} batches; "
+        f"dropped {len(run.dropped_partitions)} partitions; "
+        f"compacted {compacted or 'nothing'} into {len(run.parquet_files)} Parquet files; "
+        f"vacuumed {run.vacuumed_pages} pages in {run.duration_seconds:.1f}s"
+    )
+    return 0
+
+
+def _convert_auto_vacuum() -> int:
+    if not _convert_to_incremental_auto_vacuum():
+        print("Failed to switch the analytics database to incremental auto_vacuum")
+        return 1
+    print("Analytics database uses incremental auto_vacuum")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Analytics database maintenance, run inside the media-server container:
+
+        python -m app.services.analytics_maintenance backfill-rollups
+        python -m app.services.analytics_maintenance check-rollups [--repair]
+        python -m app.services.analytics_maintenance retention
+        python -m app.services.analytics_maintenance convert-auto-vacuum
+    """
+    parser = argparse.ArgumentParser(prog="python -m app.services.analytics_maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill-rollups", help="Rebuild the rollup tables from download_events")
+    check = commands.add_parser(
+        "check-rollups", help="Compare the rollup tables with download_events"
+    )
+    check.add_argument("--repair", action="store_true", help="Rebuild the rollups on mismatch")
+    commands.add_parser(
+        "retention", help="Archive expired events, compact closed months to Parquet and vacuum now"
+    )
+    commands.add_parser(
+        "convert-auto-vacuum",
+        help="Switch to incremental auto_vacuum with a one-time full VACUUM (locks the database)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill-rollups":
+        return _backfill_rollups()
+    if args.command == "retention":
+        return _run_retention()
+    if args.command == "convert-auto-vacuum":
+        return _convert_auto_vacuum()
+    return _check_rollups(args.repair)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,441 @@
+from __future__ import annotations
+
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterator, Mapping
+from datetime import UTC, datetime
+
+from ..models import ANALYTICS_DB_PATH
+from ..utils.parquet import INT64, STRING, ParquetFile, ParquetWriter
+from .analytics import _analytics_conn
+from .analytics_partitions import _month_start, _next_month_start
+
+# Closed months of the *_archive tables are compacted into Parquet files, one
+# per table and month compacted, under ANALYTICS_PARQUET_DIR and deleted from
+# SQLite.
+# analytics_parquet_files is the manifest: a file only counts once its row
+# is there, and rows stay in SQLite until their file is written and synced.
+
+logger = logging.getLogger("droppr.analytics_parquet")
+
+# Empty disables compaction; archived rows then stay in SQLite.
+ANALYTICS_PARQUET_DIR = os.environ.get(
+    "DROPPR_ANALYTICS_PARQUET_DIR",
+    os.path.join(os.path.dirname(ANALYTICS_DB_PATH), "analytics-parquet"),
+)
+# Rows per row group; bounds memory while compacting and querying.
+ANALYTICS_PARQUET_ROW_GROUP_ROWS = int(
+    os.environ.get("DROPPR_ANALYTICS_PARQUET_ROW_GROUP_ROWS", "20000")
+)
+ANALYTICS_PARQUET_COMPRESSION_LEVEL = int(
+    os.environ.get("DROPPR_ANALYTICS_PARQUET_COMPRESSION_LEVEL", "9")
+)
+
+DAY_SECONDS = 86400
+TIME_BUCKETS = ("day", "month")
+ARCHIVE_KINDS: dict[str, tuple[str, tuple[tuple[str, str], ...]]] = {
+    "download": (
+        "download_events_archive",
+        (
+            ("id", INT64),
+            ("share_hash", STRING),
+            ("event_type", STRING),
+            ("file_path", STRING),
+            ("ip", STRING),
+            ("user_agent", STRING),
+            ("referer", STRING),
+            ("created_at", INT64),
+            ("archived_at", INT64),
+        ),
+    ),
+    "auth": (
+        "auth_events_archive",
+        (
+            ("id", INT64),
+            ("event_type", STRING),
+            ("path", STRING),
+            ("ip", STRING),
+            ("user_agent", STRING),
+            ("success", INT64),
+            ("detail", STRING),
+            ("created_at", INT64),
+            ("archived_at", INT64),
+        ),
+    ),
+    "audit": (
+        "audit_events_archive",
+        (
+            ("id", INT64),
+            ("action", STRING),
+            ("target", STRING),
+            ("detail", STRING),
+            ("ip", STRING),
+            ("user_agent", STRING),
+            ("created_at", INT64),
+            ("archived_at", INT64),
+        ),
+    ),
+}
+_DOWNLOAD_ARCHIVE = ARCHIVE_KINDS["download"][0]
+
+
+def _parquet_path(path: str) -> str:
+    return os.path.join(ANALYTICS_PARQUET_DIR, path)
+
+
+def _query_columns(kind: str) -> tuple[str, ...]:
+    """Columns of ``kind`` that can be filtered and grouped on."""
+    return tuple(
+        name
+        for name, _ in ARCHIVE_KINDS[kind][1]
+        if name not in ("id", "created_at", "archived_at")
+    )
+
+
+def _parse_archive_query(kind: str, args: Mapping[str, str]) -> dict:
+    """
+    Parses the ``group_by``, ``distinct`` and column filter parameters of an
+    archive query into _query_archive keyword arguments; raises ValueError.
+    """
+    columns = _query_columns(kind)
+    types = dict(ARCHIVE_KINDS[kind][1])
+    group_by = tuple(g.strip() for g in (args.get("group_by") or "").split(",") if g.strip())
+    unknown = [g for g in group_by if g not in columns and g not in TIME_BUCKETS]
+    if unknown:
+        raise ValueError(f"Unknown group_by columns: {', '.join(unknown)}")
+    if len(group_by) > 3:
+        raise ValueError("At most 3 group_by columns")
+    distinct = (args.get("distinct") or "").strip() or None
+    if distinct is not None and distinct not in columns:
+        raise ValueError(f"Unknown distinct column: {distinct}")
+
+    filters: dict[str, object] = {}
+    for name in columns:
+        value = args.get(name)
+        if value is None or value == "":
+            continue
+        if types[name] == INT64:
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer") from None
+        else:
+            filters[name] = value
+    return {"filters": filters, "group_by": group_by, "distinct": distinct}
+
+
+def _closed_archive_months(table: str, cutoff: int) -> list[int]:
+    """Starts of the months of ``table`` that end at or before ``cutoff`` and have rows."""
+    months: list[int] = []
+    with _analytics_conn() as conn:
+        first = conn.execute(
+            f"SELECT MIN(created_at) AS first FROM {table} WHERE created_at < ?", (cutoff,)
+        ).fetchone()["first"]
+        if first is None:
+            return months
+        month = _month_start(int(first))
+        while _next_month_start(month) <= cutoff:
+            next_month = _next_month_start(month)
+            if conn.execute(
+                f"SELECT 1 FROM {table} WHERE created_at >= ? AND created_at < ? LIMIT 1",
+                (month, next_month),
+            ).fetchone():
+                months.append(month)
+            month = next_month
+    return months
+
+
+def _remove_orphan_files(table: str) -> int:
+    """Removes files of ``table`` left without a manifest row by an interrupted compaction."""
+    directory = _parquet_path(table)
+    if not os.path.isdir(directory):
+        return 0
+    with _analytics_conn() as conn:
+        known = {
+            row["path"]
+            for row in conn.execute(
+                "SELECT path FROM analytics_parquet_files WHERE table_name = ?", (table,)
+            ).fetchall()
+        }
+    removed = 0
+    for name in os.listdir(directory):
+        if f"{table}/{name}" in known:
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            removed += 1
+        except OSError as exc:
+            logger.warning("Failed to remove orphaned Parquet file %s: %s", name, exc)
+    return removed
+
+
+def _write_archive_month(kind: str, month: int, compacted_at: int) -> str | None:
+    """
+    Writes the rows of ``kind``'s archive for ``month`` to a Parquet file,
+    sorted by created_at so row group statistics prune time ranges, and
+    records it in the manifest as pending. Returns its manifest path.
+    """
+    table, schema = ARCHIVE_KINDS[kind]
+    columns = [name for name, _ in schema]
+    select = ", ".join(columns)
+    next_month = _next_month_start(month)
+    batch_rows = max(1, ANALYTICS_PARQUET_ROW_GROUP_ROWS)
+
+    directory = _parquet_path(table)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{datetime.fromtimestamp(month, tz=UTC):%Y%m}.tmp")
+    rows = 0
+    first_created_at = last_created_at = last_id = 0
+    cursor: tuple[int, int] | None = None
+    with open(tmp_path, "wb") as handle:
+        writer = ParquetWriter(handle, list(schema), level=ANALYTICS_PARQUET_COMPRESSION_LEVEL)
+        while True:
+            where = ""
+            params: tuple = (month, next_month)
+            if cursor is not None:
+                where = " AND (created_at > ? OR (created_at = ? AND id > ?))"
+                params += (cursor[0], cursor[0], cursor[1])
+            with _analytics_conn() as conn:
+                batch = conn.execute(
+                    f"""
+                    SELECT {select}
+                    FROM {table}
+                    WHERE created_at >= ? AND created_at < ?{where}
+                    ORDER BY created_at, id
+                    LIMIT {batch_rows}
+                    """,
+                    params,
+                ).fetchall()
+            if not batch:
+                break
+            writer.write_row_group({name: [row[name] for row in batch] for name in columns})
+            if not rows:
+                first_created_at = int(batch[0]["created_at"])
+            rows += len(batch)
+            last_created_at = int(batch[-1]["created_at"])
+            last_id = max(last_id, *(int(row["id"]) for row in batch))
+            cursor = (last_created_at, int(batch[-1]["id"]))
+            if len(batch) < batch_rows:
+                break
+        writer.close()
+        handle.flush()
+        os.fsync(handle.fileno())
+
+    if not rows:
+        os.remove(tmp_path)
+        return None
+
+    stem = f"{table}/{datetime.fromtimestamp(month, tz=UTC):%Y%m}"
+    with _analytics_conn() as conn:
+        path = f"{stem}-{compacted_at}.parquet"
+        if conn.execute("SELECT 1 FROM analytics_parquet_files WHERE path = ?", (path,)).fetchone():
+            path = f"{stem}-{compacted_at}-{last_id}.parquet"
+        os.replace(tmp_path, _parquet_path(path))
+        conn.execute(
+            """
+            INSERT INTO analytics_parquet_files (
+                path, table_name, month, first_created_at, last_created_at,
+                last_id, rows, compacted_at, pending
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+            """,
+            (path, table, month, first_created_at, last_created_at, last_id, rows, compacted_at),
+        )
+    return path
+
+
+def _pending_parquet_files() -> list[str]:
+    with _analytics_conn() as conn:
+        return [
+            row["path"]
+            for row in conn.execute(
+                "SELECT path FROM analytics_parquet_files WHERE pending = 1 ORDER BY path"
+            ).fetchall()
+        ]
+
+
+def _delete_compacted_rows(path: str, batch_rows: int) -> tuple[int, bool]:
+    """
+    Deletes the next batch of rows compacted into ``path`` from its archive
+    table; the transaction deleting the last batch marks the file done.
+    Returns (rows deleted, done).
+    """
+    batch_rows = max(1, batch_rows)
+    with _analytics_conn() as conn:
+        entry = conn.execute(
+            "SELECT table_name, month, last_id FROM analytics_parquet_files WHERE path = ?",
+            (path,),
+        ).fetchone()
+        table = entry["table_name"]
+        month = int(entry["month"])
+        conn.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE created_at >= ? AND created_at < ? AND id <= ?
+                LIMIT {batch_rows}
+            )
+            """,
+            (month, _next_month_start(month), int(entry["last_id"])),
+        )
+        count = int(conn.execute("SELECT changes() AS n").fetchone()["n"])
+        if count < batch_rows:
+            conn.execute("UPDATE analytics_parquet_files SET pending = 0 WHERE path = ?", (path,))
+            return count, True
+    return count, False
+
+
+def _archive_files(table: str, since: int, until: int) -> list[str]:
+    """Manifest paths of ``table``'s files overlapping [since, until], newest first."""
+    with _analytics_conn() as conn:
+        return [
+            row["path"]
+            for row in conn.execute(
+                """
+                SELECT path FROM analytics_parquet_files
+                WHERE table_name = ? AND last_created_at >= ? AND first_created_at <= ?
+                ORDER BY last_created_at DESC
+                """,
+                (table, since, until),
+            ).fetchall()
+        ]
+
+
+def _scan_row_groups(table: str, since: int, until: int, scanned: dict[str, int]):
+    """
+    Yields (file, row group, created_at column, selected row indexes) for
+    each row group that may hold rows in [since, until]. Files and row groups
+    outside the range are skipped on the manifest and on column statistics.
+    """
+    for path in _archive_files(table, since, until):
+        parquet = ParquetFile(_parquet_path(path))
+        scanned["files"] += 1
+        for index in range(parquet.num_row_groups):
+            bounds = parquet.statistics(index, "created_at")
+            if bounds is not None and (bounds[1] < since or bounds[0] > until):
+                continue
+            created = parquet.read_column(index, "created_at")
+            scanned["row_groups"] += 1
+            scanned["rows"] += len(created)
+            selected = [i for i, ts in enumerate(created) if since <= ts <= until]
+            if selected:
+                yield parquet, index, created, selected
+
+
+def _read_column(parquet: ParquetFile, index: int, name: str, loaded: dict[str, list]) -> list:
+    if name not in loaded:
+        loaded[name] = parquet.read_column(index, name)
+    return loaded[name]
+
+
+def _query_archive(
+    kind: str,
+    since: int,
+    until: int,
+    *,
+    filters: dict[str, object] | None = None,
+    group_by: tuple[str, ...] = (),
+    distinct: str | None = None,
+    limit: int = 1000,
+) -> dict:
+    """
+    Counts ``kind``'s compacted archive rows in [since, until] matching
+    ``filters`` (column equality), grouped by columns or day/month buckets,
+    optionally with a distinct count of one column per group. Only the
+    columns involved are read, and each is filtered as a whole column
+    against the surviving row indexes.
+    """
+    table, _ = ARCHIVE_KINDS[kind]
+    filters = filters or {}
+    scanned = {"files": 0, "row_groups": 0, "rows": 0}
+    counts: Counter[tuple] = Counter()
+    uniques: dict[tuple, set] = {}
+    months: dict[int, int] = {}
+
+    for parquet, index, created, in_range in _scan_row_groups(table, since, until, scanned):
+        loaded: dict[str, list] = {}
+        selected = in_range
+        for name, value in filters.items():
+            values = _read_column(parquet, index, name, loaded)
+            selected = [i for i in selected if values[i] == value]
+            if not selected:
+                break
+        if not selected:
+            continue
+
+        vectors = []
+        for name in group_by:
+            if name == "day":
+                vectors.append([created[i] - created[i] % DAY_SECONDS for i in selected])
+            elif name == "month":
+                days = [created[i] - created[i] % DAY_SECONDS for i in selected]
+                for day in set(days) - months.keys():
+                    months[day] = _month_start(day)
+                vectors.append([months[day] for day in days])
+            else:
+                values = _read_column(parquet, index, name, loaded)
+                vectors.append([values[i] for i in selected])
+        keys = list(zip(*vectors, strict=True)) if vectors else [()] * len(selected)
+        counts.update(keys)
+        if distinct:
+            values = _read_column(parquet, index, distinct, loaded)
+            for key, i in zip(keys, selected, strict=True):
+                if values[i] is not None:
+                    uniques.setdefault(key, set()).add(values[i])
+
+    groups = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    rows = []
+    for key, count in groups[: max(1, limit)]:
+        row: dict[str, object] = dict(zip(group_by, key, strict=True))
+        row["count"] = count
+        if distinct:
+            row[f"distinct_{distinct}"] = len(uniques.get(key, ()))
+        rows.append(row)
+    return {
+        "kind": kind,
+        "range": {"since": since, "until": until},
+        "group_by": list(group_by),
+        "filters": filters,
+        "total": sum(counts.values()),
+        "groups": len(counts),
+        "rows": rows,
+        "scanned": scanned,
+    }
+
+
+def _iter_archived_share_events(
+    share_hash: str, since: int, until: int, fields: tuple[str, ...]
+) -> Iterator[dict]:
+    """
+    Yields a share's compacted download events newest first, one file at a
+    time, so memory is bounded by one share's events in one month.
+    """
+    scanned = {"files": 0, "row_groups": 0, "rows": 0}
+    current: ParquetFile | None = None
+    rows: list[dict] = []
+    for parquet, index, created, in_range in _scan_row_groups(
+        _DOWNLOAD_ARCHIVE, since, until, scanned
+    ):
+        if parquet is not current:
+            rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+            yield from rows
+            rows = []
+            current = parquet
+        hashes = parquet.read_column(index, "share_hash")
+        selected = [i for i in in_range if hashes[i] == share_hash]
+        if not selected:
+            continue
+        ids = parquet.read_column(index, "id")
+        columns = {
+            name: parquet.read_column(index, name)
+            for name in fields
+            if name not in ("id", "created_at", "share_hash")
+        }
+        for i in selected:
+            row = {name: values[i] for name, values in columns.items()}
+            row.update(id=ids[i], created_at=created[i], share_hash=share_hash)
+            rows.append(row)
+    rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+    yield from rows
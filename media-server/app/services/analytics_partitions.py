@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import re
+import sys
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+# download_events is stored as one table per UTC calendar month, named
+# download_events_YYYYMM. Inserts go to the partition of each event's
+# created_at; range queries are fanned out (UNION ALL) to only the partitions
+# overlapping the range; retention drops whole expired partitions. Each
+# partition carries just the two indexes the range queries use, so the
+# current month's indexes stay small enough to live in the page cache.
+
+LEGACY_EVENTS_TABLE = "download_events"
+DOWNLOAD_EVENT_COLUMNS = (
+    "share_hash",
+    "event_type",
+    "file_path",
+    "ip",
+    "user_agent",
+    "referer",
+    "created_at",
+)
+OPEN_END = sys.maxsize
+
+_PARTITION_RE = re.compile(r"^download_events_(\d{4})(\d{2})$")
+# Stands in for the partitions when none overlap, so fanned-out SQL stays valid.
+_EMPTY_EVENTS = (
+    "(SELECT NULL AS id, "
+    + ", ".join(f"NULL AS {column}" for column in DOWNLOAD_EVENT_COLUMNS)
+    + " LIMIT 0)"
+)
+_INSERT_COLUMNS = ", ".join(DOWNLOAD_EVENT_COLUMNS)
+_INSERT_VALUES = ", ".join(f":{column}" for column in DOWNLOAD_EVENT_COLUMNS)
+
+
+def _month_start(ts: int) -> int:
+    day = datetime.fromtimestamp(ts, tz=UTC)
+    return int(datetime(day.year, day.month, 1, tzinfo=UTC).timestamp())
+
+
+def _next_month_start(month_start: int) -> int:
+    day = datetime.fromtimestamp(month_start, tz=UTC)
+    year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+    return int(datetime(year, month, 1, tzinfo=UTC).timestamp())
+
+
+def _partition_name(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=UTC).strftime("download_events_%Y%m")
+
+
+def _list_partitions(conn) -> list[tuple[int, int, str]]:
+    """Returns (month start, next month start, table) for every partition, oldest first."""
+    partitions = []
+    for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'download_events_%'"
+    ).fetchall():
+        match = _PARTITION_RE.match(row["name"])
+        if match is None:
+            continue
+        start = int(datetime(int(match[1]), int(match[2]), 1, tzinfo=UTC).timestamp())
+        partitions.append((start, _next_month_start(start), row["name"]))
+    return sorted(partitions)
+
+
+def _partitions_for_ranges(conn, ranges: list[tuple[int, int]]) -> list[str]:
+    """Partitions overlapping any of the half-open ``ranges``, oldest first."""
+    return [
+        name
+        for start, end, name in _list_partitions(conn)
+        if any(since < end and until > start for since, until in ranges if since < until)
+    ]
+
+
+def _fan_out(
+    conn, ranges: list[tuple[int, int]], arm: Callable[[str], str], params: tuple
+) -> tuple[str, tuple]:
+    """
+    Builds ``arm(table)`` for each partition overlapping ``ranges`` joined by
+    UNION ALL, and the matching parameters. ``arm`` must filter on
+    created_at itself; partitions are only pruned, not clipped.
+    """
+    tables = _partitions_for_ranges(conn, ranges) or [_EMPTY_EVENTS]
+    return " UNION ALL ".join(arm(table) for table in tables), params * len(tables)
+
+
+def _ensure_partition(conn, ts: int) -> str:
+    """Creates the partition holding ``ts`` if needed and returns its name."""
+    name = _partition_name(ts)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    if exists:
+        return name
+
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            share_hash TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            file_path TEXT,
+            ip TEXT,
+            user_agent TEXT,
+            referer TEXT,
+            created_at INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{name}_share_hash_created_at"
+        f" ON {name} (share_hash, created_at)"
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_created_at ON {name} (created_at)")
+    # Continue the id sequence across partitions so event ids stay unique.
+    last_id = max(
+        (
+            int(row["seq"] or 0)
+            for row in conn.execute("SELECT name, seq FROM sqlite_sequence").fetchall()
+            if _PARTITION_RE.match(row["name"])
+        ),
+        default=0,
+    )
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (name, last_id))
+    return name
+
+
+def _insert_download_events(conn, rows: list[dict], batch_size: int) -> None:
+    """Inserts download events into their monthly partitions."""
+    by_partition: dict[str, list[dict]] = {}
+    for row in rows:
+        created_at = int(row.get("created_at") or 0)
+        params = {column: row.get(column) for column in DOWNLOAD_EVENT_COLUMNS}
+        params["created_at"] = created_at
+        by_partition.setdefault(_partition_name(created_at), []).append(params)
+
+    for name, batch in by_partition.items():
+        _ensure_partition(conn, int(batch[0]["created_at"]))
+        for start in range(0, len(batch), batch_size):
+            conn.execute(
+                f"INSERT INTO {name} ({_INSERT_COLUMNS}) VALUES ({_INSERT_VALUES})",
+                batch[start : start + batch_size],
+            )
+
+
+def _migrate_unpartitioned_events(conn) -> int:
+    """
+    Moves rows from the single pre-partitioning download_events table into
+    monthly partitions, keeping their ids, then drops it. Runs once, under
+    the analytics init lock.
+    """
+    bounds = conn.execute(
+        f"SELECT MIN(created_at) AS first, MAX(created_at) AS last FROM {LEGACY_EVENTS_TABLE}"
+    ).fetchone()
+    moved = 0
+    if bounds is not None and bounds["first"] is not None:
+        month = _month_start(int(bounds["first"]))
+        while month <= int(bounds["last"]):
+            next_month = _next_month_start(month)
+            if not conn.execute(
+                f"SELECT 1 FROM {LEGACY_EVENTS_TABLE} WHERE created_at >= ? AND created_at < ? LIMIT 1",
+                (month, next_month),
+            ).fetchone():
+                month = next_month
+                continue
+            name = _ensure_partition(conn, month)
+            conn.execute(
+                f"""
+                INSERT INTO {name} (id, {_INSERT_COLUMNS})
+                SELECT id, {_INSERT_COLUMNS}
+                FROM {LEGACY_EVENTS_TABLE}
+                WHERE created_at >= ? AND created_at < ?
+                ORDER BY id
+                """,
+                (month, next_month),
+            )
+            moved += int(conn.execute("SELECT changes() AS n").fetchone()["n"])
+            month = next_month
+    conn.execute(f"DROP TABLE {LEGACY_EVENTS_TABLE}")
+    return moved
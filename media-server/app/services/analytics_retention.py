@@ -0,0 +1,390 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from ..metrics import ANALYTICS_RETENTION_DURATION, ANALYTICS_RETENTION_ROWS
+from ..models import ANALYTICS_DB_PATH
+from .analytics import (
+    _ANALYTICS_ENGINE,
+    ANALYTICS_ENABLED,
+    ANALYTICS_RETENTION_DAYS,
+    _analytics_conn,
+    _ensure_analytics_db,
+    _invalidate_analytics_cache,
+)
+from .analytics_parquet import (
+    ANALYTICS_PARQUET_DIR,
+    ARCHIVE_KINDS,
+    _closed_archive_months,
+    _delete_compacted_rows,
+    _pending_parquet_files,
+    _remove_orphan_files,
+    _write_archive_month,
+)
+from .analytics_partitions import DOWNLOAD_EVENT_COLUMNS, _list_partitions
+from .analytics_rollups import DAY_SECONDS, _delete_rollups_before
+
+logger = logging.getLogger("droppr.analytics_retention")
+
+ANALYTICS_RETENTION_INTERVAL_SECONDS = int(
+    os.environ.get("DROPPR_ANALYTICS_RETENTION_INTERVAL_SECONDS", "3600")
+)
+# Rows archived and deleted per transaction, and the pause between batches
+# that lets queued event writes through.
+ANALYTICS_RETENTION_BATCH_ROWS = int(
+    os.environ.get("DROPPR_ANALYTICS_RETENTION_BATCH_ROWS", "2000")
+)
+ANALYTICS_RETENTION_PAUSE_MS = int(os.environ.get("DROPPR_ANALYTICS_RETENTION_PAUSE_MS", "50"))
+# Free pages returned to the filesystem per incremental_vacuum step.
+ANALYTICS_VACUUM_STEP_PAGES = int(os.environ.get("DROPPR_ANALYTICS_VACUUM_STEP_PAGES", "1000"))
+
+_DOWNLOAD_ARCHIVE = "download_events_archive"
+_DOWNLOAD_COLUMNS = ", ".join(DOWNLOAD_EVENT_COLUMNS)
+# download_events partitions are handled by _expire_download_partitions.
+_RETENTION_TABLES = (
+    (
+        "auth_events",
+        "auth_events_archive",
+        "event_type, path, ip, user_agent, success, detail, created_at",
+    ),
+    ("audit_events", "audit_events_archive", "action, target, detail, ip, user_agent, created_at"),
+)
+_INCREMENTAL_AUTO_VACUUM = 2
+
+
+@dataclass
+class AnalyticsRetentionRun:
+    """What one retention run moved and reclaimed."""
+
+    started_at: float
+    cutoff: int = 0
+    duration_seconds: float = 0.0
+    moved: dict[str, int] = field(default_factory=dict)
+    batches: int = 0
+    vacuumed_pages: int = 0
+    dropped_partitions: list[str] = field(default_factory=list)
+    compacted: dict[str, int] = field(default_factory=dict)
+    parquet_files: list[str] = field(default_factory=list)
+
+
+_last_retention_run: AnalyticsRetentionRun | None = None
+_auto_vacuum_hint_logged = False
+_scheduler_thread: threading.Thread | None = None
+_scheduler_pid: int | None = None
+_scheduler_lock = threading.Lock()
+
+
+def _retention_cutoff(now: float) -> int:
+    # Cut at a day boundary so whole rollup buckets expire with their events.
+    cutoff = int(now - (ANALYTICS_RETENTION_DAYS * 86400))
+    return cutoff - (cutoff % DAY_SECONDS)
+
+
+def _archive_batch(table: str, archive: str, columns: str, cutoff: int, archived_at: int) -> int:
+    """Moves the oldest ``ANALYTICS_RETENTION_BATCH_ROWS`` expired rows in one short transaction."""
+    oldest = f"""
+        SELECT id FROM {table}
+        WHERE created_at < ?
+        ORDER BY created_at, id
+        LIMIT {max(1, ANALYTICS_RETENTION_BATCH_ROWS)}
+    """
+    with _analytics_conn() as conn:
+        conn.execute(
+            f"""
+            INSERT INTO {archive} ({columns}, archived_at)
+            SELECT {columns}, ?
+            FROM {table}
+            WHERE id IN ({oldest})
+            """,
+            (archived_at, cutoff),
+        )
+        conn.execute(f"DELETE FROM {table} WHERE id IN ({oldest})", (cutoff,))
+        return int(conn.execute("SELECT changes() AS n").fetchone()["n"])
+
+
+def _copy_partition_batch(name: str, archived_at: int) -> tuple[int, bool]:
+    """
+    Copies the next batch of an expired partition into the archive, keyed on
+    id and checkpointed in analytics_archive_progress so an interrupted run
+    resumes without duplicating rows. The transaction that copies the last
+    batch also drops the partition. Returns (rows copied, dropped).
+    """
+    batch_rows = max(1, ANALYTICS_RETENTION_BATCH_ROWS)
+    with _analytics_conn() as conn:
+        progress = conn.execute(
+            "SELECT last_id FROM analytics_archive_progress WHERE table_name = ?", (name,)
+        ).fetchone()
+        after = int(progress["last_id"]) if progress else 0
+        batch = conn.execute(
+            f"""
+            SELECT COUNT(*) AS n, MAX(id) AS last_id
+            FROM (SELECT id FROM {name} WHERE id > ? ORDER BY id LIMIT {batch_rows})
+            """,
+            (after,),
+        ).fetchone()
+        count = int(batch["n"] or 0)
+        if count:
+            conn.execute(
+                f"""
+                INSERT INTO {_DOWNLOAD_ARCHIVE} ({_DOWNLOAD_COLUMNS}, archived_at)
+                SELECT {_DOWNLOAD_COLUMNS}, ?
+                FROM {name}
+                WHERE id > ? AND id <= ?
+                ORDER BY id
+                """,
+                (archived_at, after, int(batch["last_id"])),
+            )
+            conn.execute(
+                """
+                INSERT INTO analytics_archive_progress (table_name, last_id)
+                VALUES (?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET last_id = excluded.last_id
+                """,
+                (name, int(batch["last_id"])),
+            )
+        if count < batch_rows:
+            conn.execute(f"DROP TABLE {name}")
+            conn.execute("DELETE FROM analytics_archive_progress WHERE table_name = ?", (name,))
+            return count, True
+    return count, False
+
+
+def _move_expired_rows(
+    run: AnalyticsRetentionRun,
+    table: str,
+    archive: str,
+    columns: str,
+    archived_at: int,
+    pause: float,
+) -> int:
+    moved = 0
+    while True:
+        count = _archive_batch(table, archive, columns, run.cutoff, archived_at)
+        moved += count
+        if count:
+            run.batches += 1
+        if count < max(1, ANALYTICS_RETENTION_BATCH_ROWS):
+            return moved
+        time.sleep(pause)
+
+
+def _expire_download_partitions(run: AnalyticsRetentionRun, archived_at: int, pause: float) -> int:
+    """
+    Archives expired download events. Months wholly before the cutoff are
+    copied out and dropped, so their rows are never deleted one by one; only
+    the month straddling the cutoff is trimmed row by row.
+    """
+    with _analytics_conn() as conn:
+        partitions = _list_partitions(conn)
+    moved = 0
+    for start, end, name in partitions:
+        if start >= run.cutoff:
+            break
+        if end > run.cutoff:
+            moved += _move_expired_rows(
+                run, name, _DOWNLOAD_ARCHIVE, _DOWNLOAD_COLUMNS, archived_at, pause
+            )
+            continue
+        while True:
+            count, dropped = _copy_partition_batch(name, archived_at)
+            moved += count
+            if count:
+                run.batches += 1
+            if dropped:
+                run.dropped_partitions.append(name)
+                break
+            time.sleep(pause)
+    return moved
+
+
+def _drain_compacted_rows(run: AnalyticsRetentionRun, path: str, pause: float) -> int:
+    deleted = 0
+    while True:
+        count, done = _delete_compacted_rows(path, ANALYTICS_RETENTION_BATCH_ROWS)
+        deleted += count
+        if count:
+            run.batches += 1
+        if done:
+            return deleted
+        time.sleep(pause)
+
+
+def _compact_archives(run: AnalyticsRetentionRun, compacted_at: int, pause: float) -> None:
+    """
+    Moves the archived rows of each month that has closed by the cutoff
+    into a Parquet file, then deletes them from SQLite in batches.
+    """
+    for kind, (table, _) in ARCHIVE_KINDS.items():
+        _remove_orphan_files(table)
+        for month in _closed_archive_months(table, run.cutoff):
+            path = _write_archive_month(kind, month, compacted_at)
+            if path is None:
+                continue
+            run.parquet_files.append(path)
+            run.compacted[table] = run.compacted.get(table, 0) + _drain_compacted_rows(
+                run, path, pause
+            )
+
+
+def _auto_vacuum_mode() -> int:
+    with _ANALYTICS_ENGINE.connect() as conn:
+        return int(conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() or 0)
+
+
+def _convert_to_incremental_auto_vacuum() -> bool:
+    """
+    Switches the database to ``auto_vacuum=INCREMENTAL``. Existing files only
+    change mode through a full VACUUM, which holds an exclusive lock while it
+    rewrites the file and needs about its size again in free disk, so this
+    only runs from the maintenance command, never from scheduled retention.
+    """
+    with _ANALYTICS_ENGINE.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        if mode == _INCREMENTAL_AUTO_VACUUM:
+            return True
+        started = time.perf_counter()
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        mode = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    logger.info(
+        "Converted analytics database to incremental auto_vacuum in %.1fs",
+        time.perf_counter() - started,
+    )
+    return mode == _INCREMENTAL_AUTO_VACUUM
+
+
+def _incremental_vacuum(run: AnalyticsRetentionRun, pause: float) -> None:
+    step = max(1, ANALYTICS_VACUUM_STEP_PAGES)
+    with _ANALYTICS_ENGINE.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        while True:
+            free_pages = int(conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0)
+            if free_pages <= 0:
+                return
+            # pysqlite steps a pragma once (one page); executescript runs it to completion.
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({step});")
+            run.vacuumed_pages += min(step, free_pages)
+            if free_pages <= step:
+                return
+            time.sleep(pause)
+
+
+def _run_analytics_retention(now: float | None = None) -> AnalyticsRetentionRun:
+    """
+    Archives and deletes events older than the retention window in bounded
+    batches, oldest first, pausing between batches; expired download_events
+    partitions are dropped whole. Archived months that have closed are then
+    compacted into Parquet files. Finally drops the expired rollup buckets
+    and, once the database is in incremental auto_vacuum mode, returns freed
+    pages to the filesystem.
+    """
+    global _last_retention_run, _auto_vacuum_hint_logged
+
+    now = time.time() if now is None else now
+    run = AnalyticsRetentionRun(started_at=now, cutoff=_retention_cutoff(now))
+    pause = max(0, ANALYTICS_RETENTION_PAUSE_MS) / 1000.0
+    started = time.perf_counter()
+    archived_at = int(now)
+
+    # Finish deleting rows an interrupted run already wrote to Parquet before
+    # archiving new rows into the same tables.
+    for path in _pending_parquet_files():
+        table = path.split("/", 1)[0]
+        run.compacted[table] = run.compacted.get(table, 0) + _drain_compacted_rows(run, path, pause)
+
+    run.moved["download_events"] = _expire_download_partitions(run, archived_at, pause)
+    for table, archive, columns in _RETENTION_TABLES:
+        run.moved[table] = _move_expired_rows(run, table, archive, columns, archived_at, pause)
+    for table, moved in run.moved.items():
+        if ANALYTICS_RETENTION_ROWS is not None and moved:
+            ANALYTICS_RETENTION_ROWS.labels(table).inc(moved)
+    if ANALYTICS_PARQUET_DIR:
+        _compact_archives(run, archived_at, pause)
+    for table, compacted in run.compacted.items():
+        if ANALYTICS_RETENTION_ROWS is not None and compacted:
+            ANALYTICS_RETENTION_ROWS.labels(table).inc(compacted)
+
+    with _analytics_conn() as conn:
+        _delete_rollups_before(conn, run.cutoff)
+    if any(run.moved.values()):
+        _invalidate_analytics_cache()
+
+    if _auto_vacuum_mode() == _INCREMENTAL_AUTO_VACUUM:
+        _incremental_vacuum(run, pause)
+    elif not _auto_vacuum_hint_logged:
+        _auto_vacuum_hint_logged = True
+        logger.info(
+            "Analytics database is not in incremental auto_vacuum mode, so freed pages are not "
+            "returned to the filesystem; run `python -m app.services.analytics_maintenance "
+            "convert-auto-vacuum` once during a quiet period"
+        )
+
+    run.duration_seconds = time.perf_counter() - started
+    if ANALYTICS_RETENTION_DURATION is not None:
+        ANALYTICS_RETENTION_DURATION.observe(run.duration_seconds)
+    _last_retention_run = run
+    logger.info("Analytics retention: %s", asdict(run))
+    return run
+
+
+def _analytics_retention_tick() -> AnalyticsRetentionRun | None:
+    """
+    One scheduled retention pass, run by Celery beat or the per-worker
+    scheduler thread. An flock next to the database keeps workers sharing it
+    from running passes concurrently.
+    """
+    if not ANALYTICS_ENABLED or ANALYTICS_RETENTION_DAYS <= 0:
+        return None
+    _ensure_analytics_db()
+
+    lock_file = open(f"{ANALYTICS_DB_PATH}.retention.lock", "w")
+    try:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return None
+        return _run_analytics_retention()
+    finally:
+        lock_file.close()
+
+
+def _analytics_retention_scheduler_loop() -> None:
+    interval = max(1, ANALYTICS_RETENTION_INTERVAL_SECONDS)
+    while True:
+        time.sleep(interval)
+        try:
+            _analytics_retention_tick()
+        except Exception as exc:
+            logger.warning("Scheduled analytics retention failed: %s", exc)
+
+
+def _ensure_analytics_retention_scheduler() -> bool:
+    """Starts this process's retention scheduler thread when Celery beat is not configured."""
+    global _scheduler_thread, _scheduler_pid
+    if (
+        not ANALYTICS_ENABLED
+        or ANALYTICS_RETENTION_DAYS <= 0
+        or ANALYTICS_RETENTION_INTERVAL_SECONDS <= 0
+    ):
+        return False
+    pid = os.getpid()
+    thread = _scheduler_thread
+    if thread is not None and _scheduler_pid == pid and thread.is_alive():
+        return False
+    with _scheduler_lock:
+        thread = _scheduler_thread
+        if thread is not None and _scheduler_pid == pid and thread.is_alive():
+            return False
+        thread = threading.Thread(
+            target=_analytics_retention_scheduler_loop,
+            name="droppr-analytics-retention",
+            daemon=True,
+        )
+        thread.start()
+        _scheduler_thread = thread
+        _scheduler_pid = pid
+    return True
@@ -0,0 +1,494 @@
+from __future__ import annotations
+
+from ..utils.hyperloglog import HyperLogLog
+from .analytics_partitions import _fan_out, _list_partitions
+
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+DOWNLOAD_EVENT_TYPES = ("file_download", "zip_download")
+
+# download_events is rolled up per (share_hash, event_type) into UTC hour and
+# day buckets, and per (share_hash, ip) into day buckets for the distinct-IP
+# and per-IP download figures. A HyperLogLog sketch of each share's daily IPs
+# answers approximate distinct counts without reading per-IP rows. Rollups
+# are updated in the same transaction that inserts the raw events, so a
+# query can read whole buckets from the rollups and only the partial buckets
+# at either end of its range from the download_events partitions. Buckets
+# never straddle a (monthly) partition, so full rebuilds go partition by
+# partition.
+
+ROLLUP_TABLES = (
+    "download_events_hourly",
+    "download_events_daily",
+    "download_ips_daily",
+    "download_ip_sketches",
+)
+
+_UPSERT_EVENT_ROLLUP_SQL = """
+    INSERT INTO {table} (share_hash, event_type, bucket, count, last_seen)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(share_hash, event_type, bucket) DO UPDATE SET
+        count = count + excluded.count,
+        last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+_UPSERT_IP_ROLLUP_SQL = """
+    INSERT INTO download_ips_daily (share_hash, bucket, ip, file_downloads, zip_downloads, last_seen)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(share_hash, bucket, ip) DO UPDATE SET
+        file_downloads = file_downloads + excluded.file_downloads,
+        zip_downloads = zip_downloads + excluded.zip_downloads,
+        last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+_EMPTY_RANGE = (0, 0)
+
+
+def _floor(ts: int, step: int) -> int:
+    return ts - (ts % step)
+
+
+def _ceil(ts: int, step: int) -> int:
+    return -(-ts // step) * step
+
+
+def _apply_download_rollups(conn, rows: list[dict]) -> None:
+    """Adds freshly inserted download_events rows to the rollup tables."""
+    hourly: dict[tuple[str, str, int], list[int]] = {}
+    daily: dict[tuple[str, str, int], list[int]] = {}
+    ips: dict[tuple[str, int, str], list[int]] = {}
+
+    for row in rows:
+        share_hash = row.get("share_hash")
+        event_type = row.get("event_type")
+        created_at = int(row.get("created_at") or 0)
+        if not share_hash or not event_type:
+            continue
+        for buckets, step in ((hourly, HOUR_SECONDS), (daily, DAY_SECONDS)):
+            entry = buckets.setdefault((share_hash, event_type, _floor(created_at, step)), [0, 0])
+            entry[0] += 1
+            entry[1] = max(entry[1], created_at)
+
+        ip = row.get("ip")
+        if ip and event_type in DOWNLOAD_EVENT_TYPES:
+            entry = ips.setdefault((share_hash, _floor(created_at, DAY_SECONDS), ip), [0, 0, 0])
+            entry[0 if event_type == "file_download" else 1] += 1
+            entry[2] = max(entry[2], created_at)
+
+    for table, buckets in (("download_events_hourly", hourly), ("download_events_daily", daily)):
+        if buckets:
+            conn.execute(
+                _UPSERT_EVENT_ROLLUP_SQL.format(table=table),
+                [(*key, count, last_seen) for key, (count, last_seen) in buckets.items()],
+            )
+    if ips:
+        conn.execute(_UPSERT_IP_ROLLUP_SQL, [(*key, *values) for key, values in ips.items()])
+        ips_by_bucket: dict[tuple[str, int], set[str]] = {}
+        for share_hash, bucket, ip in ips:
+            ips_by_bucket.setdefault((share_hash, bucket), set()).add(ip)
+        _merge_ip_sketches(conn, ips_by_bucket)
+
+
+def _rollup_segments(since: int, until: int) -> dict[str, list[tuple[int, int]]]:
+    """
+    Splits the inclusive range [since, until] into half-open ranges: whole
+    days, whole hours outside those days, and raw seconds at the edges.
+    Every key always has the same number of ranges; unused ones are empty.
+    """
+    end = until + 1
+    hour_start, hour_end = _ceil(since, HOUR_SECONDS), _floor(end, HOUR_SECONDS)
+    if hour_start >= hour_end:
+        return {
+            "daily": [_EMPTY_RANGE],
+            "hourly": [_EMPTY_RANGE, _EMPTY_RANGE],
+            "raw": [(since, end), _EMPTY_RANGE],
+        }
+
+    day_start, day_end = _ceil(hour_start, DAY_SECONDS), _floor(hour_end, DAY_SECONDS)
+    if day_start >= day_end:
+        daily = [_EMPTY_RANGE]
+        hourly = [(hour_start, hour_end), _EMPTY_RANGE]
+    else:
+        daily = [(day_start, day_end)]
+        hourly = [(hour_start, day_start), (day_end, hour_end)]
+    return {"daily": daily, "hourly": hourly, "raw": [(since, hour_start), (hour_end, end)]}
+
+
+def _ip_segments(since: int, until: int) -> dict[str, list[tuple[int, int]]]:
+    """Like _rollup_segments, for the per-IP rollup which only has day buckets."""
+    end = until + 1
+    day_start, day_end = _ceil(since, DAY_SECONDS), _floor(end, DAY_SECONDS)
+    if day_start >= day_end:
+        return {"daily": [_EMPTY_RANGE], "raw": [(since, end), _EMPTY_RANGE]}
+    return {"daily": [(day_start, day_end)], "raw": [(since, day_start), (day_end, end)]}
+
+
+def _range_params(ranges: list[tuple[int, int]]) -> list[int]:
+    return [bound for pair in ranges for bound in pair]
+
+
+def _share_event_totals(conn, since: int, until: int, share_hash: str | None = None) -> list[dict]:
+    """
+    Returns one row per (share_hash, event_type) with the event count and
+    latest event time in [since, until].
+    """
+    segments = _rollup_segments(since, until)
+    share_filter = "" if share_hash is None else " AND share_hash = ?"
+    share_params = [] if share_hash is None else [share_hash]
+    raw_sql, raw_params = _fan_out(
+        conn,
+        segments["raw"],
+        lambda events: f"""
+            SELECT share_hash, event_type, 1 AS n, created_at AS last_seen
+            FROM {events}
+            WHERE ((created_at >= ? AND created_at < ?) OR (created_at >= ? AND created_at < ?)){share_filter}
+        """,
+        (*_range_params(segments["raw"]), *share_params),
+    )
+
+    rows = conn.execute(
+        f"""
+        SELECT share_hash, event_type, SUM(n) AS count, MAX(last_seen) AS last_seen
+        FROM (
+            SELECT share_hash, event_type, count AS n, last_seen
+            FROM download_events_daily
+            WHERE bucket >= ? AND bucket < ?{share_filter}
+            UNION ALL
+            SELECT share_hash, event_type, count AS n, last_seen
+            FROM download_events_hourly
+            WHERE ((bucket >= ? AND bucket < ?) OR (bucket >= ? AND bucket < ?)){share_filter}
+            UNION ALL
+            {raw_sql}
+        )
+        GROUP BY share_hash, event_type
+        """,
+        (
+            *_range_params(segments["daily"]),
+            *share_params,
+            *_range_params(segments["hourly"]),
+            *share_params,
+            *raw_params,
+        ),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _download_ips_source(
+    conn, segments: dict[str, list[tuple[int, int]]], share_params: list[str]
+) -> tuple[str, tuple]:
+    share_filter = " AND share_hash = ?" if share_params else ""
+    raw_sql, raw_params = _fan_out(
+        conn,
+        segments["raw"],
+        lambda events: f"""
+            SELECT
+                share_hash,
+                ip,
+                CASE WHEN event_type = 'file_download' THEN 1 ELSE 0 END AS file_downloads,
+                CASE WHEN event_type = 'zip_download' THEN 1 ELSE 0 END AS zip_downloads,
+                created_at AS last_seen
+            FROM {events}
+            WHERE ((created_at >= ? AND created_at < ?) OR (created_at >= ? AND created_at < ?))
+                AND ip IS NOT NULL AND event_type IN ('file_download', 'zip_download'){share_filter}
+        """,
+        (*_range_params(segments["raw"]), *share_params),
+    )
+    sql = f"""
+        SELECT share_hash, ip, file_downloads, zip_downloads, last_seen
+        FROM download_ips_daily
+        WHERE bucket >= ? AND bucket < ?{share_filter}
+        UNION ALL
+        {raw_sql}
+    """
+    return sql, (*_range_params(segments["daily"]), *share_params, *raw_params)
+
+
+def _share_unique_ips(conn, since: int, until: int) -> dict[str, int]:
+    """Distinct downloading IPs per share in [since, until]."""
+    source, params = _download_ips_source(conn, _ip_segments(since, until), [])
+    rows = conn.execute(
+        f"""
+        SELECT share_hash, COUNT(DISTINCT ip) AS unique_ips
+        FROM ({source})
+        GROUP BY share_hash
+        """,
+        params,
+    ).fetchall()
+    return {str(row["share_hash"]): int(row["unique_ips"] or 0) for row in rows}
+
+
+def _total_unique_ips(conn, since: int, until: int) -> int:
+    """Distinct downloading IPs across all shares in [since, until]."""
+    source, params = _download_ips_source(conn, _ip_segments(since, until), [])
+    row = conn.execute(
+        f"""
+        SELECT COUNT(DISTINCT ip) AS unique_ips
+        FROM ({source})
+        """,
+        params,
+    ).fetchone()
+    return int(row["unique_ips"] or 0) if row is not None else 0
+
+
+def _share_ip_stats(conn, share_hash: str, since: int, until: int, limit: int = 200) -> list[dict]:
+    """Per-IP download counts for one share, busiest first."""
+    source, params = _download_ips_source(conn, _ip_segments(since, until), [share_hash])
+    rows = conn.execute(
+        f"""
+        SELECT
+            ip,
+            SUM(file_downloads) AS file_downloads,
+            SUM(zip_downloads) AS zip_downloads,
+            MAX(last_seen) AS last_seen
+        FROM ({source})
+        GROUP BY ip
+        ORDER BY (SUM(file_downloads) + SUM(zip_downloads)) DESC, MAX(last_seen) DESC
+        LIMIT ?
+        """,
+        (*params, limit),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _rebuild_download_rollups(conn) -> None:
+    """Recomputes every rollup table from the download_events partitions."""
+    conn.execute("DELETE FROM download_events_hourly")
+    conn.execute("DELETE FROM download_events_daily")
+    conn.execute("DELETE FROM download_ips_daily")
+    for _, _, events in _list_partitions(conn):
+        for table, step in (
+            ("download_events_hourly", HOUR_SECONDS),
+            ("download_events_daily", DAY_SECONDS),
+        ):
+            conn.execute(
+                f"""
+                INSERT INTO {table} (share_hash, event_type, bucket, count, last_seen)
+                SELECT share_hash, event_type, created_at - (created_at % {step}), COUNT(*), MAX(created_at)
+                FROM {events}
+                GROUP BY share_hash, event_type, created_at - (created_at % {step})
+                """
+            )
+        conn.execute(
+            f"""
+            INSERT INTO download_ips_daily (share_hash, bucket, ip, file_downloads, zip_downloads, last_seen)
+            SELECT
+                share_hash,
+                created_at - (created_at % {DAY_SECONDS}),
+                ip,
+                SUM(CASE WHEN event_type = 'file_download' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN event_type = 'zip_download' THEN 1 ELSE 0 END),
+                MAX(created_at)
+            FROM {events}
+            WHERE ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
+            GROUP BY share_hash, created_at - (created_at % {DAY_SECONDS}), ip
+            """
+        )
+    conn.execute("DELETE FROM download_ip_sketches")
+    sketches = _sketches_from_events(conn)
+    if sketches:
+        conn.execute(
+            "INSERT INTO download_ip_sketches (share_hash, bucket, sketch) VALUES (?, ?, ?)",
+            [(*key, sketch.to_bytes()) for key, sketch in sketches.items()],
+        )
+
+
+def _delete_rollups_before(conn, cutoff: int) -> None:
+    """Drops rollup buckets that end at or before ``cutoff`` (a day boundary)."""
+    conn.execute("DELETE FROM download_events_hourly WHERE bucket < ?", (cutoff,))
+    conn.execute("DELETE FROM download_events_daily WHERE bucket < ?", (cutoff,))
+    conn.execute("DELETE FROM download_ips_daily WHERE bucket < ?", (cutoff,))
+    conn.execute("DELETE FROM download_ip_sketches WHERE bucket < ?", (cutoff,))
+
+
+def _check_download_rollups(conn) -> list[dict]:
+    """
+    Compares each rollup table with an aggregate of download_events and
+    returns the buckets that differ (empty when the rollups are consistent).
+    """
+    partitions = [events for _, _, events in _list_partitions(conn)]
+    mismatches: list[dict] = []
+    for table, step in (
+        ("download_events_hourly", HOUR_SECONDS),
+        ("download_events_daily", DAY_SECONDS),
+    ):
+        expected = {
+            (row["share_hash"], row["event_type"], int(row["bucket"])): (
+                int(row["count"]),
+                int(row["last_seen"]),
+            )
+            for events in partitions
+            for row in conn.execute(
+                f"""
+                SELECT share_hash, event_type, created_at - (created_at % {step}) AS bucket,
+                    COUNT(*) AS count, MAX(created_at) AS last_seen
+                FROM {events}
+                GROUP BY share_hash, event_type, bucket
+                """
+            ).fetchall()
+        }
+        actual = {
+            (row["share_hash"], row["event_type"], int(row["bucket"])): (
+                int(row["count"]),
+                int(row["last_seen"]),
+            )
+            for row in conn.execute(
+                f"SELECT share_hash, event_type, bucket, count, last_seen FROM {table}"
+            ).fetchall()
+        }
+        mismatches.extend(_diff_buckets(table, expected, actual))
+
+    expected_ips = {
+        (row["share_hash"], int(row["bucket"]), row["ip"]): (
+            int(row["file_downloads"]),
+            int(row["zip_downloads"]),
+            int(row["last_seen"]),
+        )
+        for events in partitions
+        for row in conn.execute(
+            f"""
+            SELECT share_hash, created_at - (created_at % {DAY_SECONDS}) AS bucket, ip,
+                SUM(CASE WHEN event_type = 'file_download' THEN 1 ELSE 0 END) AS file_downloads,
+                SUM(CASE WHEN event_type = 'zip_download' THEN 1 ELSE 0 END) AS zip_downloads,
+                MAX(created_at) AS last_seen
+            FROM {events}
+            WHERE ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
+            GROUP BY share_hash, bucket, ip
+            """
+        ).fetchall()
+    }
+    actual_ips = {
+        (row["share_hash"], int(row["bucket"]), row["ip"]): (
+            int(row["file_downloads"]),
+            int(row["zip_downloads"]),
+            int(row["last_seen"]),
+        )
+        for row in conn.execute(
+            """
+            SELECT share_hash, bucket, ip, file_downloads, zip_downloads, last_seen
+            FROM download_ips_daily
+            """
+        ).fetchall()
+    }
+    mismatches.extend(_diff_buckets("download_ips_daily", expected_ips, actual_ips))
+
+    # Sketches are deterministic, so they are compared register for register
+    # against sketches rebuilt from the raw events.
+    expected_sketches = {
+        key: bytes(sketch.registers) for key, sketch in _sketches_from_events(conn).items()
+    }
+    actual_sketches = {
+        (row["share_hash"], int(row["bucket"])): bytes(
+            HyperLogLog.from_bytes(bytes(row["sketch"])).registers
+        )
+        for row in conn.execute(
+            "SELECT share_hash, bucket, sketch FROM download_ip_sketches"
+        ).fetchall()
+    }
+    mismatches.extend(
+        {
+            "table": "download_ip_sketches",
+            "key": list(key),
+            "expected": "sketch" if key in expected_sketches else None,
+            "actual": "differs" if key in actual_sketches else None,
+        }
+        for key in sorted(set(expected_sketches) | set(actual_sketches), key=repr)
+        if expected_sketches.get(key) != actual_sketches.get(key)
+    )
+    return mismatches
+
+
+def _diff_buckets(table: str, expected: dict, actual: dict) -> list[dict]:
+    return [
+        {"table": table, "key": list(key), "expected": expected.get(key), "actual": actual.get(key)}
+        for key in sorted(set(expected) | set(actual), key=repr)
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+def _sketches_from_events(conn) -> dict[tuple[str, int], HyperLogLog]:
+    sketches: dict[tuple[str, int], HyperLogLog] = {}
+    for _, _, events in _list_partitions(conn):
+        for row in conn.execute(
+            f"""
+            SELECT DISTINCT share_hash, created_at - (created_at % {DAY_SECONDS}) AS bucket, ip
+            FROM {events}
+            WHERE ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
+            """
+        ).fetchall():
+            key = (row["share_hash"], int(row["bucket"]))
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = HyperLogLog()
+            sketch.add(row["ip"])
+    return sketches
+
+
+def _merge_ip_sketches(conn, ips_by_bucket: dict[tuple[str, int], set[str]]) -> None:
+    """Adds newly seen downloading IPs to the per-share, per-day sketches."""
+    updates = []
+    for (share_hash, bucket), ips in ips_by_bucket.items():
+        row = conn.execute(
+            "SELECT sketch FROM download_ip_sketches WHERE share_hash = ? AND bucket = ?",
+            (share_hash, bucket),
+        ).fetchone()
+        sketch = HyperLogLog.from_bytes(bytes(row["sketch"])) if row else HyperLogLog()
+        for ip in ips:
+            sketch.add(ip)
+        updates.append((share_hash, bucket, sketch.to_bytes()))
+    if updates:
+        conn.execute(
+            """
+            INSERT INTO download_ip_sketches (share_hash, bucket, sketch)
+            VALUES (?, ?, ?)
+            ON CONFLICT(share_hash, bucket) DO UPDATE SET sketch = excluded.sketch
+            """,
+            updates,
+        )
+
+
+def _estimate_unique_ips(conn, since: int, until: int) -> tuple[dict[str, int], int]:
+    """
+    Estimates distinct downloading IPs per share and overall in [since,
+    until] by merging day sketches, plus the raw events in partial days.
+    Costs one sketch per share and day rather than one row per event.
+    """
+    segments = _ip_segments(since, until)
+    per_share: dict[str, HyperLogLog] = {}
+    # Stored sketches are mostly sparse, so merging each one into the total
+    # as well is cheaper than merging the dense per-share results.
+    total = HyperLogLog()
+    for row in conn.execute(
+        """
+        SELECT share_hash, sketch
+        FROM download_ip_sketches
+        WHERE bucket >= ? AND bucket < ?
+        """,
+        tuple(_range_params(segments["daily"])),
+    ).fetchall():
+        share_hash = str(row["share_hash"])
+        sketch = per_share.get(share_hash)
+        if sketch is None:
+            sketch = per_share[share_hash] = HyperLogLog()
+        blob = bytes(row["sketch"])
+        sketch.merge_bytes(blob)
+        total.merge_bytes(blob)
+
+    raw_sql, raw_params = _fan_out(
+        conn,
+        segments["raw"],
+        lambda events: f"""
+            SELECT DISTINCT share_hash, ip
+            FROM {events}
+            WHERE ((created_at >= ? AND created_at < ?) OR (created_at >= ? AND created_at < ?))
+                AND ip IS NOT NULL AND event_type IN ('file_download', 'zip_download')
+        """,
+        tuple(_range_params(segments["raw"])),
+    )
+    for row in conn.execute(raw_sql, raw_params).fetchall():
+        share_hash = str(row["share_hash"])
+        sketch = per_share.get(share_hash)
+        if sketch is None:
+            sketch = per_share[share_hash] = HyperLogLog()
+        sketch.add(row["ip"])
+        total.add(row["ip"])
+    return {h: sketch.estimate() for h, sketch in per_share.items()}, total.estimate()
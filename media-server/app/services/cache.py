@@ -3,49 +3,98 @@ from __future__ import annotations
 import json
 import logging
 import os
+import secrets
 import threading
 import time
 from typing import cast
 
 import redis
 
+from .share import ShareFileList, _as_stale
+from .share_codec import _decode_share_payload, _encode_share_payload
+
 logger = logging.getLogger("droppr.cache")
 
 REDIS_URL = (os.environ.get("DROPPR_REDIS_URL") or "").strip()
 REDIS_SHARE_CACHE_PREFIX = os.environ.get("DROPPR_REDIS_SHARE_CACHE_PREFIX", "droppr:share-cache:")
 REDIS_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("DROPPR_REDIS_CONNECT_TIMEOUT_SECONDS", "2"))
+REDIS_LEASE_PREFIX = os.environ.get("DROPPR_REDIS_LEASE_PREFIX", "droppr:lease:")
+REDIS_SHARE_INDEX_PREFIX = os.environ.get("DROPPR_REDIS_SHARE_INDEX_PREFIX", "droppr:share-index:")
+REDIS_SHARE_WARM_RUN_KEY = os.environ.get(
+    "DROPPR_REDIS_SHARE_WARM_RUN_KEY", "droppr:share-warm:last-run"
+)
+REDIS_SHARE_META_PREFIX = os.environ.get("DROPPR_REDIS_SHARE_META_PREFIX", "droppr:share-meta:")
+REDIS_DOWNLOAD_COUNT_PREFIX = os.environ.get(
+    "DROPPR_REDIS_DOWNLOAD_COUNT_PREFIX", "droppr:downloads:"
+)
 REDIS_ENABLED = bool(REDIS_URL)
 
+# Deletes the lease only if it still holds our token, so an expired lease that
+# another worker has since taken over is never released by the old holder.
+_RELEASE_LEASE_LUA = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Counts one download unless the limit is already reached. The running total
+# is seeded from the database count plus deltas not yet flushed to it; the
+# per-share delta is queued in a hash for the periodic database flush.
+_CLAIM_DOWNLOAD_LUA = """
+local count = redis.call("get", KEYS[1])
+if count then
+    count = tonumber(count)
+else
+    count = tonumber(ARGV[1]) + tonumber(redis.call("hget", KEYS[2], ARGV[3]) or "0")
+end
+local limit = tonumber(ARGV[2])
+if limit > 0 and count >= limit then
+    return -1
+end
+redis.call("set", KEYS[1], count + 1, "EX", ARGV[4])
+redis.call("hincrby", KEYS[2], ARGV[3], 1)
+return count + 1
+"""
+_DOWNLOAD_COUNT_TTL_SECONDS = 7 * 24 * 3600
+
 _redis_client: redis.Redis | None = None
+_redis_binary_client: redis.Redis | None = None
 _redis_lock = threading.Lock()
 
 
-def _get_redis_client() -> redis.Redis | None:
+def _get_redis_client(*, binary: bool = False) -> redis.Redis | None:
     """
     Returns a lazily-initialized Redis client if REDIS_URL is configured.
-    Includes a connection timeout and ping check.
+    Includes a connection timeout and ping check. ``binary=True`` returns a
+    client that leaves values as bytes, for payloads that are not text.
     """
     if not REDIS_ENABLED:
         return None
-    global _redis_client
-    if _redis_client is not None:
-        return _redis_client
+    global _redis_client, _redis_binary_client
+    client = _redis_binary_client if binary else _redis_client
+    if client is not None:
+        return client
     with _redis_lock:
-        if _redis_client is not None:
-            return _redis_client
+        client = _redis_binary_client if binary else _redis_client
+        if client is not None:
+            return client
         try:
             client = redis.Redis.from_url(
                 REDIS_URL,
                 socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS,
                 socket_timeout=REDIS_CONNECT_TIMEOUT_SECONDS,
-                decode_responses=True,
+                decode_responses=not binary,
             )
             client.ping()
-            _redis_client = client
         except Exception as exc:
             logger.warning("Redis unavailable: %s", exc)
-            _redis_client = None
-    return _redis_client
+            client = None
+        if binary:
+            _redis_binary_client = client
+        else:
+            _redis_client = client
+    return client
 
 
 def _redis_share_cache_key(share_hash: str) -> str:
@@ -59,32 +108,49 @@ def _redis_share_cache_get(
     source_hash: str,
     recursive: bool,
     max_age_seconds: int,
+    stale_seconds: int = 0,
 ) -> list[dict] | None:
     """
     Attempts to retrieve the file list for a share from Redis.
-    Validates the source_hash, recursive flag, and cache age.
+    Validates the source_hash, recursive flag, and cache age. With
+    ``stale_seconds`` a list up to that far past its freshness window is
+    returned marked ``stale`` instead of being treated as a miss.
     """
-    client = _get_redis_client()
+    client = _get_redis_client(binary=True)
     if not client:
         return None
     try:
-        raw = cast(str | None, client.get(_redis_share_cache_key(request_hash)))
+        raw = cast(bytes | None, client.get(_redis_share_cache_key(request_hash)))
     except Exception as exc:
         logger.warning("Redis cache get failed: %s", exc)
         return None
     if not raw:
         return None
-    try:
-        payload = json.loads(raw)
-    except Exception:
+    payload = _decode_share_payload(raw, request_hash=request_hash)
+    if payload is None:
         return None
     if payload.get("source_hash") != source_hash or payload.get("recursive") != recursive:
         return None
-    created_at = float(payload.get("created_at") or 0)
-    if created_at and max_age_seconds > 0 and (time.time() - created_at) > max_age_seconds:
-        return None
     files = payload.get("files")
-    return files if isinstance(files, list) else None
+    if not isinstance(files, list):
+        return None
+
+    now = time.time()
+    created_at = float(payload.get("created_at") or 0)
+    fresh_until = float(payload.get("expires_at") or 0) or float("inf")
+    if created_at and max_age_seconds > 0:
+        fresh_until = min(fresh_until, created_at + max_age_seconds)
+
+    result = ShareFileList(files)
+    result.truncated = bool(payload.get("truncated"))
+    result.etag = payload.get("etag") or None
+    result.fresh_until = fresh_until
+    if now > fresh_until:
+        stale_age = now - fresh_until
+        if stale_age > stale_seconds:
+            return None
+        return _as_stale(result, stale_age)
+    return result
 
 
 def _redis_share_cache_set(
@@ -94,23 +160,31 @@ def _redis_share_cache_set(
     recursive: bool,
     files: list[dict],
     ttl_seconds: int,
+    stale_seconds: int = 0,
 ) -> None:
     """
-    Stores a share's file list in Redis with a specified TTL.
+    Stores a share's file list in Redis. The list is fresh for ``ttl_seconds``
+    and the key is kept ``stale_seconds`` longer so it can still be served stale.
     """
-    client = _get_redis_client()
+    client = _get_redis_client(binary=True)
     if not client:
         return
+    ttl = max(1, int(ttl_seconds))
+    now = time.time()
     payload = {
-        "created_at": time.time(),
+        "created_at": now,
+        "expires_at": now + ttl,
         "source_hash": source_hash,
         "recursive": recursive,
+        "truncated": bool(getattr(files, "truncated", False)),
+        "etag": getattr(files, "etag", None),
         "files": files,
     }
     try:
-        ttl = max(1, int(ttl_seconds))
         client.setex(
-            _redis_share_cache_key(request_hash), ttl, json.dumps(payload, separators=(",", ":"))
+            _redis_share_cache_key(request_hash),
+            ttl + max(0, int(stale_seconds)),
+            _encode_share_payload(payload, request_hash=request_hash),
         )
     except Exception as exc:
         logger.warning("Redis cache set failed: %s", exc)
@@ -124,3 +198,272 @@ def _redis_share_cache_delete(request_hash: str) -> None:
         client.delete(_redis_share_cache_key(request_hash))
     except Exception as exc:
         logger.warning("Redis cache delete failed: %s", exc)
+
+
+def _redis_share_index_get(source_hash: str, *, max_age_seconds: int) -> dict | None:
+    """
+    Returns the per-folder crawl index for a share as
+    ``{"crawled_at": float, "dirs": {path: [stamp, files, subdirs]}}``, or
+    None when missing or older than ``max_age_seconds``.
+    """
+    client = _get_redis_client()
+    if not client:
+        return None
+    try:
+        raw = cast(str | None, client.get(f"{REDIS_SHARE_INDEX_PREFIX}{source_hash}"))
+    except Exception as exc:
+        logger.warning("Redis share index get failed: %s", exc)
+        return None
+    if not raw:
+        return None
+    try:
+        payload = json.loads(raw)
+    except Exception:
+        return None
+    crawled_at = float(payload.get("crawled_at") or 0)
+    if not isinstance(payload.get("dirs"), dict) or time.time() - crawled_at > max_age_seconds:
+        return None
+    return payload
+
+
+def _redis_share_index_set(
+    source_hash: str, *, dirs: dict, crawled_at: float, max_age_seconds: int
+) -> None:
+    client = _get_redis_client()
+    if not client:
+        return
+    ttl = max(1, int(crawled_at + max_age_seconds - time.time()))
+    payload = {"crawled_at": crawled_at, "dirs": dirs}
+    try:
+        client.setex(
+            f"{REDIS_SHARE_INDEX_PREFIX}{source_hash}",
+            ttl,
+            json.dumps(payload, separators=(",", ":")),
+        )
+    except Exception as exc:
+        logger.warning("Redis share index set failed: %s", exc)
+
+
+def _redis_share_index_delete(source_hash: str) -> None:
+    client = _get_redis_client()
+    if not client:
+        return
+    try:
+        client.delete(f"{REDIS_SHARE_INDEX_PREFIX}{source_hash}")
+    except Exception as exc:
+        logger.warning("Redis share index delete failed: %s", exc)
+
+
+def _redis_share_meta_key(source_hash: str, subpath: str) -> str:
+    return f"{REDIS_SHARE_META_PREFIX}{source_hash}:{subpath}"
+
+
+def _redis_share_meta_get(source_hash: str, subpath: str) -> tuple[bool, dict | None]:
+    """
+    Returns ``(hit, meta)`` for a cached share subpath lookup. A hit with
+    ``meta`` None is a cached "not found".
+    """
+    client = _get_redis_client()
+    if not client:
+        return False, None
+    try:
+        raw = cast(str | None, client.get(_redis_share_meta_key(source_hash, subpath)))
+    except Exception as exc:
+        logger.warning("Redis share meta get failed: %s", exc)
+        return False, None
+    if raw is None:
+        return False, None
+    try:
+        meta = json.loads(raw)
+    except Exception:
+        return False, None
+    return True, meta if isinstance(meta, dict) else None
+
+
+def _redis_share_meta_set(
+    source_hash: str,
+    entries: dict[str, dict | None],
+    *,
+    ttl_seconds: int,
+    negative_ttl_seconds: int,
+) -> None:
+    """Caches subpath lookups in one round trip; None values are cached as "not found"."""
+    client = _get_redis_client()
+    if not client or not entries:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for subpath, meta in entries.items():
+            pipe.setex(
+                _redis_share_meta_key(source_hash, subpath),
+                max(1, int(ttl_seconds if meta is not None else negative_ttl_seconds)),
+                json.dumps(meta, separators=(",", ":")),
+            )
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Redis share meta set failed: %s", exc)
+
+
+def _redis_share_warm_run_get() -> dict | None:
+    """Returns the cost record of the most recent share cache warm run, from any worker."""
+    client = _get_redis_client()
+    if not client:
+        return None
+    try:
+        raw = cast(str | None, client.get(REDIS_SHARE_WARM_RUN_KEY))
+    except Exception as exc:
+        logger.warning("Redis share warm run get failed: %s", exc)
+        return None
+    try:
+        payload = json.loads(raw) if raw else None
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _redis_share_warm_run_set(run: dict, *, ttl_seconds: int) -> None:
+    client = _get_redis_client()
+    if not client:
+        return
+    try:
+        client.setex(
+            REDIS_SHARE_WARM_RUN_KEY,
+            max(1, int(ttl_seconds)),
+            json.dumps(run, separators=(",", ":")),
+        )
+    except Exception as exc:
+        logger.warning("Redis share warm run set failed: %s", exc)
+
+
+def _redis_download_count_key(share_hash: str) -> str:
+    return f"{REDIS_DOWNLOAD_COUNT_PREFIX}count:{share_hash}"
+
+
+def _redis_download_pending_key() -> str:
+    return f"{REDIS_DOWNLOAD_COUNT_PREFIX}pending"
+
+
+def _redis_download_claim(share_hash: str, *, db_count: int, limit: int) -> int | None:
+    """
+    Atomically checks ``limit`` and counts one download for ``share_hash``.
+    Returns the new total, -1 when the limit was already reached, or None when
+    Redis is not available (callers fall back to the database).
+    """
+    client = _get_redis_client()
+    if not client:
+        return None
+    try:
+        result = client.eval(
+            _CLAIM_DOWNLOAD_LUA,
+            2,
+            _redis_download_count_key(share_hash),
+            _redis_download_pending_key(),
+            int(db_count),
+            int(limit or 0),
+            share_hash,
+            _DOWNLOAD_COUNT_TTL_SECONDS,
+        )
+    except Exception as exc:
+        logger.warning("Redis download claim failed: %s", exc)
+        return None
+    return int(cast(int, result))
+
+
+def _redis_download_count_get(share_hash: str) -> int | None:
+    client = _get_redis_client()
+    if not client:
+        return None
+    try:
+        raw = cast(str | None, client.get(_redis_download_count_key(share_hash)))
+    except Exception as exc:
+        logger.warning("Redis download count get failed: %s", exc)
+        return None
+    return int(raw) if raw is not None else None
+
+
+def _redis_download_pending_take() -> dict[str, int]:
+    """Removes and returns the download deltas queued since the last flush."""
+    client = _get_redis_client()
+    if not client:
+        return {}
+    taken = f"{_redis_download_pending_key()}:{secrets.token_hex(8)}"
+    try:
+        client.rename(_redis_download_pending_key(), taken)
+    except redis.ResponseError:
+        # Nothing queued.
+        return {}
+    except Exception as exc:
+        logger.warning("Redis download pending take failed: %s", exc)
+        return {}
+    try:
+        raw = cast(dict[str, str], client.hgetall(taken))
+        client.delete(taken)
+    except Exception as exc:
+        logger.warning("Redis download pending read failed: %s", exc)
+        return {}
+    return {share_hash: int(delta) for share_hash, delta in raw.items() if int(delta) > 0}
+
+
+def _redis_download_pending_add(counts: dict[str, int]) -> bool:
+    """Re-queues deltas that could not be written to the database."""
+    client = _get_redis_client()
+    if not client or not counts:
+        return False
+    try:
+        pipe = client.pipeline(transaction=False)
+        for share_hash, delta in counts.items():
+            pipe.hincrby(_redis_download_pending_key(), share_hash, int(delta))
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Redis download pending re-queue failed: %s", exc)
+        return False
+    return True
+
+
+def _redis_lease_key(name: str) -> str:
+    return f"{REDIS_LEASE_PREFIX}{name}"
+
+
+def _redis_lease_acquire(name: str, ttl_seconds: float) -> str | None:
+    """
+    Tries to take a cross-worker lease.
+
+    Returns a token when the lease is ours, or None when another worker holds
+    it. If Redis is not configured or unreachable, returns "" so callers
+    proceed as the sole holder; releasing "" is a no-op.
+    """
+    client = _get_redis_client()
+    if not client:
+        return ""
+    token = secrets.token_hex(8)
+    try:
+        acquired = client.set(
+            _redis_lease_key(name), token, nx=True, px=max(1, int(ttl_seconds * 1000))
+        )
+    except Exception as exc:
+        logger.warning("Redis lease acquire failed: %s", exc)
+        return ""
+    return token if acquired else None
+
+
+def _redis_lease_release(name: str, token: str) -> None:
+    if not token:
+        return
+    client = _get_redis_client()
+    if not client:
+        return
+    try:
+        client.eval(_RELEASE_LEASE_LUA, 1, _redis_lease_key(name), token)
+    except Exception as exc:
+        logger.warning("Redis lease release failed: %s", exc)
+
+
+def _redis_lease_held(name: str) -> bool:
+    client = _get_redis_client()
+    if not client:
+        return False
+    try:
+        return bool(client.exists(_redis_lease_key(name)))
+    except Exception as exc:
+        logger.warning("Redis lease check failed: %s", exc)
+        return False
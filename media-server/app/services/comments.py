@@ -8,6 +8,7 @@ import time
 from contextlib import contextmanager
 
 from ..models import COMMENTS_DB_PATH, CommentsBase, get_comments_engine
+from ..utils.sqlite_pool import _record_locked_retry
 
 logger = logging.getLogger("droppr.comments")
 
@@ -55,6 +56,7 @@ def _ensure_comments_db() -> None:
                 return
             except sqlite3.OperationalError as exc:
                 if "locked" in str(exc).lower() and attempt < 9:
+                    _record_locked_retry("comments")
                     time.sleep(0.05 * (attempt + 1))
                     continue
                 logger.warning("Comments init failed: %s", exc)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from ..utils.validation import is_valid_share_hash
+from .aliases import (
+    _add_share_alias_download_counts,
+    _alias_download_state,
+    _claim_share_alias_download_sync,
+)
+from .cache import (
+    _redis_download_claim,
+    _redis_download_pending_add,
+    _redis_download_pending_take,
+)
+
+logger = logging.getLogger("droppr.download_counts")
+
+# Share alias download counts are kept in Redis (or in process for aliases
+# without a limit) and written to the database in batches. 0 writes through.
+DOWNLOAD_COUNT_FLUSH_SECONDS = float(os.environ.get("DROPPR_DOWNLOAD_COUNT_FLUSH_SECONDS", "10"))
+
+_pending_lock = threading.Lock()
+_pending: Counter[str] = Counter()
+
+_flusher_lock = threading.Lock()
+_flusher_thread: threading.Thread | None = None
+_flusher_pid: int | None = None
+
+
+def _claim_share_alias_download(share_hash: str) -> bool:
+    """
+    Counts one download of ``share_hash`` against its alias. Returns False,
+    without counting, when the alias's download limit is already reached.
+    Shares without an alias are not counted.
+    """
+    if not is_valid_share_hash(share_hash):
+        return True
+    try:
+        state = _alias_download_state(share_hash)
+    except Exception as exc:
+        logger.warning("Download count lookup failed for %s: %s", share_hash, exc)
+        return True
+    if state is None:
+        return True
+    limit, db_count = state
+    limited = limit is not None and limit > 0
+
+    if DOWNLOAD_COUNT_FLUSH_SECONDS > 0:
+        claimed = _redis_download_claim(share_hash, db_count=db_count, limit=limit or 0)
+        if claimed is not None:
+            _ensure_download_count_flusher()
+            return claimed >= 0
+        if not limited:
+            with _pending_lock:
+                _pending[share_hash] += 1
+            _ensure_download_count_flusher()
+            return True
+
+    # Limited aliases without Redis are counted in the database directly: a
+    # per-process tally could not enforce the limit across workers.
+    return _claim_share_alias_download_sync(share_hash)
+
+
+def _flush_download_counts() -> int:
+    """Writes queued download counts to the database; returns the number of downloads written."""
+    with _pending_lock:
+        counts = dict(_pending)
+        _pending.clear()
+    from_redis = _redis_download_pending_take()
+    for share_hash, delta in from_redis.items():
+        counts[share_hash] = counts.get(share_hash, 0) + delta
+    if not counts:
+        return 0
+
+    try:
+        _add_share_alias_download_counts(counts)
+    except Exception as exc:
+        logger.warning("Download count flush failed: %s", exc)
+        # Re-queue for the next flush; Redis deltas go back to Redis if possible.
+        if _redis_download_pending_add(from_redis):
+            counts = {h: d - from_redis.get(h, 0) for h, d in counts.items()}
+        with _pending_lock:
+            _pending.update({h: d for h, d in counts.items() if d > 0})
+        return 0
+    return sum(counts.values())
+
+
+def _download_count_flusher_loop() -> None:
+    interval = max(1.0, DOWNLOAD_COUNT_FLUSH_SECONDS)
+    while True:
+        time.sleep(interval)
+        try:
+            _flush_download_counts()
+        except Exception as exc:
+            logger.warning("Download count flusher failed: %s", exc)
+
+
+def _ensure_download_count_flusher() -> bool:
+    global _flusher_thread, _flusher_pid
+    pid = os.getpid()
+    thread = _flusher_thread
+    if thread is not None and _flusher_pid == pid and thread.is_alive():
+        return False
+    with _flusher_lock:
+        thread = _flusher_thread
+        if thread is not None and _flusher_pid == pid and thread.is_alive():
+            return False
+        thread = threading.Thread(
+            target=_download_count_flusher_loop, name="droppr-download-counts", daemon=True
+        )
+        thread.start()
+        _flusher_thread = thread
+        _flusher_pid = pid
+    return True
+
+
+def _flush_download_counts_at_exit() -> None:
+    try:
+        _flush_download_counts()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_download_counts_at_exit)
@@ -12,6 +12,7 @@ from contextlib import contextmanager
 
 import requests
 
+from ..utils.sqlite_pool import _record_locked_retry, _sqlite_pool
 from ..utils.validation import _safe_join, _safe_root_path, is_valid_share_hash
 from .users import USER_DATA_DIR
 
@@ -203,22 +204,9 @@ def _requests_conn():
     """
     _ensure_requests_db()
 
-    conn = sqlite3.connect(
-        REQUESTS_DB_PATH,
-        timeout=REQUESTS_DB_TIMEOUT_SECONDS,
-        isolation_level=None,
-        check_same_thread=False,
-    )
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.execute("PRAGMA temp_store=MEMORY;")
-    conn.execute("PRAGMA busy_timeout=5000;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    try:
+    pool = _sqlite_pool("requests", REQUESTS_DB_PATH, timeout=REQUESTS_DB_TIMEOUT_SECONDS)
+    with pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def _init_requests_db() -> None:
@@ -281,6 +269,7 @@ def _ensure_requests_db() -> None:
                 return
             except sqlite3.OperationalError as exc:
                 if "locked" in str(exc).lower() and attempt < 9:
+                    _record_locked_retry("requests")
                     time.sleep(0.05 * (attempt + 1))
                     continue
                 logger.warning("Requests init failed: %s", exc)
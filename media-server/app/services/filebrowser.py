@@ -2,12 +2,17 @@ from __future__ import annotations
 
 import logging
 import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from urllib.parse import quote
 
 import requests
 
 from ..utils.security import _with_internal_signature
 from ..utils.validation import _safe_root_path
+from .http_transport import CircuitBreaker, HTTPTransport
 
 logger = logging.getLogger("droppr.filebrowser")
 
@@ -16,6 +21,45 @@ FILEBROWSER_PUBLIC_DL_API = f"{FILEBROWSER_BASE_URL}/api/public/dl"
 FILEBROWSER_PUBLIC_SHARE_API = f"{FILEBROWSER_BASE_URL}/api/public/share"
 FILEBROWSER_SHARES_API = f"{FILEBROWSER_BASE_URL}/api/shares"
 
+# Keep-alive pool shared by every client in the process: sized for gunicorn
+# request threads plus the share crawl's concurrent folder fetches.
+FILEBROWSER_POOL_MAXSIZE = int(os.environ.get("DROPPR_FILEBROWSER_POOL_MAXSIZE", "32"))
+FILEBROWSER_CONNECT_TIMEOUT_SECONDS = float(
+    os.environ.get("DROPPR_FILEBROWSER_CONNECT_TIMEOUT_SECONDS", "3")
+)
+FILEBROWSER_READ_TIMEOUT_SECONDS = float(
+    os.environ.get("DROPPR_FILEBROWSER_READ_TIMEOUT_SECONDS", "10")
+)
+# Idempotent GETs are retried on connection errors and 502/503/504.
+FILEBROWSER_RETRIES = int(os.environ.get("DROPPR_FILEBROWSER_RETRIES", "2"))
+FILEBROWSER_RETRY_BACKOFF_SECONDS = float(
+    os.environ.get("DROPPR_FILEBROWSER_RETRY_BACKOFF_SECONDS", "0.2")
+)
+FILEBROWSER_CIRCUIT_FAILURES = int(os.environ.get("DROPPR_FILEBROWSER_CIRCUIT_FAILURES", "5"))
+FILEBROWSER_CIRCUIT_RESET_SECONDS = float(
+    os.environ.get("DROPPR_FILEBROWSER_CIRCUIT_RESET_SECONDS", "30")
+)
+
+
+class _RequestMeter:
+    """Counts public share requests made by one background job."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self) -> None:
+        with self._lock:
+            self.count += 1
+
+
+# Set by _count_public_share_requests; threads the crawl fans out to run in a
+# copy of the caller's context, so their requests land on the same meter while
+# concurrent user traffic does not.
+_public_share_request_meter: ContextVar[_RequestMeter | None] = ContextVar(
+    "droppr_public_share_request_meter", default=None
+)
+
 USER_DEFAULT_PERMS = {
     "admin": False,
     "create": True,
@@ -28,6 +72,40 @@ USER_DEFAULT_PERMS = {
 }
 
 
+_shared_transport: HTTPTransport | None = None
+_shared_transport_lock = threading.Lock()
+
+
+def _filebrowser_transport(session: requests.Session | None = None) -> HTTPTransport:
+    """
+    Returns the process-wide FileBrowser transport, or a dedicated one around
+    ``session`` (used by tests to inject a session).
+    """
+    global _shared_transport
+    if session is None and _shared_transport is not None:
+        return _shared_transport
+    with _shared_transport_lock:
+        if session is None and _shared_transport is not None:
+            return _shared_transport
+        transport = HTTPTransport(
+            "filebrowser",
+            pool_maxsize=FILEBROWSER_POOL_MAXSIZE,
+            connect_timeout=FILEBROWSER_CONNECT_TIMEOUT_SECONDS,
+            read_timeout=FILEBROWSER_READ_TIMEOUT_SECONDS,
+            retries=FILEBROWSER_RETRIES,
+            backoff_seconds=FILEBROWSER_RETRY_BACKOFF_SECONDS,
+            breaker=CircuitBreaker(
+                "filebrowser",
+                failure_threshold=FILEBROWSER_CIRCUIT_FAILURES,
+                reset_seconds=FILEBROWSER_CIRCUIT_RESET_SECONDS,
+            ),
+            session=session,
+        )
+        if session is None:
+            _shared_transport = transport
+        return transport
+
+
 class FileBrowserClient:
     """
     A client for interacting with the FileBrowser API.
@@ -41,13 +119,14 @@ class FileBrowserClient:
         base_url: str | None = None,
         signer=_with_internal_signature,
         session: requests.Session | None = None,
+        transport: HTTPTransport | None = None,
     ) -> None:
         self.base_url = base_url or FILEBROWSER_BASE_URL
         self.public_dl_api = f"{self.base_url}/api/public/dl"
         self.public_share_api = f"{self.base_url}/api/public/share"
         self.shares_api = f"{self.base_url}/api/shares"
         self._signer = signer
-        self._session = session or requests.Session()
+        self._transport = transport or _filebrowser_transport(session)
 
     def _signed_headers(self, headers: dict, method: str, url: str) -> dict:
         """Adds internal HMAC signatures to the request headers."""
@@ -65,12 +144,7 @@ class FileBrowserClient:
             "POST",
             url,
         )
-        resp = self._session.post(
-            url,
-            headers=headers,
-            json=body,
-            timeout=10,
-        )
+        resp = self._transport.post(url, endpoint="share_create", headers=headers, json=body)
         if resp.status_code in {401, 403}:
             raise PermissionError("Unauthorized")
         resp.raise_for_status()
@@ -94,12 +168,7 @@ class FileBrowserClient:
             "POST",
             url,
         )
-        resp = self._session.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=10,
-        )
+        resp = self._transport.post(url, endpoint="user_create", headers=headers, json=payload)
         if resp.status_code in {401, 403}:
             raise PermissionError("Unauthorized")
         if resp.status_code == 409:
@@ -135,7 +204,10 @@ class FileBrowserClient:
             url = f"{self.public_share_api}/{share_hash}"
 
         headers = self._signed_headers({}, "GET", url)
-        resp = self._session.get(url, headers=headers, timeout=10)
+        meter = _public_share_request_meter.get()
+        if meter is not None:
+            meter.add()
+        resp = self._transport.get(url, endpoint="public_share", headers=headers)
         if resp.status_code == 404:
             return None
         resp.raise_for_status()
@@ -151,7 +223,7 @@ class FileBrowserClient:
         encoded = quote(safe_path.lstrip("/"), safe="/")
         url = f"{self.base_url}/api/resources/{encoded}"
         headers = self._signed_headers({"X-Auth": token}, "GET", url)
-        resp = self._session.get(url, headers=headers, timeout=10)
+        resp = self._transport.get(url, endpoint="resources", headers=headers)
         if resp.status_code == 404:
             return None
         if resp.status_code in {401, 403}:
@@ -160,6 +232,24 @@ class FileBrowserClient:
         data = resp.json()
         return data if isinstance(data, dict) else None
 
+    def signed_get(
+        self,
+        url: str,
+        *,
+        endpoint: str,
+        headers: dict | None = None,
+        stream: bool = False,
+        read_timeout: float | None = None,
+    ) -> requests.Response:
+        """Sends a signed GET for ``url`` through the pooled transport; the caller handles the response."""
+        return self._transport.get(
+            url,
+            endpoint=endpoint,
+            headers=self._signed_headers(dict(headers or {}), "GET", url),
+            stream=stream,
+            read_timeout=read_timeout,
+        )
+
 
 DEFAULT_FILEBROWSER_CLIENT = FileBrowserClient()
 
@@ -192,6 +282,31 @@ def _fetch_public_share_json(
     )
 
 
+def _filebrowser_get(
+    url: str,
+    *,
+    endpoint: str,
+    headers: dict | None = None,
+    stream: bool = False,
+    read_timeout: float | None = None,
+    client: FileBrowserClient | None = None,
+) -> requests.Response:
+    return (client or DEFAULT_FILEBROWSER_CLIENT).signed_get(
+        url, endpoint=endpoint, headers=headers, stream=stream, read_timeout=read_timeout
+    )
+
+
+@contextmanager
+def _count_public_share_requests() -> Iterator[Callable[[], int]]:
+    """Yields a function returning the public share requests made in this block."""
+    meter = _RequestMeter()
+    token = _public_share_request_meter.set(meter)
+    try:
+        yield lambda: meter.count
+    finally:
+        _public_share_request_meter.reset(token)
+
+
 def _fetch_filebrowser_resource(
     path: str, token: str, client: FileBrowserClient | None = None
 ) -> dict | None:
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..metrics import UPSTREAM_CIRCUIT_STATE, UPSTREAM_ERRORS, UPSTREAM_LATENCY
+
+logger = logging.getLogger("droppr.http_transport")
+
+_CIRCUIT_STATES = {"closed": 0, "open": 1, "half_open": 2}
+
+
+class UpstreamUnavailableError(requests.exceptions.ConnectionError):
+    """Raised without contacting the upstream while its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. After ``failure_threshold`` failures
+    in a row the circuit opens and calls fail fast for ``reset_seconds``; then
+    one trial call is let through, closing the circuit on success and
+    re-opening it on failure.
+    """
+
+    def __init__(self, name: str, *, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_seconds = max(0.0, float(reset_seconds))
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._set_state_locked("half_open")
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != "closed":
+                logger.info("Upstream %s recovered; closing circuit", self.name)
+                self._set_state_locked("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    logger.warning(
+                        "Upstream %s failing (%d in a row); opening circuit for %.0fs",
+                        self.name,
+                        self._failures,
+                        self.reset_seconds,
+                    )
+                self._opened_at = time.monotonic()
+                self._set_state_locked("open")
+
+    def _set_state_locked(self, state: str) -> None:
+        self._state = state
+        if UPSTREAM_CIRCUIT_STATE is not None:
+            UPSTREAM_CIRCUIT_STATE.labels(self.name).set(_CIRCUIT_STATES[state])
+
+
+class HTTPTransport:
+    """
+    A pooled ``requests`` session for one upstream: keep-alive connections
+    sized for concurrent callers, jittered retries for idempotent requests,
+    separate connect and read timeouts, a circuit breaker, and per-endpoint
+    latency metrics. ``endpoint`` names are metric labels and must be low
+    cardinality (``"public_share"``, never a URL).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        pool_maxsize: int,
+        connect_timeout: float,
+        read_timeout: float,
+        retries: int,
+        backoff_seconds: float,
+        breaker: CircuitBreaker | None = None,
+        session: requests.Session | None = None,
+    ) -> None:
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.breaker = breaker
+        self.session = session or requests.Session()
+        if session is None:
+            retry = Retry(
+                total=max(0, retries),
+                connect=max(0, retries),
+                read=max(0, retries),
+                status=max(0, retries),
+                backoff_factor=max(0.0, backoff_seconds),
+                backoff_jitter=max(0.0, backoff_seconds),
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=4, pool_maxsize=max(1, pool_maxsize), max_retries=retry
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        endpoint: str,
+        read_timeout: float | None = None,
+        **kwargs,
+    ) -> requests.Response:
+        if self.breaker is not None and not self.breaker.allow():
+            self._record_error(endpoint, "circuit_open")
+            raise UpstreamUnavailableError(f"{self.name} circuit is open")
+
+        kwargs.setdefault(
+            "timeout",
+            (self.connect_timeout, self.read_timeout if read_timeout is None else read_timeout),
+        )
+        started = time.perf_counter()
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except requests.exceptions.Timeout:
+            self._record_failure(endpoint, "timeout", started)
+            raise
+        except requests.exceptions.ConnectionError:
+            self._record_failure(endpoint, "connection", started)
+            raise
+        except Exception:
+            # Anything else (bad chunked encoding, redirect loops, ...) is a
+            # failure too; it must also end a half-open trial.
+            self._record_failure(endpoint, "error", started)
+            raise
+        self._observe(endpoint, started)
+        if resp.status_code >= 500:
+            self._record_error(endpoint, "5xx")
+            if self.breaker is not None:
+                self.breaker.record_failure()
+        elif self.breaker is not None:
+            self.breaker.record_success()
+        return resp
+
+    def get(self, url: str, *, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url: str, *, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    def _observe(self, endpoint: str, started: float) -> None:
+        if UPSTREAM_LATENCY is not None:
+            UPSTREAM_LATENCY.labels(self.name, endpoint).observe(time.perf_counter() - started)
+
+    def _record_failure(self, endpoint: str, reason: str, started: float) -> None:
+        self._observe(endpoint, started)
+        self._record_error(endpoint, reason)
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def _record_error(self, endpoint: str, reason: str) -> None:
+        if UPSTREAM_ERRORS is not None:
+            UPSTREAM_ERRORS.labels(self.name, endpoint, reason).inc()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from collections.abc import Callable
+
+from ..config import parse_bool
+from ..metrics import CACHE_INVALIDATIONS
+from .cache import REDIS_ENABLED, _get_redis_client
+
+logger = logging.getLogger("droppr.invalidation")
+
+# Every worker (gunicorn process, Celery worker, other pods) publishes cache
+# invalidations on this channel and evicts its own in-memory entries when it
+# sees one from another process.
+INVALIDATION_BUS_ENABLED = parse_bool(os.environ.get("DROPPR_INVALIDATION_BUS_ENABLED", "true"))
+REDIS_INVALIDATION_CHANNEL = os.environ.get(
+    "DROPPR_REDIS_INVALIDATION_CHANNEL", "droppr:cache-invalidate"
+)
+_LISTENER_POLL_SECONDS = 1.0
+_LISTENER_MAX_BACKOFF_SECONDS = 30.0
+
+# ``key`` is None when every local entry of that kind should be dropped.
+InvalidationHandler = Callable[[str | None], None]
+
+_handlers: dict[str, list[InvalidationHandler]] = {}
+_handlers_lock = threading.Lock()
+_listener_thread: threading.Thread | None = None
+_listener_pid: int | None = None
+_listener_lock = threading.Lock()
+_origin: str | None = None
+_origin_pid: int | None = None
+
+
+def _process_origin() -> str:
+    """Identifies this process on the bus so it can skip its own messages."""
+    global _origin, _origin_pid
+    pid = os.getpid()
+    if _origin is None or _origin_pid != pid:
+        _origin = f"{socket.gethostname()}:{pid}:{secrets.token_hex(4)}"
+        _origin_pid = pid
+    return _origin
+
+
+def register_invalidation_handler(kind: str, handler: InvalidationHandler) -> None:
+    """Registers a local eviction callback for invalidations of ``kind``."""
+    with _handlers_lock:
+        _handlers.setdefault(kind, []).append(handler)
+
+
+def _apply_invalidation(kind: str, key: str | None) -> None:
+    with _handlers_lock:
+        handlers = list(_handlers.get(kind, ()))
+    for handler in handlers:
+        try:
+            handler(key)
+        except Exception as exc:
+            logger.warning("Invalidation handler for %s failed: %s", kind, exc)
+
+
+def _apply_all_invalidations() -> None:
+    with _handlers_lock:
+        kinds = list(_handlers)
+    for kind in kinds:
+        _apply_invalidation(kind, None)
+
+
+def _publish_invalidation(kind: str, key: str | None = None) -> None:
+    """
+    Tells other workers to evict their local ``kind`` entries for ``key``
+    (or all of them when ``key`` is None). The caller evicts its own entries;
+    this is best effort and never raises.
+    """
+    if not INVALIDATION_BUS_ENABLED:
+        return
+    client = _get_redis_client()
+    if not client:
+        return
+    message = json.dumps({"kind": kind, "key": key, "origin": _process_origin()})
+    try:
+        client.publish(REDIS_INVALIDATION_CHANNEL, message)
+    except Exception as exc:
+        logger.warning("Invalidation publish failed for %s %s: %s", kind, key, exc)
+        return
+    if CACHE_INVALIDATIONS is not None:
+        CACHE_INVALIDATIONS.labels(kind, "published").inc()
+
+
+def _handle_invalidation_message(data) -> bool:
+    """Applies one raw bus message. Returns False for malformed or own messages."""
+    try:
+        message = json.loads(data)
+    except (TypeError, ValueError):
+        return False
+    if not isinstance(message, dict) or message.get("origin") == _process_origin():
+        return False
+    kind = message.get("kind")
+    key = message.get("key")
+    if not isinstance(kind, str) or not (key is None or isinstance(key, str)):
+        return False
+    _apply_invalidation(kind, key)
+    if CACHE_INVALIDATIONS is not None:
+        CACHE_INVALIDATIONS.labels(kind, "received").inc()
+    return True
+
+
+def _invalidation_listener_loop() -> None:
+    backoff = 1.0
+    while True:
+        client = _get_redis_client()
+        if client is None:
+            time.sleep(backoff)
+            backoff = min(backoff * 2, _LISTENER_MAX_BACKOFF_SECONDS)
+            continue
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(REDIS_INVALIDATION_CHANNEL)
+            if backoff > 1.0:
+                # Messages published while we were disconnected are lost, so
+                # drop everything that might have missed one.
+                _apply_all_invalidations()
+            backoff = 1.0
+            while True:
+                message = pubsub.get_message(timeout=_LISTENER_POLL_SECONDS)
+                if message and message.get("type") == "message":
+                    _handle_invalidation_message(message.get("data"))
+        except Exception as exc:
+            logger.warning("Invalidation listener disconnected: %s", exc)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, _LISTENER_MAX_BACKOFF_SECONDS)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def _ensure_invalidation_listener() -> bool:
+    """
+    Starts this process's subscriber thread if it is not running. Cheap to
+    call per request; a forked worker gets its own thread on first call.
+    """
+    global _listener_thread, _listener_pid
+    if not (REDIS_ENABLED and INVALIDATION_BUS_ENABLED):
+        return False
+    pid = os.getpid()
+    thread = _listener_thread
+    if thread is not None and _listener_pid == pid and thread.is_alive():
+        return False
+    with _listener_lock:
+        thread = _listener_thread
+        if thread is not None and _listener_pid == pid and thread.is_alive():
+            return False
+        thread = threading.Thread(
+            target=_invalidation_listener_loop, name="droppr-invalidation", daemon=True
+        )
+        thread.start()
+        _listener_thread = thread
+        _listener_pid = pid
+    return True
@@ -8,7 +8,6 @@ import shutil
 import subprocess
 import threading
 import time
-from urllib.parse import quote
 
 import boto3
 from botocore.config import Config as BotoConfig
@@ -18,7 +17,7 @@ from werkzeug.wrappers.response import Response as WerkzeugResponse
 
 from ..config import parse_bool
 from ..metrics import VIDEO_TRANSCODE_COUNT, VIDEO_TRANSCODE_LATENCY
-from .filebrowser import FILEBROWSER_PUBLIC_DL_API
+from .media_source import _media_source
 from .video_meta import _ffprobe_video_meta
 
 logger = logging.getLogger("droppr.media_processing")
@@ -745,9 +744,7 @@ def _ensure_fast_proxy_mp4(
         except FileNotFoundError:
             pass
 
-        src_url = (
-            f"{FILEBROWSER_PUBLIC_DL_API}/{share_hash}/{quote(file_path, safe='/')}?inline=true"
-        )
+        src_url = _media_source(share_hash, file_path)
 
         start_time = time.perf_counter()
         try:
@@ -947,9 +944,7 @@ def _ensure_hd_mp4(
         except FileNotFoundError:
             pass
 
-        src_url = (
-            f"{FILEBROWSER_PUBLIC_DL_API}/{share_hash}/{quote(file_path, safe='/')}?inline=true"
-        )
+        src_url = _media_source(share_hash, file_path)
 
         attempts = [
             ("remux", _ffmpeg_hd_remux_cmd(src_url=src_url, dst_path=tmp_path)),
@@ -1039,9 +1034,7 @@ def _ensure_hls_package(
         shutil.rmtree(tmp_dir, ignore_errors=True)
         os.makedirs(tmp_dir, exist_ok=True)
 
-        src_url = (
-            f"{FILEBROWSER_PUBLIC_DL_API}/{share_hash}/{quote(file_path, safe='/')}?inline=true"
-        )
+        src_url = _media_source(share_hash, file_path)
         fps = None
         try:
             meta = _ffprobe_video_meta(src_url)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+import os
+import stat
+import threading
+import time
+from urllib.parse import quote
+
+from ..config import parse_bool
+from ..metrics import MEDIA_SOURCE_RESOLUTIONS
+from ..utils.validation import _safe_join, _safe_root_path
+from .filebrowser import FILEBROWSER_PUBLIC_DL_API, _fetch_public_share_json
+
+logger = logging.getLogger("droppr.media_source")
+
+# FileBrowser and the media server mount the same data volume, so ffmpeg and
+# ffprobe can read share files directly instead of range-requesting them over HTTP.
+MEDIA_LOCAL_SOURCE_ENABLED = parse_bool(os.environ.get("DROPPR_MEDIA_LOCAL_SOURCE_ENABLED", "true"))
+MEDIA_SOURCE_ROOT = os.environ.get(
+    "DROPPR_MEDIA_SOURCE_ROOT", os.environ.get("DROPPR_USER_DATA_DIR", "/srv")
+)
+MEDIA_SOURCE_ROOT_CACHE_TTL_SECONDS = int(
+    os.environ.get("DROPPR_MEDIA_SOURCE_ROOT_CACHE_TTL_SECONDS", "600")
+)
+MEDIA_SOURCE_ROOT_NEGATIVE_TTL_SECONDS = int(
+    os.environ.get("DROPPR_MEDIA_SOURCE_ROOT_NEGATIVE_TTL_SECONDS", "60")
+)
+# Root listing entries checked against the local folder before trusting it.
+_VERIFY_SAMPLE_SIZE = 20
+
+_share_roots_lock = threading.Lock()
+_share_roots: dict[str, tuple[float, str | None]] = {}
+
+
+def _http_media_source(source_hash: str, rel_path: str) -> str:
+    return f"{FILEBROWSER_PUBLIC_DL_API}/{source_hash}/{quote(rel_path, safe='/')}?inline=true"
+
+
+def _verified_share_root(data: dict | None) -> str | None:
+    """
+    Maps a share's root listing to the local folder it was created from. The
+    folder is trusted only if it exists under ``MEDIA_SOURCE_ROOT`` and holds
+    the entries FileBrowser lists, which rules out a mismatched user scope.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        return None
+    raw_path = data.get("path")
+    share_path = _safe_root_path(raw_path) if isinstance(raw_path, str) else None
+    if not share_path:
+        return None
+
+    base = os.path.realpath(MEDIA_SOURCE_ROOT)
+    joined = _safe_join(base, share_path.lstrip("/"))
+    if not joined:
+        return None
+    local_root = os.path.realpath(joined)
+    if not (local_root == base or local_root.startswith(base + os.sep)):
+        return None
+    if not os.path.isdir(local_root):
+        return None
+
+    names = [
+        item.get("name")
+        for item in data["items"][:_VERIFY_SAMPLE_SIZE]
+        if isinstance(item, dict) and isinstance(item.get("name"), str)
+    ]
+    try:
+        local_names = set(os.listdir(local_root))
+    except OSError:
+        return None
+    if any(name not in local_names for name in names):
+        return None
+    return local_root
+
+
+def _share_local_root(source_hash: str) -> str | None:
+    """Returns the verified local folder behind a share, cached per process."""
+    now = time.time()
+    with _share_roots_lock:
+        cached = _share_roots.get(source_hash)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    try:
+        local_root = _verified_share_root(_fetch_public_share_json(source_hash))
+    except Exception as exc:
+        logger.warning("Share path lookup failed for %s: %s", source_hash, exc)
+        local_root = None
+    if local_root is None:
+        logger.debug("No local source for share %s; using FileBrowser HTTP", source_hash)
+    ttl = (
+        MEDIA_SOURCE_ROOT_CACHE_TTL_SECONDS
+        if local_root is not None
+        else MEDIA_SOURCE_ROOT_NEGATIVE_TTL_SECONDS
+    )
+    with _share_roots_lock:
+        _share_roots[source_hash] = (now + max(0, ttl), local_root)
+    return local_root
+
+
+def _resolve_local_media_source(source_hash: str, rel_path: str) -> str | None:
+    """
+    Resolves a file inside a share to a regular file on the shared volume,
+    refusing anything (including symlinks) that escapes the share's folder.
+    """
+    if not MEDIA_LOCAL_SOURCE_ENABLED:
+        return None
+    local_root = _share_local_root(source_hash)
+    if not local_root:
+        return None
+    joined = _safe_join(local_root, rel_path.lstrip("/"))
+    if not joined:
+        return None
+    path = os.path.realpath(joined)
+    if not path.startswith(local_root.rstrip(os.sep) + os.sep):
+        return None
+    try:
+        if not stat.S_ISREG(os.stat(path).st_mode):
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def _media_source(source_hash: str, rel_path: str) -> str:
+    """
+    Input for ffmpeg/ffprobe: the local file when it can be resolved and
+    verified, otherwise FileBrowser's inline download URL.
+    """
+    path = _resolve_local_media_source(source_hash, rel_path)
+    if MEDIA_SOURCE_RESOLUTIONS is not None:
+        MEDIA_SOURCE_RESOLUTIONS.labels("local" if path else "http").inc()
+    return path or _http_media_source(source_hash, rel_path)
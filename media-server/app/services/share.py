@@ -1,11 +1,46 @@
 from __future__ import annotations
 
+import logging
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Any
 from urllib.parse import quote
 
+from ..config import parse_bool
 from ..utils.validation import IMAGE_EXTS, VIDEO_EXTS, _safe_rel_path
 from .filebrowser import _fetch_public_share_json
 
+logger = logging.getLogger("droppr.share")
+
+# Recursive crawl limits: per-share parallelism, a process-wide cap protecting
+# FileBrowser, and a total time budget after which a partial list is returned.
+SHARE_CRAWL_CONCURRENCY = max(1, int(os.environ.get("DROPPR_SHARE_CRAWL_CONCURRENCY", "6")))
+SHARE_CRAWL_GLOBAL_CONCURRENCY = max(
+    1, int(os.environ.get("DROPPR_SHARE_CRAWL_GLOBAL_CONCURRENCY", "16"))
+)
+SHARE_CRAWL_DEADLINE_SECONDS = float(os.environ.get("DROPPR_SHARE_CRAWL_DEADLINE_SECONDS", "45"))
+SHARE_CRAWL_TRUNCATED_TTL_SECONDS = int(
+    os.environ.get("DROPPR_SHARE_CRAWL_TRUNCATED_TTL_SECONDS", "30")
+)
+# Per-folder crawl index: unchanged folders are reused on refresh until the
+# index is this old, after which the next build re-lists every folder.
+SHARE_INDEX_ENABLED = parse_bool(os.environ.get("DROPPR_SHARE_INDEX_ENABLED", "true"))
+SHARE_INDEX_MAX_AGE_SECONDS = int(os.environ.get("DROPPR_SHARE_INDEX_MAX_AGE_SECONDS", "21600"))
+# A folder's stamp only changes with its direct children, so a folder under a
+# reused parent is re-listed once its own listing is older than this (by
+# default the share list TTL) to pick up changes deeper in the tree.
+SHARE_INDEX_REUSE_MAX_AGE_SECONDS = int(
+    os.environ.get(
+        "DROPPR_SHARE_INDEX_REUSE_MAX_AGE_SECONDS",
+        os.environ.get("DROPPR_SHARE_CACHE_TTL_SECONDS", "3600"),
+    )
+)
+_crawl_global_sema = threading.BoundedSemaphore(SHARE_CRAWL_GLOBAL_CONCURRENCY)
+
 
 def _infer_gallery_type(item: dict, extension: str) -> str:
     """
@@ -29,66 +64,274 @@ def _infer_gallery_type(item: dict, extension: str) -> str:
     return "file"
 
 
+class ShareFileList(list):
+    """
+    A share's flat file list. Behaves as a plain list (and serializes as one)
+    but carries crawl metadata that callers may surface, such as whether the
+    recursive crawl hit its deadline and returned a partial result, or whether
+    the list came from the cache past its freshness window, plus a content
+    hash used as the listing's ETag.
+    """
+
+    truncated: bool = False
+    stale: bool = False
+    stale_age: float = 0.0
+    etag: str | None = None
+    fresh_until: float | None = None
+
+
+def _as_stale(files: list[dict], stale_age: float) -> ShareFileList:
+    """Returns a shallow copy of ``files`` marked as served stale."""
+    result = ShareFileList(files)
+    # Carry memoized views/encodings; they reference the same item dicts.
+    result.__dict__.update(getattr(files, "__dict__", {}))
+    result.truncated = bool(getattr(files, "truncated", False))
+    result.stale = True
+    result.stale_age = max(0.0, stale_age)
+    return result
+
+
+def _fetch_share_dir(source_hash: str, dir_path: str, deadline: float) -> dict | None:
+    """
+    Fetches one folder listing under the global crawl cap. Raises TimeoutError
+    if the crawl deadline passes while waiting for a FileBrowser slot.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0 or not _crawl_global_sema.acquire(timeout=remaining):
+        raise TimeoutError(f"crawl deadline reached before fetching {dir_path}")
+    try:
+        return _fetch_public_share_json(source_hash, subpath=dir_path)
+    finally:
+        _crawl_global_sema.release()
+
+
+def _split_dir_items(items: list, *, collect_dirs: bool) -> tuple[list[dict], list[str]]:
+    files: list[dict] = []
+    dirs: list[str] = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if item.get("isDir"):
+            path = item.get("path")
+            if collect_dirs and isinstance(path, str) and path.startswith("/"):
+                dirs.append(path)
+            continue
+        files.append(item)
+    return files, dirs
+
+
+_INDEX_ITEM_KEYS = ("path", "name", "extension", "type", "size", "modified")
+# Queue marker for folders under a reused folder: their parent was not
+# re-listed, so there is no fresh stamp to compare and the index entry is
+# trusted while it was verified within the reuse max age.
+_REUSE = object()
+
+
+def _dir_stamps(items: list) -> dict[str, Any]:
+    """Maps each subfolder path in a listing to its ``modified`` stamp."""
+    return {
+        item["path"]: item.get("modified")
+        for item in items
+        if isinstance(item, dict) and item.get("isDir") and isinstance(item.get("path"), str)
+    }
+
+
+def _index_item(item: dict) -> dict:
+    return {key: item[key] for key in _INDEX_ITEM_KEYS if key in item}
+
+
+def _reusable_listing(known: list | None, stamp: Any, now: float, max_age: float) -> list | None:
+    """The indexed listing of a folder if it can be reused, re-stamped with when it was verified."""
+    if known is None or stamp is None:
+        return None
+    if stamp is _REUSE:
+        verified_at = float(known[3]) if len(known) > 3 else 0.0
+        return list(known[:3]) + [verified_at] if now - verified_at < max_age else None
+    return list(known[:3]) + [now] if known[0] == stamp else None
+
+
+def _crawl_share_dirs(
+    source_hash: str,
+    start_dirs: list[str],
+    *,
+    concurrency: int,
+    deadline_seconds: float,
+    start_stamps: dict[str, Any] | None = None,
+    index: dict[str, list] | None = None,
+    reuse_max_age: float | None = None,
+) -> tuple[dict[str, list], bool]:
+    """
+    Lists every folder reachable from start_dirs, fetching up to `concurrency`
+    folders at once. Returns the listing per folder as
+    ``[stamp, files, subdirs, verified_at]`` and whether the crawl stopped
+    early because the deadline passed.
+
+    With a previous `index` (same shape as the returned listings), a folder
+    whose ``modified`` stamp in its freshly listed parent matches the indexed
+    stamp is reused instead of being fetched. Folder stamps only change when
+    direct children are added, removed or renamed, so the folders below a
+    reused folder are only reused while their own listing was verified within
+    `reuse_max_age` seconds; older ones are re-listed, which checks the stamps
+    of their children in turn.
+
+    Upstream errors propagate, as with a serial crawl, so an incomplete
+    listing is never mistaken for a complete one.
+    """
+    index = index or {}
+    stamps = start_stamps or {}
+    now = time.time()
+    max_age = SHARE_INDEX_REUSE_MAX_AGE_SECONDS if reuse_max_age is None else reuse_max_age
+    listings: dict[str, list] = {}
+    queue: deque[tuple[str, Any]] = deque((d, stamps.get(d)) for d in start_dirs)
+    visited: set[str] = set()
+    pending: dict[Future, tuple[str, Any]] = {}
+    truncated = False
+    reused = 0
+    deadline = time.monotonic() + max(0.0, deadline_seconds)
+    workers = max(1, concurrency)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="share-crawl")
+    try:
+        while queue or pending:
+            while queue and len(pending) < workers:
+                dir_path, stamp = queue.popleft()
+                if dir_path in visited:
+                    continue
+                visited.add(dir_path)
+                known = _reusable_listing(index.get(dir_path), stamp, now, max_age)
+                if known is not None:
+                    listings[dir_path] = known
+                    queue.extend((subdir, _REUSE) for subdir in known[2])
+                    reused += 1
+                    continue
+                # Each fetch runs in a copy of this context so request
+                # meters set by the caller see it.
+                future = pool.submit(
+                    copy_context().run, _fetch_share_dir, source_hash, dir_path, deadline
+                )
+                pending[future] = (dir_path, None if stamp is _REUSE else stamp)
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            done: set[Future] = set()
+            if remaining > 0:
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                truncated = True
+                break
+
+            for future in done:
+                dir_path, stamp = pending.pop(future)
+                try:
+                    data = future.result()
+                except TimeoutError:
+                    truncated = True
+                    continue
+                if not data:
+                    continue
+                items = data.get("items")
+                if not isinstance(items, list):
+                    continue
+                dir_files, subdirs = _split_dir_items(items, collect_dirs=True)
+                listings[dir_path] = [
+                    stamp,
+                    [_index_item(f) for f in dir_files],
+                    subdirs,
+                    time.time(),
+                ]
+                child_stamps = _dir_stamps(items)
+                queue.extend((subdir, child_stamps.get(subdir)) for subdir in subdirs)
+    finally:
+        # Never wait for stragglers past the deadline; they finish on their own.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if truncated or queue:
+        truncated = True
+        logger.warning(
+            "Share crawl for %s hit its %.1fs deadline after %d folders; returning partial list",
+            source_hash,
+            deadline_seconds,
+            len(listings),
+        )
+    elif reused:
+        logger.debug(
+            "Share crawl for %s reused %d of %d folders from the index",
+            source_hash,
+            reused,
+            len(listings),
+        )
+    return listings, truncated
+
+
 def _build_folder_share_file_list(
-    *, request_hash: str, source_hash: str, root: dict, recursive: bool
-) -> list[dict]:
+    *,
+    request_hash: str,
+    source_hash: str,
+    root: dict,
+    recursive: bool,
+    concurrency: int | None = None,
+    deadline_seconds: float | None = None,
+    index: dict[str, list] | None = None,
+) -> ShareFileList:
     """
     Constructs a list of files within a folder share, optionally scanning
     subdirectories recursively.
 
+    Subfolders are fetched concurrently (bounded per share and globally). If
+    the crawl deadline passes, the folders listed so far are returned and the
+    result is flagged as truncated.
+
     Args:
         request_hash: The public share hash used in the request.
         source_hash: The resolved internal share hash.
         root: The root folder metadata.
         recursive: Whether to scan subfolders.
+        concurrency: Max folders fetched at once for this share.
+        deadline_seconds: Total time budget for the recursive crawl.
+        index: Per-folder listings from a previous crawl. Unchanged folders
+            are reused from it, and it is replaced in place with this crawl's
+            listings.
 
     Returns:
-        A list of dictionaries containing file details (name, path, type, size, etc.).
+        A ShareFileList of dictionaries containing file details (name, path, type, size, etc.).
     """
-    files: list[dict] = []
-    dirs_to_scan: list[str] = []
-    visited_dirs: set[str] = set()
+    files = ShareFileList()
 
     root_items = root.get("items")
     if not isinstance(root_items, list):
         return files
 
-    for item in root_items:
-        if not isinstance(item, dict):
-            continue
-        if item.get("isDir"):
-            path = item.get("path")
-            if recursive and isinstance(path, str) and path.startswith("/"):
-                dirs_to_scan.append(path)
-            continue
-        files.append(item)
-
-    if recursive:
-        while dirs_to_scan:
-            dir_path = dirs_to_scan.pop()
-            if dir_path in visited_dirs:
-                continue
-            visited_dirs.add(dir_path)
+    root_files, root_dirs = _split_dir_items(root_items, collect_dirs=recursive)
+    ordered: list[dict] = list(root_files)
 
-            data = _fetch_public_share_json(source_hash, subpath=dir_path)
-            if not data:
-                continue
-            items = data.get("items")
-            if not isinstance(items, list):
+    if recursive and root_dirs:
+        listings, files.truncated = _crawl_share_dirs(
+            source_hash,
+            root_dirs,
+            concurrency=SHARE_CRAWL_CONCURRENCY if concurrency is None else concurrency,
+            deadline_seconds=(
+                SHARE_CRAWL_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+            ),
+            start_stamps=_dir_stamps(root_items),
+            index=index,
+        )
+        if index is not None:
+            index.clear()
+            index.update(listings)
+        # Emit in folder pre-order so the result does not depend on fetch timing.
+        stack = list(reversed(root_dirs))
+        emitted: set[str] = set()
+        while stack:
+            dir_path = stack.pop()
+            if dir_path in emitted or dir_path not in listings:
                 continue
+            emitted.add(dir_path)
+            dir_files, subdirs = listings[dir_path][1:3]
+            ordered.extend(dir_files)
+            stack.extend(reversed(subdirs))
 
-            for item in items:
-                if not isinstance(item, dict):
-                    continue
-                if item.get("isDir"):
-                    path = item.get("path")
-                    if isinstance(path, str) and path.startswith("/"):
-                        dirs_to_scan.append(path)
-                    continue
-                files.append(item)
-
-    result: list[dict] = []
-    for item in files:
+    for item in ordered:
         raw_path = item.get("path")
         if not isinstance(raw_path, str) or not raw_path:
             continue
@@ -108,7 +351,7 @@ def _build_folder_share_file_list(
         ext = ext[1:] if ext.startswith(".") else ext
         ext = ext.lower()
 
-        result.append(
+        files.append(
             {
                 "name": name,
                 "path": safe_path,
@@ -121,7 +364,7 @@ def _build_folder_share_file_list(
             }
         )
 
-    return result
+    return files
 
 
 def _build_file_share_file_list(*, request_hash: str, source_hash: str, meta: dict) -> list[dict]:
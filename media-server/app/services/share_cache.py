@@ -1,14 +1,298 @@
 from __future__ import annotations
 
+import logging
+import os
+import sys
 import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
+from ..metrics import (
+    SHARE_CACHE_BYTES,
+    SHARE_CACHE_COALESCED,
+    SHARE_CACHE_EVICTIONS,
+    SHARE_CACHE_HITS,
+    SHARE_CACHE_MISSES,
+    SHARE_CACHE_OVERSIZE,
+    SHARE_CACHE_STALE_HITS,
+    SHARE_CACHE_STALE_SERVED,
+)
+from ..utils.singleflight import SingleFlight
 from .cache import _redis_share_cache_delete
+from .invalidation import _publish_invalidation, register_invalidation_handler
+from .share import _as_stale
+from .share_listing import _encode_share_items
+from .share_manifest import _share_manifest_delete
 
-_share_cache_lock = threading.Lock()
-_share_files_cache: dict[str, tuple[float, str, bool, list[dict]]] = {}
+logger = logging.getLogger("droppr.share_cache")
+
+try:
+    SHARE_CACHE_MAX_BYTES = int(
+        os.environ.get("DROPPR_SHARE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+except (TypeError, ValueError):
+    SHARE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SHARE_CACHE_MAX_BYTES = max(1024 * 1024, SHARE_CACHE_MAX_BYTES)
+
+
+def _estimate_files_bytes(files: list[dict]) -> int:
+    """
+    Approximates the resident size of a share file list.
+
+    Counts the list, each item dict and each value object, plus pre-encoded
+    JSON fragments when present. Keys are shared interned strings across
+    items, so they are not counted per item.
+    """
+    total = sys.getsizeof(files)
+    for item in files:
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            for value in item.values():
+                total += sys.getsizeof(value)
+    for fragment in (getattr(files, "encoded_items", None) or {}).values():
+        total += sys.getsizeof(fragment)
+    return total
+
+
+@dataclass
+class ShareCacheEntry:
+    created_at: float
+    expires_at: float
+    stale_until: float
+    source_hash: str
+    recursive: bool
+    files: list[dict]
+    size_bytes: int
+
+
+class ShareFilesCache:
+    """
+    Per-worker LRU cache of share file lists, bounded by approximate payload
+    bytes rather than entry count. Each entry carries its own expiry, and may
+    be retained past it for a stale window during which it is still servable
+    when the caller asks for stale results.
+    """
+
+    def __init__(self, max_bytes: int = SHARE_CACHE_MAX_BYTES, *, layer: str = "memory") -> None:
+        self.max_bytes = max(1, int(max_bytes))
+        self.layer = layer
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, ShareCacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale_hits = 0
+        self._oversize = 0
+        self._evictions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(
+        self,
+        key: str,
+        *,
+        source_hash: str,
+        recursive: bool,
+        max_age_seconds: int,
+        stale_seconds: int = 0,
+        now: float | None = None,
+    ) -> list[dict] | None:
+        """
+        Returns the cached list if present, fresh and matching the source. With
+        ``stale_seconds`` a list up to that far past its freshness window is
+        returned as a copy marked ``stale``.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                self._remove_locked(key, "expired")
+                entry = None
+            if entry is None or entry.source_hash != source_hash or entry.recursive != recursive:
+                self._record_miss_locked()
+                return None
+            fresh_until = min(entry.expires_at, entry.created_at + max_age_seconds)
+            stale_age = 0.0
+            if now >= fresh_until:
+                stale_age = now - fresh_until
+                if stale_age >= stale_seconds:
+                    self._record_miss_locked()
+                    return None
+            self._entries.move_to_end(key)
+            # A stale entry is only a fallback, so it is not counted as a hit.
+            if now >= fresh_until:
+                self._stale_hits += 1
+                if SHARE_CACHE_STALE_HITS is not None:
+                    SHARE_CACHE_STALE_HITS.labels(self.layer).inc()
+                return _as_stale(entry.files, stale_age)
+            self._hits += 1
+            if SHARE_CACHE_HITS is not None:
+                SHARE_CACHE_HITS.labels(self.layer).inc()
+            return entry.files
+
+    def set(
+        self,
+        key: str,
+        *,
+        source_hash: str,
+        recursive: bool,
+        files: list[dict],
+        ttl_seconds: int,
+        stale_seconds: int = 0,
+        now: float | None = None,
+    ) -> bool:
+        """
+        Stores a file list, evicting least-recently-used entries until the
+        byte budget is met. Lists larger than the whole budget are not cached.
+        The entry is fresh for ``ttl_seconds`` and retained ``stale_seconds``
+        longer.
+        """
+        now = time.time() if now is None else now
+        _encode_share_items(files)
+        size_bytes = _estimate_files_bytes(files)
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key, None)
+            if size_bytes > self.max_bytes:
+                # Nothing was evicted; the list never entered the cache.
+                self._oversize += 1
+                if SHARE_CACHE_OVERSIZE is not None:
+                    SHARE_CACHE_OVERSIZE.labels(self.layer).inc()
+                logger.info(
+                    "Share list %s (%d bytes) exceeds cache budget (%d bytes); not cached",
+                    key,
+                    size_bytes,
+                    self.max_bytes,
+                )
+                self._update_bytes_gauge_locked()
+                return False
+            expires_at = now + max(1, int(ttl_seconds))
+            self._entries[key] = ShareCacheEntry(
+                created_at=now,
+                expires_at=expires_at,
+                stale_until=expires_at + max(0, int(stale_seconds)),
+                source_hash=source_hash,
+                recursive=recursive,
+                files=files,
+                size_bytes=size_bytes,
+            )
+            self._bytes += size_bytes
+            self._evict_locked(now)
+            self._update_bytes_gauge_locked()
+            return True
+
+    def fresh_until(self, key: str, *, source_hash: str, recursive: bool) -> float | None:
+        """Returns when a matching entry stops being fresh, without touching stats or LRU order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.source_hash != source_hash or entry.recursive != recursive:
+                return None
+            return entry.expires_at
+
+    def pop(self, key: str) -> ShareCacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._remove_locked(key, None)
+                self._update_bytes_gauge_locked()
+            return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._update_bytes_gauge_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._stale_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": (self._hits / lookups) if lookups else None,
+                "stale_hits": self._stale_hits,
+                "oversize": self._oversize,
+                "evictions": dict(self._evictions),
+            }
+
+    def _record_miss_locked(self) -> None:
+        self._misses += 1
+        if SHARE_CACHE_MISSES is not None:
+            SHARE_CACHE_MISSES.labels(self.layer).inc()
+
+    def _evict_locked(self, now: float) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        for key in [k for k, e in self._entries.items() if now >= e.stale_until]:
+            self._remove_locked(key, "expired")
+        while self._bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove_locked(oldest_key, "capacity")
+
+    def _remove_locked(self, key: str, reason: str | None) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size_bytes
+        if reason:
+            self._record_eviction_locked(reason)
+
+    def _record_eviction_locked(self, reason: str) -> None:
+        self._evictions[reason] = self._evictions.get(reason, 0) + 1
+        if SHARE_CACHE_EVICTIONS is not None:
+            SHARE_CACHE_EVICTIONS.labels(self.layer, reason).inc()
+
+    def _update_bytes_gauge_locked(self) -> None:
+        if SHARE_CACHE_BYTES is not None:
+            SHARE_CACHE_BYTES.labels(self.layer).set(self._bytes)
+
+
+def _record_share_build_coalesced(scope: str) -> None:
+    if SHARE_CACHE_COALESCED is not None:
+        SHARE_CACHE_COALESCED.labels(scope).inc()
+
+
+def _record_share_stale_served(reason: str) -> None:
+    if SHARE_CACHE_STALE_SERVED is not None:
+        SHARE_CACHE_STALE_SERVED.labels(reason).inc()
+
+
+_share_files_cache = ShareFilesCache()
+# One in-process crawl per share list; concurrent misses wait for the leader.
+_share_build_flight = SingleFlight(on_join=lambda _key: _record_share_build_coalesced("process"))
+
+
+def _evict_local_share_cache(share_hash: str | None) -> None:
+    if share_hash is None:
+        _share_files_cache.clear()
+    else:
+        _share_files_cache.pop(share_hash)
+
+
+register_invalidation_handler("share", _evict_local_share_cache)
 
 
 def clear_share_cache(share_hash: str) -> None:
-    with _share_cache_lock:
-        _share_files_cache.pop(share_hash, None)
+    """Drops a share's cached list here, on disk, in Redis and in every other worker."""
+    _evict_local_share_cache(share_hash)
+    _share_manifest_delete(share_hash)
     _redis_share_cache_delete(share_hash)
+    _publish_invalidation("share", share_hash)
+
+
+def _share_cache_stats() -> dict:
+    return _share_files_cache.stats()
+
+
+def _share_build_stats() -> dict:
+    return _share_build_flight.stats()
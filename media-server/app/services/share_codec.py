@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from urllib.parse import quote
+
+import msgpack
+import zstandard
+
+logger = logging.getLogger("droppr.share_codec")
+
+# "compact" writes the versioned msgpack+zstd format; "json" keeps writing the
+# legacy JSON payload (use while older workers that only read JSON still run).
+# Both formats are always readable.
+SHARE_CACHE_FORMAT = (os.environ.get("DROPPR_SHARE_CACHE_FORMAT") or "compact").strip().lower()
+SHARE_CACHE_ZSTD_LEVEL = int(os.environ.get("DROPPR_SHARE_CACHE_ZSTD_LEVEL", "3"))
+
+_COMPACT_MAGIC = b"DSC\x01"
+_COLUMNS = ("name", "path", "type", "extension", "size", "modified")
+_ITEM_KEYS = frozenset(_COLUMNS) | {"inline_url", "download_url"}
+
+
+def _folder_item_urls(request_hash: str, source_hash: str, quoted: str) -> tuple[str, str]:
+    """The URLs _build_folder_share_file_list derives for an item's quoted path."""
+    return (
+        f"/api/public/dl/{source_hash}/{quoted}?inline=true",
+        f"/api/share/{request_hash}/file/{quoted}?download=1",
+    )
+
+
+def _encode_share_payload(payload: dict, *, request_hash: str) -> bytes | str:
+    """
+    Serializes a share cache payload (``files`` plus metadata) for Redis.
+
+    In compact mode the file list is stored as columns, URLs that can be
+    rebuilt from the hashes and path are dropped (others are kept as per-item
+    overrides), and the result is msgpack-packed and zstd-compressed behind a
+    version header. Lists whose items do not have exactly the standard keys
+    are stored as rows.
+    """
+    if SHARE_CACHE_FORMAT != "compact":
+        return json.dumps(payload, separators=(",", ":"))
+
+    files = payload.get("files") or []
+    source_hash = str(payload.get("source_hash") or "")
+    body = {k: v for k, v in payload.items() if k != "files"}
+    if all(isinstance(item, dict) and item.keys() == _ITEM_KEYS for item in files):
+        columns: dict[str, list] = {col: [] for col in _COLUMNS}
+        quoted_paths: dict[int, str] = {}
+        urls: dict[int, list] = {}
+        for idx, item in enumerate(files):
+            for col in _COLUMNS:
+                columns[col].append(item.get(col))
+            path = str(item.get("path") or "")
+            # Quoting is the costly part of rebuilding URLs, so it is done here
+            # and only kept for the paths it changes.
+            quoted = quote(path, safe="/")
+            if quoted != path:
+                quoted_paths[idx] = quoted
+            derived = _folder_item_urls(request_hash, source_hash, quoted)
+            actual = (item.get("inline_url"), item.get("download_url"))
+            if actual != derived:
+                urls[idx] = list(actual)
+        body["columns"] = columns
+        body["quoted"] = quoted_paths
+        body["urls"] = urls
+    else:
+        body["rows"] = files
+    packed = msgpack.packb(body, use_bin_type=True)
+    return _COMPACT_MAGIC + zstandard.ZstdCompressor(level=SHARE_CACHE_ZSTD_LEVEL).compress(packed)
+
+
+def _decode_share_payload(raw: bytes | str, *, request_hash: str) -> dict | None:
+    """Reads either the compact format or a legacy JSON payload."""
+    if isinstance(raw, bytes) and raw.startswith(_COMPACT_MAGIC):
+        try:
+            packed = zstandard.ZstdDecompressor().decompress(raw[len(_COMPACT_MAGIC) :])
+            body = msgpack.unpackb(packed, raw=False, strict_map_key=False)
+        except Exception as exc:
+            logger.warning("Compact share cache payload unreadable: %s", exc)
+            return None
+        if not isinstance(body, dict):
+            return None
+        if "rows" in body:
+            body["files"] = body.pop("rows")
+        else:
+            try:
+                body["files"] = _files_from_columns(
+                    body.pop("columns"),
+                    body.pop("quoted", None) or {},
+                    body.pop("urls", None) or {},
+                    request_hash=request_hash,
+                    source_hash=str(body.get("source_hash") or ""),
+                )
+            except (KeyError, TypeError, ValueError):
+                return None
+        return body
+    try:
+        payload = json.loads(raw)
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _files_from_columns(
+    columns: dict, quoted_paths: dict, urls: dict, *, request_hash: str, source_hash: str
+) -> list[dict]:
+    inline_prefix = f"/api/public/dl/{source_hash}/"
+    download_prefix = f"/api/share/{request_hash}/file/"
+    files: list[dict] = []
+    rows = zip(*(columns[col] for col in _COLUMNS), strict=True)
+    for idx, (name, path, kind, extension, size, modified) in enumerate(rows):
+        override = urls.get(idx)
+        if override is not None:
+            inline_url, download_url = override
+        else:
+            quoted = quoted_paths.get(idx) or path
+            inline_url = f"{inline_prefix}{quoted}?inline=true"
+            download_url = f"{download_prefix}{quoted}?download=1"
+        files.append(
+            {
+                "name": name,
+                "path": path,
+                "type": kind,
+                "extension": extension,
+                "size": size,
+                "modified": modified,
+                "inline_url": inline_url,
+                "download_url": download_url,
+            }
+        )
+    return files
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import zlib
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from ..config import parse_bool
+
+SHARE_LIST_SORTS = ("name", "modified", "size", "type")
+SHARE_LIST_MAX_LIMIT = 1000
+# Listings with at least this many items are streamed instead of built with jsonify.
+SHARE_LIST_STREAM_MIN_ITEMS = int(os.environ.get("DROPPR_SHARE_LIST_STREAM_MIN_ITEMS", "500"))
+SHARE_LIST_STREAM_GZIP = parse_bool(os.environ.get("DROPPR_SHARE_LIST_STREAM_GZIP", "true"))
+_STREAM_CHUNK_BYTES = 64 * 1024
+
+_SORT_KEYS: dict[str, Callable[[dict], tuple]] = {
+    "name": lambda f: (str(f.get("name") or "").casefold(), str(f.get("path") or "")),
+    "modified": lambda f: (int(f.get("modified") or 0), str(f.get("path") or "")),
+    "size": lambda f: (int(f.get("size") or 0), str(f.get("path") or "")),
+    "type": lambda f: (
+        str(f.get("type") or ""),
+        str(f.get("name") or "").casefold(),
+        str(f.get("path") or ""),
+    ),
+}
+
+
+class ShareListQueryError(ValueError):
+    """Raised for malformed listing parameters (bad sort, limit or cursor)."""
+
+
+def _sorted_view(files: list[dict], sort: str) -> tuple[list[tuple], list[dict]]:
+    """
+    Returns ``(keys, items)`` for ``files`` sorted ascending by ``sort``.
+
+    Views are memoized on share lists that accept attributes (ShareFileList),
+    so a list held in the per-worker cache is sorted once per sort key and
+    every later page is a bisect plus a slice.
+    """
+    attrs = getattr(files, "__dict__", None)
+    views = attrs.setdefault("sorted_views", {}) if attrs is not None else {}
+    view = views.get(sort)
+    if view is None:
+        key_fn = _SORT_KEYS[sort]
+        items = sorted(files, key=key_fn)
+        view = views[sort] = ([key_fn(f) for f in items], items)
+    return view
+
+
+def _encode_cursor(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ShareListQueryError("Invalid cursor") from exc
+    if not isinstance(payload, dict):
+        raise ShareListQueryError("Invalid cursor")
+    return payload
+
+
+def _cursor_key(state: dict) -> tuple:
+    key = state.get("k")
+    if not isinstance(key, list):
+        raise ShareListQueryError("Invalid cursor")
+    return tuple(key)
+
+
+def _matches(
+    item: dict, *, types: set[str] | None, exts: set[str] | None, prefix: str | None
+) -> bool:
+    if types is not None and item.get("type") not in types:
+        return False
+    if exts is not None and str(item.get("extension") or "").lower() not in exts:
+        return False
+    if prefix is not None and not str(item.get("path") or "").startswith(prefix):
+        return False
+    return True
+
+
+def _share_list_page(
+    files: list[dict],
+    *,
+    sort: str | None = None,
+    descending: bool = False,
+    types: set[str] | None = None,
+    exts: set[str] | None = None,
+    prefix: str | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict], int, str | None]:
+    """
+    Sorts, filters and paginates a cached share list.
+
+    Without ``sort`` the crawl order is kept and the cursor is an offset. With
+    ``sort`` the cursor is the sort key of the last item returned, so pages
+    stay consistent if the list is rebuilt between requests.
+
+    Returns:
+        ``(page, total, next_cursor)`` where ``total`` counts every item
+        matching the filters and ``next_cursor`` is None on the last page.
+    """
+    if sort is not None and sort not in _SORT_KEYS:
+        raise ShareListQueryError(f"sort must be one of: {', '.join(SHARE_LIST_SORTS)}")
+
+    filtered = types is not None or exts is not None or prefix is not None
+    state = _decode_cursor(cursor) if cursor else None
+
+    keys: list[Any]
+    if sort is None:
+        keys, items = [], files
+        if state is not None and ("s" in state or not isinstance(state.get("i"), int)):
+            raise ShareListQueryError("Cursor does not match sort")
+        start = max(0, state["i"]) if state is not None else 0
+        order = range(start, len(items))
+    else:
+        keys, items = _sorted_view(files, sort)
+        if state is not None and (state.get("s") != sort or bool(state.get("d")) != descending):
+            raise ShareListQueryError("Cursor does not match sort")
+        try:
+            if descending:
+                end = bisect_left(keys, _cursor_key(state)) if state else len(items)
+                order = range(end - 1, -1, -1)
+            else:
+                start = bisect_right(keys, _cursor_key(state)) if state else 0
+                order = range(start, len(items))
+        except TypeError as exc:
+            raise ShareListQueryError("Invalid cursor") from exc
+
+    # Reaching a match past a full page means there is a next page; exhausting
+    # the items means this is the last one.
+    page: list[dict] = []
+    last = -1
+    for idx in order:
+        item = items[idx]
+        if filtered and not _matches(item, types=types, exts=exts, prefix=prefix):
+            continue
+        if limit is not None and len(page) == limit:
+            break
+        page.append(item)
+        last = idx
+    else:
+        last = -1
+
+    next_cursor = None
+    if limit is not None and last >= 0:
+        if sort is None:
+            next_cursor = _encode_cursor({"i": last + 1})
+        else:
+            next_cursor = _encode_cursor({"s": sort, "d": descending, "k": list(keys[last])})
+
+    if filtered:
+        total = sum(1 for f in files if _matches(f, types=types, exts=exts, prefix=prefix))
+    else:
+        total = len(files)
+    return page, total, next_cursor
+
+
+def _encode_share_item(item: dict) -> bytes:
+    return json.dumps(item, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_share_items(files: list[dict]) -> None:
+    """
+    Pre-encodes each item of a share list to JSON bytes, keyed by item
+    identity so sorted and filtered pages can reuse them. Stored on lists
+    that accept attributes (ShareFileList); a no-op for plain lists.
+    """
+    attrs = getattr(files, "__dict__", None)
+    if attrs is None or "encoded_items" in attrs:
+        return
+    attrs["encoded_items"] = {id(item): _encode_share_item(item) for item in files}
+
+
+def _share_list_etag(files: list[dict]) -> str:
+    """
+    Returns a content hash of a share list, memoized on lists that accept
+    attributes. Reuses pre-encoded item fragments when present.
+    """
+    etag = getattr(files, "etag", None)
+    if etag:
+        return etag
+    fragments: dict[int, bytes] = getattr(files, "encoded_items", None) or {}
+    digest = hashlib.blake2b(digest_size=16)
+    for item in files:
+        digest.update(fragments.get(id(item)) or _encode_share_item(item))
+        digest.update(b"\n")
+    etag = digest.hexdigest()
+    attrs = getattr(files, "__dict__", None)
+    if attrs is not None:
+        attrs["etag"] = etag
+    return etag
+
+
+def _stream_share_listing(
+    files: list[dict], page: list[dict], meta: dict, *, gzip: bool
+) -> Iterator[bytes]:
+    """
+    Yields ``{"files": [...], "meta": {...}}`` in ~64 KiB chunks, reusing the
+    item fragments pre-encoded on ``files`` and gzip-compressing on the fly.
+    """
+    fragments: dict[int, bytes] = getattr(files, "encoded_items", None) or {}
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def emit(chunk: bytes) -> bytes:
+        if compressor is None:
+            return chunk
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    buf = bytearray(b'{"files":[')
+    for idx, item in enumerate(page):
+        if idx:
+            buf += b","
+        buf += fragments.get(id(item)) or _encode_share_item(item)
+        if len(buf) >= _STREAM_CHUNK_BYTES:
+            yield emit(bytes(buf))
+            buf.clear()
+    buf += b'],"meta":' + json.dumps(meta, separators=(",", ":")).encode("utf-8") + b"}"
+    if compressor is None:
+        yield bytes(buf)
+    else:
+        yield compressor.compress(bytes(buf)) + compressor.flush()
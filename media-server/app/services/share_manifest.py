@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from ..config import parse_bool
+from ..utils.sqlite_pool import _sqlite_pool
+from .share import ShareFileList, _as_stale
+from .share_codec import _decode_share_payload, _encode_share_payload
+
+logger = logging.getLogger("droppr.share_manifest")
+
+# Built share lists persisted on disk and shared by every worker on the host,
+# so a restarted or freshly scaled worker answers from disk instead of crawling.
+SHARE_MANIFEST_ENABLED = parse_bool(os.environ.get("DROPPR_SHARE_MANIFEST_ENABLED", "true"))
+SHARE_MANIFEST_DB_PATH = os.environ.get(
+    "DROPPR_SHARE_MANIFEST_DB_PATH", "/database/droppr-share-manifest.sqlite3"
+)
+SHARE_MANIFEST_DB_TIMEOUT_SECONDS = float(
+    os.environ.get("DROPPR_SHARE_MANIFEST_DB_TIMEOUT_SECONDS", "5")
+)
+_PRUNE_INTERVAL_SECONDS = 3600
+
+_manifest_db_ready: bool = False
+_last_prune_at: float = 0.0
+
+
+@contextmanager
+def _manifest_conn():
+    _ensure_manifest_db()
+
+    pool = _sqlite_pool(
+        "share_manifest", SHARE_MANIFEST_DB_PATH, timeout=SHARE_MANIFEST_DB_TIMEOUT_SECONDS
+    )
+    with pool.connection() as conn:
+        yield conn
+
+
+def _init_manifest_db() -> None:
+    conn = sqlite3.connect(
+        SHARE_MANIFEST_DB_PATH,
+        timeout=SHARE_MANIFEST_DB_TIMEOUT_SECONDS,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA busy_timeout=5000;")
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS share_manifests (
+                request_hash TEXT NOT NULL,
+                recursive INTEGER NOT NULL,
+                source_hash TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                etag TEXT,
+                truncated INTEGER NOT NULL DEFAULT 0,
+                item_count INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (request_hash, recursive)
+            )
+            """
+        )
+        # Manifests are not checked against the share's modified stamp (it only
+        # reflects direct children); drop the index older databases still have.
+        conn.execute("DROP INDEX IF EXISTS idx_share_manifests_source")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_share_manifests_stale_until ON share_manifests(stale_until)"
+        )
+    finally:
+        conn.close()
+
+
+def _ensure_manifest_db() -> None:
+    global _manifest_db_ready
+
+    if _manifest_db_ready:
+        return
+
+    db_dir = os.path.dirname(SHARE_MANIFEST_DB_PATH)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    lock_file = open(f"{SHARE_MANIFEST_DB_PATH}.init.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _init_manifest_db()
+        _manifest_db_ready = True
+    finally:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
+
+
+def _share_manifest_get(
+    request_hash: str,
+    *,
+    source_hash: str,
+    recursive: bool,
+    max_age_seconds: int,
+    stale_seconds: int = 0,
+) -> list[dict] | None:
+    """
+    Reads a share list from the on-disk manifest, with the same freshness
+    rules as the Redis layer: fresh until its expiry (or ``max_age_seconds``
+    after it was built), then returned marked ``stale`` for ``stale_seconds``.
+    """
+    if not SHARE_MANIFEST_ENABLED:
+        return None
+    try:
+        with _manifest_conn() as conn:
+            row = conn.execute(
+                """
+                SELECT source_hash, created_at, expires_at, etag, truncated, payload
+                FROM share_manifests
+                WHERE request_hash = ? AND recursive = ?
+                """,
+                (request_hash, int(recursive)),
+            ).fetchone()
+    except Exception as exc:
+        logger.warning("Share manifest read failed for %s: %s", request_hash, exc)
+        return None
+    if row is None or row["source_hash"] != source_hash:
+        return None
+
+    now = time.time()
+    fresh_until = float(row["expires_at"])
+    if max_age_seconds > 0:
+        fresh_until = min(fresh_until, float(row["created_at"]) + max_age_seconds)
+    stale_age = now - fresh_until
+    if stale_age > 0 and stale_age > stale_seconds:
+        return None
+
+    payload = _decode_share_payload(row["payload"], request_hash=request_hash)
+    files = payload.get("files") if payload is not None else None
+    if not isinstance(files, list):
+        return None
+    result = ShareFileList(files)
+    result.truncated = bool(row["truncated"])
+    result.etag = row["etag"] or None
+    result.fresh_until = fresh_until
+    if stale_age > 0:
+        return _as_stale(result, stale_age)
+    return result
+
+
+def _share_manifest_set(
+    request_hash: str,
+    *,
+    source_hash: str,
+    recursive: bool,
+    files: list[dict],
+    ttl_seconds: int,
+    stale_seconds: int = 0,
+) -> None:
+    """
+    Stores a built share list. When the stored list has the same ETag only its
+    timestamps are bumped, so unchanged rebuilds do not re-encode or rewrite it.
+    """
+    if not SHARE_MANIFEST_ENABLED:
+        return
+    now = time.time()
+    expires_at = now + max(1, int(ttl_seconds))
+    stale_until = expires_at + max(0, int(stale_seconds))
+    etag = getattr(files, "etag", None)
+    truncated = int(bool(getattr(files, "truncated", False)))
+    try:
+        with _manifest_conn() as conn:
+            if etag:
+                updated = conn.execute(
+                    """
+                    UPDATE share_manifests
+                    SET created_at = ?, expires_at = ?, stale_until = ?, truncated = ?
+                    WHERE request_hash = ? AND recursive = ? AND source_hash = ? AND etag = ?
+                    """,
+                    (
+                        now,
+                        expires_at,
+                        stale_until,
+                        truncated,
+                        request_hash,
+                        int(recursive),
+                        source_hash,
+                        etag,
+                    ),
+                ).rowcount
+                if updated:
+                    return
+            payload = _encode_share_payload(
+                {"source_hash": source_hash, "recursive": recursive, "files": files},
+                request_hash=request_hash,
+            )
+            conn.execute(
+                """
+                INSERT INTO share_manifests (
+                    request_hash, recursive, source_hash, created_at,
+                    expires_at, stale_until, etag, truncated, item_count, payload
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(request_hash, recursive) DO UPDATE SET
+                    source_hash = excluded.source_hash,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at,
+                    stale_until = excluded.stale_until,
+                    etag = excluded.etag,
+                    truncated = excluded.truncated,
+                    item_count = excluded.item_count,
+                    payload = excluded.payload
+                """,
+                (
+                    request_hash,
+                    int(recursive),
+                    source_hash,
+                    now,
+                    expires_at,
+                    stale_until,
+                    etag,
+                    truncated,
+                    len(files),
+                    payload,
+                ),
+            )
+            _maybe_prune_manifest(conn, now)
+    except Exception as exc:
+        logger.warning("Share manifest write failed for %s: %s", request_hash, exc)
+
+
+def _share_manifest_delete(request_hash: str) -> None:
+    if not SHARE_MANIFEST_ENABLED:
+        return
+    try:
+        with _manifest_conn() as conn:
+            conn.execute("DELETE FROM share_manifests WHERE request_hash = ?", (request_hash,))
+    except Exception as exc:
+        logger.warning("Share manifest delete failed for %s: %s", request_hash, exc)
+
+
+def _maybe_prune_manifest(conn, now: float) -> None:
+    global _last_prune_at
+
+    if now - _last_prune_at < _PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune_at = now
+    conn.execute("DELETE FROM share_manifests WHERE stale_until < ?", (now,))
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ..utils.validation import VIDEO_EXTS
+from .cache import _redis_share_meta_get, _redis_share_meta_set
+from .filebrowser import _fetch_public_share_json
+from .share import _index_item
+
+logger = logging.getLogger("droppr.share_meta_cache")
+
+# Per-file FileBrowser metadata used by the video routes, which clients poll
+# while a transcode runs. Kept short so renamed or replaced files show up quickly.
+SHARE_META_CACHE_TTL_SECONDS = int(os.environ.get("DROPPR_SHARE_META_CACHE_TTL_SECONDS", "30"))
+SHARE_META_CACHE_NEGATIVE_TTL_SECONDS = int(
+    os.environ.get("DROPPR_SHARE_META_CACHE_NEGATIVE_TTL_SECONDS", "10")
+)
+SHARE_META_CACHE_MAX_ITEMS = int(os.environ.get("DROPPR_SHARE_META_CACHE_MAX_ITEMS", "4096"))
+# Videos primed from a recursive crawl, per share build.
+SHARE_META_PRIME_MAX_ITEMS = int(os.environ.get("DROPPR_SHARE_META_PRIME_MAX_ITEMS", "1000"))
+
+_meta_cache_lock = threading.Lock()
+_meta_cache: OrderedDict[tuple[str, str], tuple[float, dict | None]] = OrderedDict()
+
+
+def _meta_cache_get(key: tuple[str, str]) -> tuple[bool, dict | None]:
+    now = time.time()
+    with _meta_cache_lock:
+        entry = _meta_cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, meta = entry
+        if now >= expires_at:
+            _meta_cache.pop(key, None)
+            return False, None
+        _meta_cache.move_to_end(key)
+        return True, meta
+
+
+def _meta_cache_set(key: tuple[str, str], meta: dict | None, *, ttl_seconds: int) -> None:
+    if ttl_seconds <= 0:
+        return
+    with _meta_cache_lock:
+        _meta_cache[key] = (time.time() + ttl_seconds, meta)
+        _meta_cache.move_to_end(key)
+        while len(_meta_cache) > max(1, SHARE_META_CACHE_MAX_ITEMS):
+            _meta_cache.popitem(last=False)
+
+
+def _meta_ttl(meta: dict | None) -> int:
+    return (
+        SHARE_META_CACHE_TTL_SECONDS if meta is not None else SHARE_META_CACHE_NEGATIVE_TTL_SECONDS
+    )
+
+
+def _fetch_public_share_json_cached(source_hash: str, subpath: str | None = None) -> dict | None:
+    """
+    ``_fetch_public_share_json`` with a short-lived per-(share, subpath) cache
+    in memory and Redis, including "not found" results. Root listings
+    (no subpath) are not cached here; the share list cache covers them.
+    Folder listings are cached as an empty stub, since callers only use
+    subpath lookups for files.
+    """
+    if not subpath or SHARE_META_CACHE_TTL_SECONDS <= 0:
+        return _fetch_public_share_json(source_hash, subpath=subpath)
+
+    subpath = "/" + subpath.lstrip("/")
+    key = (source_hash, subpath)
+    hit, meta = _meta_cache_get(key)
+    if hit:
+        return meta
+    hit, meta = _redis_share_meta_get(source_hash, subpath)
+    if hit:
+        _meta_cache_set(key, meta, ttl_seconds=_meta_ttl(meta))
+        return meta
+
+    meta = _fetch_public_share_json(source_hash, subpath=subpath)
+    if meta is not None and isinstance(meta.get("items"), list):
+        meta = {"name": meta.get("name"), "path": meta.get("path"), "isDir": True, "items": []}
+    _meta_cache_set(key, meta, ttl_seconds=_meta_ttl(meta))
+    _redis_share_meta_set(
+        source_hash,
+        {subpath: meta},
+        ttl_seconds=SHARE_META_CACHE_TTL_SECONDS,
+        negative_ttl_seconds=SHARE_META_CACHE_NEGATIVE_TTL_SECONDS,
+    )
+    return meta
+
+
+def _prime_share_file_meta(
+    source_hash: str, root_items: list, index: dict[str, list] | None
+) -> int:
+    """
+    Seeds the cache with video metadata from a folder crawl that just ran, so
+    the video routes find it without another FileBrowser call. ``index`` is
+    the per-folder crawl listing (``{dir: [stamp, files, subdirs]}``).
+    Returns the number of entries primed.
+    """
+    if SHARE_META_CACHE_TTL_SECONDS <= 0 or SHARE_META_PRIME_MAX_ITEMS <= 0:
+        return 0
+    candidates = [item for item in root_items if isinstance(item, dict) and not item.get("isDir")]
+    for listing in (index or {}).values():
+        candidates.extend(listing[1])
+
+    entries: dict[str, dict | None] = {}
+    for item in candidates:
+        path = item.get("path")
+        ext = str(item.get("extension") or "").lstrip(".").lower()
+        if not isinstance(path, str) or not path.startswith("/") or ext not in VIDEO_EXTS:
+            continue
+        entries[path] = {**_index_item(item), "isDir": False}
+        if len(entries) >= SHARE_META_PRIME_MAX_ITEMS:
+            break
+
+    for subpath, meta in entries.items():
+        _meta_cache_set((source_hash, subpath), meta, ttl_seconds=SHARE_META_CACHE_TTL_SECONDS)
+    _redis_share_meta_set(
+        source_hash,
+        entries,
+        ttl_seconds=SHARE_META_CACHE_TTL_SECONDS,
+        negative_ttl_seconds=SHARE_META_CACHE_NEGATIVE_TTL_SECONDS,
+    )
+    return len(entries)
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+from ..config import parse_bool
+from ..metrics import SHARE_WARM_DURATION, SHARE_WARM_FILEBROWSER_CALLS, SHARE_WARM_SHARES
+from .analytics_partitions import OPEN_END, _fan_out
+from .cache import _redis_share_warm_run_get, _redis_share_warm_run_set
+
+logger = logging.getLogger("droppr.share_warmer")
+
+SHARE_CACHE_WARM_ENABLED = parse_bool(os.environ.get("DROPPR_SHARE_CACHE_WARM_ENABLED", "true"))
+SHARE_CACHE_WARM_INTERVAL_SECONDS = int(
+    os.environ.get("DROPPR_SHARE_CACHE_WARM_INTERVAL_SECONDS", "900")
+)
+SHARE_CACHE_WARM_LIMIT = int(os.environ.get("DROPPR_SHARE_CACHE_WARM_LIMIT", "20"))
+SHARE_CACHE_WARM_DAYS = int(os.environ.get("DROPPR_SHARE_CACHE_WARM_DAYS", "7"))
+# Activity this many hours old counts half as much as activity now.
+SHARE_CACHE_WARM_HALF_LIFE_HOURS = float(
+    os.environ.get("DROPPR_SHARE_CACHE_WARM_HALF_LIFE_HOURS", "24")
+)
+# Lists that stop being fresh within this window are rebuilt ahead of expiry.
+SHARE_CACHE_WARM_LEAD_SECONDS = int(
+    os.environ.get(
+        "DROPPR_SHARE_CACHE_WARM_LEAD_SECONDS", str(max(0, SHARE_CACHE_WARM_INTERVAL_SECONDS))
+    )
+)
+SHARE_CACHE_WARM_CALLS_PER_SECOND = float(
+    os.environ.get("DROPPR_SHARE_CACHE_WARM_CALLS_PER_SECOND", "5")
+)
+SHARE_CACHE_WARM_MAX_CALLS = int(os.environ.get("DROPPR_SHARE_CACHE_WARM_MAX_CALLS", "2000"))
+
+# Downloads signal more intent than a gallery view.
+_WARM_EVENT_WEIGHTS = {"gallery_view": 1.0, "file_download": 2.0, "zip_download": 4.0}
+_WARM_BUCKET_SECONDS = 3600
+
+# Outcome of warming one share: "warmed", "fresh" (nothing to do) or "missing",
+# plus the number of items in the rebuilt list.
+WarmOneFn = Callable[[str], tuple[str, int]]
+
+
+@dataclass
+class ShareWarmRun:
+    """What one warm run did and what it cost."""
+
+    started_at: float
+    duration_seconds: float = 0.0
+    candidates: int = 0
+    warmed: int = 0
+    fresh: int = 0
+    missing: int = 0
+    failed: int = 0
+    skipped: int = 0
+    items: int = 0
+    filebrowser_calls: int = 0
+    throttled_seconds: float = 0.0
+
+
+_last_warm_run: ShareWarmRun | None = None
+_scheduler_thread: threading.Thread | None = None
+_scheduler_pid: int | None = None
+_scheduler_lock = threading.Lock()
+
+
+def _rank_warm_candidates(
+    conn,
+    *,
+    now: float,
+    days: int = SHARE_CACHE_WARM_DAYS,
+    half_life_hours: float = SHARE_CACHE_WARM_HALF_LIFE_HOURS,
+    limit: int = SHARE_CACHE_WARM_LIMIT,
+) -> list[tuple[str, float]]:
+    """
+    Ranks shares by recent views and downloads with exponential decay.
+
+    Events are counted per share, type and hour in SQL; the decay is applied
+    per hourly bucket here, so the query stays a plain indexed GROUP BY.
+    """
+    since = int(now - max(1, days) * 86400)
+    placeholders = ", ".join("?" for _ in _WARM_EVENT_WEIGHTS)
+    # Hourly buckets never straddle a monthly partition, so each is grouped separately.
+    sql, params = _fan_out(
+        conn,
+        [(since, OPEN_END)],
+        lambda events: f"""
+            SELECT share_hash, event_type, created_at / {_WARM_BUCKET_SECONDS} AS bucket,
+                   COUNT(*) AS events
+            FROM {events}
+            WHERE created_at >= ? AND event_type IN ({placeholders})
+            GROUP BY share_hash, event_type, bucket
+        """,
+        (since, *_WARM_EVENT_WEIGHTS),
+    )
+    rows = conn.execute(sql, params).fetchall()
+
+    half_life_seconds = max(1.0, half_life_hours * 3600)
+    scores: dict[str, float] = {}
+    for row in rows:
+        share_hash = str(row["share_hash"] or "")
+        bucket_mid = (int(row["bucket"]) + 0.5) * _WARM_BUCKET_SECONDS
+        decay = 0.5 ** (max(0.0, now - bucket_mid) / half_life_seconds)
+        weight = _WARM_EVENT_WEIGHTS.get(str(row["event_type"]), 0.0)
+        scores[share_hash] = scores.get(share_hash, 0.0) + weight * int(row["events"]) * decay
+    return heapq.nlargest(max(1, limit), scores.items(), key=lambda kv: kv[1])
+
+
+def _run_share_cache_warm(
+    candidates: list[str],
+    *,
+    warm_one: WarmOneFn,
+    filebrowser_calls: Callable[[], int],
+    calls_per_second: float = SHARE_CACHE_WARM_CALLS_PER_SECOND,
+    max_calls: int = SHARE_CACHE_WARM_MAX_CALLS,
+    sleep: Callable[[float], None] = time.sleep,
+) -> ShareWarmRun:
+    """
+    Warms ``candidates`` in order. FileBrowser calls are paced to
+    ``calls_per_second`` on average between shares, and the run stops once
+    ``max_calls`` have been spent; the rest are counted as skipped.
+    """
+    started = time.time()
+    clock = time.monotonic()
+    run = ShareWarmRun(started_at=started, candidates=len(candidates))
+    calls_at_start = filebrowser_calls()
+
+    for position, share_hash in enumerate(candidates):
+        spent = filebrowser_calls() - calls_at_start
+        if max_calls > 0 and spent >= max_calls:
+            run.skipped += len(candidates) - position
+            break
+        if calls_per_second > 0:
+            wait = spent / calls_per_second - (time.monotonic() - clock)
+            if wait > 0:
+                sleep(wait)
+                run.throttled_seconds += wait
+        try:
+            result, items = warm_one(share_hash)
+        except Exception as exc:
+            logger.warning("Share cache warm failed for %s: %s", share_hash, exc)
+            run.failed += 1
+            continue
+        if result == "warmed":
+            run.warmed += 1
+            run.items += items
+        elif result == "fresh":
+            run.fresh += 1
+        else:
+            run.missing += 1
+
+    run.filebrowser_calls = filebrowser_calls() - calls_at_start
+    run.duration_seconds = time.monotonic() - clock
+    _record_warm_run(run)
+    return run
+
+
+def _record_warm_run(run: ShareWarmRun) -> None:
+    global _last_warm_run
+    _last_warm_run = run
+    logger.info(
+        "Share cache warm: %d candidates, %d warmed, %d fresh, %d missing, %d failed, "
+        "%d skipped, %d FileBrowser calls, %.1fs (%.1fs throttled)",
+        run.candidates,
+        run.warmed,
+        run.fresh,
+        run.missing,
+        run.failed,
+        run.skipped,
+        run.filebrowser_calls,
+        run.duration_seconds,
+        run.throttled_seconds,
+    )
+    if SHARE_WARM_SHARES is not None:
+        for result in ("warmed", "fresh", "missing", "failed", "skipped"):
+            count = getattr(run, result)
+            if count:
+                SHARE_WARM_SHARES.labels(result).inc(count)
+    if SHARE_WARM_DURATION is not None:
+        SHARE_WARM_DURATION.observe(run.duration_seconds)
+    if SHARE_WARM_FILEBROWSER_CALLS is not None:
+        SHARE_WARM_FILEBROWSER_CALLS.inc(run.filebrowser_calls)
+    # Runs usually happen in a Celery worker; Redis makes the record visible
+    # to the admin stats endpoint on the web workers.
+    _redis_share_warm_run_set(
+        asdict(run), ttl_seconds=max(3600, 4 * SHARE_CACHE_WARM_INTERVAL_SECONDS)
+    )
+
+
+def _share_warm_stats() -> dict | None:
+    run = _redis_share_warm_run_get()
+    if run is None and _last_warm_run is not None:
+        run = asdict(_last_warm_run)
+    return run
+
+
+def _share_warm_scheduler_loop(tick: Callable[[], object]) -> None:
+    interval = max(1, SHARE_CACHE_WARM_INTERVAL_SECONDS)
+    while True:
+        time.sleep(interval)
+        try:
+            tick()
+        except Exception as exc:
+            logger.warning("Scheduled share cache warm failed: %s", exc)
+
+
+def _ensure_share_warm_scheduler(tick: Callable[[], object]) -> bool:
+    """
+    Starts this process's warm scheduler thread if it is not running. Used
+    when Celery beat is not configured; ``tick`` elects a single runner
+    across workers through a Redis lease.
+    """
+    global _scheduler_thread, _scheduler_pid
+    if not SHARE_CACHE_WARM_ENABLED or SHARE_CACHE_WARM_INTERVAL_SECONDS <= 0:
+        return False
+    pid = os.getpid()
+    thread = _scheduler_thread
+    if thread is not None and _scheduler_pid == pid and thread.is_alive():
+        return False
+    with _scheduler_lock:
+        thread = _scheduler_thread
+        if thread is not None and _scheduler_pid == pid and thread.is_alive():
+            return False
+        thread = threading.Thread(
+            target=_share_warm_scheduler_loop, args=(tick,), name="droppr-share-warm", daemon=True
+        )
+        thread.start()
+        _scheduler_thread = thread
+        _scheduler_pid = pid
+    return True
@@ -16,6 +16,7 @@ from sqlalchemy.exc import OperationalError
 
 from ..models import VIDEO_META_DB_PATH, VideoMetaBase, get_video_meta_engine
 from ..models.video_meta import VideoMeta
+from ..utils.sqlite_pool import _record_locked_retry
 
 logger = logging.getLogger("droppr.video_meta")
 
@@ -82,6 +83,7 @@ def _ensure_video_meta_db() -> None:
                 return
             except OperationalError as exc:
                 if "locked" in str(exc).lower() and attempt < 9:
+                    _record_locked_retry("video_meta")
                     time.sleep(0.05 * (attempt + 1))
                     continue
                 logger.warning("Video meta init failed: %s", exc)
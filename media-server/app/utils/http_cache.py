@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from flask import Response, jsonify, request
+
+# Gallery clients may reuse a response for this long, then revalidate with
+# If-None-Match and usually get an empty 304.
+GALLERY_REVALIDATE_MAX_AGE_SECONDS = max(
+    0, int(os.environ.get("DROPPR_GALLERY_REVALIDATE_MAX_AGE_SECONDS", "5"))
+)
+
+
+def _revalidate_cache_control(max_age: int = GALLERY_REVALIDATE_MAX_AGE_SECONDS) -> str:
+    return f"private, max-age={max(0, max_age)}, must-revalidate"
+
+
+def _etag_for(*parts) -> str:
+    """Returns a stable hex digest of JSON-serializable parts, for use as an ETag."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, bytes):
+            digest.update(part)
+        else:
+            digest.update(json.dumps(part, sort_keys=True, separators=(",", ":")).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _not_modified(etag: str, cache_control: str) -> Response | None:
+    """Returns a 304 response if the request's If-None-Match matches ``etag``."""
+    if request.method not in {"GET", "HEAD"} or not request.if_none_match.contains(etag):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+
+def _conditional_json(payload: dict, cache_control: str) -> Response:
+    """
+    jsonify ``payload`` with a strong ETag over the body, answering a matching
+    If-None-Match on GET/HEAD with an empty 304.
+    """
+    resp = jsonify(payload)
+    resp.set_etag(_etag_for(resp.get_data()))
+    resp.headers["Cache-Control"] = cache_control
+    resp.make_conditional(request)
+    return resp
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import struct
+import zlib
+
+HLL_PRECISION = 12
+_SPARSE = b"\x01"
+_DENSE = b"\x02"
+_PAIR = struct.Struct(">HB")
+
+
+class HyperLogLog:
+    """
+    A HyperLogLog distinct-count sketch over 64-bit BLAKE2 hashes. With the
+    default precision (4096 registers) the standard error is about 1.6%.
+    Sketches merge by taking the maximum of each register, so the union of
+    any set of sketches estimates the distinct count of the combined input.
+    """
+
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = HLL_PRECISION):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: str) -> None:
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+        x = int.from_bytes(digest, "big")
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: HyperLogLog) -> None:
+        if other.p != self.p:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def merge_bytes(self, blob: bytes) -> None:
+        """Merges a sketch serialized by ``to_bytes`` without building it first."""
+        if blob[:1] == _SPARSE:
+            registers = self.registers
+            for index, rank in _PAIR.iter_unpack(blob[1:]):
+                if rank > registers[index]:
+                    registers[index] = rank
+            return
+        if blob[:1] != _DENSE:
+            raise ValueError("Unknown sketch encoding")
+        dense = zlib.decompress(blob[1:])
+        if len(dense) != self.m:
+            raise ValueError("Cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, dense))
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the registers: as (index, rank) pairs while few are set,
+        which is the common case for one share and one day, else compressed.
+        """
+        pairs = [(i, r) for i, r in enumerate(self.registers) if r]
+        if len(pairs) * _PAIR.size < self.m // 2:
+            return _SPARSE + b"".join(_PAIR.pack(i, r) for i, r in pairs)
+        return _DENSE + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, p: int = HLL_PRECISION) -> HyperLogLog:
+        sketch = cls(p)
+        sketch.merge_bytes(blob)
+        return sketch
+
+    def estimate(self) -> int:
+        m = self.m
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / m)
+        registers = self.registers
+        raw = alpha * m * m / sum(registers.count(r) * 2.0**-r for r in set(registers))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are empty.
+            return round(m * math.log(m / zeros))
+        return round(raw)
@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import struct
+from typing import BinaryIO
+
+import zstandard
+
+# A small Parquet writer and reader for flat tables of int64 and UTF-8
+# string columns: one PLAIN-encoded, zstd-compressed data page per column
+# chunk, RLE definition levels (every column is optional), and min/max
+# statistics on int64 columns. Files are readable by any Parquet reader
+# (pyarrow, DuckDB, Spark); the reader here only has to read files written
+# by the writer here.
+
+MAGIC = b"PAR1"
+INT64 = "int64"
+STRING = "string"
+
+# Parquet enums (parquet.thrift).
+_TYPE_INT64 = 2
+_TYPE_BYTE_ARRAY = 6
+_REPETITION_OPTIONAL = 1
+_CONVERTED_UTF8 = 0
+_ENCODING_PLAIN = 0
+_ENCODING_RLE = 3
+_CODEC_UNCOMPRESSED = 0
+_CODEC_ZSTD = 6
+_PAGE_DATA = 0
+
+# Thrift compact protocol type ids; _BOOL picks TRUE/FALSE from the value.
+_T_TRUE = 1
+_T_FALSE = 2
+_T_BYTE = 3
+_T_I16 = 4
+_T_I32 = 5
+_T_I64 = 6
+_T_DOUBLE = 7
+_T_BINARY = 8
+_T_LIST = 9
+_T_SET = 10
+_T_MAP = 11
+_T_STRUCT = 12
+_BOOL = -1
+
+_PHYSICAL_TYPES = {INT64: _TYPE_INT64, STRING: _TYPE_BYTE_ARRAY}
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _encode_value(ftype: int, value) -> bytes:
+    if ftype in (_T_I16, _T_I32, _T_I64):
+        return _varint(_zigzag(value))
+    if ftype == _T_BINARY:
+        data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+        return _varint(len(data)) + data
+    if ftype == _T_STRUCT:
+        return _encode_struct(value)
+    if ftype == _T_LIST:
+        elem_type, items = value
+        if len(items) < 15:
+            header = bytes([(len(items) << 4) | elem_type])
+        else:
+            header = bytes([0xF0 | elem_type]) + _varint(len(items))
+        return header + b"".join(_encode_value(elem_type, item) for item in items)
+    raise ValueError(f"Unsupported thrift type {ftype}")
+
+
+def _encode_struct(fields: list[tuple[int, int, object]]) -> bytes:
+    """Encodes (field id, type, value) triples in ascending id order; None fields are omitted."""
+    out = bytearray()
+    last_id = 0
+    for field_id, ftype, value in fields:
+        if value is None:
+            continue
+        wire = (_T_TRUE if value else _T_FALSE) if ftype == _BOOL else ftype
+        delta = field_id - last_id
+        if 0 < delta <= 15:
+            out.append((delta << 4) | wire)
+        else:
+            out.append(wire)
+            out += _varint(_zigzag(field_id))
+        if ftype != _BOOL:
+            out += _encode_value(ftype, value)
+        last_id = field_id
+    out.append(0)
+    return bytes(out)
+
+
+class _ThriftReader:
+    """Decodes compact-protocol structs into {field id: value} dicts."""
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _byte(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def _varint(self) -> int:
+        shift = result = 0
+        while True:
+            byte = self._byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self) -> int:
+        value = self._varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def read_struct(self) -> dict[int, object]:
+        fields: dict[int, object] = {}
+        last_id = 0
+        while True:
+            header = self._byte()
+            if header == 0:
+                return fields
+            ftype = header & 0x0F
+            delta = header >> 4
+            field_id = last_id + delta if delta else self._zigzag()
+            if ftype in (_T_TRUE, _T_FALSE):
+                fields[field_id] = ftype == _T_TRUE
+            else:
+                fields[field_id] = self._read_value(ftype)
+            last_id = field_id
+
+    def _read_value(self, ftype: int):
+        if ftype in (_T_I16, _T_I32, _T_I64):
+            return self._zigzag()
+        if ftype == _T_BYTE:
+            return struct.unpack("b", bytes([self._byte()]))[0]
+        if ftype == _T_DOUBLE:
+            value = struct.unpack_from("<d", self.data, self.pos)[0]
+            self.pos += 8
+            return value
+        if ftype == _T_BINARY:
+            size = self._varint()
+            value = self.data[self.pos : self.pos + size]
+            self.pos += size
+            return value
+        if ftype in (_T_LIST, _T_SET):
+            header = self._byte()
+            size = header >> 4
+            if size == 15:
+                size = self._varint()
+            elem_type = header & 0x0F
+            if elem_type in (_T_TRUE, _T_FALSE):
+                return [self._byte() == _T_TRUE for _ in range(size)]
+            return [self._read_value(elem_type) for _ in range(size)]
+        if ftype == _T_MAP:
+            size = self._varint()
+            if not size:
+                return {}
+            types = self._byte()
+            return {
+                self._read_value(types >> 4): self._read_value(types & 0x0F) for _ in range(size)
+            }
+        if ftype == _T_STRUCT:
+            return self.read_struct()
+        raise ValueError(f"Unsupported thrift type {ftype}")
+
+
+def _encode_levels(levels: list[int]) -> bytes:
+    """RLE-encodes bit-width-1 definition levels, prefixed with their byte length."""
+    out = bytearray()
+    start = 0
+    while start < len(levels):
+        value = levels[start]
+        end = start
+        while end < len(levels) and levels[end] == value:
+            end += 1
+        out += _varint((end - start) << 1)
+        out.append(value)
+        start = end
+    return struct.pack("<I", len(out)) + bytes(out)
+
+
+def _decode_levels(data: bytes, pos: int, count: int) -> tuple[list[int], int]:
+    """Decodes length-prefixed bit-width-1 RLE/bit-packed levels; returns (levels, end)."""
+    (size,) = struct.unpack_from("<I", data, pos)
+    reader = _ThriftReader(data, pos + 4)
+    end = pos + 4 + size
+    levels: list[int] = []
+    while len(levels) < count and reader.pos < end:
+        header = reader._varint()
+        if header & 1:
+            groups = header >> 1
+            for byte in data[reader.pos : reader.pos + groups]:
+                levels.extend((byte >> bit) & 1 for bit in range(8))
+            reader.pos += groups
+        else:
+            levels.extend([reader._byte()] * (header >> 1))
+    return levels[:count], end
+
+
+def _encode_plain(kind: str, values: list) -> bytes:
+    if kind == INT64:
+        return struct.pack(f"<{len(values)}q", *values)
+    out = bytearray()
+    for value in values:
+        data = str(value).encode("utf-8")
+        out += struct.pack("<I", len(data))
+        out += data
+    return bytes(out)
+
+
+def _decode_plain(kind: str, data: bytes, pos: int, count: int) -> list:
+    if kind == INT64:
+        return list(struct.unpack_from(f"<{count}q", data, pos))
+    values = []
+    for _ in range(count):
+        (size,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        values.append(data[pos : pos + size].decode("utf-8"))
+        pos += size
+    return values
+
+
+class ParquetWriter:
+    """
+    Writes a flat ``schema`` of (name, INT64 | STRING) columns to ``handle``
+    one row group at a time, so memory is bounded by a single row group.
+    """
+
+    def __init__(self, handle: BinaryIO, schema: list[tuple[str, str]], *, level: int = 3):
+        self._handle = handle
+        self._schema = schema
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._row_groups: list[list[tuple[int, int, object]]] = []
+        self._num_rows = 0
+        handle.write(MAGIC)
+        self._offset = len(MAGIC)
+
+    def write_row_group(self, columns: dict[str, list]) -> None:
+        num_rows = len(columns[self._schema[0][0]])
+        if not num_rows:
+            return
+        chunks = []
+        total_size = 0
+        for name, kind in self._schema:
+            values = columns[name]
+            present = [value for value in values if value is not None]
+            body = _encode_levels([0 if value is None else 1 for value in values])
+            body += _encode_plain(kind, present)
+            compressed = self._compressor.compress(body)
+            statistics = None
+            if kind == INT64 and present:
+                statistics = [
+                    (3, _T_I64, num_rows - len(present)),
+                    (5, _T_BINARY, struct.pack("<q", max(present))),
+                    (6, _T_BINARY, struct.pack("<q", min(present))),
+                ]
+            header = _encode_struct(
+                [
+                    (1, _T_I32, _PAGE_DATA),
+                    (2, _T_I32, len(body)),
+                    (3, _T_I32, len(compressed)),
+                    (
+                        5,
+                        _T_STRUCT,
+                        [
+                            (1, _T_I32, num_rows),
+                            (2, _T_I32, _ENCODING_PLAIN),
+                            (3, _T_I32, _ENCODING_RLE),
+                            (4, _T_I32, _ENCODING_RLE),
+                        ],
+                    ),
+                ]
+            )
+            page_offset = self._offset
+            self._handle.write(header)
+            self._handle.write(compressed)
+            chunk_size = len(header) + len(compressed)
+            self._offset += chunk_size
+            total_size += len(header) + len(body)
+            chunks.append(
+                [
+                    (2, _T_I64, page_offset),
+                    (
+                        3,
+                        _T_STRUCT,
+                        [
+                            (1, _T_I32, _PHYSICAL_TYPES[kind]),
+                            (2, _T_LIST, (_T_I32, [_ENCODING_PLAIN, _ENCODING_RLE])),
+                            (3, _T_LIST, (_T_BINARY, [name])),
+                            (4, _T_I32, _CODEC_ZSTD),
+                            (5, _T_I64, num_rows),
+                            (6, _T_I64, len(header) + len(body)),
+                            (7, _T_I64, chunk_size),
+                            (9, _T_I64, page_offset),
+                            (12, _T_STRUCT, statistics),
+                        ],
+                    ),
+                ]
+            )
+        self._row_groups.append(
+            [
+                (1, _T_LIST, (_T_STRUCT, chunks)),
+                (2, _T_I64, total_size),
+                (3, _T_I64, num_rows),
+            ]
+        )
+        self._num_rows += num_rows
+
+    def close(self) -> None:
+        """Writes the footer. The handle itself is left open."""
+        schema = [[(4, _T_BINARY, "schema"), (5, _T_I32, len(self._schema))]]
+        for name, kind in self._schema:
+            schema.append(
+                [
+                    (1, _T_I32, _PHYSICAL_TYPES[kind]),
+                    (3, _T_I32, _REPETITION_OPTIONAL),
+                    (4, _T_BINARY, name),
+                    (6, _T_I32, _CONVERTED_UTF8 if kind == STRING else None),
+                ]
+            )
+        footer = _encode_struct(
+            [
+                (1, _T_I32, 1),
+                (2, _T_LIST, (_T_STRUCT, schema)),
+                (3, _T_I64, self._num_rows),
+                (4, _T_LIST, (_T_STRUCT, self._row_groups)),
+                (6, _T_BINARY, "droppr-media-server"),
+                # TypeDefinedOrder for every column, without which readers
+                # ignore the min_value/max_value statistics.
+                (7, _T_LIST, (_T_STRUCT, [[(1, _T_STRUCT, [])] for _ in self._schema])),
+            ]
+        )
+        self._handle.write(footer)
+        self._handle.write(struct.pack("<I", len(footer)))
+        self._handle.write(MAGIC)
+
+
+class ParquetFile:
+    """
+    Reads files written by ParquetWriter column by column: only the column
+    chunks asked for are read from disk, and row groups can be skipped on
+    their int64 min/max statistics before any data is read.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        with open(path, "rb") as handle:
+            handle.seek(-8, 2)
+            tail = handle.read(8)
+            if tail[4:] != MAGIC:
+                raise ValueError(f"Not a Parquet file: {path}")
+            (footer_size,) = struct.unpack("<I", tail[:4])
+            handle.seek(-8 - footer_size, 2)
+            metadata = _ThriftReader(handle.read(footer_size)).read_struct()
+
+        self.num_rows = int(metadata[3])  # type: ignore[call-overload]
+        self.schema: dict[str, str] = {}
+        for element in metadata[2][1:]:  # type: ignore[index]
+            kind = INT64 if element.get(1) == _TYPE_INT64 else STRING
+            self.schema[element[4].decode("utf-8")] = kind
+        self._row_groups: list[dict[str, dict]] = []
+        for row_group in metadata[4]:  # type: ignore[attr-defined]
+            columns = {}
+            for chunk in row_group[1]:
+                meta = chunk[3]
+                columns[b".".join(meta[3]).decode("utf-8")] = meta
+            self._row_groups.append(columns)
+
+    @property
+    def num_row_groups(self) -> int:
+        return len(self._row_groups)
+
+    def row_group_rows(self, index: int) -> int:
+        return int(next(iter(self._row_groups[index].values()))[5])
+
+    def statistics(self, index: int, column: str) -> tuple[int, int] | None:
+        """(min, max) of an int64 column in a row group, if recorded."""
+        stats = self._row_groups[index][column].get(12)
+        if not stats or 5 not in stats or 6 not in stats:
+            return None
+        return struct.unpack("<q", stats[6])[0], struct.unpack("<q", stats[5])[0]
+
+    def read_column(self, index: int, column: str) -> list:
+        """All values of ``column`` in row group ``index``, with None for nulls."""
+        meta = self._row_groups[index][column]
+        kind = self.schema[column]
+        with open(self._path, "rb") as handle:
+            handle.seek(int(meta[9]))
+            data = handle.read(int(meta[7]))
+
+        values: list = []
+        pos = 0
+        while len(values) < int(meta[5]):
+            reader = _ThriftReader(data, pos)
+            header = reader.read_struct()
+            pos = reader.pos + int(header[3])  # type: ignore[call-overload]
+            if header[1] != _PAGE_DATA:
+                raise ValueError(f"Unsupported Parquet page type {header[1]}")
+            page = data[reader.pos : pos]
+            if meta[4] == _CODEC_ZSTD:
+                page = zstandard.ZstdDecompressor().decompress(
+                    page, max_output_size=int(header[2])  # type: ignore[call-overload]
+                )
+            elif meta[4] != _CODEC_UNCOMPRESSED:
+                raise ValueError(f"Unsupported Parquet codec {meta[4]}")
+            count = int(header[5][1])  # type: ignore[index]
+            levels, offset = _decode_levels(page, 0, count)
+            present = iter(_decode_plain(kind, page, offset, sum(levels)))
+            values.extend(next(present) if level else None for level in levels)
+        return values
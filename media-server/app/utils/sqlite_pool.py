@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from typing import TypeVar
+
+from ..metrics import SQLITE_CONN_WAIT, SQLITE_LOCKED_RETRIES
+
+logger = logging.getLogger("droppr.sqlite")
+
+T = TypeVar("T")
+
+SQLITE_POOL_SIZE = int(os.environ.get("DROPPR_SQLITE_POOL_SIZE", "8"))
+SQLITE_STATEMENT_CACHE_SIZE = int(os.environ.get("DROPPR_SQLITE_STATEMENT_CACHE_SIZE", "256"))
+SQLITE_MMAP_SIZE_BYTES = int(
+    os.environ.get("DROPPR_SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024))
+)
+SQLITE_CACHE_SIZE_KIB = int(os.environ.get("DROPPR_SQLITE_CACHE_SIZE_KIB", "16384"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("DROPPR_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_LOCKED_RETRY_ATTEMPTS = int(os.environ.get("DROPPR_SQLITE_LOCKED_RETRY_ATTEMPTS", "10"))
+
+
+def _configure_sqlite_connection(conn) -> None:
+    """Applies the shared per-connection PRAGMAs; run once when a connection is opened."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL;")
+        cursor.execute("PRAGMA synchronous=NORMAL;")
+        cursor.execute("PRAGMA temp_store=MEMORY;")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)};")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE_BYTES)};")
+        cursor.execute(f"PRAGMA cache_size={-abs(int(SQLITE_CACHE_SIZE_KIB))};")
+        cursor.execute("PRAGMA foreign_keys=ON;")
+    finally:
+        cursor.close()
+
+
+def _is_locked_error(exc: BaseException) -> bool:
+    return "locked" in str(exc).lower()
+
+
+def _record_locked_retry(db: str) -> None:
+    if SQLITE_LOCKED_RETRIES is not None:
+        SQLITE_LOCKED_RETRIES.labels(db).inc()
+
+
+def _retry_locked(db: str, fn: Callable[[], T], *, attempts: int | None = None) -> T:
+    """
+    Runs ``fn``, retrying with a short backoff while SQLite reports the
+    database as locked (beyond ``busy_timeout``, e.g. during WAL recovery).
+    """
+    attempts = max(1, attempts or SQLITE_LOCKED_RETRY_ATTEMPTS)
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except sqlite3.OperationalError as exc:
+            if not _is_locked_error(exc) or attempt >= attempts - 1:
+                raise
+            _record_locked_retry(db)
+            time.sleep(0.05 * (attempt + 1))
+    raise AssertionError("unreachable")
+
+
+class SQLitePool:
+    """
+    A bounded pool of reusable autocommit connections to one SQLite file.
+    Connections are configured once when opened and keep their prepared
+    statement cache between checkouts. Callers past ``size`` wait for a
+    connection to be returned, up to ``timeout`` seconds.
+    """
+
+    def __init__(self, name: str, path: str, *, timeout: float, size: int = SQLITE_POOL_SIZE):
+        self.name = name
+        self.path = path
+        self.timeout = timeout
+        self.size = max(1, int(size))
+        self._cond = threading.Condition()
+        self._idle: list[sqlite3.Connection] = []
+        self._open = 0
+        self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+        )
+        try:
+            conn.row_factory = sqlite3.Row
+            _configure_sqlite_connection(conn)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._pid != os.getpid():
+                # Connections must not cross a fork; the child starts empty.
+                self._idle = []
+                self._open = 0
+                self._pid = os.getpid()
+            while not self._idle and self._open >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"{self.name} connection pool exhausted")
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._open += 1
+        if SQLITE_CONN_WAIT is not None:
+            SQLITE_CONN_WAIT.labels(self.name).observe(time.perf_counter() - started)
+        if conn is not None:
+            return conn
+        try:
+            return self._connect()
+        except Exception:
+            self._discard()
+            raise
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                conn.close()
+                self._discard()
+                return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self) -> None:
+        with self._cond:
+            self._open = max(0, self._open - 1)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+_pools_lock = threading.Lock()
+_pools: dict[tuple[str, str], SQLitePool] = {}
+
+
+def _sqlite_pool(name: str, path: str, *, timeout: float) -> SQLitePool:
+    """Returns the process-wide pool for ``path``; ``name`` labels its metrics."""
+    key = (name, path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = SQLitePool(name, path, timeout=timeout)
+                _pools[key] = pool
+    return pool
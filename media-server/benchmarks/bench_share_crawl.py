@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recursive share crawl against a fake FileBrowser.
+
+Starts a local HTTP server that mimics `GET /api/public/share/<hash>[/<path>]`
+over a synthetic folder tree, sleeping a fixed latency per request, then times
+`_build_folder_share_file_list` at several per-share concurrency levels.
+
+Usage (from media-server/):
+    python benchmarks/bench_share_crawl.py --depth 2 --fanout 17 --latency-ms 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+SHARE_HASH = "benchshare"
+
+
+def _make_handler(depth: int, fanout: int, files_per_dir: int, latency: float):
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class FakeFileBrowser(BaseHTTPRequestHandler):
+        def log_message(self, *_args):
+            pass
+
+        def do_GET(self):
+            prefix = f"/api/public/share/{SHARE_HASH}"
+            path = unquote(urlparse(self.path).path)
+            if not path.startswith(prefix):
+                self.send_error(404)
+                return
+            with lock:
+                counter["requests"] += 1
+            time.sleep(latency)
+
+            folder = path[len(prefix) :] or "/"
+            level = 0 if folder == "/" else folder.rstrip("/").count("/")
+            base = folder.rstrip("/")
+            items = [
+                {
+                    "isDir": False,
+                    "path": f"{base}/img_{i:04d}.jpg",
+                    "name": f"img_{i:04d}.jpg",
+                    "extension": ".jpg",
+                    "size": 1024 * (i + 1),
+                    "modified": 1700000000 + i,
+                }
+                for i in range(files_per_dir)
+            ]
+            if level < depth:
+                items.extend(
+                    {"isDir": True, "path": f"{base}/folder_{i:03d}", "name": f"folder_{i:03d}"}
+                    for i in range(fanout)
+                )
+
+            body = json.dumps({"path": folder, "items": items}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeFileBrowser, counter
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=17)
+    parser.add_argument("--files-per-dir", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    parser.add_argument("--deadline", type=float, default=300.0)
+    args = parser.parse_args()
+
+    handler, counter = _make_handler(
+        args.depth, args.fanout, args.files_per_dir, args.latency_ms / 1000.0
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Configure before importing the app so module-level settings pick it up.
+    base_dir = tempfile.mkdtemp(prefix="droppr-bench-")
+    os.environ["DROPPR_FILEBROWSER_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("DROPPR_SHARE_CRAWL_GLOBAL_CONCURRENCY", "64")
+    os.environ.setdefault("DROPPR_LOG_FORMAT", "plain")
+    os.environ.setdefault("DROPPR_VIDEO_META_LOCK_DIR", os.path.join(base_dir, "locks"))
+    os.environ.setdefault("DROPPR_VIDEO_META_DB_PATH", os.path.join(base_dir, "vm.sqlite3"))
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+    from app.services.filebrowser import _fetch_public_share_json  # noqa: PLC0415
+    from app.services.share import _build_folder_share_file_list  # noqa: PLC0415
+
+    folders = sum(args.fanout**level for level in range(1, args.depth + 1))
+    print(
+        f"tree: {folders} subfolders, {args.files_per_dir} files/folder, "
+        f"{args.latency_ms:.0f} ms latency per listing"
+    )
+    print(f"{'concurrency':>11} {'seconds':>9} {'requests':>9} {'files':>7} {'truncated':>9}")
+
+    for raw in args.concurrency.split(","):
+        concurrency = int(raw)
+        root = _fetch_public_share_json(SHARE_HASH)
+        counter["requests"] = 0
+        started = time.perf_counter()
+        files = _build_folder_share_file_list(
+            request_hash=SHARE_HASH,
+            source_hash=SHARE_HASH,
+            root=root or {},
+            recursive=True,
+            concurrency=concurrency,
+            deadline_seconds=args.deadline,
+        )
+        elapsed = time.perf_counter() - started
+        print(
+            f"{concurrency:>11} {elapsed:>9.3f} {counter['requests']:>9} "
+            f"{len(files):>7} {str(files.truncated):>9}"
+        )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
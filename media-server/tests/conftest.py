@@ -9,11 +9,16 @@ LOCK_DIR = os.path.join(BASE_DIR, "video-locks")
 os.environ["DROPPR_ANALYTICS_DB_PATH"] = os.path.join(BASE_DIR, "analytics.sqlite3")
 os.environ["DROPPR_ALIASES_DB_PATH"] = os.path.join(BASE_DIR, "aliases.sqlite3")
 os.environ["DROPPR_REQUESTS_DB_PATH"] = os.path.join(BASE_DIR, "requests.sqlite3")
+os.environ["DROPPR_SHARE_MANIFEST_DB_PATH"] = os.path.join(BASE_DIR, "share-manifest.sqlite3")
 os.environ["DROPPR_VIDEO_META_DB_PATH"] = os.path.join(BASE_DIR, "video-meta.sqlite3")
 os.environ["DROPPR_VIDEO_META_LOCK_DIR"] = LOCK_DIR
 os.environ["DROPPR_ANALYTICS_ENABLED"] = "true"
 os.environ["DROPPR_ANALYTICS_IP_MODE"] = "full"
 os.environ["DROPPR_SHARE_CACHE_WARM_ENABLED"] = "false"
+os.environ["DROPPR_SHARE_MANIFEST_ENABLED"] = "false"
+os.environ["DROPPR_MEDIA_LOCAL_SOURCE_ENABLED"] = "false"
+os.environ["DROPPR_DOWNLOAD_COUNT_FLUSH_SECONDS"] = "0"
+os.environ["DROPPR_ANALYTICS_FLUSH_INTERVAL_MS"] = "0"
 os.environ["DROPPR_REDIS_URL"] = ""
 os.environ["DROPPR_CAPTCHA_SITE_KEY"] = ""
 os.environ["DROPPR_CAPTCHA_SECRET_KEY"] = ""
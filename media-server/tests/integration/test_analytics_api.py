@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import gzip
 import sqlite3
 import time
 from unittest.mock import MagicMock, patch
@@ -7,9 +8,10 @@ from unittest.mock import MagicMock, patch
 import pytest
 from flask import Flask
 
+import app.services.analytics_parquet as analytics_parquet
 from app.routes.analytics import create_analytics_blueprint
-from app.models.analytics import DownloadEvent
 from app.services.analytics import _analytics_conn, _ensure_analytics_db
+from app.services.analytics_partitions import _insert_download_events, _list_partitions
 
 
 @pytest.fixture
@@ -34,14 +36,15 @@ def client(analytics_app):
 def seed_analytics_db(app_module):
     _ensure_analytics_db()
     with _analytics_conn() as conn:
-        conn.execute("DELETE FROM download_events")
+        for _, _, partition in _list_partitions(conn):
+            conn.execute(f"DELETE FROM {partition}")
         conn.execute("DELETE FROM auth_events")
         conn.execute("DELETE FROM audit_events")
 
         now = int(time.time())
 
-        conn.execute(
-            DownloadEvent.__table__.insert(),
+        _insert_download_events(
+            conn,
             [
                 {
                     "share_hash": "hash1",
@@ -71,6 +74,7 @@ def seed_analytics_db(app_module):
                     "created_at": now - 100,
                 },
             ],
+            100,
         )
 
         conn.execute(
@@ -126,6 +130,18 @@ def test_analytics_shares(mock_get_services, client, seed_analytics_db):
     assert s2["zip_downloads"] == 1
 
 
+@patch("app.routes.analytics.get_services")
+def test_analytics_shares_unique_ips_exact_flag(mock_get_services, client, seed_analytics_db):
+    mock_get_services.return_value.filebrowser.fetch_shares.return_value = []
+
+    approx = client.get("/api/analytics/shares").get_json()
+    exact = client.get("/api/analytics/shares?exact=1").get_json()
+
+    assert approx["approximate"] is True
+    assert exact["approximate"] is False
+    assert approx["totals"]["unique_ips"] == exact["totals"]["unique_ips"] == 2
+
+
 @patch("app.routes.analytics.get_services")
 def test_analytics_share_detail(mock_get_services, client, seed_analytics_db):
     mock_fb = MagicMock()
@@ -160,3 +176,71 @@ def test_analytics_export_csv(mock_get_services, client, seed_analytics_db):
     assert "event_type,file_path,ip" in csv
     assert "gallery_view,,1.2.3.4" in csv
     assert "file_download,/file1.jpg,1.2.3.4" in csv
+
+
+@patch("app.routes.analytics.get_services")
+def test_analytics_export_csv_options(mock_get_services, client, seed_analytics_db):
+    mock_get_services.return_value.filebrowser.fetch_shares.return_value = []
+    with _analytics_conn() as conn:
+        conn.execute("DELETE FROM download_events_archive")
+        conn.execute(
+            "INSERT INTO download_events_archive (share_hash, event_type, ip, created_at, archived_at)"
+            " VALUES ('hash1', 'zip_download', '9.9.9.9', 5, 10)"
+        )
+
+    resp = client.get("/api/analytics/shares/hash1/export.csv?fields=ip,event_type")
+    assert resp.get_data(as_text=True).splitlines()[0] == "ip,event_type"
+
+    resp = client.get(
+        "/api/analytics/shares/hash1/export.csv?source=all&fields=event_type,archived_at&gzip=1"
+    )
+    assert resp.status_code == 200
+    assert resp.content_type == "application/gzip"
+    assert "analytics.csv.gz" in resp.headers["Content-Disposition"]
+    lines = gzip.decompress(resp.get_data()).decode().splitlines()
+    assert lines[0] == "event_type,archived_at"
+    assert lines[-1] == "zip_download,10"
+    assert len(lines) == 4
+
+    assert client.get("/api/analytics/shares/hash1/export.csv?fields=password").status_code == 400
+    assert client.get("/api/analytics/shares/hash1/export.csv?source=x").status_code == 400
+
+    with _analytics_conn() as conn:
+        conn.execute("DELETE FROM download_events_archive")
+
+
+def test_analytics_archive_query(client, seed_analytics_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(analytics_parquet, "ANALYTICS_PARQUET_DIR", str(tmp_path))
+    with _analytics_conn() as conn:
+        conn.execute("DELETE FROM download_events_archive")
+        conn.execute(
+            "INSERT INTO download_events_archive (share_hash, event_type, ip, created_at, archived_at)"
+            " VALUES ('hash1', 'zip_download', '9.9.9.9', 5, 10),"
+            " ('hash1', 'file_download', '9.9.9.8', 6, 10),"
+            " ('hash2', 'zip_download', '9.9.9.9', 7, 10)"
+        )
+    path = analytics_parquet._write_archive_month("download", 0, 100)
+    analytics_parquet._delete_compacted_rows(path, 100)
+
+    resp = client.get(
+        "/api/analytics/archive/query?since=0&until=100&group_by=event_type&distinct=ip"
+        "&share_hash=hash1"
+    )
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["total"] == 2
+    assert {row["event_type"]: row["distinct_ip"] for row in data["rows"]} == {
+        "file_download": 1,
+        "zip_download": 1,
+    }
+    assert resp.headers["Cache-Control"] == "no-store"
+
+    assert client.get("/api/analytics/archive/query?kind=x").status_code == 400
+    assert client.get("/api/analytics/archive/query?group_by=password").status_code == 400
+    resp = client.get("/api/analytics/archive/query?limit=abc")
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "limit must be an integer"}
+    assert client.get("/api/analytics/archive/query?limit=0").status_code == 200
+
+    with _analytics_conn() as conn:
+        conn.execute("DELETE FROM analytics_parquet_files")
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from app.routes.droppr_cache import create_droppr_cache_blueprint
+
+
+@pytest.fixture
+def mock_admin():
+    return MagicMock(return_value=(None, {"token": "mock-token"}))
+
+
+@pytest.fixture
+def client(mock_admin):
+    app = Flask(__name__)
+    app.register_blueprint(create_droppr_cache_blueprint(mock_admin))
+    return app.test_client()
+
+
+def test_cache_stats_success(client):
+    stats = {"entries": 2, "bytes": 1024, "hits": 5, "misses": 1}
+    builds = {"in_flight": 1, "waiting": 3, "leaders": 4, "joined": 7}
+    warm = {"warmed": 3, "filebrowser_calls": 40, "duration_seconds": 8.5}
+    with (
+        patch("app.routes.droppr_cache._share_cache_stats", return_value=stats),
+        patch("app.routes.droppr_cache._share_build_stats", return_value=builds),
+        patch("app.routes.droppr_cache._share_warm_stats", return_value=warm),
+    ):
+        resp = client.get("/api/droppr/cache/stats")
+
+    assert resp.status_code == 200
+    assert resp.get_json() == {"share_files": stats, "share_builds": builds, "share_warm": warm}
+    assert resp.headers["Cache-Control"] == "no-store"
+
+
+def test_cache_stats_unauthorized(client, mock_admin):
+    mock_admin.return_value = (({"error": "Unauthorized"}, 401), None)
+    resp = client.get("/api/droppr/cache/stats")
+    assert resp.status_code == 401
@@ -18,13 +18,12 @@ def mock_deps():
         "default_cache_ttl_seconds": 60,
         "get_share_files": MagicMock(return_value=[{"name": "test.jpg", "path": "/test.jpg"}]),
         "log_event": MagicMock(),
-        "maybe_warm_share_cache": MagicMock(),
         "safe_rel_path": MagicMock(side_effect=lambda p: p),
         "rate_limit_downloads": "1000 per hour",
         "fetch_public_share_json": MagicMock(return_value={"items": []}),
         "filebrowser_public_dl_api": "http://mock-fb/api/public/dl",
-        "with_internal_signature": MagicMock(return_value={}),
-        "increment_share_alias_download_count": MagicMock(),
+        "filebrowser_get": MagicMock(),
+        "claim_share_alias_download": MagicMock(return_value=True),
         "get_share_alias_meta": MagicMock(return_value={"allow_download": True}),
     }
 
@@ -60,6 +59,79 @@ def test_list_share_files_success(client, mock_deps):
     mock_deps["log_event"].assert_called_with("gallery_view", "valid-hash")
 
 
+def test_list_share_files_paginates_sorted_and_filtered(client, mock_deps):
+    mock_deps["get_share_files"].return_value = [
+        {"name": "b.jpg", "path": "b.jpg", "type": "image", "extension": "jpg"},
+        {"name": "a.jpg", "path": "a.jpg", "type": "image", "extension": "jpg"},
+        {"name": "c.mp4", "path": "c.mp4", "type": "video", "extension": "mp4"},
+    ]
+
+    resp = client.get("/api/share/valid-hash/files?sort=name&type=image&limit=1")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [f["name"] for f in data["files"]] == ["a.jpg"]
+    assert data["meta"]["total"] == 2
+    cursor = data["meta"]["next_cursor"]
+    assert cursor
+
+    resp = client.get(f"/api/share/valid-hash/files?sort=name&type=image&limit=1&cursor={cursor}")
+    data = resp.get_json()
+    assert [f["name"] for f in data["files"]] == ["b.jpg"]
+    assert data["meta"]["next_cursor"] is None
+
+
+@pytest.mark.parametrize(
+    "query", ["limit=0", "limit=abc", "sort=colour", "sort=name&cursor=bogus"]
+)
+def test_list_share_files_rejects_bad_listing_params(client, query):
+    resp = client.get(f"/api/share/valid-hash/files?{query}")
+    assert resp.status_code == 400
+
+
+def test_list_share_files_streams_large_listings(client, mock_deps, monkeypatch):
+    import gzip
+
+    monkeypatch.setattr("app.routes.share.SHARE_LIST_STREAM_MIN_ITEMS", 2)
+    files = [{"name": f"{i}.jpg", "path": f"{i}.jpg"} for i in range(3)]
+    mock_deps["get_share_files"].return_value = files
+
+    resp = client.get("/api/share/valid-hash/files", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers["Content-Encoding"] == "gzip"
+    data = json.loads(gzip.decompress(resp.get_data()))
+    assert data["files"] == files
+    assert data["meta"]["total"] == 3
+
+    resp = client.get("/api/share/valid-hash/files")
+    assert "Content-Encoding" not in resp.headers
+    assert resp.get_json()["files"] == files
+
+
+def test_list_share_files_etag_and_304(client, mock_deps):
+    from app.services.share import ShareFileList
+
+    files = ShareFileList([{"name": "a.jpg", "path": "a.jpg"}])
+    files.etag = "content-v1"
+    mock_deps["get_share_files"].return_value = files
+
+    resp = client.get("/api/share/valid-hash/files?limit=10")
+    assert resp.status_code == 200
+    etag = resp.headers["ETag"]
+    assert "no-store" not in resp.headers["Cache-Control"]
+
+    resp = client.get("/api/share/valid-hash/files?limit=10", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+
+    # Different page parameters or new content are different representations.
+    resp = client.get("/api/share/valid-hash/files?limit=5", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    files.etag = "content-v2"
+    resp = client.get("/api/share/valid-hash/files?limit=10", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+
+
 def test_list_share_files_invalid_hash(client, mock_deps):
     mock_deps["is_valid_share_hash"].return_value = False
     resp = client.get("/api/share/invalid-hash/files")
@@ -86,3 +158,18 @@ def test_download_all_redirect(client, mock_deps):
     resp = client.get("/api/share/valid-hash/download")
     assert resp.status_code == 302
     assert resp.headers["Location"] == "/api/public/file/valid-hash"
+
+
+def test_download_all_streams_zip_through_filebrowser_transport(client, mock_deps):
+    mock_deps["fetch_public_share_json"].return_value = {"items": []}
+    upstream = MagicMock(status_code=200, headers={"Content-Type": "application/zip"})
+    upstream.iter_content.return_value = [b"PK", b"zip"]
+    mock_deps["filebrowser_get"].return_value = upstream
+
+    resp = client.get("/api/share/valid-hash/download")
+
+    assert resp.status_code == 200
+    assert resp.data == b"PKzip"
+    assert resp.headers["Content-Disposition"] == 'attachment; filename="share_valid-hash.zip"'
+    _url, kwargs = mock_deps["filebrowser_get"].call_args
+    assert kwargs["stream"] is True and kwargs["endpoint"] == "public_dl_zip"
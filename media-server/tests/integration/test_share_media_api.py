@@ -31,11 +31,11 @@ def mock_deps():
         "thumb_sema": MagicMock(),
         "thumb_ffmpeg_timeout_seconds": 30,
         "preview_mimetype": MagicMock(return_value="image/jpeg"),
-        "filebrowser_public_dl_api": "http://mock-fb/api/public/dl",
         "normalize_preview_format": MagicMock(side_effect=lambda f: f or "auto"),
         "ffprobe_video_meta": MagicMock(return_value={"duration": 100.0}),
         "thumb_multi_default": 3,
         "thumb_multi_max": 10,
+        "media_source": MagicMock(side_effect=lambda h, p: f"http://mock-fb/api/public/dl/{h}/{p}?inline=true"),
         "fetch_public_share_json": MagicMock(return_value={"name": "test.mp4", "size": 1000, "path": "/test.mp4"}),
         "parse_bool": MagicMock(side_effect=lambda v: str(v).lower() in ("true", "1", "yes") if v else False),
         "proxy_cache_key": MagicMock(return_value="proxy_key"),
@@ -138,3 +138,24 @@ def test_share_video_meta(client, mock_deps):
     assert data["status"] == "ready"
     assert data["recorded"] is True
     assert data["original"]["width"] == 1920
+
+
+def test_share_video_meta_revalidates_with_etag(client, mock_deps):
+    resp = client.get("/api/share/hash/video-meta/video.mp4")
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"].startswith("private, max-age=")
+
+    resp = client.get("/api/share/hash/video-meta/video.mp4", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.get_data() == b""
+
+
+def test_video_sources_revalidates_with_etag(client, mock_deps):
+    resp = client.get("/api/share/hash/video-sources/video.mp4")
+    assert resp.headers["Cache-Control"] == "private, max-age=0, must-revalidate"
+
+    resp = client.get(
+        "/api/share/hash/video-sources/video.mp4",
+        headers={"If-None-Match": resp.headers["ETag"]},
+    )
+    assert resp.status_code == 304
@@ -30,11 +30,11 @@ def mock_deps():
         "thumb_sema": MagicMock(),
         "thumb_ffmpeg_timeout_seconds": 30,
         "preview_mimetype": MagicMock(return_value="image/jpeg"),
-        "filebrowser_public_dl_api": "http://fb/api/public/dl",
         "normalize_preview_format": MagicMock(return_value="jpg"),
         "ffprobe_video_meta": MagicMock(return_value={"duration": 100}),
         "thumb_multi_default": 3,
         "thumb_multi_max": 10,
+        "media_source": MagicMock(side_effect=lambda h, p: f"http://fb/api/public/dl/{h}/{p}?inline=true"),
         "fetch_public_share_json": MagicMock(
             return_value={"name": "test.mp4", "size": 100, "items": None, "isDir": False}
         ),
@@ -314,3 +314,126 @@ def test_ensure_aliases_db_creates_directory():
             with patch("app.services.aliases._aliases_db_ready", False):
                 _ensure_aliases_db()
                 assert os.path.exists(os.path.dirname(db_path))
+
+
+def _terminal_hashes(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT from_hash, terminal_hash FROM share_aliases"))
+    finally:
+        conn.close()
+
+
+def test_terminal_hash_follows_chain_rewrites(temp_db):
+    """Test that the flattened terminal hash is kept up to date on upstream aliases"""
+    with patch("app.services.aliases.ALIASES_DB_PATH", temp_db):
+        _upsert_share_alias(from_hash="alias1", to_hash="alias2", path=None, target_expire=None)
+        _upsert_share_alias(from_hash="alias2", to_hash="target1", path=None, target_expire=None)
+        assert _terminal_hashes(temp_db) == {"alias1": "target1", "alias2": "target1"}
+
+        _upsert_share_alias(from_hash="alias2", to_hash="target2", path=None, target_expire=None)
+        assert _terminal_hashes(temp_db) == {"alias1": "target2", "alias2": "target2"}
+        assert _resolve_share_hash("alias1") == "target2"
+
+
+def test_init_backfills_terminal_hash_column(temp_db):
+    """Test that databases created before the terminal hash column are migrated"""
+    conn = sqlite3.connect(temp_db)
+    conn.execute("DROP TABLE share_aliases")
+    conn.execute(
+        "CREATE TABLE share_aliases (from_hash TEXT PRIMARY KEY, to_hash TEXT NOT NULL, path TEXT, "
+        "target_expire INTEGER, download_limit INTEGER, download_count INTEGER DEFAULT 0, "
+        "allow_download INTEGER DEFAULT 1, created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT INTO share_aliases VALUES ('alias1', 'alias2', NULL, NULL, NULL, 0, 1, 0, 0)")
+    conn.execute("INSERT INTO share_aliases VALUES ('alias2', 'target1', NULL, NULL, NULL, 0, 1, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    with patch("app.services.aliases.ALIASES_DB_PATH", temp_db):
+        _init_aliases_db()
+
+    assert _terminal_hashes(temp_db) == {"alias1": "target1", "alias2": "target1"}
+
+
+def test_resolution_is_cached_and_rechecked(temp_db):
+    """Test that cached resolutions skip the database but still honour limits and expiry"""
+    import app.services.aliases as aliases
+
+    with patch("app.services.aliases.ALIASES_DB_PATH", temp_db):
+        _upsert_share_alias(
+            from_hash="alias1",
+            to_hash="target1",
+            path=None,
+            target_expire=int(time.time()) + 10,
+            download_limit=1,
+        )
+        assert _resolve_share_hash("alias1") == "target1"
+
+        with patch.object(aliases, "_aliases_conn", side_effect=AssertionError("db hit")):
+            assert _resolve_share_hash("alias1") == "target1"
+            with patch.object(aliases.time, "time", return_value=time.time() + 20):
+                assert _resolve_share_hash("alias1") is None
+
+        _increment_share_alias_download_count("alias1")
+        assert _resolve_share_hash("alias1") is None
+
+
+def test_alias_invalidation_handler_evicts_chains(temp_db):
+    """Test that a remote alias invalidation drops resolutions passing through that hash"""
+    import app.services.aliases as aliases
+
+    with patch("app.services.aliases.ALIASES_DB_PATH", temp_db):
+        _upsert_share_alias(from_hash="alias1", to_hash="alias2", path=None, target_expire=None)
+        _upsert_share_alias(from_hash="alias2", to_hash="target1", path=None, target_expire=None)
+        _resolve_share_hash("alias1")
+        _resolve_share_hash("other1")
+
+        aliases._evict_local_alias_cache("alias2")
+        assert "alias1" not in aliases._alias_cache
+        assert "other1" in aliases._alias_cache
+
+        aliases._evict_local_alias_cache(None)
+        assert aliases._alias_cache == {}
+
+
+def test_multi_hop_resolution_reads_stored_terminal_hash(temp_db):
+    """Test that chains resolve from the stored terminal hash and still check every hop"""
+    import app.services.aliases as aliases
+
+    with patch("app.services.aliases.ALIASES_DB_PATH", temp_db):
+        _upsert_share_alias(from_hash="alias1", to_hash="alias2", path=None, target_expire=None)
+        _upsert_share_alias(from_hash="alias2", to_hash="alias3", path=None, target_expire=None)
+        _upsert_share_alias(from_hash="alias3", to_hash="target1", path=None, target_expire=None)
+
+        with patch.object(aliases, "_alias_chain", side_effect=AssertionError("walked")):
+            terminal, hops, chain = aliases._lookup_alias_resolution("alias1")
+            assert terminal == "target1"
+            assert [hop[0] for hop in hops] == ["alias1", "alias2", "alias3"]
+            assert chain == {"alias1", "alias2", "alias3", "target1"}
+
+        _upsert_share_alias(
+            from_hash="alias2",
+            to_hash="alias3",
+            path=None,
+            target_expire=int(time.time()) - 60,
+        )
+        with patch.object(aliases, "_alias_chain", side_effect=AssertionError("walked")):
+            assert _resolve_share_hash("alias1") is None
+
+
+def test_resolution_cache_evicts_least_recently_used(temp_db):
+    """Test that a full resolution cache drops its oldest entry rather than everything"""
+    import app.services.aliases as aliases
+
+    with (
+        patch("app.services.aliases.ALIASES_DB_PATH", temp_db),
+        patch.object(aliases, "ALIAS_CACHE_MAX_ITEMS", 2),
+    ):
+        aliases._evict_local_alias_cache(None)
+        _resolve_share_hash("share1")
+        _resolve_share_hash("share2")
+        _resolve_share_hash("share1")
+        _resolve_share_hash("share3")
+
+        assert list(aliases._alias_cache) == ["share1", "share3"]
@@ -0,0 +1,56 @@
+import csv
+import io
+
+import pytest
+
+import app.services.analytics as analytics_service
+import app.services.analytics_export as analytics_export
+from app.services.analytics_partitions import _insert_download_events, _list_partitions
+
+
+@pytest.fixture
+def many_events(app_module, monkeypatch):
+    monkeypatch.setattr(analytics_export, "ANALYTICS_EXPORT_BATCH_ROWS", 7)
+    monkeypatch.setattr(analytics_export, "_EXPORT_CHUNK_BYTES", 256)
+    analytics_service._ensure_analytics_db()
+    with analytics_service._analytics_conn() as conn:
+        _insert_download_events(
+            conn,
+            # Many rows share a timestamp so batches split inside a tie.
+            [
+                {
+                    "share_hash": "exportshare",
+                    "event_type": "file_download",
+                    "file_path": f"/f,{n}\n.txt",
+                    "created_at": 1000 + n // 5,
+                }
+                for n in range(50)
+            ],
+            100,
+        )
+    yield
+    with analytics_service._analytics_conn() as conn:
+        for _, _, partition in _list_partitions(conn):
+            conn.execute(f"DELETE FROM {partition} WHERE share_hash = 'exportshare'")
+
+
+def test_export_streams_every_row_in_small_chunks(many_events):
+    chunks = list(
+        analytics_export._stream_share_events_csv(
+            "exportshare", 0, 10_000, fields=("file_path", "created_at")
+        )
+    )
+    assert len(chunks) > 3
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+
+    assert rows[0] == ["file_path", "created_at"]
+    assert sorted(r[0] for r in rows[1:]) == sorted(f"/f,{n}\n.txt" for n in range(50))
+    created = [int(r[1]) for r in rows[1:]]
+    assert created == sorted(created, reverse=True)
+
+
+def test_parse_export_fields():
+    assert analytics_export._parse_export_fields(None) == analytics_export.DEFAULT_EXPORT_FIELDS
+    assert analytics_export._parse_export_fields("ip, id") == ("ip", "id")
+    with pytest.raises(ValueError):
+        analytics_export._parse_export_fields("ip,secret")
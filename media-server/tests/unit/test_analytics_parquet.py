@@ -0,0 +1,189 @@
+import csv
+import io
+from datetime import UTC, datetime
+
+import pytest
+
+import app.services.analytics as analytics_service
+import app.services.analytics_export as analytics_export
+import app.services.analytics_parquet as analytics_parquet
+import app.services.analytics_retention as analytics_retention
+
+NOW = 1_700_000_000
+
+
+def _ts(year, month, day=1, hour=0):
+    return int(datetime(year, month, day, hour, tzinfo=UTC).timestamp())
+
+
+# With 30 days of retention the cutoff is 2023-10-15: August and September
+# have closed and get compacted, October is still open.
+AUG = _ts(2023, 8, 10)
+SEP = _ts(2023, 9, 20)
+OCT = _ts(2023, 10, 5)
+
+
+@pytest.fixture
+def archived_events(app_module, monkeypatch, tmp_path):
+    for module in (analytics_parquet, analytics_retention):
+        monkeypatch.setattr(module, "ANALYTICS_PARQUET_DIR", str(tmp_path))
+    monkeypatch.setattr(analytics_parquet, "ANALYTICS_PARQUET_ROW_GROUP_ROWS", 5)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_DAYS", 30)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_BATCH_ROWS", 7)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_PAUSE_MS", 0)
+    analytics_service._ensure_analytics_db()
+    rows = (
+        [
+            (
+                "file_download" if n % 2 == 0 else "zip_download",
+                f"/a{n}.txt",
+                f"10.0.0.{n % 3}",
+                AUG + n * 3600,
+            )
+            for n in range(12)
+        ]
+        + [("file_download", f"/s{n}.txt", f"10.0.1.{n % 2}", SEP + n) for n in range(8)]
+        + [("file_download", f"/o{n}.txt", "10.0.2.1", OCT + n) for n in range(2)]
+    )
+    with analytics_service._analytics_conn() as conn:
+        _clear(conn)
+        conn.execute(
+            """
+            INSERT INTO download_events_archive
+                (share_hash, event_type, file_path, ip, created_at, archived_at)
+            VALUES ('pqshare', ?, ?, ?, ?, 1)
+            """,
+            rows,
+        )
+        conn.execute(
+            "INSERT INTO audit_events_archive (action, target, created_at, archived_at)"
+            " VALUES ('share_create', ?, ?, 1)",
+            [(f"t{n}", AUG + n) for n in range(3)],
+        )
+    yield
+    with analytics_service._analytics_conn() as conn:
+        _clear(conn)
+
+
+def _clear(conn):
+    for table in ("download_events_archive", "auth_events_archive", "audit_events_archive"):
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute("DELETE FROM analytics_parquet_files")
+
+
+def _archived_paths():
+    with analytics_service._analytics_conn() as conn:
+        return [
+            row["file_path"]
+            for row in conn.execute(
+                "SELECT file_path FROM download_events_archive"
+                " WHERE share_hash = 'pqshare' ORDER BY created_at"
+            ).fetchall()
+        ]
+
+
+def test_retention_compacts_closed_archive_months(archived_events, tmp_path):
+    run = analytics_retention._run_analytics_retention(now=NOW)
+
+    assert run.compacted == {"download_events_archive": 20, "audit_events_archive": 3}
+    assert sorted(run.parquet_files) == [
+        f"audit_events_archive/202308-{NOW}.parquet",
+        f"download_events_archive/202308-{NOW}.parquet",
+        f"download_events_archive/202309-{NOW}.parquet",
+    ]
+    assert _archived_paths() == ["/o0.txt", "/o1.txt"]
+    with analytics_service._analytics_conn() as conn:
+        pending = conn.execute("SELECT SUM(pending) AS n FROM analytics_parquet_files").fetchone()
+    assert pending["n"] == 0
+    assert (tmp_path / "download_events_archive" / f"202309-{NOW}.parquet").exists()
+
+
+def test_archive_queries_aggregate_columns(archived_events):
+    analytics_retention._run_analytics_retention(now=NOW)
+
+    result = analytics_parquet._query_archive(
+        "download",
+        0,
+        NOW,
+        filters={"share_hash": "pqshare"},
+        group_by=("event_type",),
+        distinct="ip",
+    )
+    assert result["total"] == 20
+    assert result["rows"] == [
+        {"event_type": "file_download", "count": 14, "distinct_ip": 5},
+        {"event_type": "zip_download", "count": 6, "distinct_ip": 3},
+    ]
+
+    by_month = analytics_parquet._query_archive("download", 0, NOW, group_by=("month",))
+    assert by_month["rows"] == [
+        {"month": _ts(2023, 8), "count": 12},
+        {"month": _ts(2023, 9), "count": 8},
+    ]
+
+    audit = analytics_parquet._query_archive("audit", 0, NOW, group_by=("action",))
+    assert audit["rows"] == [{"action": "share_create", "count": 3}]
+
+
+def test_archive_queries_skip_files_and_row_groups_outside_the_range(archived_events):
+    analytics_retention._run_analytics_retention(now=NOW)
+
+    result = analytics_parquet._query_archive("download", AUG, AUG + 4 * 3600)
+
+    assert result["total"] == 5
+    # The September file is pruned on the manifest; of August's three row
+    # groups of five rows, two are pruned on their created_at statistics.
+    assert result["scanned"] == {"files": 1, "row_groups": 1, "rows": 5}
+
+
+def test_interrupted_compaction_is_finished_without_duplicates(archived_events, tmp_path):
+    path = analytics_parquet._write_archive_month("download", _ts(2023, 8), NOW - 3600)
+    assert analytics_parquet._delete_compacted_rows(path, 5) == (5, False)
+    orphan = tmp_path / "download_events_archive" / "202309-1.parquet"
+    orphan.write_bytes(b"partial")
+
+    run = analytics_retention._run_analytics_retention(now=NOW)
+
+    assert run.compacted["download_events_archive"] == 15
+    assert not orphan.exists()
+    assert _archived_paths() == ["/o0.txt", "/o1.txt"]
+    result = analytics_parquet._query_archive("download", 0, NOW)
+    assert result["total"] == 20
+    assert result["scanned"]["files"] == 2
+
+
+def test_archive_export_reads_compacted_months(archived_events):
+    analytics_retention._run_analytics_retention(now=NOW)
+
+    body = b"".join(
+        analytics_export._stream_share_events_csv(
+            "pqshare", 0, NOW, fields=("file_path", "created_at"), source="archive"
+        )
+    )
+    rows = list(csv.reader(io.StringIO(body.decode())))[1:]
+
+    assert len(rows) == 22
+    assert [r[0] for r in rows[:3]] == ["/o1.txt", "/o0.txt", "/s7.txt"]
+    created = [int(r[1]) for r in rows]
+    assert created == sorted(created, reverse=True)
+
+
+def test_parse_archive_query():
+    args = {"group_by": "day, event_type", "distinct": "ip", "share_hash": "abc"}
+    assert analytics_parquet._parse_archive_query("download", args) == {
+        "filters": {"share_hash": "abc"},
+        "group_by": ("day", "event_type"),
+        "distinct": "ip",
+    }
+    assert analytics_parquet._parse_archive_query("auth", {"success": "1"})["filters"] == {
+        "success": 1
+    }
+    for bad in (
+        {"group_by": "secret"},
+        {"distinct": "id"},
+        {"group_by": "day,month,ip,event_type"},
+    ):
+        with pytest.raises(ValueError):
+            analytics_parquet._parse_archive_query("download", bad)
+    with pytest.raises(ValueError):
+        analytics_parquet._parse_archive_query("auth", {"success": "yes"})
@@ -0,0 +1,115 @@
+import sqlite3
+from datetime import UTC, datetime
+
+import pytest
+
+from app.services.analytics_partitions import (
+    OPEN_END,
+    _ensure_partition,
+    _fan_out,
+    _list_partitions,
+    _migrate_unpartitioned_events,
+    _month_start,
+    _next_month_start,
+    _partition_name,
+    _partitions_for_ranges,
+)
+
+
+def _ts(year, month, day=1, hour=0):
+    return int(datetime(year, month, day, hour, tzinfo=UTC).timestamp())
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def _insert(conn, share_hash, created_at):
+    partition = _ensure_partition(conn, created_at)
+    conn.execute(
+        f"INSERT INTO {partition} (share_hash, event_type, created_at) VALUES (?, 'gallery_view', ?)",
+        (share_hash, created_at),
+    )
+
+
+def test_month_boundaries_are_utc_calendar_months():
+    assert _month_start(_ts(2025, 12, 31, 23)) == _ts(2025, 12)
+    assert _next_month_start(_ts(2025, 12)) == _ts(2026, 1)
+    assert _next_month_start(_ts(2024, 2)) == _ts(2024, 3)
+    assert _partition_name(_ts(2026, 1, 1)) == "download_events_202601"
+    assert _partition_name(_ts(2026, 1, 1) - 1) == "download_events_202512"
+
+
+def test_range_queries_fan_out_to_overlapping_partitions_only(conn):
+    for month in (1, 2, 3):
+        _insert(conn, f"s{month}", _ts(2025, month, 10))
+    conn.execute("CREATE TABLE download_events_daily (share_hash TEXT)")
+
+    assert [name for _, _, name in _list_partitions(conn)] == [
+        "download_events_202501",
+        "download_events_202502",
+        "download_events_202503",
+    ]
+    assert _partitions_for_ranges(conn, [(_ts(2025, 2, 5), _ts(2025, 3, 1))]) == [
+        "download_events_202502"
+    ]
+    assert _partitions_for_ranges(conn, [(_ts(2025, 1, 5), _ts(2025, 1, 5))]) == []
+
+    sql, params = _fan_out(
+        conn,
+        [(_ts(2025, 1, 20), OPEN_END)],
+        lambda events: f"SELECT share_hash FROM {events} WHERE created_at >= ?",
+        (_ts(2025, 1, 20),),
+    )
+    assert "download_events_202501" in sql and len(params) == 3
+    assert sorted(row["share_hash"] for row in conn.execute(sql, params)) == ["s2", "s3"]
+
+    sql, params = _fan_out(
+        conn,
+        [(_ts(2024, 1, 1), _ts(2024, 2, 1))],
+        lambda events: f"SELECT share_hash FROM {events} WHERE created_at >= ?",
+        (0,),
+    )
+    assert conn.execute(sql, params).fetchall() == []
+
+
+def test_ids_keep_increasing_across_partitions(conn):
+    _insert(conn, "a", _ts(2025, 1, 10))
+    _insert(conn, "b", _ts(2025, 1, 11))
+    _insert(conn, "c", _ts(2025, 2, 10))
+
+    first = conn.execute("SELECT MAX(id) AS id FROM download_events_202501").fetchone()["id"]
+    second = conn.execute("SELECT id FROM download_events_202502").fetchone()["id"]
+    assert second > first
+
+
+def test_unpartitioned_events_are_migrated_with_their_ids(conn):
+    conn.execute(
+        "CREATE TABLE download_events (id INTEGER PRIMARY KEY, share_hash TEXT NOT NULL,"
+        " event_type TEXT NOT NULL, file_path TEXT, ip TEXT, user_agent TEXT, referer TEXT,"
+        " created_at INTEGER NOT NULL)"
+    )
+    rows = [(10, _ts(2025, 1, 31, 23)), (11, _ts(2025, 2, 1)), (12, _ts(2025, 4, 2))]
+    conn.executemany(
+        "INSERT INTO download_events (id, share_hash, event_type, created_at)"
+        " VALUES (?, 'h', 'gallery_view', ?)",
+        rows,
+    )
+
+    assert _migrate_unpartitioned_events(conn) == 3
+
+    tables = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert "download_events" not in tables
+    # March had no events, so it gets no partition.
+    assert [name for _, _, name in _list_partitions(conn)] == [
+        "download_events_202501",
+        "download_events_202502",
+        "download_events_202504",
+    ]
+    assert conn.execute("SELECT id FROM download_events_202502").fetchone()["id"] == 11
+    _insert(conn, "later", _ts(2025, 5, 1))
+    assert conn.execute("SELECT id FROM download_events_202505").fetchone()["id"] == 13
@@ -0,0 +1,133 @@
+import pytest
+
+import app.services.analytics as analytics_service
+import app.services.analytics_maintenance as analytics_maintenance
+import app.services.analytics_retention as analytics_retention
+from app.services.analytics_partitions import (
+    _insert_download_events,
+    _list_partitions,
+    _partition_name,
+)
+from app.services.analytics_rollups import DAY_SECONDS
+
+NOW = 1_700_000_000
+# With 30 days of retention, September 2023 is wholly expired and October
+# 2023 straddles the cutoff.
+OLD = NOW - 60 * DAY_SECONDS
+STRADDLING = NOW - 35 * DAY_SECONDS
+KEPT = NOW - 20 * DAY_SECONDS
+
+
+def _event(file_path, created_at):
+    return {
+        "share_hash": "retainshare",
+        "event_type": "file_download",
+        "file_path": file_path,
+        "created_at": created_at,
+    }
+
+
+@pytest.fixture
+def expired_events(app_module, monkeypatch):
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_DAYS", 30)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_BATCH_ROWS", 7)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_PAUSE_MS", 0)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_PARQUET_DIR", "")
+    analytics_service._ensure_analytics_db()
+    with analytics_service._analytics_conn() as conn:
+        _insert_download_events(
+            conn,
+            [_event(f"/f{n}.txt", OLD + n) for n in range(40)]
+            + [_event(f"/g{n}.txt", STRADDLING + n) for n in range(3)]
+            + [_event("/kept.txt", KEPT), _event("/fresh.txt", NOW - 10)],
+            100,
+        )
+        conn.execute(
+            "INSERT INTO audit_events (action, target, created_at) VALUES (?, ?, ?)",
+            [("share_create", f"t{n}", OLD + n) for n in range(3)],
+        )
+    yield
+    with analytics_service._analytics_conn() as conn:
+        for _, _, partition in _list_partitions(conn):
+            conn.execute(f"DELETE FROM {partition} WHERE share_hash = 'retainshare'")
+        conn.execute("DELETE FROM download_events_archive WHERE share_hash = 'retainshare'")
+        conn.execute("DELETE FROM analytics_archive_progress")
+        for table in ("audit_events", "audit_events_archive"):
+            conn.execute(f"DELETE FROM {table} WHERE action = 'share_create' AND target LIKE 't%'")
+
+
+def _retained_paths():
+    with analytics_service._analytics_conn() as conn:
+        partitions = [name for _, _, name in _list_partitions(conn)]
+        left = [
+            row["file_path"]
+            for name in partitions
+            for row in conn.execute(
+                f"SELECT file_path FROM {name} WHERE share_hash = 'retainshare'"
+            ).fetchall()
+        ]
+        archived = [
+            row["file_path"]
+            for row in conn.execute(
+                "SELECT file_path FROM download_events_archive"
+                " WHERE share_hash = 'retainshare' ORDER BY created_at"
+            ).fetchall()
+        ]
+    return partitions, left, archived
+
+
+def test_retention_drops_expired_partitions_and_trims_the_straddling_one(expired_events):
+    run = analytics_retention._run_analytics_retention(now=NOW)
+
+    assert run.moved["download_events"] == 43
+    assert run.moved["audit_events"] == 3
+    assert _partition_name(OLD) in run.dropped_partitions
+    assert _partition_name(STRADDLING) not in run.dropped_partitions
+    # 40 rows copied in batches of 7, one batch trimmed, one batch of audit rows.
+    assert run.batches >= 8
+    partitions, left, archived = _retained_paths()
+    assert _partition_name(OLD) not in partitions
+    assert sorted(left) == ["/fresh.txt", "/kept.txt"]
+    assert archived == [f"/f{n}.txt" for n in range(40)] + [f"/g{n}.txt" for n in range(3)]
+
+
+def test_interrupted_partition_copy_resumes_without_duplicates(expired_events):
+    copied, dropped = analytics_retention._copy_partition_batch(_partition_name(OLD), NOW)
+    assert (copied, dropped) == (7, False)
+
+    analytics_retention._run_analytics_retention(now=NOW)
+
+    _, _, archived = _retained_paths()
+    assert archived == [f"/f{n}.txt" for n in range(40)] + [f"/g{n}.txt" for n in range(3)]
+
+
+def _pragma(name):
+    with analytics_service._ANALYTICS_ENGINE.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_retention_only_vacuums_once_converted(expired_events, monkeypatch):
+    run = analytics_retention._run_analytics_retention(now=NOW)
+    # Scheduled runs never rewrite the database to change its mode.
+    assert _pragma("auto_vacuum") != 2
+    assert run.vacuumed_pages == 0
+
+    assert analytics_maintenance.main(["convert-auto-vacuum"]) == 0
+    assert _pragma("auto_vacuum") == 2
+
+    monkeypatch.setattr(analytics_retention, "_auto_vacuum_hint_logged", False)
+    analytics_retention._run_analytics_retention(now=NOW)
+    assert _pragma("freelist_count") == 0
+
+
+def test_retention_tick_skips_when_another_worker_holds_the_lock(expired_events, monkeypatch):
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_ENABLED", True)
+    monkeypatch.setattr(analytics_retention.fcntl, "flock", _busy_flock)
+
+    assert analytics_retention._analytics_retention_tick() is None
+    _, left, _ = _retained_paths()
+    assert len(left) == 45
+
+
+def _busy_flock(fd, operation):
+    raise BlockingIOError
@@ -0,0 +1,173 @@
+import random
+
+import pytest
+
+import app.services.analytics as analytics_service
+import app.services.analytics_retention as analytics_retention
+from app.services.analytics_maintenance import main as maintenance_main
+from app.services.analytics_partitions import _list_partitions
+from app.services.analytics_rollups import (
+    DAY_SECONDS,
+    ROLLUP_TABLES,
+    _check_download_rollups,
+    _estimate_unique_ips,
+    _ip_segments,
+    _rollup_segments,
+    _share_event_totals,
+    _share_ip_stats,
+    _share_unique_ips,
+    _total_unique_ips,
+)
+
+BASE = 1_600_000_000 - (1_600_000_000 % DAY_SECONDS)
+
+
+def _clear(conn):
+    for _, _, partition in _list_partitions(conn):
+        conn.execute(f"DROP TABLE {partition}")
+    for table in ROLLUP_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+
+
+@pytest.fixture
+def events(app_module):
+    analytics_service._ensure_analytics_db()
+    with analytics_service._analytics_conn() as conn:
+        _clear(conn)
+
+    rng = random.Random(7)
+    rows = [
+        {
+            "share_hash": rng.choice(["share1", "share2"]),
+            "event_type": rng.choice(["gallery_view", "file_download", "zip_download"]),
+            "file_path": None,
+            "ip": rng.choice(["1.1.1.1", "2.2.2.2", "3.3.3.3", None]),
+            "user_agent": None,
+            "referer": None,
+            "created_at": BASE + rng.randrange(3 * DAY_SECONDS),
+        }
+        for _ in range(400)
+    ]
+    # Written in several batches so rollup rows are updated, not just inserted.
+    for start in range(0, len(rows), 100):
+        analytics_service._write_analytics_events(
+            [("download", row) for row in rows[start : start + 100]]
+        )
+    yield rows
+    with analytics_service._analytics_conn() as conn:
+        _clear(conn)
+
+
+@pytest.mark.parametrize(
+    "since,until",
+    [
+        (BASE, BASE + 10),
+        (BASE + 100, BASE + 3 * 3600 + 5),
+        (BASE + 1800, BASE + 2 * DAY_SECONDS + 7200 + 1),
+        (BASE, BASE + 3 * DAY_SECONDS - 1),
+    ],
+)
+def test_segments_partition_the_range(since, until):
+    for segments in (_rollup_segments(since, until), _ip_segments(since, until)):
+        ranges = sorted(r for rs in segments.values() for r in rs if r[0] < r[1])
+        assert ranges[0][0] == since
+        assert ranges[-1][1] == until + 1
+        for (_, end), (start, _) in zip(ranges, ranges[1:], strict=False):
+            assert end == start
+
+
+@pytest.mark.parametrize(
+    "since,until",
+    [
+        (BASE + 123, BASE + 3 * DAY_SECONDS),
+        (BASE + 3600, BASE + DAY_SECONDS + 3599),
+        (BASE + 5000, BASE + 5100),
+        (BASE + DAY_SECONDS, BASE + 2 * DAY_SECONDS - 1),
+    ],
+)
+def test_rollup_queries_match_raw_events(events, since, until):
+    in_range = [e for e in events if since <= e["created_at"] <= until]
+    expected: dict[tuple[str, str], tuple[int, int]] = {}
+    for e in in_range:
+        count, last_seen = expected.get((e["share_hash"], e["event_type"]), (0, 0))
+        expected[(e["share_hash"], e["event_type"])] = (count + 1, max(last_seen, e["created_at"]))
+    downloads = [
+        e for e in in_range if e["ip"] and e["event_type"] in ("file_download", "zip_download")
+    ]
+
+    with analytics_service._analytics_conn() as conn:
+        totals = {
+            (row["share_hash"], row["event_type"]): (row["count"], row["last_seen"])
+            for row in _share_event_totals(conn, since, until)
+        }
+        unique_ips = _share_unique_ips(conn, since, until)
+        total_ips = _total_unique_ips(conn, since, until)
+        ip_stats = {row["ip"]: row for row in _share_ip_stats(conn, "share1", since, until)}
+
+    assert totals == expected
+    for share_hash in ("share1", "share2"):
+        ips = {e["ip"] for e in downloads if e["share_hash"] == share_hash}
+        assert unique_ips.get(share_hash, 0) == len(ips)
+    assert total_ips == len({e["ip"] for e in downloads})
+    estimated, estimated_total = _estimate_unique_ips_in(since, until)
+    assert estimated == {h: n for h, n in unique_ips.items() if n}
+    assert estimated_total == total_ips
+    for ip, row in ip_stats.items():
+        mine = [e for e in downloads if e["share_hash"] == "share1" and e["ip"] == ip]
+        assert row["file_downloads"] == sum(e["event_type"] == "file_download" for e in mine)
+        assert row["zip_downloads"] == sum(e["event_type"] == "zip_download" for e in mine)
+
+
+def _estimate_unique_ips_in(since, until):
+    with analytics_service._analytics_conn() as conn:
+        return _estimate_unique_ips(conn, since, until)
+
+
+def test_checker_reports_and_repairs_drift(events, capsys):
+    with analytics_service._analytics_conn() as conn:
+        assert _check_download_rollups(conn) == []
+        conn.execute(
+            "UPDATE download_events_daily SET count = count + 1 WHERE share_hash = 'share1'"
+        )
+        conn.execute("DELETE FROM download_ips_daily WHERE ip = '1.1.1.1'")
+        conn.execute("DELETE FROM download_ip_sketches WHERE share_hash = 'share2'")
+        mismatches = _check_download_rollups(conn)
+
+    assert {m["table"] for m in mismatches} == {
+        "download_events_daily",
+        "download_ips_daily",
+        "download_ip_sketches",
+    }
+    assert maintenance_main(["check-rollups"]) == 1
+    assert maintenance_main(["check-rollups", "--repair"]) == 0
+    assert maintenance_main(["check-rollups"]) == 0
+    assert "consistent" in capsys.readouterr().out
+
+
+def test_retention_expires_rollup_buckets(events, monkeypatch):
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_DAYS", 1)
+    monkeypatch.setattr(analytics_retention, "ANALYTICS_RETENTION_PAUSE_MS", 0)
+
+    analytics_retention._run_analytics_retention(now=BASE + 2 * DAY_SECONDS + 600)
+
+    with analytics_service._analytics_conn() as conn:
+        oldest = conn.execute("SELECT MIN(bucket) AS b FROM download_events_hourly").fetchone()["b"]
+        assert oldest >= BASE + DAY_SECONDS
+        assert _check_download_rollups(conn) == []
+        conn.execute("DELETE FROM download_events_archive")
+        conn.execute("DELETE FROM auth_events_archive")
+        conn.execute("DELETE FROM audit_events_archive")
+
+
+def test_missing_rollup_tables_are_backfilled_on_init(events, monkeypatch):
+    with analytics_service._analytics_conn() as conn:
+        for table in ROLLUP_TABLES:
+            conn.execute(f"DROP TABLE {table}")
+
+    monkeypatch.setattr(analytics_service, "_analytics_db_ready", False)
+    analytics_service._ensure_analytics_db()
+
+    with analytics_service._analytics_conn() as conn:
+        total = conn.execute("SELECT SUM(count) AS n FROM download_events_daily").fetchone()["n"]
+        assert total == len(events)
+        assert _check_download_rollups(conn) == []
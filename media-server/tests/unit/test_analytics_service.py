@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import json
+import os
 import time
 import pytest
 from unittest.mock import patch, MagicMock
@@ -72,10 +74,14 @@ def test_log_event(mock_conn_ctx, app_module):
     with app_module.app.test_request_context("/", headers={"User-Agent": "test-ua"}):
         analytics_service._log_event("gallery_view", "hash1")
         assert mock_conn.execute.called
-        # Check if it tried to insert into download_events
-        args, kwargs = mock_conn.execute.call_args
-        assert args[1]["share_hash"] == "hash1"
-        assert args[1]["event_type"] == "gallery_view"
+        # Check if it tried to insert into this month's download_events partition
+        args, kwargs = next(
+            c
+            for c in mock_conn.execute.call_args_list
+            if c.args[0].startswith("INSERT INTO download_events_")
+        )
+        assert args[1][0]["share_hash"] == "hash1"
+        assert args[1][0]["event_type"] == "gallery_view"
 
 @patch("app.services.analytics._analytics_conn")
 def test_log_auth_event(mock_conn_ctx, app_module):
@@ -86,6 +92,115 @@ def test_log_auth_event(mock_conn_ctx, app_module):
         analytics_service._log_auth_event("login", True, "success-detail")
         assert mock_conn.execute.called
         args, kwargs = mock_conn.execute.call_args
-        assert args[1]["event_type"] == "login"
-        assert args[1]["success"] == 1
-        assert args[1]["detail"] == "success-detail"
+        assert args[1][0]["event_type"] == "login"
+        assert args[1][0]["success"] == 1
+        assert args[1][0]["detail"] == "success-detail"
+
+
+@pytest.fixture
+def queued_analytics(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_service, "ANALYTICS_FLUSH_INTERVAL_MS", 60_000)
+    monkeypatch.setattr(analytics_service, "ANALYTICS_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setattr(analytics_service, "_ensure_analytics_writer", lambda: None)
+    monkeypatch.setattr(analytics_service, "_queue_pid", None)
+    written = []
+    monkeypatch.setattr(
+        analytics_service, "_write_analytics_events", lambda events: written.append(list(events))
+    )
+    yield written
+    with analytics_service._queue_cond:
+        analytics_service._queue.clear()
+        if analytics_service._spool_lock_file is not None:
+            analytics_service._spool_lock_file.close()
+        if analytics_service._spool_file is not None:
+            analytics_service._spool_file.close()
+    monkeypatch.setattr(analytics_service, "_spool_file", None)
+    monkeypatch.setattr(analytics_service, "_spool_lock_file", None)
+    monkeypatch.setattr(analytics_service, "_spool_paths", None)
+
+
+def test_events_are_queued_and_written_in_batches(queued_analytics, app_module):
+    with app_module.app.test_request_context("/api/x", headers={"User-Agent": "ua"}):
+        analytics_service._log_event("gallery_view", "hash1")
+        analytics_service._log_auth_event("login", False, "bad")
+    assert queued_analytics == []
+    assert len(analytics_service._read_spool(analytics_service._spool_paths[1])) == 2
+
+    assert analytics_service._flush_analytics_events() == 2
+    kinds = [kind for kind, _ in queued_analytics[0]]
+    assert kinds == ["download", "auth"]
+    assert analytics_service._read_spool(analytics_service._spool_paths[1]) == []
+    assert not os.path.exists(analytics_service._spool_paths[2])
+
+
+def test_full_queue_drops_new_events(queued_analytics, monkeypatch):
+    monkeypatch.setattr(analytics_service, "ANALYTICS_QUEUE_MAX_EVENTS", 2)
+    dropped = []
+    monkeypatch.setattr(
+        analytics_service,
+        "_record_dropped_event",
+        lambda kind, reason, count=1: dropped.append((kind, reason)),
+    )
+    for n in range(3):
+        analytics_service._enqueue_analytics_event("audit", {"action": f"a{n}"})
+
+    assert [row["action"] for _, row in analytics_service._queue] == ["a0", "a1"]
+    assert dropped == [("audit", "queue_full")]
+
+
+def test_failed_flush_requeues_ahead_of_new_events(queued_analytics, monkeypatch):
+    analytics_service._enqueue_analytics_event("audit", {"action": "first"})
+
+    def broken(events):
+        analytics_service._enqueue_analytics_event("audit", {"action": "second"})
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(analytics_service, "_write_analytics_events", broken)
+    with pytest.raises(RuntimeError):
+        analytics_service._flush_analytics_events()
+
+    actions = [row["action"] for _, row in analytics_service._queue]
+    assert actions == ["first", "second"]
+    spooled = analytics_service._read_spool(analytics_service._spool_paths[1])
+    assert [row["action"] for _, row in spooled] == ["first", "second"]
+
+
+def test_orphaned_spools_are_recovered(queued_analytics, tmp_path):
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    (spool_dir / "deadhost-1.lock").write_text("")
+    (spool_dir / "deadhost-1.inflight.jsonl").write_text(
+        json.dumps({"kind": "audit", "row": {"action": "inflight"}}) + "\n"
+    )
+    (spool_dir / "deadhost-1.jsonl").write_text(
+        json.dumps({"kind": "audit", "row": {"action": "queued"}}) + "\n" + '{"kind": "au'
+    )
+
+    analytics_service._enqueue_analytics_event("audit", {"action": "new"})
+
+    actions = [row["action"] for _, row in analytics_service._queue]
+    assert actions == ["inflight", "queued", "new"]
+    assert not (spool_dir / "deadhost-1.jsonl").exists()
+    assert not (spool_dir / "deadhost-1.lock").exists()
+
+
+def test_write_analytics_events_bulk_inserts(app_module):
+    analytics_service._ensure_analytics_db()
+    rows = [
+        {
+            "action": "bulk",
+            "target": f"t{n}",
+            "detail": None,
+            "ip": None,
+            "user_agent": None,
+            "created_at": 1000 + n,
+        }
+        for n in range(3)
+    ]
+    analytics_service._write_analytics_events([("audit", row) for row in rows])
+
+    with analytics_service._analytics_conn() as conn:
+        count = conn.execute(
+            "SELECT COUNT(*) AS c FROM audit_events WHERE action = 'bulk'"
+        ).fetchone()["c"]
+    assert count == 3
@@ -116,4 +116,250 @@ def test_redis_share_cache_delete():
     
     with patch("app.services.cache._get_redis_client", return_value=mock_client):
         cache._redis_share_cache_delete("req")
-        mock_client.delete.assert_called_once()
\ No newline at end of file
+        mock_client.delete.assert_called_once()
+
+def test_get_share_files_coalesces_concurrent_misses(app_module, monkeypatch):
+    import threading
+
+    root = {"items": [{"isDir": False, "path": "/a.jpg", "name": "a.jpg", "extension": ".jpg"}]}
+    calls = {"count": 0}
+    gate = threading.Event()
+
+    def slow_fetch(share_hash, subpath=None):
+        calls["count"] += 1
+        gate.wait(2)
+        return root
+
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", slow_fetch)
+    app_module._share_files_cache.clear()
+
+    results = []
+
+    def worker():
+        results.append(
+            app_module._get_share_files(
+                "coalesce",
+                source_hash="src",
+                force_refresh=False,
+                max_age_seconds=60,
+                recursive=False,
+            )
+        )
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while app_module._share_build_flight.stats()["waiting"] < 7:
+        time.sleep(0.01)
+    gate.set()
+    for t in threads:
+        t.join(2)
+
+    assert calls["count"] == 1
+    assert len(results) == 8
+    assert all(r == results[0] for r in results)
+
+
+def test_get_share_files_waits_for_other_worker_lease(app_module, monkeypatch):
+    files = [{"name": "a.jpg", "path": "a.jpg"}]
+    fetch = MagicMock()
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", fetch)
+    monkeypatch.setattr(app_module, "_redis_lease_acquire", MagicMock(return_value=None))
+    monkeypatch.setattr(app_module, "_redis_lease_held", MagicMock(return_value=True))
+    redis_get = MagicMock(side_effect=[None, None, files])
+    monkeypatch.setattr(app_module, "_redis_share_cache_get", redis_get)
+    app_module._share_files_cache.clear()
+
+    result = app_module._get_share_files(
+        "leased", source_hash="src", force_refresh=False, max_age_seconds=60, recursive=True
+    )
+
+    assert result == files
+    fetch.assert_not_called()
+
+
+def test_get_share_files_builds_when_lease_holder_disappears(app_module, monkeypatch):
+    root = {"items": [{"isDir": False, "path": "/a.jpg", "name": "a.jpg"}]}
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", MagicMock(return_value=root))
+    monkeypatch.setattr(app_module, "_redis_lease_acquire", MagicMock(side_effect=[None, "tok"]))
+    monkeypatch.setattr(app_module, "_redis_lease_held", MagicMock(return_value=False))
+    release = MagicMock()
+    monkeypatch.setattr(app_module, "_redis_lease_release", release)
+    app_module._share_files_cache.clear()
+
+    result = app_module._get_share_files(
+        "orphaned", source_hash="src", force_refresh=False, max_age_seconds=60, recursive=True
+    )
+
+    assert [f["name"] for f in result] == ["a.jpg"]
+    release.assert_called_once_with("share-build:orphaned:src:1", "tok")
+
+
+def test_redis_lease_acquire_and_release():
+    import app.services.cache as cache
+
+    mock_client = MagicMock()
+    mock_client.set.return_value = True
+    with patch("app.services.cache._get_redis_client", return_value=mock_client):
+        token = cache._redis_lease_acquire("job", 5)
+        assert token
+        assert mock_client.set.call_args.kwargs["nx"] is True
+        cache._redis_lease_release("job", token)
+        mock_client.eval.assert_called_once()
+
+    mock_client.set.return_value = None
+    with patch("app.services.cache._get_redis_client", return_value=mock_client):
+        assert cache._redis_lease_acquire("job", 5) is None
+
+
+def test_redis_lease_without_redis_is_local():
+    import app.services.cache as cache
+
+    with patch("app.services.cache._get_redis_client", return_value=None):
+        assert cache._redis_lease_acquire("job", 5) == ""
+        assert cache._redis_lease_held("job") is False
+        cache._redis_lease_release("job", "")
+
+
+def test_redis_share_cache_get_stale_within_window():
+    import app.services.cache as cache
+
+    mock_client = MagicMock()
+    now = time.time()
+    payload = {
+        "source_hash": "src",
+        "recursive": True,
+        "created_at": now - 100,
+        "expires_at": now - 40,
+        "files": [{"name": "f1"}],
+    }
+    mock_client.get.return_value = json.dumps(payload)
+    with patch("app.services.cache._get_redis_client", return_value=mock_client):
+        assert cache._redis_share_cache_get(
+            "h", source_hash="src", recursive=True, max_age_seconds=3600
+        ) is None
+        stale = cache._redis_share_cache_get(
+            "h", source_hash="src", recursive=True, max_age_seconds=3600, stale_seconds=60
+        )
+        assert stale == [{"name": "f1"}]
+        assert stale.stale is True
+        assert 39 <= stale.stale_age <= 45
+        assert cache._redis_share_cache_get(
+            "h", source_hash="src", recursive=True, max_age_seconds=3600, stale_seconds=30
+        ) is None
+
+
+def test_get_share_files_serves_stale_and_refreshes_in_background(app_module, monkeypatch):
+    files = [{"name": "old.jpg"}]
+    app_module._share_files_cache.clear()
+    app_module._share_files_cache.set(
+        "swr",
+        source_hash="src",
+        recursive=True,
+        files=files,
+        ttl_seconds=10,
+        stale_seconds=app_module.SHARE_CACHE_RETAIN_STALE_SECONDS,
+        now=time.time() - 20,
+    )
+    fetch = MagicMock()
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", fetch)
+    enqueue = MagicMock(return_value=True)
+    monkeypatch.setattr(app_module, "_enqueue_task", enqueue)
+
+    result = app_module._get_share_files(
+        "swr", source_hash="src", force_refresh=False, max_age_seconds=3600, recursive=True
+    )
+
+    assert result == files
+    assert result.stale is True
+    fetch.assert_not_called()
+    enqueue.assert_called_once()
+    assert enqueue.call_args.args[1] == "droppr.share_refresh"
+    assert enqueue.call_args.args[2] is app_module._refresh_share_files
+
+
+def test_get_share_files_serves_stale_on_upstream_error(app_module, monkeypatch):
+    files = [{"name": "old.jpg"}]
+    app_module._share_files_cache.clear()
+    # Past the revalidate window but inside stale-if-error.
+    app_module._share_files_cache.set(
+        "sie",
+        source_hash="src",
+        recursive=True,
+        files=files,
+        ttl_seconds=10,
+        stale_seconds=app_module.SHARE_CACHE_RETAIN_STALE_SECONDS,
+        now=time.time() - app_module.SHARE_CACHE_STALE_SECONDS - 20,
+    )
+    monkeypatch.setattr(
+        app_module, "_fetch_public_share_json", MagicMock(side_effect=TimeoutError("slow"))
+    )
+    enqueue = MagicMock()
+    monkeypatch.setattr(app_module, "_enqueue_task", enqueue)
+
+    result = app_module._get_share_files(
+        "sie", source_hash="src", force_refresh=False, max_age_seconds=3600, recursive=True
+    )
+
+    assert result == files
+    assert result.stale is True
+    enqueue.assert_not_called()
+
+
+def test_get_share_files_raises_without_stale_copy(app_module, monkeypatch):
+    app_module._share_files_cache.clear()
+    monkeypatch.setattr(
+        app_module, "_fetch_public_share_json", MagicMock(side_effect=TimeoutError("slow"))
+    )
+    with pytest.raises(TimeoutError):
+        app_module._get_share_files(
+            "nothing", source_hash="src", force_refresh=False, max_age_seconds=60, recursive=True
+        )
+
+
+def test_refresh_share_files_drops_cache_when_share_is_gone(app_module, monkeypatch):
+    app_module._share_files_cache.clear()
+    app_module._share_files_cache.set(
+        "gone", source_hash="src", recursive=True, files=[{"name": "a"}], ttl_seconds=60
+    )
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", MagicMock(return_value=None))
+
+    app_module._refresh_share_files("gone", "src", 60, True)
+
+    assert "gone" not in app_module._share_files_cache
+
+
+def test_redis_share_index_round_trip_and_expiry():
+    import app.services.cache as cache
+
+    mock_client = MagicMock()
+    dirs = {"/a": ["t1", [{"path": "/a/f.jpg"}], []]}
+    with patch("app.services.cache._get_redis_client", return_value=mock_client):
+        cache._redis_share_index_set("src", dirs=dirs, crawled_at=time.time(), max_age_seconds=600)
+        key, ttl, raw = mock_client.setex.call_args.args
+        assert key.endswith("src")
+        assert 590 <= ttl <= 600
+
+        mock_client.get.return_value = raw
+        assert cache._redis_share_index_get("src", max_age_seconds=600)["dirs"] == dirs
+        assert cache._redis_share_index_get("src", max_age_seconds=-1) is None
+
+
+def test_build_share_files_uses_and_saves_share_index(app_module, monkeypatch):
+    root = {"items": [{"isDir": True, "path": "/a", "modified": "t1"}]}
+    index = {"crawled_at": 123.0, "dirs": {"/a": ["t1", [{"path": "/a/f.jpg", "name": "f.jpg"}], []]}}
+    fetch = MagicMock(return_value=root)
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", fetch)
+    monkeypatch.setattr(app_module, "_redis_share_index_get", MagicMock(return_value=index))
+    saved = MagicMock()
+    monkeypatch.setattr(app_module, "_redis_share_index_set", saved)
+    app_module._share_files_cache.clear()
+
+    files = app_module._build_share_files(
+        "idx", source_hash="src", max_age_seconds=60, recursive=True
+    )
+
+    assert [f["path"] for f in files] == ["a/f.jpg"]
+    fetch.assert_called_once_with("src")
+    assert saved.call_args.kwargs["crawled_at"] == 123.0
+    assert set(saved.call_args.kwargs["dirs"]) == {"/a"}
@@ -16,7 +16,7 @@ def test_analytics_db_bootstrap(app_module):
     analytics_service._ensure_analytics_db()
     conn = sqlite3.connect(ANALYTICS_DB_PATH)
     try:
-        assert _table_exists(conn, "download_events")
+        assert _table_exists(conn, "download_events_archive")
         assert _table_exists(conn, "auth_events")
     finally:
         conn.close()
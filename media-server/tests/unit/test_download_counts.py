@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+import app.services.download_counts as download_counts
+from app.services.aliases import _get_share_alias_meta, _resolve_share_hash, _upsert_share_alias
+
+
+@pytest.fixture
+def aliases_db(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.aliases.ALIASES_DB_PATH", str(tmp_path / "aliases.sqlite3"))
+    monkeypatch.setattr("app.services.aliases._aliases_db_ready", False)
+    monkeypatch.setattr(download_counts, "_ensure_download_count_flusher", lambda: False)
+    download_counts._pending.clear()
+    yield
+    download_counts._pending.clear()
+
+
+def _count(share_hash):
+    return _get_share_alias_meta(share_hash)["download_count"]
+
+
+def test_limited_alias_without_redis_is_enforced_exactly(aliases_db, monkeypatch):
+    monkeypatch.setattr(download_counts, "DOWNLOAD_COUNT_FLUSH_SECONDS", 10)
+    _upsert_share_alias(
+        from_hash="limited1", to_hash="target1", path=None, target_expire=None, download_limit=5
+    )
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(download_counts._claim_share_alias_download("limited1"))
+        )
+        for _ in range(12)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 5
+    assert _count("limited1") == 5
+    assert _resolve_share_hash("limited1") is None
+
+
+def test_unlimited_alias_counts_are_written_behind(aliases_db, monkeypatch):
+    monkeypatch.setattr(download_counts, "DOWNLOAD_COUNT_FLUSH_SECONDS", 10)
+    _upsert_share_alias(from_hash="open1", to_hash="target1", path=None, target_expire=None)
+
+    for _ in range(3):
+        assert download_counts._claim_share_alias_download("open1")
+    assert _count("open1") == 0
+
+    assert download_counts._flush_download_counts() == 3
+    assert _count("open1") == 3
+    assert download_counts._flush_download_counts() == 0
+
+
+def test_shares_without_alias_are_not_counted(aliases_db):
+    assert download_counts._claim_share_alias_download("plainshare1")
+    assert download_counts._pending == {}
+
+
+def test_redis_claims_pass_limit_and_seed(aliases_db, monkeypatch):
+    monkeypatch.setattr(download_counts, "DOWNLOAD_COUNT_FLUSH_SECONDS", 10)
+    _upsert_share_alias(
+        from_hash="limited1", to_hash="target1", path=None, target_expire=None, download_limit=2
+    )
+    seen = []
+
+    def fake_claim(share_hash, *, db_count, limit):
+        seen.append((share_hash, db_count, limit))
+        return -1 if len(seen) > 2 else len(seen)
+
+    monkeypatch.setattr(download_counts, "_redis_download_claim", fake_claim)
+
+    assert download_counts._claim_share_alias_download("limited1")
+    assert download_counts._claim_share_alias_download("limited1")
+    assert not download_counts._claim_share_alias_download("limited1")
+    assert seen[0] == ("limited1", 0, 2)
+    assert _count("limited1") == 0
+
+
+def test_failed_flush_requeues_counts(aliases_db, monkeypatch):
+    download_counts._pending["open1"] = 2
+    monkeypatch.setattr(download_counts, "_redis_download_pending_take", lambda: {"open1": 1})
+    requeued = []
+    monkeypatch.setattr(
+        download_counts,
+        "_redis_download_pending_add",
+        lambda counts: requeued.append(counts) or True,
+    )
+
+    def broken(counts):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(download_counts, "_add_share_alias_download_counts", broken)
+
+    assert download_counts._flush_download_counts() == 0
+    assert requeued == [{"open1": 1}]
+    assert download_counts._pending == {"open1": 2}
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+import requests_mock
+
+from app.services.filebrowser import FileBrowserClient, _filebrowser_transport
+from app.services.http_transport import CircuitBreaker, HTTPTransport, UpstreamUnavailableError
+
+
+def _transport(breaker=None):
+    return HTTPTransport(
+        "test",
+        pool_maxsize=8,
+        connect_timeout=1.5,
+        read_timeout=7,
+        retries=2,
+        backoff_seconds=0.1,
+        breaker=breaker,
+    )
+
+
+def test_transport_configures_pool_retries_and_timeouts():
+    transport = _transport()
+    adapter = transport.session.get_adapter("http://upstream")
+    assert adapter._pool_maxsize == 8
+    assert adapter.max_retries.total == 2
+    assert adapter.max_retries.backoff_jitter == 0.1
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert 503 in adapter.max_retries.status_forcelist
+
+    with requests_mock.Mocker() as m:
+        m.get("http://upstream/a", text="ok")
+        transport.get("http://upstream/a", endpoint="a")
+        transport.get("http://upstream/a", endpoint="a", read_timeout=120)
+    assert m.request_history[0].timeout == (1.5, 7)
+    assert m.request_history[1].timeout == (1.5, 120)
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    transport = _transport(breaker)
+
+    with requests_mock.Mocker() as m:
+        m.get("http://upstream/a", exc=requests.exceptions.ConnectTimeout)
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.ConnectTimeout):
+                transport.get("http://upstream/a", endpoint="a")
+        assert breaker.state == "open"
+
+        with pytest.raises(UpstreamUnavailableError):
+            transport.get("http://upstream/a", endpoint="a")
+        assert m.call_count == 2
+
+
+def test_breaker_counts_5xx_but_not_4xx():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60)
+    transport = _transport(breaker)
+
+    with requests_mock.Mocker() as m:
+        m.get("http://upstream/missing", status_code=404)
+        m.get("http://upstream/broken", status_code=500)
+        transport.get("http://upstream/broken", endpoint="a")
+        transport.get("http://upstream/missing", endpoint="a")
+        transport.get("http://upstream/broken", endpoint="a")
+        assert breaker.state == "closed"
+        transport.get("http://upstream/broken", endpoint="a")
+        assert breaker.state == "open"
+
+
+def test_breaker_half_open_allows_one_trial(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr("app.services.http_transport.time.monotonic", lambda: clock["now"])
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock["now"] += 31
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock["now"] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_breaker_recovers_after_non_timeout_error_in_half_open_trial(monkeypatch):
+    clock = {"now": 100.0}
+    monkeypatch.setattr("app.services.http_transport.time.monotonic", lambda: clock["now"])
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    transport = _transport(breaker)
+    breaker.record_failure()
+    clock["now"] += 31
+
+    with requests_mock.Mocker() as m:
+        m.get("http://upstream/a", exc=requests.exceptions.ChunkedEncodingError)
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            transport.get("http://upstream/a", endpoint="a")
+        assert breaker.state == "open"
+
+        clock["now"] += 31
+        m.get("http://upstream/a", text="ok")
+        assert transport.get("http://upstream/a", endpoint="a").text == "ok"
+    assert breaker.state == "closed"
+
+
+def test_filebrowser_clients_share_one_transport():
+    assert FileBrowserClient()._transport is FileBrowserClient()._transport
+    assert _filebrowser_transport(MagicMock()) is not _filebrowser_transport()
+
+
+def test_filebrowser_signed_get_signs_and_streams():
+    signer = MagicMock(side_effect=lambda headers, method, url: {**headers, "X-Sig": method})
+    client = FileBrowserClient(base_url="http://test", signer=signer, transport=_transport())
+
+    with requests_mock.Mocker() as m:
+        m.get("http://test/api/users", json=[])
+        resp = client.signed_get(
+            "http://test/api/users", endpoint="users", headers={"X-Auth": "tok"}
+        )
+
+    assert resp.status_code == 200
+    sent = m.request_history[0].headers
+    assert sent["X-Auth"] == "tok" and sent["X-Sig"] == "GET"
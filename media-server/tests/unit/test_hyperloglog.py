@@ -0,0 +1,55 @@
+import zlib
+
+import pytest
+
+from app.utils.hyperloglog import HyperLogLog
+
+
+def test_small_sets_are_counted_almost_exactly():
+    sketch = HyperLogLog()
+    assert sketch.estimate() == 0
+    for n in range(50):
+        sketch.add(f"10.0.0.{n}")
+        sketch.add(f"10.0.0.{n}")
+    assert sketch.estimate() == 50
+
+
+def test_large_sets_are_within_error_bounds():
+    sketch = HyperLogLog()
+    for n in range(50_000):
+        sketch.add(f"ip-{n}")
+    assert abs(sketch.estimate() - 50_000) / 50_000 < 0.05
+
+
+def test_merge_estimates_the_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    for n in range(3000):
+        left.add(f"ip-{n}")
+    for n in range(2000, 6000):
+        right.add(f"ip-{n}")
+
+    left.merge(right)
+    assert abs(left.estimate() - 6000) / 6000 < 0.05
+
+
+@pytest.mark.parametrize("count", [3, 5000])
+def test_serialization_round_trips(count):
+    sketch = HyperLogLog()
+    for n in range(count):
+        sketch.add(f"ip-{n}")
+
+    blob = sketch.to_bytes()
+    assert blob[:1] == (b"\x01" if count < 100 else b"\x02")
+    assert HyperLogLog.from_bytes(blob).registers == sketch.registers
+
+    merged = HyperLogLog()
+    merged.add("ip-extra")
+    merged.merge_bytes(blob)
+    assert merged.estimate() >= sketch.estimate()
+
+
+def test_rejects_mismatched_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge_bytes(b"\x02" + zlib.compress(bytes(4096)))
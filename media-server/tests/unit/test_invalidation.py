@@ -0,0 +1,103 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import app.services.invalidation as invalidation
+
+
+def test_publish_invalidation_sends_kind_key_and_origin():
+    mock_client = MagicMock()
+    with patch("app.services.invalidation._get_redis_client", return_value=mock_client):
+        invalidation._publish_invalidation("share", "abc")
+
+    channel, raw = mock_client.publish.call_args.args
+    assert channel == invalidation.REDIS_INVALIDATION_CHANNEL
+    assert json.loads(raw) == {
+        "kind": "share",
+        "key": "abc",
+        "origin": invalidation._process_origin(),
+    }
+
+
+def test_publish_invalidation_without_redis_is_noop():
+    with patch("app.services.invalidation._get_redis_client", return_value=None):
+        invalidation._publish_invalidation("share", "abc")
+
+
+def test_handle_message_runs_handlers_and_skips_own_messages():
+    seen = []
+    invalidation.register_invalidation_handler("test-kind", seen.append)
+
+    other = json.dumps({"kind": "test-kind", "key": "k1", "origin": "other-host:1:ff"})
+    own = json.dumps({"kind": "test-kind", "key": "k2", "origin": invalidation._process_origin()})
+    assert invalidation._handle_invalidation_message(other) is True
+    assert invalidation._handle_invalidation_message(own) is False
+    assert invalidation._handle_invalidation_message("not json") is False
+    assert invalidation._handle_invalidation_message(json.dumps({"kind": 1})) is False
+    assert seen == ["k1"]
+
+
+def test_remote_share_invalidation_evicts_local_entry():
+    from app.services.share_cache import _share_files_cache
+
+    _share_files_cache.clear()
+    _share_files_cache.set(
+        "req", source_hash="src", recursive=True, files=[{"name": "a"}], ttl_seconds=60
+    )
+    message = json.dumps({"kind": "share", "key": "req", "origin": "other"})
+    invalidation._handle_invalidation_message(message)
+
+    assert "req" not in _share_files_cache
+
+
+def test_clear_share_cache_publishes(monkeypatch):
+    import app.services.share_cache as share_cache
+
+    published = []
+    monkeypatch.setattr(share_cache, "_redis_share_cache_delete", lambda _h: None)
+    monkeypatch.setattr(
+        share_cache, "_publish_invalidation", lambda kind, key=None: published.append((kind, key))
+    )
+    share_cache.clear_share_cache("req")
+
+    assert published == [("share", "req")]
+
+
+def test_remote_analytics_invalidation_clears_all_entries(monkeypatch):
+    import app.services.analytics as analytics
+
+    monkeypatch.setattr(analytics, "ANALYTICS_CACHE_TTL_SECONDS", 60)
+    analytics._analytics_cache_set("a", {"v": 1})
+    analytics._analytics_cache_set("b", {"v": 2})
+    invalidation._handle_invalidation_message(
+        json.dumps({"kind": "analytics", "key": None, "origin": "other"})
+    )
+
+    assert analytics._analytics_cache_get("a") is None
+    assert analytics._analytics_cache_get("b") is None
+
+
+def test_ensure_listener_is_noop_without_redis(monkeypatch):
+    monkeypatch.setattr(invalidation, "REDIS_ENABLED", False)
+    assert invalidation._ensure_invalidation_listener() is False
+
+
+def test_ensure_listener_starts_one_thread_per_process(monkeypatch):
+    monkeypatch.setattr(invalidation, "REDIS_ENABLED", True)
+    monkeypatch.setattr(invalidation, "_listener_thread", None)
+    started = []
+
+    class FakeThread:
+        def __init__(self, target, name, daemon):
+            self.alive = False
+
+        def start(self):
+            self.alive = True
+            started.append(self)
+
+        def is_alive(self):
+            return self.alive
+
+    monkeypatch.setattr(invalidation.threading, "Thread", FakeThread)
+    assert invalidation._ensure_invalidation_listener() is True
+    assert invalidation._ensure_invalidation_listener() is False
+    assert len(started) == 1
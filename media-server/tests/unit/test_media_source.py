@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+import app.services.media_source as media_source
+
+
+@pytest.fixture
+def share_root(tmp_path, monkeypatch):
+    root = tmp_path / "srv"
+    share = root / "users" / "alice" / "trip"
+    (share / "nested").mkdir(parents=True)
+    (share / "a.mp4").write_bytes(b"video")
+    (share / "nested" / "b.mov").write_bytes(b"video")
+    (tmp_path / "secret.mp4").write_bytes(b"outside")
+    os.symlink(tmp_path / "secret.mp4", share / "escape.mp4")
+
+    calls = []
+
+    def fake_fetch(source_hash, subpath=None):
+        calls.append(source_hash)
+        return {
+            "path": "/users/alice/trip",
+            "items": [{"name": "a.mp4"}, {"name": "nested", "isDir": True}],
+        }
+
+    monkeypatch.setattr(media_source, "MEDIA_SOURCE_ROOT", str(root))
+    monkeypatch.setattr(media_source, "MEDIA_LOCAL_SOURCE_ENABLED", True)
+    monkeypatch.setattr(media_source, "_fetch_public_share_json", fake_fetch)
+    media_source._share_roots.clear()
+    yield share, calls
+    media_source._share_roots.clear()
+
+
+def test_resolves_share_files_to_local_paths(share_root):
+    share, calls = share_root
+
+    assert media_source._media_source("src", "a.mp4") == str(share / "a.mp4")
+    assert media_source._media_source("src", "nested/b.mov") == str(share / "nested" / "b.mov")
+    assert calls == ["src"]
+
+
+def test_falls_back_to_http_outside_share_or_missing(share_root):
+    assert media_source._resolve_local_media_source("src", "escape.mp4") is None
+    assert media_source._resolve_local_media_source("src", "../../secret.mp4") is None
+    assert media_source._resolve_local_media_source("src", "nested") is None
+    assert media_source._media_source("src", "missing file.mp4") == (
+        f"{media_source.FILEBROWSER_PUBLIC_DL_API}/src/missing%20file.mp4?inline=true"
+    )
+
+
+def test_unverified_share_root_is_not_trusted(share_root, monkeypatch):
+    monkeypatch.setattr(
+        media_source,
+        "_fetch_public_share_json",
+        lambda source_hash, subpath=None: {"path": "/users/alice/trip", "items": [{"name": "x"}]},
+    )
+    assert media_source._resolve_local_media_source("other", "a.mp4") is None
+
+    monkeypatch.setattr(media_source, "MEDIA_LOCAL_SOURCE_ENABLED", False)
+    assert media_source._resolve_local_media_source("src", "a.mp4") is None
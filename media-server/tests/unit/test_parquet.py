@@ -0,0 +1,117 @@
+import struct
+
+import pytest
+
+from app.utils.parquet import (
+    _T_BINARY,
+    _T_I64,
+    _T_LIST,
+    _T_STRUCT,
+    INT64,
+    MAGIC,
+    STRING,
+    ParquetFile,
+    ParquetWriter,
+    _decode_levels,
+    _encode_struct,
+    _ThriftReader,
+)
+
+SCHEMA = [("id", INT64), ("name", STRING), ("created_at", INT64)]
+
+
+def _write(path, row_groups):
+    with open(path, "wb") as handle:
+        writer = ParquetWriter(handle, SCHEMA)
+        for row_group in row_groups:
+            writer.write_row_group(row_group)
+        writer.close()
+    return ParquetFile(str(path))
+
+
+def test_round_trips_columns_with_nulls(tmp_path):
+    parquet = _write(
+        tmp_path / "a.parquet",
+        [
+            {"id": [1, 2, 3], "name": ["a", None, "ünï"], "created_at": [-5, None, 2**40]},
+            {"id": [4], "name": [""], "created_at": [7]},
+            {"id": [], "name": [], "created_at": []},
+        ],
+    )
+
+    assert parquet.num_rows == 4
+    assert parquet.num_row_groups == 2
+    assert parquet.schema == {"id": INT64, "name": STRING, "created_at": INT64}
+    assert parquet.read_column(0, "name") == ["a", None, "ünï"]
+    assert parquet.read_column(0, "created_at") == [-5, None, 2**40]
+    assert parquet.read_column(1, "name") == [""]
+    assert parquet.row_group_rows(0) == 3
+
+
+def test_row_group_statistics_skip_nulls(tmp_path):
+    parquet = _write(
+        tmp_path / "a.parquet",
+        [
+            {"id": [3, 1, 2], "name": ["x", "y", "z"], "created_at": [None, 20, 10]},
+            {"id": [4], "name": ["w"], "created_at": [None]},
+        ],
+    )
+
+    assert parquet.statistics(0, "created_at") == (10, 20)
+    assert parquet.statistics(0, "id") == (1, 3)
+    assert parquet.statistics(1, "created_at") is None
+    assert parquet.statistics(0, "name") is None
+
+
+def test_large_row_groups_compress(tmp_path):
+    rows = 5000
+    parquet = _write(
+        tmp_path / "a.parquet",
+        [
+            {
+                "id": list(range(rows)),
+                "name": ["file_download"] * rows,
+                "created_at": [1_700_000_000 + n for n in range(rows)],
+            }
+        ],
+    )
+
+    assert parquet.read_column(0, "id")[-1] == rows - 1
+    assert (tmp_path / "a.parquet").stat().st_size < rows * 4
+
+
+def test_rejects_files_without_magic(tmp_path):
+    path = tmp_path / "bad.parquet"
+    path.write_bytes(b"not parquet" + struct.pack("<I", 3) + b"PAR0")
+    with pytest.raises(ValueError):
+        ParquetFile(str(path))
+    assert MAGIC == b"PAR1"
+
+
+def test_thrift_structs_round_trip():
+    encoded = _encode_struct(
+        [
+            (1, _T_I64, -3),
+            (40, _T_BINARY, "far field"),
+            (41, _T_LIST, (_T_I64, list(range(20)))),
+            (42, _T_STRUCT, [(1, _T_BINARY, b"\x00\xff")]),
+            (43, _T_I64, None),
+        ]
+    )
+
+    assert _ThriftReader(encoded).read_struct() == {
+        1: -3,
+        40: b"far field",
+        41: list(range(20)),
+        42: {1: b"\x00\xff"},
+    }
+
+
+def test_decodes_bit_packed_levels_from_other_writers():
+    # One bit-packed group of eight levels, then a run of three ones.
+    data = struct.pack("<I", 4) + bytes([0x03, 0b10110001, 0x06, 0x01])
+
+    levels, end = _decode_levels(data, 0, 11)
+
+    assert levels == [1, 0, 0, 0, 1, 1, 0, 1, 1, 1, 1]
+    assert end == len(data)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from app.services.share_cache import ShareFilesCache, _estimate_files_bytes
+
+
+def _files(count: int, prefix: str = "f") -> list[dict]:
+    return [
+        {"name": f"{prefix}{i}.jpg", "path": f"dir/{prefix}{i}.jpg", "size": i, "modified": 0}
+        for i in range(count)
+    ]
+
+
+def test_estimate_files_bytes_grows_with_items():
+    assert _estimate_files_bytes(_files(100)) > _estimate_files_bytes(_files(10)) > 0
+
+
+def test_get_hit_and_miss_counters():
+    cache = ShareFilesCache(max_bytes=10 * 1024 * 1024)
+    files = _files(3)
+    cache.set("a", source_hash="src", recursive=True, files=files, ttl_seconds=60, now=100)
+
+    assert cache.get("a", source_hash="src", recursive=True, max_age_seconds=60, now=110) is files
+    assert cache.get("a", source_hash="other", recursive=True, max_age_seconds=60, now=110) is None
+    assert cache.get("a", source_hash="src", recursive=False, max_age_seconds=60, now=110) is None
+    assert cache.get("missing", source_hash="src", recursive=True, max_age_seconds=60) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 1
+
+
+def test_entry_ttl_expires_independently_of_max_age():
+    cache = ShareFilesCache(max_bytes=10 * 1024 * 1024)
+    cache.set("a", source_hash="src", recursive=True, files=_files(1), ttl_seconds=10, now=100)
+
+    assert cache.get("a", source_hash="src", recursive=True, max_age_seconds=3600, now=111) is None
+    assert "a" not in cache
+    assert cache.stats()["evictions"] == {"expired": 1}
+
+
+def test_max_age_is_respected_without_evicting():
+    cache = ShareFilesCache(max_bytes=10 * 1024 * 1024)
+    cache.set("a", source_hash="src", recursive=True, files=_files(1), ttl_seconds=600, now=100)
+
+    assert cache.get("a", source_hash="src", recursive=True, max_age_seconds=5, now=110) is None
+    assert "a" in cache
+
+
+def test_evicts_least_recently_used_by_bytes():
+    one = _estimate_files_bytes(_files(50))
+    cache = ShareFilesCache(max_bytes=int(one * 2.5))
+    cache.set("a", source_hash="s", recursive=True, files=_files(50, "a"), ttl_seconds=60, now=0)
+    cache.set("b", source_hash="s", recursive=True, files=_files(50, "b"), ttl_seconds=60, now=0)
+
+    # Touch "a" so "b" becomes the eviction candidate.
+    assert cache.get("a", source_hash="s", recursive=True, max_age_seconds=60, now=1) is not None
+    cache.set("c", source_hash="s", recursive=True, files=_files(50, "c"), ttl_seconds=60, now=2)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert stats["evictions"] == {"capacity": 1}
+
+
+def test_oversize_list_is_not_cached():
+    cache = ShareFilesCache(max_bytes=1024)
+    stored = cache.set(
+        "big", source_hash="s", recursive=True, files=_files(500), ttl_seconds=60, now=0
+    )
+
+    assert stored is False
+    assert len(cache) == 0
+    stats = cache.stats()
+    assert stats["oversize"] == 1
+    assert stats["evictions"] == {}
+
+
+def test_replace_pop_and_clear_track_bytes():
+    cache = ShareFilesCache(max_bytes=10 * 1024 * 1024)
+    cache.set("a", source_hash="s", recursive=True, files=_files(10), ttl_seconds=60, now=0)
+    cache.set("a", source_hash="s", recursive=True, files=_files(20), ttl_seconds=60, now=0)
+    assert cache.stats()["bytes"] == _estimate_files_bytes(_files(20))
+
+    assert cache.pop("a") is not None
+    assert cache.stats()["bytes"] == 0
+
+    cache.set("b", source_hash="s", recursive=True, files=_files(5), ttl_seconds=60, now=0)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_stale_entry_served_within_stale_window():
+    cache = ShareFilesCache(max_bytes=10 * 1024 * 1024)
+    files = _files(2)
+    cache.set(
+        "a",
+        source_hash="src",
+        recursive=True,
+        files=files,
+        ttl_seconds=10,
+        stale_seconds=50,
+        now=100,
+    )
+
+    assert cache.get("a", source_hash="src", recursive=True, max_age_seconds=60, now=115) is None
+    stale = cache.get(
+        "a", source_hash="src", recursive=True, max_age_seconds=60, stale_seconds=50, now=115
+    )
+    assert stale == files
+    assert stale is not files
+    assert stale.stale is True
+    assert stale.stale_age == 5
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["hits"] == 0
+    assert stats["misses"] == 1
+
+    assert (
+        cache.get(
+            "a", source_hash="src", recursive=True, max_age_seconds=60, stale_seconds=50, now=161
+        )
+        is None
+    )
+    assert "a" not in cache
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+from unittest.mock import MagicMock, patch
+
+from app.services import share_codec
+from app.services.share import _build_folder_share_file_list
+from app.services.share_codec import _decode_share_payload, _encode_share_payload
+
+
+def _folder_files(count: int = 50) -> list[dict]:
+    root = {
+        "items": [
+            {
+                "path": f"/Event 2024/IMG_{i:04d}.jpg",
+                "name": f"IMG_{i:04d}.jpg",
+                "size": i,
+                "modified": i,
+            }
+            for i in range(count)
+        ]
+    }
+    return _build_folder_share_file_list(
+        request_hash="req", source_hash="src", root=root, recursive=False
+    )
+
+
+def _payload(files: list[dict]) -> dict:
+    return {"created_at": 1.0, "source_hash": "src", "recursive": True, "files": files}
+
+
+def test_compact_round_trip_rebuilds_urls():
+    files = _folder_files()
+    raw = _encode_share_payload(_payload(files), request_hash="req")
+
+    assert isinstance(raw, bytes)
+    assert raw.startswith(share_codec._COMPACT_MAGIC)
+    assert len(raw) * 3 < len(json.dumps(_payload(files)))
+
+    decoded = _decode_share_payload(raw, request_hash="req")
+    assert decoded["files"] == files
+    assert decoded["created_at"] == 1.0
+
+
+def test_compact_keeps_urls_that_cannot_be_derived():
+    files = [
+        {
+            "name": "clip.mp4",
+            "path": "clip.mp4",
+            "type": "video",
+            "extension": "mp4",
+            "size": 1,
+            "modified": 2,
+            "inline_url": "/api/public/file/src?inline=true",
+            "download_url": "/api/share/req/download",
+        }
+    ]
+    raw = _encode_share_payload(_payload(files), request_hash="req")
+    assert _decode_share_payload(raw, request_hash="req")["files"] == files
+
+
+def test_compact_falls_back_to_rows_for_nonstandard_items():
+    files = [{"name": "t"}]
+    raw = _encode_share_payload(_payload(files), request_hash="req")
+    assert _decode_share_payload(raw, request_hash="req")["files"] == files
+
+
+def test_reads_legacy_json_and_writes_json_in_json_mode():
+    files = _folder_files(2)
+    legacy = json.dumps(_payload(files))
+    assert _decode_share_payload(legacy, request_hash="req")["files"] == files
+    assert _decode_share_payload(legacy.encode(), request_hash="req")["files"] == files
+
+    with patch.object(share_codec, "SHARE_CACHE_FORMAT", "json"):
+        raw = _encode_share_payload(_payload(files), request_hash="req")
+    assert json.loads(raw)["files"] == files
+
+
+def test_corrupt_compact_payload_is_a_miss():
+    assert _decode_share_payload(share_codec._COMPACT_MAGIC + b"junk", request_hash="req") is None
+
+
+def test_redis_share_cache_round_trip_in_compact_format():
+    import app.services.cache as cache
+
+    store: dict = {}
+    mock_client = MagicMock()
+    mock_client.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+    mock_client.get.side_effect = store.get
+    files = _folder_files(5)
+    files.etag = "abc123"
+
+    with patch("app.services.cache._get_redis_client", return_value=mock_client):
+        cache._redis_share_cache_set(
+            "req", source_hash="src", recursive=False, files=files, ttl_seconds=60
+        )
+        assert isinstance(next(iter(store.values())), bytes)
+        cached = cache._redis_share_cache_get(
+            "req", source_hash="src", recursive=False, max_age_seconds=60
+        )
+
+    assert cached == files
+    assert cached.etag == "abc123"
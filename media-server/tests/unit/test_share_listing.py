@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services.share import ShareFileList
+from app.services.share_listing import ShareListQueryError, _share_list_page
+
+
+def _files() -> ShareFileList:
+    return ShareFileList(
+        [
+            {
+                "name": "b.jpg",
+                "path": "a/b.jpg",
+                "type": "image",
+                "extension": "jpg",
+                "size": 30,
+                "modified": 3,
+            },
+            {
+                "name": "A.mp4",
+                "path": "a/A.mp4",
+                "type": "video",
+                "extension": "mp4",
+                "size": 10,
+                "modified": 1,
+            },
+            {
+                "name": "c.pdf",
+                "path": "c.pdf",
+                "type": "file",
+                "extension": "pdf",
+                "size": 20,
+                "modified": 2,
+            },
+            {
+                "name": "d.png",
+                "path": "x/d.png",
+                "type": "image",
+                "extension": "png",
+                "size": 40,
+                "modified": 4,
+            },
+        ]
+    )
+
+
+def _walk(files, **kwargs) -> list[str]:
+    names: list[str] = []
+    cursor = None
+    while True:
+        page, _total, cursor = _share_list_page(files, cursor=cursor, **kwargs)
+        names.extend(f["name"] for f in page)
+        if cursor is None:
+            return names
+
+
+def test_no_params_returns_everything_in_crawl_order():
+    files = _files()
+    page, total, cursor = _share_list_page(files)
+    assert page == list(files)
+    assert total == 4
+    assert cursor is None
+
+
+@pytest.mark.parametrize(
+    ("sort", "descending", "expected"),
+    [
+        ("name", False, ["A.mp4", "b.jpg", "c.pdf", "d.png"]),
+        ("size", True, ["d.png", "b.jpg", "c.pdf", "A.mp4"]),
+        ("modified", False, ["A.mp4", "c.pdf", "b.jpg", "d.png"]),
+        ("type", False, ["c.pdf", "b.jpg", "d.png", "A.mp4"]),
+        (None, False, ["b.jpg", "A.mp4", "c.pdf", "d.png"]),
+    ],
+)
+def test_pages_cover_sorted_list(sort, descending, expected):
+    assert _walk(_files(), sort=sort, descending=descending, limit=1) == expected
+    assert _walk(_files(), sort=sort, descending=descending, limit=3) == expected
+
+
+def test_filters_apply_before_pagination():
+    files = _files()
+    page, total, cursor = _share_list_page(files, types={"image"}, sort="name", limit=1)
+    assert [f["name"] for f in page] == ["b.jpg"]
+    assert total == 2
+    assert _walk(files, types={"image"}, sort="name", limit=1) == ["b.jpg", "d.png"]
+    assert _walk(files, exts={"pdf", "mp4"}) == ["A.mp4", "c.pdf"]
+    assert _walk(files, prefix="a/", sort="size", limit=1) == ["A.mp4", "b.jpg"]
+
+
+def test_sorted_views_are_memoized_on_share_lists():
+    files = _files()
+    _share_list_page(files, sort="name", limit=2)
+    view = files.sorted_views["name"]
+    _share_list_page(files, sort="name", limit=2)
+    assert files.sorted_views["name"] is view
+
+
+def test_cursor_survives_list_rebuild():
+    files = _files()
+    page, _total, cursor = _share_list_page(files, sort="name", limit=2)
+    rebuilt = ShareFileList([f for f in _files() if f["name"] != "A.mp4"])
+    page2, _total, _cursor = _share_list_page(rebuilt, sort="name", limit=2, cursor=cursor)
+    assert [f["name"] for f in page2] == ["c.pdf", "d.png"]
+
+
+def test_bad_queries_raise():
+    files = _files()
+    with pytest.raises(ShareListQueryError):
+        _share_list_page(files, sort="colour")
+    with pytest.raises(ShareListQueryError):
+        _share_list_page(files, sort="name", cursor="not-a-cursor")
+    _page, _total, cursor = _share_list_page(files, sort="name", limit=1)
+    with pytest.raises(ShareListQueryError):
+        _share_list_page(files, sort="size", cursor=cursor)
+
+
+@pytest.mark.parametrize("gzip", [False, True])
+def test_stream_share_listing_matches_json(gzip):
+    import json
+    import zlib
+
+    from app.services.share_listing import _encode_share_items, _stream_share_listing
+
+    files = ShareFileList(_files() * 5000)
+    _encode_share_items(files)
+    page, total, cursor = _share_list_page(files, sort="name", limit=1000)
+    meta = {"total": total, "next_cursor": cursor}
+
+    body = b"".join(_stream_share_listing(files, page, meta, gzip=gzip))
+    if gzip:
+        body = zlib.decompress(body, 31)
+    assert json.loads(body) == {"files": page, "meta": meta}
+
+
+def test_encoded_items_count_toward_cache_budget():
+    from app.services.share_cache import _estimate_files_bytes
+    from app.services.share_listing import _encode_share_items
+
+    files = _files()
+    before = _estimate_files_bytes(files)
+    _encode_share_items(files)
+    assert len(files.encoded_items) == len(files)
+    assert _estimate_files_bytes(files) > before
+
+
+def test_share_list_etag_tracks_content():
+    from app.services.share_listing import _share_list_etag
+
+    a, b = _files(), _files()
+    assert _share_list_etag(a) == _share_list_etag(b)
+    assert a.etag == _share_list_etag(a)
+    b[0] = dict(b[0], size=31)
+    b.etag = None
+    assert _share_list_etag(b) != _share_list_etag(a)
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+import app.services.share_manifest as manifest
+from app.services.share import ShareFileList
+
+H1 = "manifestshare0000001"
+
+
+@pytest.fixture(autouse=True)
+def _clean_manifest(monkeypatch):
+    monkeypatch.setattr(manifest, "SHARE_MANIFEST_ENABLED", True)
+    manifest._share_manifest_delete(H1)
+    yield
+    manifest._share_manifest_delete(H1)
+
+
+def _files(etag="e1"):
+    files = ShareFileList([{"name": "a.jpg", "path": "a.jpg", "type": "image"}])
+    files.etag = etag
+    return files
+
+
+def test_manifest_round_trip():
+    manifest._share_manifest_set(
+        H1, source_hash="src", recursive=True, files=_files(), ttl_seconds=60
+    )
+
+    got = manifest._share_manifest_get(H1, source_hash="src", recursive=True, max_age_seconds=60)
+
+    assert got == [{"name": "a.jpg", "path": "a.jpg", "type": "image"}]
+    assert got.etag == "e1"
+    assert got.fresh_until == pytest.approx(time.time() + 60, abs=2)
+    assert (
+        manifest._share_manifest_get(H1, source_hash="other", recursive=True, max_age_seconds=60)
+        is None
+    )
+    assert (
+        manifest._share_manifest_get(H1, source_hash="src", recursive=False, max_age_seconds=60)
+        is None
+    )
+
+
+def test_manifest_stale_window(monkeypatch):
+    manifest._share_manifest_set(
+        H1,
+        source_hash="src",
+        recursive=True,
+        files=_files(),
+        ttl_seconds=10,
+        stale_seconds=100,
+    )
+    later = time.time() + 30
+    monkeypatch.setattr(manifest.time, "time", lambda: later)
+
+    assert (
+        manifest._share_manifest_get(H1, source_hash="src", recursive=True, max_age_seconds=60)
+        is None
+    )
+    stale = manifest._share_manifest_get(
+        H1, source_hash="src", recursive=True, max_age_seconds=60, stale_seconds=100
+    )
+    assert stale is not None and stale.stale
+    assert stale.stale_age == pytest.approx(20, abs=2)
+
+
+def test_manifest_unchanged_etag_skips_reencoding(monkeypatch):
+    manifest._share_manifest_set(
+        H1, source_hash="src", recursive=True, files=_files(), ttl_seconds=60
+    )
+    encoded = []
+    monkeypatch.setattr(
+        manifest, "_encode_share_payload", lambda payload, request_hash: encoded.append(1) or b""
+    )
+
+    manifest._share_manifest_set(
+        H1, source_hash="src", recursive=True, files=_files(), ttl_seconds=60
+    )
+    assert encoded == []
+
+    manifest._share_manifest_set(
+        H1,
+        source_hash="src",
+        recursive=True,
+        files=_files("e2"),
+        ttl_seconds=60,
+    )
+    assert encoded == [1]
+
+
+def test_cold_worker_answers_from_manifest(app_module, monkeypatch):
+    calls = {"count": 0}
+
+    def fake_fetch(share_hash, subpath=None):
+        calls["count"] += 1
+        return {"items": [{"isDir": False, "path": "/a.jpg", "name": "a.jpg", "extension": ".jpg"}]}
+
+    monkeypatch.setattr(app_module, "_fetch_public_share_json", fake_fetch)
+    app_module._share_files_cache.clear()
+
+    first = app_module._get_share_files(
+        H1, source_hash="src", force_refresh=False, max_age_seconds=60, recursive=False
+    )
+    # A restarted worker has an empty memory cache but the same disk.
+    app_module._share_files_cache.clear()
+    second = app_module._get_share_files(
+        H1, source_hash="src", force_refresh=False, max_age_seconds=60, recursive=False
+    )
+
+    assert calls["count"] == 1
+    assert second == first
+    assert H1 in app_module._share_files_cache
+    app_module._share_files_cache.clear()
+
+
+def test_clear_share_cache_drops_manifest_entry(monkeypatch):
+    import app.services.share_cache as share_cache
+
+    monkeypatch.setattr(share_cache, "_publish_invalidation", lambda kind, key=None: None)
+    manifest._share_manifest_set(
+        H1, source_hash="src", recursive=True, files=_files(), ttl_seconds=60
+    )
+    share_cache.clear_share_cache(H1)
+
+    assert (
+        manifest._share_manifest_get(H1, source_hash="src", recursive=True, max_age_seconds=60)
+        is None
+    )
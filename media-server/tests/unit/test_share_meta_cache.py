@@ -0,0 +1,100 @@
+import pytest
+
+import app.services.share_meta_cache as meta_cache
+
+
+@pytest.fixture(autouse=True)
+def _clean_meta_cache(monkeypatch):
+    meta_cache._meta_cache.clear()
+    monkeypatch.setattr(
+        meta_cache, "_redis_share_meta_get", lambda source_hash, subpath: (False, None)
+    )
+    monkeypatch.setattr(meta_cache, "_redis_share_meta_set", lambda *args, **kwargs: None)
+    yield
+    meta_cache._meta_cache.clear()
+
+
+def _counting_fetch(monkeypatch, result):
+    calls = []
+
+    def fake_fetch(source_hash, subpath=None):
+        calls.append(subpath)
+        return result
+
+    monkeypatch.setattr(meta_cache, "_fetch_public_share_json", fake_fetch)
+    return calls
+
+
+def test_subpath_lookups_are_cached(monkeypatch):
+    calls = _counting_fetch(monkeypatch, {"name": "a.mp4", "path": "/a.mp4", "size": 5})
+
+    first = meta_cache._fetch_public_share_json_cached("src", subpath="/a.mp4")
+    second = meta_cache._fetch_public_share_json_cached("src", subpath="a.mp4")
+
+    assert first == second == {"name": "a.mp4", "path": "/a.mp4", "size": 5}
+    assert calls == ["/a.mp4"]
+
+
+def test_not_found_is_cached_with_shorter_ttl(monkeypatch):
+    calls = _counting_fetch(monkeypatch, None)
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(meta_cache.time, "time", lambda: clock["now"])
+    monkeypatch.setattr(meta_cache, "SHARE_META_CACHE_NEGATIVE_TTL_SECONDS", 5)
+
+    assert meta_cache._fetch_public_share_json_cached("src", subpath="/gone.mp4") is None
+    assert meta_cache._fetch_public_share_json_cached("src", subpath="/gone.mp4") is None
+    assert len(calls) == 1
+
+    clock["now"] += 6
+    assert meta_cache._fetch_public_share_json_cached("src", subpath="/gone.mp4") is None
+    assert len(calls) == 2
+
+
+def test_root_listing_and_folder_lookups(monkeypatch):
+    calls = _counting_fetch(monkeypatch, {"name": "dir", "path": "/dir", "items": [{"a": 1}]})
+
+    meta_cache._fetch_public_share_json_cached("src")
+    meta_cache._fetch_public_share_json_cached("src")
+    assert calls == [None, None]
+
+    folder = meta_cache._fetch_public_share_json_cached("src", subpath="/dir")
+    assert folder == {"name": "dir", "path": "/dir", "isDir": True, "items": []}
+
+
+def test_prime_from_crawl_avoids_upstream_calls(monkeypatch):
+    calls = _counting_fetch(monkeypatch, None)
+    root_items = [
+        {"isDir": False, "path": "/a.mp4", "name": "a.mp4", "extension": ".mp4", "size": 3},
+        {"isDir": False, "path": "/b.jpg", "name": "b.jpg", "extension": ".jpg"},
+        {"isDir": True, "path": "/nested", "name": "nested"},
+    ]
+    index = {
+        "/nested": [
+            "stamp",
+            [{"path": "/nested/c.MOV", "name": "c.MOV", "extension": ".MOV", "modified": "m"}],
+            [],
+        ]
+    }
+
+    assert meta_cache._prime_share_file_meta("src", root_items, index) == 2
+
+    nested = meta_cache._fetch_public_share_json_cached("src", subpath="/nested/c.MOV")
+    assert nested == {
+        "path": "/nested/c.MOV",
+        "name": "c.MOV",
+        "extension": ".MOV",
+        "modified": "m",
+        "isDir": False,
+    }
+    assert meta_cache._fetch_public_share_json_cached("src", subpath="/a.mp4")["size"] == 3
+    assert calls == []
+
+
+def test_memory_cache_is_bounded(monkeypatch):
+    _counting_fetch(monkeypatch, {"name": "x"})
+    monkeypatch.setattr(meta_cache, "SHARE_META_CACHE_MAX_ITEMS", 2)
+
+    for name in ("a", "b", "c"):
+        meta_cache._fetch_public_share_json_cached("src", subpath=f"/{name}.mp4")
+
+    assert list(meta_cache._meta_cache) == [("src", "/b.mp4"), ("src", "/c.mp4")]
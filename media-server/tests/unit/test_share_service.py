@@ -57,3 +57,208 @@ def test_build_file_share_file_list():
     assert res[0]["name"] == "video.mov"
     assert res[0]["type"] == "video"
     assert res[0]["download_url"] == "/api/share/req1/download"
+
+
+def _fake_tree(depth: int, fanout: int, latency: float, tracker: dict | None = None):
+    """Builds a fake FileBrowser listing function over a synthetic folder tree."""
+    import threading
+    import time
+
+    lock = threading.Lock()
+
+    def listing(path: str) -> dict:
+        level = 0 if path == "/" else path.count("/")
+        items = [{"isDir": False, "path": f"{path.rstrip('/')}/f.jpg", "name": "f.jpg"}]
+        if level < depth:
+            for i in range(fanout):
+                items.append({"isDir": True, "path": f"{path.rstrip('/')}/d{i}"})
+        return {"items": items}
+
+    def fake_fetch(share_hash, subpath=None):
+        if tracker is not None:
+            with lock:
+                tracker["in_flight"] += 1
+                tracker["max_in_flight"] = max(tracker["max_in_flight"], tracker["in_flight"])
+        try:
+            time.sleep(latency)
+            return listing(subpath or "/")
+        finally:
+            if tracker is not None:
+                with lock:
+                    tracker["in_flight"] -= 1
+
+    return listing("/"), fake_fetch
+
+
+def test_build_folder_share_file_list_fetches_concurrently():
+    tracker = {"in_flight": 0, "max_in_flight": 0}
+    root, fake_fetch = _fake_tree(depth=2, fanout=4, latency=0.02, tracker=tracker)
+
+    with patch("app.services.share._fetch_public_share_json", side_effect=fake_fetch):
+        res = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=root, recursive=True, concurrency=4
+        )
+
+    # root + 4 folders + 16 subfolders, one file each
+    assert len(res) == 21
+    assert res.truncated is False
+    assert 1 < tracker["max_in_flight"] <= 4
+
+
+def test_build_folder_share_file_list_order_is_deterministic():
+    root, fake_fetch = _fake_tree(depth=2, fanout=3, latency=0)
+
+    with patch("app.services.share._fetch_public_share_json", side_effect=fake_fetch):
+        serial = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=root, recursive=True, concurrency=1
+        )
+        parallel = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=root, recursive=True, concurrency=6
+        )
+
+    assert [f["path"] for f in serial] == [f["path"] for f in parallel]
+    assert serial[0]["path"] == "f.jpg"
+    assert serial[1]["path"] == "d0/f.jpg"
+    assert serial[2]["path"] == "d0/d0/f.jpg"
+
+
+def test_build_folder_share_file_list_deadline_returns_partial():
+    root, fake_fetch = _fake_tree(depth=3, fanout=3, latency=0.05)
+
+    with patch("app.services.share._fetch_public_share_json", side_effect=fake_fetch):
+        res = share_service._build_folder_share_file_list(
+            request_hash="r",
+            source_hash="s",
+            root=root,
+            recursive=True,
+            concurrency=2,
+            deadline_seconds=0.08,
+        )
+
+    assert res.truncated is True
+    assert 1 <= len(res) < 40
+    assert res[0]["path"] == "f.jpg"
+
+
+def test_build_folder_share_file_list_propagates_upstream_errors():
+    root = {"items": [{"isDir": True, "path": "/a"}, {"isDir": True, "path": "/b"}]}
+
+    with patch("app.services.share._fetch_public_share_json", side_effect=RuntimeError("boom")):
+        with pytest.raises(RuntimeError):
+            share_service._build_folder_share_file_list(
+                request_hash="r", source_hash="s", root=root, recursive=True
+            )
+
+
+def test_crawl_requests_count_towards_the_callers_meter_only():
+    import re
+    import threading
+
+    import requests_mock
+
+    from app.services.filebrowser import FileBrowserClient, _count_public_share_requests
+
+    client = FileBrowserClient(base_url="http://test", signer=lambda h, m, u: h)
+    root = {"items": [{"isDir": True, "path": f"/d{i}"} for i in range(3)]}
+
+    with requests_mock.Mocker() as m:
+        m.get(re.compile(r"http://test/api/public/share/"), json={"items": []})
+        with patch(
+            "app.services.share._fetch_public_share_json",
+            side_effect=client.fetch_public_share_json,
+        ):
+            with _count_public_share_requests() as calls:
+                share_service._build_folder_share_file_list(
+                    request_hash="r", source_hash="s", root=root, recursive=True, concurrency=3
+                )
+                # A request served by another thread of the process meanwhile.
+                other = threading.Thread(target=client.fetch_public_share_json, args=("other",))
+                other.start()
+                other.join()
+
+    assert m.call_count == 4
+    assert calls() == 3
+
+
+def _stamped_tree(stamps: dict[str, str], calls: list[str]):
+    """Fake FileBrowser over /a, /a/x and /b whose folder stamps come from `stamps`."""
+    children = {"/": ["/a", "/b"], "/a": ["/a/x"], "/a/x": [], "/b": []}
+
+    def listing(path: str) -> dict:
+        items = [{"isDir": False, "path": f"{path.rstrip('/')}/f.jpg", "name": "f.jpg"}]
+        for child in children[path]:
+            items.append({"isDir": True, "path": child, "modified": stamps[child]})
+        return {"items": items}
+
+    def fake_fetch(share_hash, subpath=None):
+        calls.append(subpath)
+        return listing(subpath or "/")
+
+    return listing, fake_fetch
+
+
+def test_build_folder_share_file_list_reuses_unchanged_folders_from_index():
+    stamps = {"/a": "t1", "/a/x": "t1", "/b": "t1"}
+    calls: list[str] = []
+    listing, fake_fetch = _stamped_tree(stamps, calls)
+    index: dict = {}
+
+    with patch("app.services.share._fetch_public_share_json", side_effect=fake_fetch):
+        first = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        assert sorted(calls) == ["/a", "/a/x", "/b"]
+        assert set(index) == {"/a", "/a/x", "/b"}
+
+        calls.clear()
+        unchanged = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        assert calls == []
+        assert unchanged == first
+
+        calls.clear()
+        stamps["/b"] = "t2"
+        share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        assert calls == ["/b"]
+        assert index["/b"][0] == "t2"
+
+
+def test_nested_change_under_unchanged_folder_is_picked_up_after_reuse_max_age(monkeypatch):
+    stamps = {"/a": "t1", "/a/x": "t1", "/b": "t1"}
+    calls: list[str] = []
+    listing, fake_fetch = _stamped_tree(stamps, calls)
+    added: list[dict] = []
+
+    def fetch_with_added(share_hash, subpath=None):
+        data = fake_fetch(share_hash, subpath)
+        if subpath == "/a/x":
+            data["items"].extend(added)
+        return data
+
+    index: dict = {}
+    with patch("app.services.share._fetch_public_share_json", side_effect=fetch_with_added):
+        share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        # A file lands in /a/x: /a's own stamp (in the root listing) does not change.
+        added.append({"isDir": False, "path": "/a/x/new.jpg", "name": "new.jpg"})
+        stamps["/a/x"] = "t2"
+
+        calls.clear()
+        cached = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        assert calls == []
+        assert "a/x/new.jpg" not in [f["path"] for f in cached]
+
+        monkeypatch.setattr(share_service, "SHARE_INDEX_REUSE_MAX_AGE_SECONDS", 0)
+        calls.clear()
+        refreshed = share_service._build_folder_share_file_list(
+            request_hash="r", source_hash="s", root=listing("/"), recursive=True, index=index
+        )
+        # /a and /b are verified by the root listing; only /a/x is re-listed.
+        assert calls == ["/a/x"]
+        assert "a/x/new.jpg" in [f["path"] for f in refreshed]
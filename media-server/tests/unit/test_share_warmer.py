@@ -0,0 +1,157 @@
+import sqlite3
+import time
+
+import pytest
+
+import app.services.share_warmer as warmer
+from app.services.analytics_partitions import _ensure_partition
+
+H1 = "aaaaaaaaaaaaaaaaaaaa"
+H2 = "bbbbbbbbbbbbbbbbbbbb"
+H3 = "cccccccccccccccccccc"
+
+
+@pytest.fixture
+def events_conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def _add_events(conn, share_hash, event_type, created_at, count):
+    partition = _ensure_partition(conn, created_at)
+    conn.executemany(
+        f"INSERT INTO {partition} (share_hash, event_type, created_at) VALUES (?, ?, ?)",
+        [(share_hash, event_type, created_at)] * count,
+    )
+
+
+def test_rank_prefers_recent_activity_and_weights_downloads(events_conn):
+    now = time.time()
+    # H1: many old views; H2: a few recent downloads; H3: one recent view.
+    _add_events(events_conn, H1, "gallery_view", int(now - 4 * 86400), 20)
+    _add_events(events_conn, H2, "zip_download", int(now - 600), 2)
+    _add_events(events_conn, H3, "gallery_view", int(now - 600), 1)
+    _add_events(events_conn, H3, "comment", int(now - 600), 50)
+
+    ranked = warmer._rank_warm_candidates(
+        events_conn, now=now, days=7, half_life_hours=24, limit=10
+    )
+
+    assert [h for h, _ in ranked] == [H2, H1, H3]
+    assert ranked[0][1] == pytest.approx(8.0, rel=0.05)
+    assert ranked[1][1] == pytest.approx(20 / 16, rel=0.1)
+
+
+def test_rank_ignores_events_outside_window_and_applies_limit(events_conn):
+    now = time.time()
+    _add_events(events_conn, H1, "file_download", int(now - 10 * 86400), 100)
+    _add_events(events_conn, H2, "file_download", int(now - 60), 1)
+    _add_events(events_conn, H3, "file_download", int(now - 60), 2)
+
+    ranked = warmer._rank_warm_candidates(events_conn, now=now, days=7, limit=1)
+
+    assert [h for h, _ in ranked] == [H3]
+
+
+def test_run_records_outcomes_and_cost(monkeypatch):
+    monkeypatch.setattr(warmer, "_redis_share_warm_run_set", lambda run, ttl_seconds: None)
+    calls = {"n": 0}
+    outcomes = {H1: ("warmed", 12), H2: ("fresh", 0), H3: ("missing", 0)}
+
+    def warm_one(share_hash):
+        calls["n"] += 3
+        if share_hash == "boom":
+            raise RuntimeError("upstream down")
+        return outcomes[share_hash]
+
+    run = warmer._run_share_cache_warm(
+        [H1, H2, H3, "boom"],
+        warm_one=warm_one,
+        filebrowser_calls=lambda: calls["n"],
+        calls_per_second=0,
+        max_calls=0,
+    )
+
+    assert (run.candidates, run.warmed, run.fresh, run.missing, run.failed) == (4, 1, 1, 1, 1)
+    assert run.items == 12
+    assert run.filebrowser_calls == 12
+    assert warmer._last_warm_run is run
+
+
+def test_run_paces_calls_and_stops_at_budget(monkeypatch):
+    monkeypatch.setattr(warmer, "_redis_share_warm_run_set", lambda run, ttl_seconds: None)
+    calls = {"n": 0}
+    slept = []
+
+    def warm_one(_share_hash):
+        calls["n"] += 10
+        return "warmed", 1
+
+    run = warmer._run_share_cache_warm(
+        [H1, H2, H3, "d" * 20],
+        warm_one=warm_one,
+        filebrowser_calls=lambda: calls["n"],
+        calls_per_second=100,
+        max_calls=20,
+        sleep=slept.append,
+    )
+
+    assert run.warmed == 2
+    assert run.skipped == 2
+    # After 10 calls at 100/s the second share waits until ~0.1s into the run.
+    assert len(slept) == 1 and 0 < slept[0] <= 0.1
+    assert run.throttled_seconds == pytest.approx(slept[0])
+
+
+def test_share_warm_stats_prefers_redis_record(monkeypatch):
+    monkeypatch.setattr(warmer, "_redis_share_warm_run_get", lambda: {"warmed": 5})
+    assert warmer._share_warm_stats() == {"warmed": 5}
+
+    monkeypatch.setattr(warmer, "_redis_share_warm_run_get", lambda: None)
+    monkeypatch.setattr(warmer, "_last_warm_run", warmer.ShareWarmRun(started_at=1.0, warmed=2))
+    assert warmer._share_warm_stats()["warmed"] == 2
+
+
+def test_warm_tick_runs_only_for_lease_holder(app_module, monkeypatch):
+    ran = []
+    monkeypatch.setattr(app_module, "SHARE_CACHE_WARM_ENABLED", True)
+    monkeypatch.setattr(app_module, "ANALYTICS_ENABLED", True)
+    monkeypatch.setattr(app_module, "_rank_warm_candidates", lambda conn, now: [(H1, 1.0)])
+    monkeypatch.setattr(
+        app_module, "_run_share_cache_warm", lambda candidates, **_kw: ran.append(candidates)
+    )
+
+    monkeypatch.setattr(app_module, "_redis_lease_acquire", lambda name, ttl: None)
+    app_module._share_cache_warm_tick()
+    assert ran == []
+
+    monkeypatch.setattr(app_module, "_redis_lease_acquire", lambda name, ttl: "token")
+    app_module._share_cache_warm_tick()
+    assert ran == [[H1]]
+
+
+def test_warm_share_skips_lists_fresh_past_lead_time(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "REDIS_ENABLED", False)
+    monkeypatch.setattr(app_module, "_resolve_share_hash", lambda h: "src")
+    monkeypatch.setattr(app_module, "SHARE_CACHE_WARM_LEAD_SECONDS", 60)
+    builds = []
+    monkeypatch.setattr(
+        app_module,
+        "_build_share_files_once",
+        lambda request_hash, **kw: builds.append(request_hash) or [{"name": "a"}],
+    )
+    app_module._share_files_cache.clear()
+    app_module._share_files_cache.set(
+        H1, source_hash="src", recursive=True, files=[{"name": "a"}], ttl_seconds=3600
+    )
+    app_module._share_files_cache.set(
+        H2, source_hash="src", recursive=True, files=[{"name": "a"}], ttl_seconds=30
+    )
+
+    assert app_module._warm_share(H1) == ("fresh", 0)
+    assert app_module._warm_share(H2) == ("warmed", 1)
+    assert app_module._warm_share(H3) == ("warmed", 1)
+    assert builds == [H2, H3]
+    app_module._share_files_cache.clear()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    joined: list[str] = []
+    flight = SingleFlight(on_join=joined.append)
+    calls = {"count": 0}
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls["count"] += 1
+        started.set()
+        release.wait(2)
+        return ["result"]
+
+    results: list = []
+
+    def worker():
+        results.append(flight.do("key", slow))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=worker) for _ in range(5)]
+    for t in followers:
+        t.start()
+    while flight.stats()["waiting"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(2)
+
+    assert calls["count"] == 1
+    assert len(results) == 6
+    assert all(r is results[0] for r in results)
+    assert joined == ["key"] * 5
+    stats = flight.stats()
+    assert stats["leaders"] == 1
+    assert stats["joined"] == 5
+    assert stats["in_flight"] == 0
+
+
+def test_leader_error_propagates_to_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors: list[BaseException] = []
+
+    def failing():
+        started.set()
+        release.wait(2)
+        raise RuntimeError("upstream down")
+
+    def worker():
+        try:
+            flight.do("key", failing)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker)]
+    threads[0].start()
+    started.wait(2)
+    threads.append(threading.Thread(target=worker))
+    threads[1].start()
+    while flight.stats()["waiting"] < 1:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert len(errors) == 2
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == 1
+    assert flight.do("key", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("key", lambda: (_ for _ in ()).throw(ValueError("x")))
+    assert flight.do("key", lambda: 3) == 3
@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.utils import sqlite_pool
+from app.utils.sqlite_pool import SQLitePool, _retry_locked, _sqlite_pool
+
+
+def test_pool_reuses_configured_connections(tmp_path):
+    pool = SQLitePool("test", str(tmp_path / "a.sqlite3"), timeout=1, size=2)
+
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -sqlite_pool.SQLITE_CACHE_SIZE_KIB
+    with pool.connection() as conn:
+        assert conn is first
+    pool.close()
+
+
+def test_pool_rolls_back_abandoned_transactions(tmp_path):
+    pool = SQLitePool("test", str(tmp_path / "a.sqlite3"), timeout=1, size=1)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+
+    with pool.connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_pool_is_bounded_and_waits(tmp_path):
+    pool = SQLitePool("test", str(tmp_path / "a.sqlite3"), timeout=0.05, size=1)
+    release = threading.Event()
+    acquired = threading.Event()
+
+    def hold():
+        with pool.connection():
+            acquired.set()
+            release.wait(2)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    acquired.wait(2)
+    with pytest.raises(sqlite3.OperationalError, match="exhausted"):
+        with pool.connection():
+            pass
+    release.set()
+    worker.join()
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_pools_are_shared_per_path(tmp_path):
+    path = str(tmp_path / "a.sqlite3")
+    assert _sqlite_pool("x", path, timeout=1) is _sqlite_pool("x", path, timeout=1)
+    assert _sqlite_pool("x", path, timeout=1) is not _sqlite_pool("x", path + "2", timeout=1)
+
+
+def test_retry_locked_retries_only_lock_errors(monkeypatch):
+    monkeypatch.setattr(sqlite_pool.time, "sleep", lambda _: None)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return "ok"
+
+    assert _retry_locked("test", flaky) == "ok"
+    assert len(calls) == 3
+
+    def broken():
+        raise sqlite3.OperationalError("no such table: t")
+
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        _retry_locked("test", broken)